@@ -2,7 +2,7 @@
 Admin para o sistema de Alertas e Regras
 """
 from django.contrib import admin
-from .models import Rule, RuleParameter, Alert, NotificationPreference
+from .models import Rule, RuleParameter, Alert, AlertDigest, NotificationPreference
 
 
 class RuleParameterInline(admin.TabularInline):
@@ -112,9 +112,21 @@ class NotificationPreferenceAdmin(admin.ModelAdmin):
         ('Contatos', {
             'fields': ('phone_number', 'whatsapp_number')
         }),
+        ('Resumo', {
+            'fields': ('digest_window_minutes',)
+        }),
         ('Informações do Sistema', {
             'fields': ('updated_at',),
             'classes': ('collapse',)
         }),
     )
 
+
+@admin.register(AlertDigest)
+class AlertDigestAdmin(admin.ModelAdmin):
+    list_display = ['user', 'site', 'channel', 'opened_at', 'flush_at', 'sent_at', 'coalesced_count', 'suppressed_count']
+    list_filter = ['channel', 'sent_at', 'opened_at']
+    search_fields = ['user__email', 'site__name']
+    readonly_fields = ['opened_at', 'sent_at', 'coalesced_count', 'suppressed_count']
+    raw_id_fields = ['user', 'site']
+    filter_horizontal = ['alerts']
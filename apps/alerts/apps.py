@@ -5,3 +5,10 @@ class AlertsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "apps.alerts"
     verbose_name = "Alertas e Regras"
+    
+    def ready(self):
+        """Import signals when app is ready"""
+        try:
+            import apps.alerts.signals  # noqa
+        except ImportError:
+            pass
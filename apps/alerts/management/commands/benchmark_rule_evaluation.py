@@ -0,0 +1,93 @@
+"""
+Benchmark da avaliação de regras: snapshot vetorizado x consulta por condição.
+
+Gera N condições sintéticas (``> 0``) sobre os sensores do tenant e mede,
+para cada N:
+  - snapshot: uma consulta para todos os sensores + comparação NumPy
+  - sequencial: uma consulta e uma comparação Python por condição
+    (formato anterior do avaliador; limitado a --max-sequential)
+
+Nenhum alerta é criado.
+
+Uso:
+    python manage.py benchmark_rule_evaluation --tenant umc
+    python manage.py benchmark_rule_evaluation --tenant umc --counts 100,1000,10000 --runs 5
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django_tenants.utils import schema_context
+
+from apps.alerts.services.evaluation import SNAPSHOT_SQL, Condition, find_triggered, load_snapshot
+from apps.alerts.tasks import evaluate_condition
+from apps.tenants.models import Tenant
+
+
+class Command(BaseCommand):
+    help = 'Mede o tempo de um ciclo de avaliação de regras em função do número de condições'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tenant', type=str, required=True, help='Slug do tenant')
+        parser.add_argument('--counts', type=str, default='10,100,1000,5000',
+                            help='Números de condições testados')
+        parser.add_argument('--runs', type=int, default=3, help='Repetições por medida (mediana)')
+        parser.add_argument('--max-sequential', type=int, default=1000,
+                            help='Maior N medido no modo sequencial')
+
+    def handle(self, *args, **options):
+        from apps.assets.models import Sensor
+
+        tenant = Tenant.objects.filter(slug=options['tenant']).first()
+        if tenant is None:
+            raise CommandError(f"Tenant '{options['tenant']}' não encontrado")
+
+        counts = [int(value) for value in options['counts'].split(',')]
+
+        with schema_context(tenant.schema_name):
+            tags = list(Sensor.objects.filter(is_active=True).values_list('tag', flat=True))
+            if not tags:
+                raise CommandError('Tenant sem sensores')
+
+            self.stdout.write(self.style.WARNING(
+                f'\n⏱️ Avaliação de regras - {tenant.slug} ({len(tags)} sensores, mediana de {options["runs"]})\n'
+            ))
+            self.stdout.write(f"{'condições':>10}  {'snapshot (ms)':>14}  {'sequencial (ms)':>16}  {'speedup':>8}")
+
+            for count in counts:
+                conditions = [
+                    Condition(None, None, tags[i % len(tags)], tags[i % len(tags)], '>', 0.0, 0)
+                    for i in range(count)
+                ]
+                snapshot_ms = self._median(options['runs'], lambda: self._snapshot(conditions))
+                if count <= options['max_sequential']:
+                    sequential_ms = self._median(options['runs'], lambda: self._sequential(conditions))
+                    speedup = f"{sequential_ms / snapshot_ms:.1f}x" if snapshot_ms else '-'
+                    sequential = f"{sequential_ms:.1f}"
+                else:
+                    sequential, speedup = '-', '-'
+                self.stdout.write(f"{count:>10}  {snapshot_ms:>14.1f}  {sequential:>16}  {speedup:>8}")
+
+        self.stdout.write('')
+
+    def _median(self, runs, func):
+        timings = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - started) * 1000)
+        return sorted(timings)[len(timings) // 2]
+
+    def _snapshot(self, conditions):
+        snapshot = load_snapshot(condition.sensor_tag for condition in conditions)
+        return find_triggered(conditions, snapshot)
+
+    def _sequential(self, conditions):
+        met = []
+        for condition in conditions:
+            with connection.cursor() as cursor:
+                cursor.execute(SNAPSHOT_SQL, {'tags': [condition.sensor_tag]})
+                row = cursor.fetchone()
+            if row and evaluate_condition(row[1], condition.operator, condition.threshold):
+                met.append(condition)
+        return met
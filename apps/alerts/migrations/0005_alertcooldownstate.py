@@ -0,0 +1,68 @@
+# Per-(rule, parameter) cooldown summary read by check_alert_cooldown
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+BACKFILL_SQL = """
+    INSERT INTO alerts_cooldown_state
+        (rule_id, parameter_key, open_triggered_at, acknowledged_open, acknowledged_at, resolved_at, updated_at)
+    SELECT rule_id,
+           parameter_key,
+           MAX(triggered_at) FILTER (WHERE NOT acknowledged AND NOT resolved),
+           COUNT(*) FILTER (WHERE acknowledged AND NOT resolved) > 0,
+           MAX(acknowledged_at) FILTER (WHERE acknowledged AND NOT resolved),
+           MAX(resolved_at) FILTER (WHERE resolved),
+           NOW()
+    FROM alerts_alert
+    WHERE rule_id IS NOT NULL
+    GROUP BY rule_id, parameter_key
+"""
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("alerts", "0004_add_work_order_to_alert"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AlertCooldownState",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("parameter_key", models.CharField(max_length=100, verbose_name="Parâmetro")),
+                (
+                    "open_triggered_at",
+                    models.DateTimeField(blank=True, null=True, verbose_name="Último Alerta Ativo"),
+                ),
+                (
+                    "acknowledged_open",
+                    models.BooleanField(default=False, verbose_name="Reconhecido sem Resolução"),
+                ),
+                (
+                    "acknowledged_at",
+                    models.DateTimeField(blank=True, null=True, verbose_name="Último Reconhecimento"),
+                ),
+                ("resolved_at", models.DateTimeField(blank=True, null=True, verbose_name="Última Resolução")),
+                ("updated_at", models.DateTimeField(auto_now=True, verbose_name="Atualizado em")),
+                (
+                    "rule",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="cooldown_states",
+                        to="alerts.rule",
+                        verbose_name="Regra",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Estado de Cooldown",
+                "verbose_name_plural": "Estados de Cooldown",
+                "db_table": "alerts_cooldown_state",
+                "constraints": [
+                    models.UniqueConstraint(fields=("rule", "parameter_key"), name="unique_cooldown_state"),
+                ],
+            },
+        ),
+        migrations.RunSQL(BACKFILL_SQL, migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,35 @@
+# Statistical anomaly condition kinds for RuleParameter
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("alerts", "0005_alertcooldownstate"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="ruleparameter",
+            name="kind",
+            field=models.CharField(
+                choices=[
+                    ("threshold", "Limite fixo"),
+                    ("ewma", "Anomalia (média móvel exponencial)"),
+                    ("mad", "Anomalia (mediana/MAD robusta)"),
+                ],
+                default="threshold",
+                max_length=20,
+                verbose_name="Tipo de Condição",
+            ),
+        ),
+        migrations.AddField(
+            model_name="ruleparameter",
+            name="window",
+            field=models.PositiveIntegerField(
+                default=60,
+                help_text="Anomalias: span da média exponencial ou janela da mediana/MAD",
+                verbose_name="Janela (leituras)",
+            ),
+        ),
+    ]
@@ -0,0 +1,78 @@
+# Per-user digest window and coalesced alert digests
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("assets", "0007_virtualsensor"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("alerts", "0006_ruleparameter_kind_window"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="notificationpreference",
+            name="digest_window_minutes",
+            field=models.PositiveIntegerField(
+                default=10,
+                help_text="Alertas não críticos do mesmo site nesta janela vão em um único resumo (0 = desativado)",
+                verbose_name="Janela de Resumo (min)",
+            ),
+        ),
+        migrations.CreateModel(
+            name="AlertDigest",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("channel", models.CharField(max_length=20, verbose_name="Canal")),
+                ("opened_at", models.DateTimeField(auto_now_add=True, verbose_name="Aberto em")),
+                ("flush_at", models.DateTimeField(verbose_name="Envio Previsto")),
+                ("sent_at", models.DateTimeField(blank=True, null=True, verbose_name="Enviado em")),
+                ("coalesced_count", models.PositiveIntegerField(default=0, verbose_name="Alertas no Resumo")),
+                ("suppressed_count", models.PositiveIntegerField(default=0, verbose_name="Mensagens Suprimidas")),
+                (
+                    "alerts",
+                    models.ManyToManyField(
+                        blank=True,
+                        related_name="digests",
+                        to="alerts.alert",
+                        verbose_name="Alertas Retidos",
+                    ),
+                ),
+                (
+                    "site",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="alert_digests",
+                        to="assets.site",
+                        verbose_name="Site",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="alert_digests",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Usuário",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Resumo de Alertas",
+                "verbose_name_plural": "Resumos de Alertas",
+                "db_table": "alerts_digest",
+                "ordering": ["-opened_at"],
+                "indexes": [models.Index(fields=["sent_at", "flush_at"], name="alerts_dige_sent_at_633496_idx")],
+                "constraints": [
+                    models.UniqueConstraint(
+                        condition=models.Q(("sent_at__isnull", True)),
+                        fields=("user", "site", "channel"),
+                        name="unique_open_alert_digest",
+                    ),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,89 @@
+# Precomputed alert counters per tenant, site and asset
+
+from django.db import migrations, models
+
+
+BACKFILL_SQL = """
+    INSERT INTO alerts_counter
+        (scope, key, severity, active, acknowledged, resolved, assets_active, updated_at)
+    SELECT counts.*, NOW()
+    FROM (
+        SELECT
+            CASE
+                WHEN GROUPING(asset_tag) = 0 THEN 'asset'
+                WHEN GROUPING(site_id) = 0 THEN 'site'
+                ELSE 'tenant'
+            END,
+            CASE
+                WHEN GROUPING(asset_tag) = 0 THEN asset_tag
+                WHEN GROUPING(site_id) = 0 THEN site_id::text
+                ELSE ''
+            END,
+            CASE WHEN GROUPING(severity) = 0 THEN severity ELSE '' END,
+            COUNT(*) FILTER (WHERE state = 'active'),
+            COUNT(*) FILTER (WHERE state = 'acknowledged'),
+            COUNT(*) FILTER (WHERE state = 'resolved'),
+            COUNT(DISTINCT asset_tag) FILTER (WHERE state = 'active')
+        FROM (
+            SELECT a.severity,
+                   a.asset_tag,
+                   s.site_id,
+                   CASE
+                       WHEN a.resolved THEN 'resolved'
+                       WHEN a.acknowledged THEN 'acknowledged'
+                       ELSE 'active'
+                   END AS state
+            FROM alerts_alert a
+            LEFT JOIN assets s ON s.tag = a.asset_tag
+        ) alerts
+        GROUP BY GROUPING SETS (
+            (asset_tag, severity), (asset_tag),
+            (site_id, severity), (site_id),
+            (severity), ()
+        )
+        HAVING GROUPING(site_id) = 1 OR site_id IS NOT NULL
+    ) counts
+"""
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("assets", "0007_virtualsensor"),
+        ("alerts", "0007_alertdigest"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AlertCounter",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                (
+                    "scope",
+                    models.CharField(
+                        choices=[("tenant", "Tenant"), ("site", "Site"), ("asset", "Ativo")],
+                        max_length=10,
+                        verbose_name="Escopo",
+                    ),
+                ),
+                ("key", models.CharField(blank=True, max_length=100, verbose_name="Chave")),
+                ("severity", models.CharField(blank=True, max_length=20, verbose_name="Severidade")),
+                ("active", models.IntegerField(default=0, verbose_name="Ativos")),
+                ("acknowledged", models.IntegerField(default=0, verbose_name="Reconhecidos")),
+                ("resolved", models.IntegerField(default=0, verbose_name="Resolvidos")),
+                (
+                    "assets_active",
+                    models.IntegerField(default=0, verbose_name="Equipamentos com Alertas Ativos"),
+                ),
+                ("updated_at", models.DateTimeField(auto_now=True, verbose_name="Atualizado em")),
+            ],
+            options={
+                "verbose_name": "Contador de Alertas",
+                "verbose_name_plural": "Contadores de Alertas",
+                "db_table": "alerts_counter",
+                "constraints": [
+                    models.UniqueConstraint(fields=("scope", "key", "severity"), name="unique_alert_counter"),
+                ],
+            },
+        ),
+        migrations.RunSQL(BACKFILL_SQL, migrations.RunSQL.noop),
+    ]
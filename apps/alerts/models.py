@@ -4,7 +4,7 @@ Models para o sistema de Alertas e Regras
 Tenant isolation é automático via django-tenants (PostgreSQL schemas).
 Todos os models herdam de models.Model e são isolados por schema.
 """
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
@@ -32,6 +32,15 @@ class RuleParameter(models.Model):
         ('Low', 'Baixo'),
     ]
     
+    # Tipos de condição: threshold fixo ou anomalia estatística
+    # (apps.alerts.services.anomaly); nas anomalias ``threshold`` é o k
+    # (desvios) e ``operator`` o lado da banda: > acima, < abaixo, != ambos
+    KIND_CHOICES = [
+        ('threshold', 'Limite fixo'),
+        ('ewma', 'Anomalia (média móvel exponencial)'),
+        ('mad', 'Anomalia (mediana/MAD robusta)'),
+    ]
+    
     # Relacionamento com a regra
     rule = models.ForeignKey(
         'Rule',
@@ -49,6 +58,12 @@ class RuleParameter(models.Model):
     threshold = models.FloatField(verbose_name='Valor Limite')
     unit = models.CharField(max_length=50, blank=True, verbose_name='Unidade')
     duration = models.IntegerField(default=5, verbose_name='Duração (minutos)')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, default='threshold', verbose_name='Tipo de Condição')
+    window = models.PositiveIntegerField(
+        default=60,
+        verbose_name='Janela (leituras)',
+        help_text='Anomalias: span da média exponencial ou janela da mediana/MAD'
+    )
     
     # Severidade e mensagem
     severity = models.CharField(max_length=20, choices=SEVERITY_CHOICES, default='Medium', verbose_name='Severidade')
@@ -263,6 +278,72 @@ class Alert(models.Model):
     def is_active(self):
         """Verifica se o alerta está ativo (não reconhecido e não resolvido)"""
         return not self.acknowledged and not self.resolved
+    
+    @property
+    def state(self):
+        """Estado do alerta nos contadores: active | acknowledged | resolved"""
+        if self.resolved:
+            return 'resolved'
+        if self.acknowledged:
+            return 'acknowledged'
+        return 'active'
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        # Estado carregado do banco: o signal de post_save aplica aos
+        # contadores (AlertCounter) só a diferença para o novo estado
+        instance = super().from_db(db, field_names, values)
+        loaded = instance.__dict__
+        if 'severity' in loaded and 'acknowledged' in loaded and 'resolved' in loaded:
+            instance._counted_as = (instance.severity, instance.state)
+        return instance
+    
+    def save(self, *args, **kwargs):
+        # Contadores atualizados pelo signal na mesma transação do alerta
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+
+class AlertCooldownState(models.Model):
+    """
+    Estado de cooldown por (regra, parâmetro).
+    
+    Resumo dos alertas do par usado por check_alert_cooldown: recalculado a
+    cada transição de Alert (disparo, reconhecimento, resolução, exclusão)
+    por signal e lido em lote no início da avaliação, no lugar de até três
+    consultas em alerts_alert por parâmetro.
+    """
+    
+    rule = models.ForeignKey(
+        Rule,
+        on_delete=models.CASCADE,
+        related_name='cooldown_states',
+        verbose_name='Regra'
+    )
+    parameter_key = models.CharField(max_length=100, verbose_name='Parâmetro')
+    
+    # Alerta ativo (não reconhecido e não resolvido) mais recente
+    open_triggered_at = models.DateTimeField(null=True, blank=True, verbose_name='Último Alerta Ativo')
+    
+    # Alertas reconhecidos ainda não resolvidos
+    acknowledged_open = models.BooleanField(default=False, verbose_name='Reconhecido sem Resolução')
+    acknowledged_at = models.DateTimeField(null=True, blank=True, verbose_name='Último Reconhecimento')
+    
+    # Resolução mais recente
+    resolved_at = models.DateTimeField(null=True, blank=True, verbose_name='Última Resolução')
+    
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Atualizado em')
+    
+    class Meta:
+        db_table = 'alerts_cooldown_state'
+        verbose_name = 'Estado de Cooldown'
+        verbose_name_plural = 'Estados de Cooldown'
+        constraints = [
+            models.UniqueConstraint(fields=['rule', 'parameter_key'], name='unique_cooldown_state'),
+        ]
+    
+    def __str__(self):
+        return f"{self.rule_id}:{self.parameter_key}"
 
 
 class NotificationPreference(models.Model):
@@ -305,6 +386,14 @@ class NotificationPreference(models.Model):
         help_text='Para WhatsApp (formato: +55XXXXXXXXXXX)'
     )
     
+    # Resumo: alertas não críticos do mesmo site dentro da janela são
+    # enviados em uma única mensagem (0 = uma mensagem por alerta)
+    digest_window_minutes = models.PositiveIntegerField(
+        default=10,
+        verbose_name='Janela de Resumo (min)',
+        help_text='Alertas não críticos do mesmo site nesta janela vão em um único resumo (0 = desativado)'
+    )
+    
     # Timestamps
     updated_at = models.DateTimeField(auto_now=True, verbose_name='Atualizado em')
     
@@ -339,3 +428,101 @@ class NotificationPreference(models.Model):
             channels.append('whatsapp')
         return channels
 
+
+class AlertDigest(models.Model):
+    """
+    Resumo de alertas por (usuário, site, canal) numa janela de tempo.
+    
+    Aberto pelo primeiro alerta não crítico da janela (enviado na hora); os
+    alertas seguintes ficam retidos aqui e saem em uma única mensagem quando
+    a janela fecha (apps.alerts.services.digest). Só existe um resumo aberto
+    (sent_at nulo) por usuário, site e canal.
+    """
+    
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='alert_digests',
+        verbose_name='Usuário'
+    )
+    site = models.ForeignKey(
+        'assets.Site',
+        on_delete=models.CASCADE,
+        related_name='alert_digests',
+        verbose_name='Site'
+    )
+    channel = models.CharField(max_length=20, verbose_name='Canal')
+    alerts = models.ManyToManyField(
+        Alert,
+        blank=True,
+        related_name='digests',
+        verbose_name='Alertas Retidos'
+    )
+    
+    opened_at = models.DateTimeField(auto_now_add=True, verbose_name='Aberto em')
+    flush_at = models.DateTimeField(verbose_name='Envio Previsto')
+    sent_at = models.DateTimeField(null=True, blank=True, verbose_name='Enviado em')
+    
+    # Preenchidos no envio
+    coalesced_count = models.PositiveIntegerField(default=0, verbose_name='Alertas no Resumo')
+    suppressed_count = models.PositiveIntegerField(default=0, verbose_name='Mensagens Suprimidas')
+    
+    class Meta:
+        db_table = 'alerts_digest'
+        verbose_name = 'Resumo de Alertas'
+        verbose_name_plural = 'Resumos de Alertas'
+        ordering = ['-opened_at']
+        indexes = [
+            models.Index(fields=['sent_at', 'flush_at']),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'site', 'channel'],
+                condition=models.Q(sent_at__isnull=True),
+                name='unique_open_alert_digest',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.user_id}:{self.site_id}:{self.channel} ({self.opened_at:%Y-%m-%d %H:%M})"
+
+
+class AlertCounter(models.Model):
+    """
+    Contadores de alertas por escopo, severidade e estado.
+    
+    Uma linha por (escopo, chave, severidade): tenant (chave vazia), site
+    (id) e ativo (tag); severidade vazia soma todas. Atualizados na mesma
+    transação de cada transição de Alert (apps.alerts.services.counters) e
+    reconciliados periodicamente com alerts_alert, para que estatísticas de
+    alertas sejam lidas sem recontar a tabela.
+    """
+    
+    SCOPE_CHOICES = [
+        ('tenant', 'Tenant'),
+        ('site', 'Site'),
+        ('asset', 'Ativo'),
+    ]
+    
+    scope = models.CharField(max_length=10, choices=SCOPE_CHOICES, verbose_name='Escopo')
+    key = models.CharField(max_length=100, blank=True, verbose_name='Chave')
+    severity = models.CharField(max_length=20, blank=True, verbose_name='Severidade')
+    
+    active = models.IntegerField(default=0, verbose_name='Ativos')
+    acknowledged = models.IntegerField(default=0, verbose_name='Reconhecidos')
+    resolved = models.IntegerField(default=0, verbose_name='Resolvidos')
+    # Ativos (equipamentos) do escopo com alertas ativos desta severidade
+    assets_active = models.IntegerField(default=0, verbose_name='Equipamentos com Alertas Ativos')
+    
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Atualizado em')
+    
+    class Meta:
+        db_table = 'alerts_counter'
+        verbose_name = 'Contador de Alertas'
+        verbose_name_plural = 'Contadores de Alertas'
+        constraints = [
+            models.UniqueConstraint(fields=['scope', 'key', 'severity'], name='unique_alert_counter'),
+        ]
+    
+    def __str__(self):
+        return f"{self.scope}:{self.key}:{self.severity or 'all'}"
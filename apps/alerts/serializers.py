@@ -1,6 +1,8 @@
 """
 Serializers para o sistema de Alertas e Regras
 """
+from datetime import timedelta
+
 from rest_framework import serializers
 from django.utils import timezone
 from .models import Rule, RuleParameter, Alert, NotificationPreference
@@ -38,6 +40,8 @@ class RuleParameterSerializer(serializers.ModelSerializer):
             'threshold',
             'unit',
             'duration',
+            'kind',
+            'window',
             'severity',
             'message_template',
             'order',
@@ -49,6 +53,8 @@ class RuleParameterSerializer(serializers.ModelSerializer):
             'variable_key': {'required': False, 'allow_blank': True},
             'unit': {'required': False, 'allow_blank': True},
             'order': {'required': False, 'default': 0},
+            'kind': {'required': False},
+            'window': {'required': False, 'min_value': 5, 'max_value': 10000},
         }
     
     def validate_severity(self, value):
@@ -57,6 +63,15 @@ class RuleParameterSerializer(serializers.ModelSerializer):
             return self.SEVERITY_MAP[value]
         raise serializers.ValidationError(f"Severidade inválida: {value}")
     
+    def validate(self, data):
+        """Anomalias: threshold é o número de desvios (k)"""
+        if data.get('kind', 'threshold') != 'threshold' and data.get('threshold') is not None:
+            if data['threshold'] <= 0:
+                raise serializers.ValidationError({
+                    'threshold': "Para anomalias, o limite é o número de desvios (k) e deve ser positivo."
+                })
+        return data
+    
     def validate_duration(self, value):
         """Valida que duration seja positivo"""
         if value is not None and value <= 0:
@@ -346,6 +361,7 @@ class NotificationPreferenceSerializer(serializers.ModelSerializer):
             'low_alerts',
             'phone_number',
             'whatsapp_number',
+            'digest_window_minutes',
             'updated_at',
             'enabled_channels',
         ]
@@ -367,6 +383,15 @@ class NotificationPreferenceSerializer(serializers.ModelSerializer):
             )
         return value
     
+    def validate_digest_window_minutes(self, value):
+        """Janela de resumo limitada a MAX_WINDOW_MINUTES"""
+        from apps.alerts.services.digest import MAX_WINDOW_MINUTES
+        if value > MAX_WINDOW_MINUTES:
+            raise serializers.ValidationError(
+                f"A janela de resumo deve ser de no máximo {MAX_WINDOW_MINUTES} minutos (0 = desativado)."
+            )
+        return value
+    
     def validate(self, data):
         """Validações cruzadas"""
         # Se SMS está habilitado, deve ter telefone
@@ -391,3 +416,71 @@ class AlertStatisticsSerializer(serializers.Serializer):
     acknowledged = serializers.IntegerField()
     resolved = serializers.IntegerField()
     by_severity = serializers.DictField()
+
+
+class BacktestParameterSerializer(serializers.Serializer):
+    """Condição de uma regra em rascunho para backtest"""
+    parameter_key = serializers.CharField(max_length=100)
+    operator = serializers.ChoiceField(choices=[choice[0] for choice in RuleParameter.OPERATOR_CHOICES])
+    threshold = serializers.FloatField()
+    duration = serializers.IntegerField(required=False, default=0, min_value=0)
+
+
+class RuleBacktestSerializer(serializers.Serializer):
+    """
+    Backtest de regra: parâmetros em rascunho ou os de uma regra salva.
+    
+    Janela padrão: últimos 7 dias (máximo MAX_WINDOW_DAYS).
+    """
+    MAX_WINDOW_DAYS = 92
+    
+    rule = serializers.PrimaryKeyRelatedField(queryset=Rule.objects.all(), required=False)
+    equipment = serializers.IntegerField(required=False)
+    parameters = BacktestParameterSerializer(many=True, required=False)
+    cooldown_minutes = serializers.IntegerField(required=False, min_value=0, max_value=1440)
+    start = serializers.DateTimeField(required=False)
+    end = serializers.DateTimeField(required=False)
+    background = serializers.BooleanField(required=False, default=False)
+    
+    def validate(self, data):
+        rule = data.get('rule')
+        if not data.get('parameters'):
+            if rule is None:
+                raise serializers.ValidationError(
+                    "Forneça 'parameters' ou o id de uma regra ('rule')."
+                )
+            # Parâmetros de anomalia dependem da linha de base e não são simulados
+            data['parameters'] = [
+                {
+                    'parameter_key': param.parameter_key,
+                    'operator': param.operator,
+                    'threshold': param.threshold,
+                    'duration': param.duration,
+                }
+                for param in rule.parameters.all()
+                if param.kind == 'threshold'
+            ]
+            if not data['parameters'] and rule.parameter_key and not rule.parameters.exists():
+                # Regra no formato antigo
+                data['parameters'] = [{
+                    'parameter_key': rule.parameter_key,
+                    'operator': rule.operator,
+                    'threshold': rule.threshold,
+                    'duration': rule.duration or 0,
+                }]
+            if not data['parameters']:
+                raise serializers.ValidationError({'rule': "Regra sem parâmetros."})
+        
+        if data.get('equipment') is None and rule is not None:
+            data['equipment'] = rule.equipment_id
+        
+        end = data.get('end') or timezone.now()
+        start = data.get('start') or end - timedelta(days=7)
+        if start >= end:
+            raise serializers.ValidationError({'start': "Início deve ser anterior ao fim."})
+        if end - start > timedelta(days=self.MAX_WINDOW_DAYS):
+            raise serializers.ValidationError(
+                {'start': f"Janela máxima de {self.MAX_WINDOW_DAYS} dias."}
+            )
+        data['start'], data['end'] = start, end
+        return data
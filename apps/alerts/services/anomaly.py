@@ -0,0 +1,244 @@
+"""
+Regras de anomalia estatística (RuleParameter.kind 'ewma' / 'mad').
+
+Limites fixos não pegam a degradação lenta de um chiller e disparam o tempo
+todo em sensores com linha de base sazonal. Nestes tipos a condição é
+"valor fora de k desvios da linha de base do próprio sensor":
+
+- ``ewma``: média e variância exponencialmente ponderadas
+  (alpha = 2 / (window + 1)); z = (x - média) / desvio;
+- ``mad``: mediana e MAD robustas, estimadas em streaming (frugal:
+  passos proporcionais ao MAD, estacionários na mediana/MAD reais);
+  z = (x - mediana) / (1.4826 * MAD).
+
+``threshold`` do parâmetro é o k e ``operator`` o lado da banda (> acima,
+< abaixo, qualquer outro = ambos). Cada leitura é comparada com a linha de
+base ANTERIOR a ela e depois a atualiza, em O(1).
+
+O estado de cada (regra, parâmetro) fica no cache compartilhado, como o de
+duração (e sob o mesmo lock por chave); leituras já vistas são ignoradas,
+então a avaliação na ingestão e a periódica alimentam o mesmo estado. Sem
+estado, a linha de base é semeada do histórico recente do sensor - no
+device da leitura ou nos devices do equipamento da regra - com cálculo
+vetorizado (NumPy); até MIN_SAMPLES leituras nenhuma anomalia é
+sinalizada.
+"""
+import logging
+from datetime import timedelta
+
+import numpy as np
+from django.core.cache import cache
+from django.db import connection
+
+from .duration import lock_states
+
+logger = logging.getLogger(__name__)
+
+KINDS = ('ewma', 'mad')
+
+MIN_SAMPLES = 30
+
+# Histórico usado na semeadura: WARMUP_FACTOR x window leituras, até WARMUP_MAX
+WARMUP_FACTOR = 5
+WARMUP_MAX = 5000
+WARMUP_DAYS = 7
+
+# Passo relativo por leitura (/ window): a estimativa percorre ~1 desvio
+# por janela; passos maiores fazem o MAD oscilar e inflam o z-score
+MAD_STEP = 1.0
+MAD_SCALE = 1.4826
+MIN_SCALE = 1e-9
+
+STATE_CACHE_TIMEOUT = 7 * 86400
+
+WARMUP_SQL = """
+    SELECT EXTRACT(EPOCH FROM p.ts)::float8, p.value
+    FROM reading_series s
+    JOIN reading_point p ON p.series_id = s.id
+    WHERE s.sensor_id = %(sensor_id)s
+      AND {scope_filter}
+      AND s.last_ts >= %(ts_from)s
+      AND p.ts >= %(ts_from)s
+      AND p.ts < %(before)s
+    ORDER BY p.ts DESC
+    LIMIT %(limit)s
+"""
+
+
+# Origem do histórico: a mesma tag pode existir em outros equipamentos
+SCOPE_FILTERS = {
+    'device': "s.device_id = %(key)s",
+    'equipment': "s.device_id IN (SELECT mqtt_client_id FROM devices WHERE asset_id = %(key)s)",
+}
+
+
+def state_cache_key(schema, rule_id, parameter_key):
+    return f"alert_anomaly:{schema}:{rule_id}:{parameter_key}"
+
+
+# =============================================================================
+# Estatísticas
+# =============================================================================
+
+def seed_state(kind, window, ts, values):
+    """
+    Linha de base a partir do histórico (vetorizado).
+
+    Args:
+        ts, values: arrays em ordem de tempo
+
+    Returns:
+        Dict de estado (count 0 se não há histórico)
+    """
+    state = {'kind': kind, 'window': window, 'count': int(len(values)), 'last_seen': None}
+    if not len(values):
+        state.update({'center': None, 'scale': None})
+        return state
+
+    state['last_seen'] = float(ts[-1])
+    if kind == 'ewma':
+        alpha = 2.0 / (window + 1)
+        weights = (1 - alpha) ** np.arange(len(values) - 1, -1, -1, dtype=np.float64)
+        weights /= weights.sum()
+        mean = float(np.dot(weights, values))
+        state['center'] = mean
+        state['scale'] = float(np.dot(weights, (values - mean) ** 2))  # variância
+    else:
+        recent = values[-window:]
+        median = float(np.median(recent))
+        state['center'] = median
+        state['scale'] = float(np.median(np.abs(recent - median)))  # MAD
+    return state
+
+
+def score(state, value):
+    """z-score do valor em relação à linha de base (None sem base suficiente)."""
+    if state['count'] < MIN_SAMPLES or state['center'] is None:
+        return None
+    if state['kind'] == 'ewma':
+        deviation = np.sqrt(max(state['scale'], 0.0))
+    else:
+        deviation = MAD_SCALE * state['scale']
+    if deviation < MIN_SCALE:
+        return 0.0 if value == state['center'] else float(np.sign(value - state['center']) * np.inf)
+    return (value - state['center']) / deviation
+
+
+def update(state, value):
+    """Incorpora uma leitura à linha de base (O(1), in place)."""
+    if state['center'] is None:
+        state['center'], state['scale'] = float(value), 0.0
+    elif state['kind'] == 'ewma':
+        alpha = 2.0 / (state['window'] + 1)
+        diff = value - state['center']
+        increment = alpha * diff
+        state['center'] += increment
+        state['scale'] = (1 - alpha) * (state['scale'] + diff * increment)
+    else:
+        step = MAD_STEP / state['window']
+        mad = max(state['scale'], MIN_SCALE)
+        state['center'] += MAD_SCALE * mad * step * float(np.sign(value - state['center']))
+        if abs(value - state['center']) > mad:
+            state['scale'] = mad * (1 + step)
+        else:
+            state['scale'] = mad * (1 - step)
+    state['count'] += 1
+
+
+def is_anomalous(z, operator, k):
+    """Compara o z-score com k no lado da banda indicado pelo operador."""
+    if z is None:
+        return False
+    if operator in ('>', '>='):
+        return z > k
+    if operator in ('<', '<='):
+        return z < -k
+    return abs(z) > k
+
+
+def observe(state, ts, value, operator, k):
+    """
+    Avalia e incorpora uma leitura.
+
+    Leituras já vistas (ts <= last_seen) não alteram o estado e repetem a
+    última avaliação.
+
+    Returns:
+        bool: leitura anômala
+    """
+    if state['last_seen'] is not None and ts <= state['last_seen']:
+        return state.get('flag', False)
+    flag = is_anomalous(score(state, value), operator, k)
+    update(state, value)
+    state['last_seen'] = ts
+    state['flag'] = flag
+    return flag
+
+
+# =============================================================================
+# Estado compartilhado
+# =============================================================================
+
+def load_warmup(sensor_tag, scope, before, limit):
+    """
+    Últimas ``limit`` leituras do sensor antes de ``before`` (ordem de tempo).
+
+    Args:
+        scope: ('device', mqtt_client_id) ou ('equipment', asset_id)
+    """
+    scope_name, key = scope
+    with connection.cursor() as cursor:
+        cursor.execute(WARMUP_SQL.format(scope_filter=SCOPE_FILTERS[scope_name]), {
+            'sensor_id': sensor_tag,
+            'key': key,
+            'ts_from': before - timedelta(days=WARMUP_DAYS),
+            'before': before,
+            'limit': limit,
+        })
+        rows = cursor.fetchall()
+    if not rows:
+        return np.empty(0), np.empty(0)
+    block = np.array(rows[::-1], dtype=np.float64)
+    return block[:, 0], block[:, 1]
+
+
+def evaluate(items):
+    """
+    Avalia leituras de várias condições de anomalia.
+
+    Args:
+        items: iterável de (rule_id, parameter_key, sensor_tag, scope, kind,
+            window, operator, k, readings) com scope de ``load_warmup`` e
+            readings = [(ts datetime, value)]
+
+    Returns:
+        Dict {(rule_id, parameter_key): [flag por leitura, em ordem de ts]}
+    """
+    schema = getattr(connection, 'schema_name', 'public')
+    items = list(items)
+    if not items:
+        return {}
+
+    keys = {(item[0], item[1]): state_cache_key(schema, item[0], item[1]) for item in items}
+
+    flags = {}
+    states = {}
+    with lock_states(keys.values()):
+        cached = cache.get_many(list(keys.values()))
+        for rule_id, parameter_key, sensor_tag, scope, kind, window, operator, k, readings in items:
+            pair = (rule_id, parameter_key)
+            readings = sorted(readings, key=lambda reading: reading[0])
+            state = states.get(pair) or cached.get(keys[pair])
+            if state is None or state['kind'] != kind or state['window'] != window:
+                # Parâmetro novo ou alterado: semeia do histórico anterior ao lote
+                ts, values = load_warmup(sensor_tag, scope, readings[0][0], min(window * WARMUP_FACTOR, WARMUP_MAX))
+                state = seed_state(kind, window, ts, values)
+                logger.info(
+                    f"📈 Anomaly baseline seeded for rule {rule_id} {parameter_key} "
+                    f"({kind}, {state['count']} readings)"
+                )
+            flags[pair] = [observe(state, ts.timestamp(), float(value), operator, k) for ts, value in readings]
+            states[pair] = state
+
+        cache.set_many({keys[pair]: state for pair, state in states.items()}, timeout=STATE_CACHE_TIMEOUT)
+    return flags
@@ -0,0 +1,259 @@
+"""
+Backtest de regras sobre o histórico de leituras.
+
+Responde "quantos alertas esta configuração teria gerado?" para uma regra
+em rascunho (operador, threshold, duration, cooldown) sem gravar nada:
+
+1. cada parâmetro é resolvido para a série (device mqtt_client_id, tag do
+   sensor) - ``resolve_series``;
+2. os pontos da janela são lidos em blocos direto para arrays NumPy,
+   usando o catálogo de reading_series para descartar séries fora da
+   janela - ``load_series``;
+3. condição e duração são avaliadas em todas as leituras de uma vez, com a
+   mesma semântica de apps.alerts.services.duration (toda leitura na
+   janela precisa satisfazer; lacunas > MAX_READING_AGE reiniciam) -
+   ``sustained_mask``;
+4. o cooldown de alerta ativo (check_alert_cooldown, regra 1) é aplicado
+   aos instantes candidatos com searchsorted - ``apply_cooldown``.
+
+Reconhecimento e resolução dependem de ações dos usuários e não são
+simulados: cada alerta bloqueia o parâmetro por ``cooldown_minutes``.
+"""
+import logging
+import time
+from datetime import datetime
+
+import numpy as np
+from django.db import connection
+from django.utils import timezone
+
+from .evaluation import MAX_READING_AGE, OPERATORS, _sensor_pk
+
+logger = logging.getLogger(__name__)
+
+FETCH_SIZE = 50000
+
+# Instantes de alerta devolvidos por parâmetro (a contagem é sempre total)
+MAX_ALERTS_RETURNED = 500
+
+SERIES_SQL = """
+    SELECT EXTRACT(EPOCH FROM p.ts)::float8, p.value
+    FROM reading_series s
+    JOIN reading_point p ON p.series_id = s.id
+    WHERE s.device_id = %(device_id)s
+      AND s.sensor_id = %(sensor_id)s
+      AND s.last_ts >= %(ts_from)s
+      AND s.first_ts <= %(ts_to)s
+      AND p.ts >= %(ts_from)s
+      AND p.ts < %(ts_to)s
+    ORDER BY p.ts
+"""
+
+
+def resolve_series(parameter_keys, equipment_id=None):
+    """
+    Série (device_id, sensor_tag) de cada parameter_key.
+
+    Chaves ``sensor_<id>`` usam o sensor do id; tags usam o sensor do
+    equipamento (se informado) ou o primeiro sensor com a tag.
+
+    Returns:
+        Dict {parameter_key: (device_id, sensor_tag)} (chaves não
+        resolvidas ficam de fora)
+    """
+    from apps.assets.models import Sensor
+
+    sensor_pks = {_sensor_pk(key) for key in parameter_keys} - {None}
+    tags = {key for key in parameter_keys if _sensor_pk(key) is None}
+
+    by_pk = {}
+    if sensor_pks:
+        rows = Sensor.objects.filter(id__in=sensor_pks).values_list('id', 'device__mqtt_client_id', 'tag')
+        by_pk = {pk: (device_id, tag) for pk, device_id, tag in rows}
+
+    by_tag = {}
+    if tags:
+        sensors = Sensor.objects.filter(tag__in=tags)
+        if equipment_id is not None:
+            sensors = sensors.filter(device__asset_id=equipment_id)
+        for tag, device_id in sensors.order_by('id').values_list('tag', 'device__mqtt_client_id'):
+            by_tag.setdefault(tag, (device_id, tag))
+
+    resolved = {}
+    for key in parameter_keys:
+        pk = _sensor_pk(key)
+        series = by_pk.get(pk) if pk is not None else by_tag.get(key)
+        if series is not None:
+            resolved[key] = series
+    return resolved
+
+
+def load_series(device_id, sensor_tag, ts_from, ts_to):
+    """
+    Pontos da série na janela como arrays (lidos em blocos de FETCH_SIZE).
+
+    Returns:
+        Tupla (ts, values): float64, ts em epoch, ordenados
+    """
+    ts_chunks = []
+    value_chunks = []
+    with connection.cursor() as cursor:
+        cursor.execute(SERIES_SQL, {
+            'device_id': device_id,
+            'sensor_id': sensor_tag,
+            'ts_from': ts_from,
+            'ts_to': ts_to,
+        })
+        while True:
+            rows = cursor.fetchmany(FETCH_SIZE)
+            if not rows:
+                break
+            block = np.array(rows, dtype=np.float64)
+            ts_chunks.append(block[:, 0])
+            value_chunks.append(block[:, 1])
+
+    if not ts_chunks:
+        return np.empty(0), np.empty(0)
+    return np.concatenate(ts_chunks), np.concatenate(value_chunks)
+
+
+def sustained_mask(ts, values, operator, threshold, duration_seconds=0):
+    """
+    Leituras em que a condição está sustentada há ``duration_seconds``.
+
+    Uma sequência de leituras verdadeiras é quebrada por uma leitura falsa
+    ou por uma lacuna maior que MAX_READING_AGE.
+
+    Returns:
+        np.ndarray bool
+    """
+    met = OPERATORS[operator](values, threshold) & ~np.isnan(values)
+    if duration_seconds <= 0 or not met.any():
+        return met
+
+    index = np.arange(len(ts))
+    gap = np.empty(len(ts), dtype=bool)
+    gap[0] = True
+    gap[1:] = np.diff(ts) > MAX_READING_AGE.total_seconds()
+
+    previous_met = np.empty(len(ts), dtype=bool)
+    previous_met[0] = False
+    previous_met[1:] = met[:-1]
+
+    starts = met & (gap | ~previous_met)
+    run_start = np.maximum.accumulate(np.where(starts, index, 0))
+    return met & (ts - ts[run_start] >= duration_seconds)
+
+
+def apply_cooldown(ts, candidates, cooldown_seconds):
+    """
+    Índices das leituras que gerariam alerta.
+
+    Um alerta bloqueia novos alertas do parâmetro até ``cooldown_seconds``
+    depois do disparo (alerta ativo não reconhecido).
+    """
+    candidate_idx = np.flatnonzero(candidates)
+    if not candidate_idx.size or cooldown_seconds <= 0:
+        return candidate_idx
+
+    candidate_ts = ts[candidate_idx]
+    fired = []
+    position = 0
+    while position < candidate_idx.size:
+        fired.append(candidate_idx[position])
+        position = int(np.searchsorted(candidate_ts, candidate_ts[position] + cooldown_seconds, side='left'))
+    return np.asarray(fired, dtype=np.int64)
+
+
+def backtest_parameter(ts, values, operator, threshold, duration_seconds, cooldown_seconds):
+    """
+    Backtest de uma condição sobre uma série.
+
+    Returns:
+        Dict {readings, met, sustained, alert_count, alerts}
+    """
+    if not len(ts):
+        return {'readings': 0, 'met': 0, 'sustained': 0, 'alert_count': 0, 'alerts': []}
+
+    met = OPERATORS[operator](values, threshold)
+    sustained = sustained_mask(ts, values, operator, threshold, duration_seconds)
+    fired = apply_cooldown(ts, sustained, cooldown_seconds)
+
+    tz = timezone.get_current_timezone()
+    return {
+        'readings': int(len(ts)),
+        'met': int(met.sum()),
+        'sustained': int(sustained.sum()),
+        'alert_count': int(fired.size),
+        'alerts': [
+            {
+                'ts': datetime.fromtimestamp(ts[i], tz=tz).isoformat(),
+                'value': float(values[i]),
+            }
+            for i in fired[:MAX_ALERTS_RETURNED]
+        ],
+    }
+
+
+def run_backtest(parameters, ts_from, ts_to, cooldown_minutes, equipment_id=None):
+    """
+    Backtest de uma regra (rascunho) na janela.
+
+    Args:
+        parameters: dicts {parameter_key, operator, threshold, duration
+            (minutos)}
+        cooldown_minutes: cooldown entre alertas do mesmo parâmetro
+
+    Returns:
+        Dict {from, to, cooldown_minutes, total_alerts, duration_ms,
+        archive_horizon, parameters: [...]}
+    """
+    from apps.ingest.services.archive import get_archive_horizon
+
+    started = time.monotonic()
+    series = resolve_series([param['parameter_key'] for param in parameters], equipment_id)
+
+    results = []
+    for param in parameters:
+        key = param['parameter_key']
+        result = {
+            'parameter_key': key,
+            'operator': param['operator'],
+            'threshold': param['threshold'],
+            'duration': param.get('duration') or 0,
+        }
+        if key not in series:
+            result.update({'error': 'Sensor not found', 'readings': 0, 'alert_count': 0, 'alerts': []})
+            results.append(result)
+            continue
+
+        device_id, sensor_tag = series[key]
+        ts, values = load_series(device_id, sensor_tag, ts_from, ts_to)
+        result.update({'device_id': device_id, 'sensor_tag': sensor_tag})
+        result.update(backtest_parameter(
+            ts,
+            values,
+            param['operator'],
+            float(param['threshold']),
+            (param.get('duration') or 0) * 60,
+            cooldown_minutes * 60,
+        ))
+        results.append(result)
+
+    horizon = get_archive_horizon()
+    duration_ms = int((time.monotonic() - started) * 1000)
+    logger.info(
+        f"🧪 Rule backtest: {len(parameters)} parameters, "
+        f"{sum(r['readings'] for r in results)} readings in {duration_ms}ms"
+    )
+
+    return {
+        'from': ts_from.isoformat(),
+        'to': ts_to.isoformat(),
+        'cooldown_minutes': cooldown_minutes,
+        'total_alerts': sum(r['alert_count'] for r in results),
+        'duration_ms': duration_ms,
+        # Pontos antes do horizonte estão na camada fria (não considerados)
+        'archive_horizon': horizon.isoformat() if horizon and horizon > ts_from else None,
+        'parameters': results,
+    }
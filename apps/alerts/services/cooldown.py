@@ -0,0 +1,67 @@
+"""
+Estado de cooldown por (regra, parâmetro) - AlertCooldownState.
+
+check_alert_cooldown precisava de até três consultas em alerts_alert por
+condição verdadeira (alerta ativo, reconhecido, resolvido recentemente).
+O estado resumido é recalculado a cada transição de um Alert (signals) e
+lido em lote, uma consulta por ciclo de avaliação:
+
+- ``refresh_cooldown_state``: recalcula o resumo de um par a partir de
+  alerts_alert (uma consulta agregada);
+- ``load_cooldown_states``: estados de um conjunto de regras.
+"""
+from django.db.models import Count, Max, Q
+
+
+def refresh_cooldown_state(rule_id, parameter_key):
+    """
+    Recalcula o estado de cooldown do par a partir dos alertas existentes.
+
+    Returns:
+        AlertCooldownState atualizado (None se o par não tem mais alertas)
+    """
+    from apps.alerts.models import Alert, AlertCooldownState
+
+    open_q = Q(acknowledged=False, resolved=False)
+    ack_q = Q(acknowledged=True, resolved=False)
+    summary = Alert.objects.filter(rule_id=rule_id, parameter_key=parameter_key).aggregate(
+        total=Count('id'),
+        open_triggered_at=Max('triggered_at', filter=open_q),
+        acknowledged_count=Count('id', filter=ack_q),
+        acknowledged_at=Max('acknowledged_at', filter=ack_q),
+        resolved_at=Max('resolved_at', filter=Q(resolved=True)),
+    )
+
+    if not summary['total']:
+        AlertCooldownState.objects.filter(rule_id=rule_id, parameter_key=parameter_key).delete()
+        return None
+
+    state, _ = AlertCooldownState.objects.update_or_create(
+        rule_id=rule_id,
+        parameter_key=parameter_key,
+        defaults={
+            'open_triggered_at': summary['open_triggered_at'],
+            'acknowledged_open': summary['acknowledged_count'] > 0,
+            'acknowledged_at': summary['acknowledged_at'],
+            'resolved_at': summary['resolved_at'],
+        },
+    )
+    return state
+
+
+def load_cooldown_states(rule_ids):
+    """
+    Estados de cooldown das regras.
+
+    Returns:
+        Dict {(rule_id, parameter_key): AlertCooldownState}
+    """
+    from apps.alerts.models import AlertCooldownState
+
+    rule_ids = list(set(rule_ids))
+    if not rule_ids:
+        return {}
+    return {
+        (state.rule_id, state.parameter_key): state
+        for state in AlertCooldownState.objects.filter(rule_id__in=rule_ids)
+    }
@@ -0,0 +1,233 @@
+"""
+Contadores de alertas pré-computados (AlertCounter).
+
+As estatísticas de alertas (AlertViewSet.statistics, SiteViewSet.stats,
+AssetSerializer.alert_count) recontavam alerts_alert a cada requisição.
+Aqui cada transição de Alert (criação, reconhecimento, resolução,
+exclusão) aplica a diferença aos contadores do ativo, do site e do tenant,
+por severidade e no total (severity ''), na mesma transação do alerta:
+
+- ``apply_transition``: dois upserts (linhas do ativo; depois site e
+  tenant, com a variação de equipamentos com alertas ativos);
+- ``read``: contadores de um escopo em uma consulta pela chave única;
+- ``reconcile``: recalcula tudo a partir de alerts_alert (task periódica
+  ``alerts.reconcile_alert_counters``), corrigindo desvios de alterações
+  feitas fora do ORM (queryset.update, SQL manual).
+
+O site de um alerta é o do ativo com a mesma tag (alerts_alert só guarda
+asset_tag); alertas sem ativo cadastrado contam para o ativo e o tenant.
+"""
+import logging
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+STATES = ('active', 'acknowledged', 'resolved')
+
+SEVERITIES = ('Critical', 'High', 'Medium', 'Low')
+
+# Severidade das linhas de total
+ALL = ''
+
+UPSERT_SQL = """
+    INSERT INTO alerts_counter
+        (scope, key, severity, active, acknowledged, resolved, assets_active, updated_at)
+    VALUES {values}
+    ON CONFLICT (scope, key, severity) DO UPDATE SET
+        active = alerts_counter.active + EXCLUDED.active,
+        acknowledged = alerts_counter.acknowledged + EXCLUDED.acknowledged,
+        resolved = alerts_counter.resolved + EXCLUDED.resolved,
+        assets_active = {assets_active},
+        updated_at = EXCLUDED.updated_at
+    RETURNING severity, active
+"""
+
+# Linha do ativo: 1 se o ativo tem alertas ativos da severidade
+ASSET_ACTIVE = "CASE WHEN alerts_counter.active + EXCLUDED.active > 0 THEN 1 ELSE 0 END"
+# Site/tenant: soma a variação calculada a partir das linhas do ativo
+SCOPE_ACTIVE = "alerts_counter.assets_active + EXCLUDED.assets_active"
+
+COUNTS_SQL = """
+    SELECT
+        CASE
+            WHEN GROUPING(asset_tag) = 0 THEN 'asset'
+            WHEN GROUPING(site_id) = 0 THEN 'site'
+            ELSE 'tenant'
+        END,
+        CASE
+            WHEN GROUPING(asset_tag) = 0 THEN asset_tag
+            WHEN GROUPING(site_id) = 0 THEN site_id::text
+            ELSE ''
+        END,
+        CASE WHEN GROUPING(severity) = 0 THEN severity ELSE '' END,
+        COUNT(*) FILTER (WHERE state = 'active'),
+        COUNT(*) FILTER (WHERE state = 'acknowledged'),
+        COUNT(*) FILTER (WHERE state = 'resolved'),
+        COUNT(DISTINCT asset_tag) FILTER (WHERE state = 'active')
+    FROM (
+        SELECT a.severity,
+               a.asset_tag,
+               s.site_id,
+               CASE
+                   WHEN a.resolved THEN 'resolved'
+                   WHEN a.acknowledged THEN 'acknowledged'
+                   ELSE 'active'
+               END AS state
+        FROM alerts_alert a
+        LEFT JOIN assets s ON s.tag = a.asset_tag
+    ) alerts
+    GROUP BY GROUPING SETS (
+        (asset_tag, severity), (asset_tag),
+        (site_id, severity), (site_id),
+        (severity), ()
+    )
+    HAVING GROUPING(site_id) = 1 OR site_id IS NOT NULL
+"""
+
+
+def site_for(alert):
+    """Site do ativo do alerta (sem consulta quando a regra já está carregada)."""
+    from apps.alerts.models import Alert, Rule
+    from apps.assets.models import Asset
+
+    if Alert._meta.get_field('rule').is_cached(alert) and alert.rule is not None:
+        rule = alert.rule
+        if Rule._meta.get_field('equipment').is_cached(rule) and rule.equipment.tag == alert.asset_tag:
+            return rule.equipment.site_id
+    return Asset.objects.filter(tag=alert.asset_tag).values_list('site_id', flat=True).first()
+
+
+def _upsert(cursor, rows, assets_active):
+    placeholders = ', '.join(['(%s, %s, %s, %s, %s, %s, %s, %s)'] * len(rows))
+    cursor.execute(
+        UPSERT_SQL.format(values=placeholders, assets_active=assets_active),
+        [value for row in rows for value in row],
+    )
+    return cursor.fetchall()
+
+
+def apply_transition(asset_tag, site_id, previous, current):
+    """
+    Aplica uma transição de alerta aos contadores.
+
+    Chamar dentro da transação que grava o alerta (signals de Alert).
+
+    Args:
+        asset_tag: tag do ativo do alerta
+        site_id: site do ativo (None = só ativo e tenant)
+        previous: (severity, state) antes da transição; None = alerta novo
+        current: (severity, state) depois; None = alerta removido
+    """
+    deltas = {}
+    for change, sign in ((previous, -1), (current, 1)):
+        if change is None:
+            continue
+        severity, state = change
+        for level in (severity, ALL):
+            deltas.setdefault(level, [0, 0, 0])[STATES.index(state)] += sign
+    deltas = {level: delta for level, delta in sorted(deltas.items()) if any(delta)}
+    if not deltas:
+        return
+
+    now = timezone.now()
+    with connection.cursor() as cursor:
+        # Linhas do ativo primeiro (mesma ordem em toda transação: ativo,
+        # site, tenant) - devolvem os ativos da severidade após a transição
+        returned = _upsert(
+            cursor,
+            [('asset', asset_tag, level, *delta, int(delta[0] > 0), now) for level, delta in deltas.items()],
+            ASSET_ACTIVE,
+        )
+        assets_delta = {
+            level: int(active > 0) - int(active - deltas[level][0] > 0)
+            for level, active in returned
+        }
+
+        scopes = [('site', str(site_id))] if site_id is not None else []
+        scopes.append(('tenant', ''))
+        _upsert(
+            cursor,
+            [
+                (scope, key, level, *delta, assets_delta.get(level, 0), now)
+                for scope, key in scopes
+                for level, delta in deltas.items()
+            ],
+            SCOPE_ACTIVE,
+        )
+
+
+def read(scope, key=''):
+    """
+    Contadores de um escopo (uma consulta).
+
+    Returns:
+        Dict {total, active, acknowledged, resolved, assets_with_active_alerts,
+        by_severity: {severity: {total, active, acknowledged, resolved}}}
+    """
+    from apps.alerts.models import AlertCounter
+
+    counts = {
+        'total': 0,
+        'active': 0,
+        'acknowledged': 0,
+        'resolved': 0,
+        'assets_with_active_alerts': 0,
+        'by_severity': {
+            severity: {'total': 0, 'active': 0, 'acknowledged': 0, 'resolved': 0}
+            for severity in SEVERITIES
+        },
+    }
+    for row in AlertCounter.objects.filter(scope=scope, key=str(key)):
+        values = {state: getattr(row, state) for state in STATES}
+        values['total'] = sum(values.values())
+        if row.severity == ALL:
+            counts.update(values)
+            counts['assets_with_active_alerts'] = row.assets_active
+        else:
+            counts['by_severity'][row.severity] = values
+    return counts
+
+
+def reconcile():
+    """
+    Recalcula os contadores do schema atual a partir de alerts_alert.
+
+    A tabela fica bloqueada para escrita durante o recálculo: transições em
+    andamento terminam antes (e entram na contagem) ou esperam e aplicam a
+    diferença depois.
+
+    Returns:
+        Número de contadores que divergiam
+    """
+    from apps.alerts.models import AlertCounter
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute('LOCK TABLE alerts_counter IN EXCLUSIVE MODE')
+        cursor.execute(COUNTS_SQL)
+        expected = {tuple(row[:3]): tuple(row[3:]) for row in cursor.fetchall()}
+        cursor.execute(
+            'SELECT scope, key, severity, active, acknowledged, resolved, assets_active FROM alerts_counter'
+        )
+        current = {tuple(row[:3]): tuple(row[3:]) for row in cursor.fetchall()}
+
+        zero = (0, 0, 0, 0)
+        drift = [
+            key for key in expected.keys() | current.keys()
+            if expected.get(key, zero) != current.get(key, zero)
+        ]
+        if drift:
+            cursor.execute('DELETE FROM alerts_counter')
+            AlertCounter.objects.bulk_create(
+                [
+                    AlertCounter(
+                        scope=scope, key=key, severity=severity,
+                        active=active, acknowledged=acknowledged, resolved=resolved,
+                        assets_active=assets_active,
+                    )
+                    for (scope, key, severity), (active, acknowledged, resolved, assets_active) in expected.items()
+                ],
+                batch_size=1000,
+            )
+    return len(drift)
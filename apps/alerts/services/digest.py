@@ -0,0 +1,202 @@
+"""
+Resumo (digest) de notificações de alertas.
+
+Quando um site perde o gateway, dezenas de regras disparam no mesmo ciclo
+e cada usuário recebia uma mensagem por alerta. Aqui os alertas não
+críticos são agrupados por (usuário, site, canal) numa janela de
+NotificationPreference.digest_window_minutes:
+
+- o primeiro alerta abre a janela (AlertDigest) e é enviado na hora;
+- os seguintes ficam retidos no resumo aberto - ``coalesce``;
+- ao fim da janela ``alerts.flush_alert_digest`` envia uma única mensagem
+  com os alertas retidos ainda ativos; os reconhecidos ou resolvidos nesse
+  meio tempo não são enviados - ``flush``.
+
+Alertas de severidade Critical não passam pela janela. Cada resumo
+registra quantos alertas foram enviados juntos (coalesced_count) e quantas
+mensagens deixaram de ser enviadas (suppressed_count).
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Canais com resumo (SMS/WhatsApp ainda sem provedor integrado)
+DIGEST_CHANNELS = ('email',)
+
+# Severidades sempre enviadas na hora
+BYPASS_SEVERITIES = ('Critical',)
+
+MAX_WINDOW_MINUTES = 60
+
+# Resumos vencidos há mais que isto são enviados pela varredura periódica
+# (task agendada perdida por reinício de worker etc.)
+FLUSH_GRACE = timedelta(minutes=2)
+
+
+def schedule_flush(schema_name, digest):
+    """Agenda o envio do resumo para o fim da janela, na fila do canal."""
+    from apps.alerts.tasks import flush_alert_digest_task
+
+    queues = getattr(settings, 'ALERT_NOTIFICATION_QUEUES', {})
+    flush_alert_digest_task.apply_async(
+        args=(schema_name, digest.id),
+        eta=digest.flush_at,
+        queue=queues.get(digest.channel),
+    )
+
+
+def coalesce(alert, channel, users, preferences, now=None):
+    """
+    Separa os destinatários de um alerta entre envio imediato e resumo.
+
+    Chamar dentro do schema do tenant, com alert.rule.equipment carregado.
+    Usuários sem resumo aberto para o site abrem um (e recebem o alerta na
+    hora); os demais têm o alerta retido no resumo aberto.
+
+    Args:
+        alert: Alert recém-criado
+        channel: canal de entrega
+        users: destinatários do canal (plan_notifications)
+        preferences: {user_id: NotificationPreference}
+
+    Returns:
+        Tupla (immediate, coalesced): usuários que recebem o alerta agora e
+        quantos o tiveram retido num resumo
+    """
+    from apps.alerts.models import AlertDigest
+
+    if channel not in DIGEST_CHANNELS or alert.severity in BYPASS_SEVERITIES:
+        return users, 0
+
+    windowed = {user.id: user for user in users if preferences[user.id].digest_window_minutes}
+    immediate = [user for user in users if user.id not in windowed]
+    if not windowed:
+        return immediate, 0
+
+    now = now or timezone.now()
+    site_id = alert.rule.equipment.site_id
+    schema_name = connection.schema_name
+
+    with transaction.atomic():
+        # O lock impede que o resumo seja fechado (flush) entre a leitura e
+        # a inclusão do alerta
+        digests = {
+            digest.user_id: digest
+            for digest in AlertDigest.objects.select_for_update().filter(
+                user_id__in=list(windowed),
+                site_id=site_id,
+                channel=channel,
+                sent_at__isnull=True,
+            )
+        }
+
+        for user_id, user in windowed.items():
+            if user_id in digests:
+                continue
+            window = min(preferences[user_id].digest_window_minutes, MAX_WINDOW_MINUTES)
+            try:
+                with transaction.atomic():
+                    digest = AlertDigest.objects.create(
+                        user=user,
+                        site_id=site_id,
+                        channel=channel,
+                        flush_at=now + timedelta(minutes=window),
+                    )
+            except IntegrityError:
+                # Aberto por outra avaliação em paralelo: retém neste
+                digests[user_id] = AlertDigest.objects.select_for_update().get(
+                    user_id=user_id, site_id=site_id, channel=channel, sent_at__isnull=True
+                )
+                continue
+            immediate.append(user)
+            transaction.on_commit(lambda digest=digest: schedule_flush(schema_name, digest))
+
+        if digests:
+            Through = AlertDigest.alerts.through
+            Through.objects.bulk_create(
+                [Through(alertdigest_id=digest.id, alert_id=alert.id) for digest in digests.values()],
+                ignore_conflicts=True,
+            )
+
+    return immediate, len(digests)
+
+
+def claim(digest_id, now=None):
+    """
+    Fecha o resumo e registra as contagens.
+
+    Returns:
+        Tupla (digest, alerts): alertas retidos ainda ativos, em ordem de
+        disparo; (None, []) se o resumo já foi enviado
+    """
+    from apps.alerts.models import AlertDigest
+
+    with transaction.atomic():
+        digest = AlertDigest.objects.select_for_update().filter(pk=digest_id, sent_at__isnull=True).first()
+        if digest is None:
+            return None, []
+
+        held = list(digest.alerts.select_related('rule').order_by('triggered_at'))
+        pending = [alert for alert in held if alert.is_active]
+
+        digest.sent_at = now or timezone.now()
+        digest.coalesced_count = len(pending)
+        # Uma mensagem no lugar de len(held); nenhuma se todos já foram tratados
+        digest.suppressed_count = len(held) - (1 if pending else 0)
+        digest.save(update_fields=['sent_at', 'coalesced_count', 'suppressed_count'])
+
+    return digest, pending
+
+
+def flush(digest_id, alert_ids=None):
+    """
+    Envia o resumo (fechando-o) ou reenvia os alertas de uma tentativa que
+    falhou (``alert_ids``).
+
+    Returns:
+        Dict {digest, channel, coalesced, suppressed, alert_ids, sent, failed}
+    """
+    from apps.alerts.models import Alert, AlertDigest
+    from .notification_service import NotificationService
+
+    if alert_ids is None:
+        digest, alerts = claim(digest_id)
+    else:
+        digest = AlertDigest.objects.filter(pk=digest_id).first()
+        alerts = list(Alert.objects.select_related('rule').filter(id__in=alert_ids).order_by('triggered_at'))
+
+    stats = {'digest': digest_id, 'channel': None, 'coalesced': 0, 'suppressed': 0, 'alert_ids': [], 'sent': 0, 'failed': 0}
+    if digest is None:
+        return stats
+
+    stats.update({
+        'channel': digest.channel,
+        'coalesced': digest.coalesced_count,
+        'suppressed': digest.suppressed_count,
+        'alert_ids': [alert.id for alert in alerts],
+    })
+    if alerts:
+        results = NotificationService().send_digest(digest, alerts)
+        stats['sent'] = len(results['sent'])
+        stats['failed'] = len(results['failed'])
+
+    logger.info(
+        f"📬 Alert digest {digest_id} ({digest.channel}, user {digest.user_id}, site {digest.site_id}): "
+        f"{stats['coalesced']} alerts coalesced, {stats['suppressed']} messages suppressed"
+    )
+    return stats
+
+
+def due_digests(now=None):
+    """(id, canal) dos resumos abertos cujo envio já devia ter ocorrido."""
+    from apps.alerts.models import AlertDigest
+
+    cutoff = (now or timezone.now()) - FLUSH_GRACE
+    return list(
+        AlertDigest.objects.filter(sent_at__isnull=True, flush_at__lte=cutoff).values_list('id', 'channel')
+    )
@@ -0,0 +1,182 @@
+"""
+Condições sustentadas (RuleParameter.duration) com estado incremental.
+
+Uma condição com ``duration`` de N minutos só dispara quando TODAS as
+leituras observadas nos últimos N minutos a satisfazem. Em vez de reler
+reading_point a cada janela, cada (regra, parâmetro) guarda no cache
+compartilhado (Redis) um pequeno estado:
+
+- ``since``:     timestamp da primeira leitura da violação em curso (None = ok)
+- ``last_ok``:   timestamp da última leitura que não satisfazia a condição
+- ``last_seen``: timestamp da última leitura observada
+
+Cada leitura nova atualiza o estado (``observe``); leituras já vistas ou
+fora de ordem são ignoradas, então a avaliação na ingestão (todas as
+leituras) e a periódica (só o último valor) podem alimentar o mesmo
+estado. Lacunas maiores que MAX_READING_AGE reiniciam a violação: sem
+leituras no meio não há como afirmar que a condição se manteve.
+
+Condições com duration 0 disparam na primeira leitura (sem estado).
+
+A ingestão e a avaliação periódica podem atualizar o mesmo estado ao
+mesmo tempo: o ler-modificar-gravar de cada chave é feito sob um lock no
+cache (``lock_states``), para que nenhuma das duas sobrescreva as
+leituras aplicadas pela outra.
+"""
+import logging
+import time
+import uuid
+from contextlib import contextmanager
+
+from django.core.cache import cache
+from django.db import connection
+
+from .evaluation import MAX_READING_AGE
+
+logger = logging.getLogger(__name__)
+
+STATE_CACHE_TIMEOUT = 86400
+
+# Lock por chave de estado: expira sozinho se o worker morrer com ele
+STATE_LOCK_TIMEOUT = 30
+STATE_LOCK_POLL = 0.01
+
+# Libera só os locks com o nosso token, comparando e apagando no próprio
+# Redis (atômico)
+RELEASE_SCRIPT = """
+local released = 0
+for _, key in ipairs(KEYS) do
+    if redis.call('get', key) == ARGV[1] then
+        released = released + redis.call('del', key)
+    end
+end
+return released
+"""
+
+
+def state_cache_key(schema, rule_id, parameter_key):
+    return f"alert_duration:{schema}:{rule_id}:{parameter_key}"
+
+
+def observe(state, ts, met, duration_seconds):
+    """
+    Aplica uma leitura ao estado da condição.
+
+    Args:
+        state: dict {since, last_ok, last_seen} (epoch) ou None
+        ts: epoch da leitura
+        met: a leitura satisfaz a condição
+        duration_seconds: duração exigida
+
+    Returns:
+        Tupla (state, sustained): novo estado e se a condição está
+        sustentada após a leitura
+    """
+    state = dict(state) if state else {'since': None, 'last_ok': None, 'last_seen': None}
+
+    last_seen = state['last_seen']
+    if last_seen is None or ts > last_seen:
+        if last_seen is not None and ts - last_seen > MAX_READING_AGE.total_seconds():
+            state['since'] = None
+        if met:
+            if state['since'] is None:
+                state['since'] = ts
+        else:
+            state['since'] = None
+            state['last_ok'] = ts
+        state['last_seen'] = ts
+
+    return state, is_sustained(state, duration_seconds)
+
+
+def is_sustained(state, duration_seconds):
+    """Violação em curso há pelo menos ``duration_seconds``."""
+    if not state or state['since'] is None:
+        return False
+    return state['last_seen'] - state['since'] >= duration_seconds
+
+
+@contextmanager
+def lock_states(keys):
+    """
+    Lock (``cache.add``) das chaves de estado durante ler-modificar-gravar.
+
+    As chaves são travadas em ordem (sem deadlock entre lotes com chaves em
+    comum). Um lock abandonado expira em STATE_LOCK_TIMEOUT segundos, então
+    a espera nunca passa disso.
+
+    Raises:
+        TimeoutError: lock não obtido (cache indisponível)
+    """
+    token = uuid.uuid4().hex
+    held = []
+    try:
+        for key in sorted(set(keys)):
+            lock_key = f"{key}:lock"
+            deadline = time.monotonic() + STATE_LOCK_TIMEOUT + 1
+            while not cache.add(lock_key, token, timeout=STATE_LOCK_TIMEOUT):
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"State lock not acquired: {key}")
+                time.sleep(STATE_LOCK_POLL)
+            held.append(lock_key)
+        yield
+    finally:
+        _release(held, token)
+
+
+def _release(lock_keys, token):
+    """
+    Libera os locks ainda nossos: um lock expirado pode ter sido obtido por
+    outro worker e não pode ser apagado.
+
+    No Redis a comparação e a exclusão são um único script (RELEASE_SCRIPT).
+    Outros backends (locmem em desenvolvimento/testes, restrito ao
+    processo) usam get_many + delete_many.
+    """
+    if not lock_keys:
+        return
+    client = getattr(cache, '_cache', None)
+    if hasattr(client, 'get_client') and hasattr(client, '_serializer'):
+        script = client.get_client(write=True).register_script(RELEASE_SCRIPT)
+        script(
+            keys=[cache.make_and_validate_key(lock_key) for lock_key in lock_keys],
+            args=[client._serializer.dumps(token)],
+        )
+        return
+    owned = [lock_key for lock_key, value in cache.get_many(lock_keys).items() if value == token]
+    if owned:
+        cache.delete_many(owned)
+
+
+def track(observations):
+    """
+    Atualiza o estado de várias condições e informa quais estão sustentadas.
+
+    Args:
+        observations: iterável de (rule_id, parameter_key, duration_seconds,
+            ts (datetime), met); leituras de uma mesma condição em qualquer
+            ordem (são aplicadas em ordem de timestamp)
+
+    Returns:
+        Set de (rule_id, parameter_key) sustentados após a última leitura
+    """
+    schema = getattr(connection, 'schema_name', 'public')
+    observations = sorted(observations, key=lambda item: item[3])
+    if not observations:
+        return set()
+
+    keys = {
+        (rule_id, parameter_key): state_cache_key(schema, rule_id, parameter_key)
+        for rule_id, parameter_key, _, _, _ in observations
+    }
+    with lock_states(keys.values()):
+        cached = cache.get_many(list(keys.values()))
+        states = {pair: cached.get(key) for pair, key in keys.items()}
+
+        sustained = {}
+        for rule_id, parameter_key, duration_seconds, ts, met in observations:
+            pair = (rule_id, parameter_key)
+            states[pair], sustained[pair] = observe(states[pair], ts.timestamp(), met, duration_seconds)
+
+        cache.set_many({keys[pair]: state for pair, state in states.items()}, timeout=STATE_CACHE_TIMEOUT)
+    return {pair for pair, ok in sustained.items() if ok}
@@ -0,0 +1,221 @@
+"""
+Avaliação vetorizada de regras sobre um snapshot dos últimos valores.
+
+Em vez de uma consulta e uma comparação Python por RuleParameter, um ciclo
+de avaliação:
+
+1. achata as regras do bloco em condições (uma por RuleParameter, ou pelos
+   campos legados da Rule) - ``build_conditions``;
+2. busca o último valor de todos os sensores referenciados em UMA consulta
+   (sensors/virtual_sensors → devices → reading_latest) - ``load_snapshot``;
+3. compara todos os thresholds de uma vez com NumPy -
+   ``evaluate_conditions``;
+4. condições com ``duration`` só contam quando sustentadas
+   (apps.alerts.services.duration).
+
+Parâmetros de anomalia (kind 'ewma'/'mad') não têm threshold fixo: são
+avaliados contra a linha de base do sensor (apps.alerts.services.anomaly)
+e seguem o mesmo caminho de duração e cooldown.
+
+Só as condições verdadeiras (com leitura recente) seguem para o trabalho
+por alerta (cooldown, criação e notificação) em apps.alerts.tasks.
+"""
+import logging
+from collections import namedtuple
+from datetime import timedelta
+
+import numpy as np
+from django.db import connection
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+OPERATORS = {
+    '>': np.greater,
+    '>=': np.greater_equal,
+    '<': np.less,
+    '<=': np.less_equal,
+    '==': np.equal,
+    '!=': np.not_equal,
+}
+
+# Leituras mais antigas que isso não disparam alertas
+MAX_READING_AGE = timedelta(minutes=15)
+
+# parameter é None para regras no formato legado (campos da Rule);
+# duration em segundos (0 = dispara na primeira leitura); kind/window dos
+# parâmetros de anomalia (threshold = k desvios)
+Condition = namedtuple(
+    'Condition',
+    'rule parameter parameter_key sensor_tag operator threshold duration kind window',
+    defaults=('threshold', 0),
+)
+
+# Sensores virtuais: série derivada gravada em um dos devices do ativo
+SNAPSHOT_SQL = """
+    SELECT DISTINCT ON (tag) tag, value, ts
+    FROM (
+        SELECT s.tag, l.value, l.ts
+        FROM sensors s
+        JOIN devices d ON d.id = s.device_id
+        JOIN reading_latest l ON l.device_id = d.mqtt_client_id AND l.sensor_id = s.tag
+        WHERE s.tag = ANY(%(tags)s)
+        UNION ALL
+        SELECT v.tag, l.value, l.ts
+        FROM virtual_sensors v
+        JOIN devices d ON d.asset_id = v.asset_id
+        JOIN reading_latest l ON l.device_id = d.mqtt_client_id AND l.sensor_id = v.tag
+        WHERE v.tag = ANY(%(tags)s)
+    ) latest
+    ORDER BY tag, ts DESC
+"""
+
+
+def _sensor_pk(parameter_key):
+    """PK do sensor em chaves ``sensor_<id>`` (None para tags)."""
+    if parameter_key.startswith('sensor_') and parameter_key[7:].isdigit():
+        return int(parameter_key[7:])
+    return None
+
+
+def build_conditions(rules):
+    """
+    Condições de um conjunto de regras (parameters pré-carregados).
+
+    Chaves ``sensor_<id>`` são resolvidas para a tag do sensor em uma
+    única consulta; chaves não resolvidas são descartadas.
+
+    Returns:
+        Lista de Condition
+    """
+    from apps.assets.models import Sensor
+
+    raw = []
+    for rule in rules:
+        parameters = list(rule.parameters.all())
+        if parameters:
+            raw.extend(
+                (rule, param, param.parameter_key, param.operator, param.threshold, param.duration,
+                 param.kind, param.window)
+                for param in parameters
+            )
+        elif rule.parameter_key:
+            raw.append((rule, None, rule.parameter_key, rule.operator, rule.threshold, rule.duration,
+                        'threshold', 0))
+
+    sensor_pks = {_sensor_pk(item[2]) for item in raw} - {None}
+    tags_by_pk = dict(Sensor.objects.filter(id__in=sensor_pks).values_list('id', 'tag')) if sensor_pks else {}
+
+    conditions = []
+    for rule, param, parameter_key, operator, threshold, duration, kind, window in raw:
+        sensor_pk = _sensor_pk(parameter_key)
+        sensor_tag = parameter_key if sensor_pk is None else tags_by_pk.get(sensor_pk)
+        if sensor_tag is None:
+            logger.warning(f"Sensor ID {sensor_pk} not found for parameter_key {parameter_key} (rule {rule.id})")
+            continue
+        if operator not in OPERATORS or threshold is None:
+            logger.warning(f"Invalid condition for rule {rule.id} parameter {parameter_key}: {operator} {threshold}")
+            continue
+        conditions.append(Condition(
+            rule, param, parameter_key, sensor_tag, operator, float(threshold), max(duration or 0, 0) * 60,
+            kind or 'threshold', window or 0
+        ))
+    return conditions
+
+
+def load_snapshot(sensor_tags):
+    """
+    Último valor de cada sensor (reading_latest do device do sensor; para
+    sensores virtuais, dos devices do ativo).
+
+    Returns:
+        Dict {tag: (value, ts)} (sensores sem leitura ficam de fora)
+    """
+    sensor_tags = sorted(set(sensor_tags))
+    if not sensor_tags:
+        return {}
+    with connection.cursor() as cursor:
+        cursor.execute(SNAPSHOT_SQL, {'tags': sensor_tags})
+        return {tag: (value, ts) for tag, value, ts in cursor.fetchall()}
+
+
+def evaluate_conditions(values, operators, thresholds):
+    """
+    Compara todos os valores com seus thresholds em uma passada.
+
+    Args:
+        values: np.ndarray float64 (NaN = sem leitura)
+        operators: np.ndarray de strings (chaves de OPERATORS)
+        thresholds: np.ndarray float64
+
+    Returns:
+        np.ndarray bool (False onde o valor é NaN)
+    """
+    met = np.zeros(len(values), dtype=bool)
+    valid = ~np.isnan(values)
+    for operator, compare in OPERATORS.items():
+        mask = valid & (operators == operator)
+        if mask.any():
+            met[mask] = compare(values[mask], thresholds[mask])
+    return met
+
+
+def find_triggered(conditions, snapshot, now=None):
+    """
+    Condições verdadeiras com leitura recente.
+
+    Condições com duration alimentam o estado de janela com todas as
+    leituras recentes (verdadeiras ou não) e só entram no resultado quando
+    sustentadas.
+
+    Returns:
+        Lista de (Condition, value, ts)
+    """
+    if not conditions:
+        return []
+
+    now = now or timezone.now()
+    oldest = now - MAX_READING_AGE
+    readings = [snapshot.get(condition.sensor_tag) for condition in conditions]
+
+    values = np.array(
+        [np.nan if reading is None or reading[0] is None or reading[1] < oldest else reading[0]
+         for reading in readings],
+        dtype=np.float64,
+    )
+    operators = np.array([condition.operator for condition in conditions])
+    thresholds = np.array([condition.threshold for condition in conditions], dtype=np.float64)
+
+    met = evaluate_conditions(values, operators, thresholds)
+
+    statistical = [
+        i for i in np.flatnonzero(~np.isnan(values)) if conditions[i].kind != 'threshold'
+    ]
+    if statistical:
+        from .anomaly import evaluate as evaluate_anomalies
+
+        flags = evaluate_anomalies(
+            (conditions[i].rule.id, conditions[i].parameter_key, conditions[i].sensor_tag,
+             ('equipment', conditions[i].rule.equipment_id), conditions[i].kind, conditions[i].window,
+             conditions[i].operator, conditions[i].threshold, [(readings[i][1], values[i])])
+            for i in statistical
+        )
+        for i in statistical:
+            met[i] = flags[(conditions[i].rule.id, conditions[i].parameter_key)][-1]
+
+    timed = [i for i in np.flatnonzero(~np.isnan(values)) if conditions[i].duration > 0]
+    if timed:
+        from .duration import track
+
+        sustained = track(
+            (conditions[i].rule.id, conditions[i].parameter_key, conditions[i].duration, readings[i][1], bool(met[i]))
+            for i in timed
+        )
+        for i in timed:
+            if (conditions[i].rule.id, conditions[i].parameter_key) not in sustained:
+                met[i] = False
+
+    return [
+        (conditions[i], float(values[i]), readings[i][1])
+        for i in np.flatnonzero(met)
+    ]
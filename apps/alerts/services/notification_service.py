@@ -8,18 +8,24 @@ This service is responsible for sending notifications through multiple channels:
 - WhatsApp (via Twilio or Meta Business API)
 
 The service respects user preferences and rule actions when deciding
-which notifications to send.
+which notifications to send. Delivery runs in Celery, one task per alert
+and channel on a dedicated queue (settings.ALERT_NOTIFICATION_QUEUES).
+Non-critical alerts of a site are coalesced per user into digests
+(apps.alerts.services.digest).
 """
 
 import logging
 from typing import List, Dict, Any
 from django.conf import settings
-from django.core.mail import send_mail
+from django.core.mail import EmailMultiAlternatives, get_connection
 from django.template.loader import render_to_string
 from django.utils.html import strip_tags
 
 logger = logging.getLogger(__name__)
 
+# Emails sent over one SMTP connection before it is recycled
+EMAIL_BATCH_SIZE = 50
+
 
 class NotificationService:
     """
@@ -29,61 +35,191 @@ class NotificationService:
     1. Rule defines which actions CAN be used (rule.actions)
     2. User preferences define which channels they WANT (user preferences)
     3. Notification is sent only if: action in rule.actions AND channel enabled in preferences
+    
+    Rule evaluation only plans the recipients (preferences loaded in bulk)
+    and queues one delivery task per channel (queue_alert_notifications);
+    recipients with an open digest for the alert's site get it in the
+    digest instead.
     """
     
+    # (rule action, preference channel, delivery channel)
+    CHANNELS = (
+        ('EMAIL', 'email', 'email'),
+        ('IN_APP', 'push', 'in_app'),
+        ('SMS', 'sms', 'sms'),
+        ('WHATSAPP', 'whatsapp', 'whatsapp'),
+    )
+    
     def __init__(self):
         """Initialize the notification service."""
         self.email_enabled = getattr(settings, 'EMAIL_NOTIFICATIONS_ENABLED', True)
         self.sms_enabled = getattr(settings, 'SMS_NOTIFICATIONS_ENABLED', False)
         self.whatsapp_enabled = getattr(settings, 'WHATSAPP_NOTIFICATIONS_ENABLED', False)
     
-    def send_alert_notifications(self, alert, users=None):
+    def load_preferences(self, users) -> Dict[int, Any]:
+        """
+        Notification preferences of all users in two queries.
+        
+        Users without preferences get the defaults (created in bulk, like
+        the previous per-user get_or_create).
+        
+        Returns:
+            Dict {user_id: NotificationPreference}
         """
-        Send notifications for an alert to all relevant users.
+        from apps.alerts.models import NotificationPreference
+        
+        user_ids = [user.id for user in users]
+        preferences = {
+            pref.user_id: pref
+            for pref in NotificationPreference.objects.filter(user_id__in=user_ids)
+        }
+        missing = [user_id for user_id in user_ids if user_id not in preferences]
+        if missing:
+            NotificationPreference.objects.bulk_create(
+                [NotificationPreference(user_id=user_id) for user_id in missing],
+                ignore_conflicts=True,
+            )
+            preferences.update(
+                (pref.user_id, pref)
+                for pref in NotificationPreference.objects.filter(user_id__in=missing)
+            )
+        return preferences
+    
+    def plan_notifications(self, alert, users=None):
+        """
+        Decide which users receive the alert on each channel.
         
         Args:
-            alert: Alert model instance
-            users: Optional list of User instances. If None, sends to all team members.
+            alert: Alert model instance (rule loaded)
+            users: Optional list of User instances. If None, all active users.
         
         Returns:
-            Dict with results of each notification attempt
+            Tuple (recipients, skipped, preferences):
+            - recipients: {channel: [User]} for channels with recipients
+            - skipped: [{'user', 'channel', 'reason'}]
+            - preferences: {user_id: NotificationPreference}
         """
         from apps.accounts.models import User
         
         if users is None:
             # Get all users from the same tenant
             users = User.objects.filter(is_active=True)
+        users = list(users)
         
-        results = {
-            'sent': [],
-            'failed': [],
-            'skipped': []
-        }
-        
+        preferences = self.load_preferences(users)
         rule = alert.rule
+        recipients = {}
+        skipped = []
         
         for user in users:
-            user_results = self._send_to_user(alert, rule, user)
+            user_preferences = preferences.get(user.id)
+            if user_preferences is None:
+                continue
+            
+            # Check if user wants alerts of this severity
+            if not user_preferences.should_notify_severity(alert.severity):
+                skipped.append({
+                    'user': user.email,
+                    'channel': 'all',
+                    'reason': f'User has disabled {alert.severity} alerts'
+                })
+                continue
             
-            for channel, result in user_results.items():
-                if result['sent']:
-                    results['sent'].append({
-                        'user': user.email,
-                        'channel': channel,
-                        'message': result.get('message')
-                    })
-                elif result.get('skipped'):
-                    results['skipped'].append({
-                        'user': user.email,
-                        'channel': channel,
-                        'reason': result.get('reason')
-                    })
+            # Send through each channel that is:
+            # 1. Enabled in rule actions
+            # 2. Enabled in user preferences
+            # 3. Enabled in system settings
+            enabled_channels = user_preferences.get_enabled_channels()
+            for action, preference_channel, channel in self.CHANNELS:
+                if action not in rule.actions or preference_channel not in enabled_channels:
+                    continue
+                reason = self._skip_reason(channel, user_preferences)
+                if reason:
+                    skipped.append({'user': user.email, 'channel': channel, 'reason': reason})
                 else:
-                    results['failed'].append({
-                        'user': user.email,
-                        'channel': channel,
-                        'error': result.get('error')
-                    })
+                    recipients.setdefault(channel, []).append(user)
+        
+        return recipients, skipped, preferences
+    
+    def _skip_reason(self, channel, preferences):
+        """Reason a channel cannot be used for a user (None = deliverable)."""
+        if channel == 'email' and not self.email_enabled:
+            return 'Email notifications disabled in settings'
+        if channel == 'sms':
+            if not self.sms_enabled:
+                return 'SMS notifications disabled in settings'
+            if not preferences.phone_number:
+                return 'User has no phone number configured'
+        if channel == 'whatsapp':
+            if not self.whatsapp_enabled:
+                return 'WhatsApp notifications disabled in settings'
+            if not preferences.whatsapp_number:
+                return 'User has no WhatsApp number configured'
+        return None
+    
+    def queue_alert_notifications(self, alert, users=None):
+        """
+        Queue the alert's notifications: one ``alerts.deliver_notifications``
+        task per channel, on that channel's queue (ALERT_NOTIFICATION_QUEUES).
+        
+        Used by rule evaluation so delivery (SMTP, providers) never blocks it.
+        Recipients with an open digest for the alert's site (non-critical
+        alerts) are not queued: the alert goes out with the digest.
+        
+        Returns:
+            Dict {'queued': {channel: recipients}, 'coalesced': {channel:
+            recipients}, 'skipped': [...]}
+        """
+        from django.db import connection
+        from apps.alerts.tasks import deliver_notifications_task
+        from .digest import coalesce
+        
+        recipients, skipped, preferences = self.plan_notifications(alert, users)
+        queues = getattr(settings, 'ALERT_NOTIFICATION_QUEUES', {})
+        
+        queued = {}
+        coalesced = {}
+        for channel, channel_users in recipients.items():
+            channel_users, held = coalesce(alert, channel, channel_users, preferences)
+            if held:
+                coalesced[channel] = held
+            if not channel_users:
+                continue
+            deliver_notifications_task.apply_async(
+                args=(connection.schema_name, alert.id, channel, [user.id for user in channel_users]),
+                queue=queues.get(channel),
+            )
+            queued[channel] = len(channel_users)
+        
+        logger.info(
+            f"Alert {alert.id} notifications queued: {queued or 'none'}, "
+            f"coalesced: {coalesced or 'none'}, {len(skipped)} skipped"
+        )
+        return {'queued': queued, 'coalesced': coalesced, 'skipped': skipped}
+    
+    def send_alert_notifications(self, alert, users=None):
+        """
+        Send notifications for an alert to all relevant users, synchronously
+        (scripts/shell; rule evaluation uses queue_alert_notifications).
+        
+        Args:
+            alert: Alert model instance
+            users: Optional list of User instances. If None, sends to all team members.
+        
+        Returns:
+            Dict with results of each notification attempt
+        """
+        recipients, skipped, _ = self.plan_notifications(alert, users)
+        results = {
+            'sent': [],
+            'failed': [],
+            'skipped': skipped,
+        }
+        
+        for channel, channel_users in recipients.items():
+            channel_results = self.deliver(channel, alert, channel_users)
+            for key in results:
+                results[key].extend(channel_results[key])
         
         logger.info(
             f"Alert {alert.id} notifications: "
@@ -94,107 +230,168 @@ class NotificationService:
         
         return results
     
-    def _send_to_user(self, alert, rule, user) -> Dict[str, Dict[str, Any]]:
+    def deliver(self, channel, alert, users, preferences=None):
         """
-        Send notifications to a specific user based on their preferences.
+        Deliver the alert to the users on one channel.
         
-        Args:
-            alert: Alert model instance
-            rule: Rule model instance
-            user: User model instance
+        Emails share one SMTP connection per EMAIL_BATCH_SIZE messages; a
+        failure affects only its recipient.
         
         Returns:
-            Dict with results for each channel
+            Dict {'sent': [...], 'failed': [...], 'skipped': [...]} with one
+            entry per user (failed entries carry ``user_id`` for
+            per-recipient retries)
         """
-        results = {}
+        if channel == 'email':
+            return self._send_email_batch(alert, users)
         
-        # Get or create user notification preferences
-        from apps.alerts.models import NotificationPreference
-        preferences, _ = NotificationPreference.objects.get_or_create(user=user)
+        if preferences is None and channel in ('sms', 'whatsapp'):
+            preferences = self.load_preferences(users)
         
-        # Check if user wants alerts of this severity
-        if not preferences.should_notify_severity(alert.severity):
-            logger.debug(
-                f"User {user.email} has disabled {alert.severity} alerts"
-            )
-            return {
-                'all': {
-                    'sent': False,
-                    'skipped': True,
-                    'reason': f'User has disabled {alert.severity} alerts'
-                }
-            }
+        results = {'sent': [], 'failed': [], 'skipped': []}
+        for user in users:
+            if channel == 'in_app':
+                result = self._send_in_app(alert, user)
+            elif channel == 'sms':
+                result = self._send_sms(alert, user, preferences[user.id])
+            else:
+                result = self._send_whatsapp(alert, user, preferences[user.id])
+            
+            if result['sent']:
+                results['sent'].append({'user': user.email, 'channel': channel, 'message': result.get('message')})
+            elif result.get('skipped'):
+                results['skipped'].append({'user': user.email, 'channel': channel, 'reason': result.get('reason')})
+            else:
+                results['failed'].append({
+                    'user': user.email, 'user_id': user.id, 'channel': channel, 'error': result.get('error')
+                })
+        return results
+    
+    def _build_email(self, alert, user):
+        """Personalized alert email for a user."""
+        from apps.alerts.models import Rule
         
-        # Get enabled channels for this user
-        enabled_channels = preferences.get_enabled_channels()
+        subject = f"[{alert.severity.upper()}] Alert: {alert.rule.name}"
         
-        # Send through each channel that is:
-        # 1. Enabled in rule actions
-        # 2. Enabled in user preferences
-        # 3. Enabled in system settings
+        # Render HTML template (Alert.severity has no choices: label from Rule)
+        context = {
+            'alert': alert,
+            'rule': alert.rule,
+            'user': user,
+            'severity_label': dict(Rule.SEVERITY_CHOICES).get(alert.severity, alert.severity),
+        }
         
-        if 'EMAIL' in rule.actions and 'email' in enabled_channels:
-            results['email'] = self._send_email(alert, user, preferences)
+        html_message = render_to_string(
+            'alerts/email/alert_notification.html',
+            context
+        )
+        message = EmailMultiAlternatives(
+            subject=subject,
+            body=strip_tags(html_message),
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to=[user.email],
+        )
+        message.attach_alternative(html_message, 'text/html')
+        return message
+    
+    def send_digest(self, digest, alerts) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Deliver the alerts held in a digest as a single message.
         
-        if 'IN_APP' in rule.actions and 'push' in enabled_channels:
-            results['in_app'] = self._send_in_app(alert, user)
+        A digest with a single alert is sent as the regular alert message.
         
-        if 'SMS' in rule.actions and 'sms' in enabled_channels:
-            results['sms'] = self._send_sms(alert, user, preferences)
+        Returns:
+            Dict {'sent': [...], 'failed': [...], 'skipped': [...]}
+        """
+        user = digest.user
+        if len(alerts) == 1:
+            return self.deliver(digest.channel, alerts[0], [user])
         
-        if 'WHATSAPP' in rule.actions and 'whatsapp' in enabled_channels:
-            results['whatsapp'] = self._send_whatsapp(alert, user, preferences)
+        results = {'sent': [], 'failed': [], 'skipped': []}
+        if digest.channel != 'email':
+            results['skipped'].append({
+                'user': user.email, 'channel': digest.channel, 'reason': 'Digest not supported for channel'
+            })
+            return results
         
+        try:
+            self._build_digest_email(digest, alerts, user).send(fail_silently=False)
+            results['sent'].append({
+                'user': user.email,
+                'channel': 'email',
+                'message': f'Digest with {len(alerts)} alerts sent to {user.email}'
+            })
+        except Exception as e:
+            logger.error(f"Failed to send alert digest {digest.id} to {user.email}: {str(e)}")
+            results['failed'].append({'user': user.email, 'user_id': user.id, 'channel': 'email', 'error': str(e)})
         return results
     
-    def _send_email(self, alert, user, preferences) -> Dict[str, Any]:
-        """Send email notification."""
-        if not self.email_enabled:
-            return {
-                'sent': False,
-                'skipped': True,
-                'reason': 'Email notifications disabled in settings'
-            }
+    def _build_digest_email(self, digest, alerts, user):
+        """Digest email: the alerts of one site held during the window."""
+        site = digest.site
+        severities = {alert.severity for alert in alerts}
+        worst = next(
+            (severity for severity in ('High', 'Medium', 'Low') if severity in severities),
+            alerts[0].severity,
+        )
+        subject = f"[{worst.upper()}] {len(alerts)} alerts at {site.name}"
         
-        try:
-            subject = f"[{alert.severity.upper()}] Alert: {alert.rule.name}"
-            
-            # Render HTML template
-            context = {
-                'alert': alert,
-                'rule': alert.rule,
-                'user': user,
-                'severity_label': alert.get_severity_display(),
-            }
-            
-            html_message = render_to_string(
-                'alerts/email/alert_notification.html',
-                context
-            )
-            plain_message = strip_tags(html_message)
-            
-            send_mail(
-                subject=subject,
-                message=plain_message,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[user.email],
-                html_message=html_message,
-                fail_silently=False,
-            )
-            
-            logger.info(f"Email sent to {user.email} for alert {alert.id}")
-            
-            return {
-                'sent': True,
-                'message': f'Email sent to {user.email}'
-            }
+        context = {
+            'alerts': alerts,
+            'site': site,
+            'user': user,
+            'digest': digest,
+            'settings': settings,
+        }
+        
+        html_message = render_to_string('alerts/email/alert_digest.html', context)
+        message = EmailMultiAlternatives(
+            subject=subject,
+            body=strip_tags(html_message),
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to=[user.email],
+        )
+        message.attach_alternative(html_message, 'text/html')
+        return message
+    
+    def _send_email_batch(self, alert, users) -> Dict[str, List[Dict[str, Any]]]:
+        """Send the alert email to several users over a reused SMTP connection."""
+        results = {'sent': [], 'failed': [], 'skipped': []}
+        
+        for start in range(0, len(users), EMAIL_BATCH_SIZE):
+            batch = users[start:start + EMAIL_BATCH_SIZE]
+            try:
+                connection = get_connection(fail_silently=False)
+                connection.open()
+            except Exception as e:
+                logger.error(f"Failed to open email connection for alert {alert.id}: {str(e)}")
+                results['failed'].extend(
+                    {'user': user.email, 'user_id': user.id, 'channel': 'email', 'error': str(e)}
+                    for user in batch
+                )
+                continue
             
-        except Exception as e:
-            logger.error(f"Failed to send email to {user.email}: {str(e)}")
-            return {
-                'sent': False,
-                'error': str(e)
-            }
+            try:
+                for user in batch:
+                    try:
+                        connection.send_messages([self._build_email(alert, user)])
+                        results['sent'].append({
+                            'user': user.email,
+                            'channel': 'email',
+                            'message': f'Email sent to {user.email}'
+                        })
+                    except Exception as e:
+                        logger.error(f"Failed to send email to {user.email}: {str(e)}")
+                        results['failed'].append({
+                            'user': user.email, 'user_id': user.id, 'channel': 'email', 'error': str(e)
+                        })
+            finally:
+                connection.close()
+        
+        logger.info(
+            f"Alert {alert.id} emails: {len(results['sent'])} sent, {len(results['failed'])} failed"
+        )
+        return results
     
     def _send_in_app(self, alert, user) -> Dict[str, Any]:
         """
@@ -0,0 +1,204 @@
+"""
+Índice compilado de regras por tenant para avaliação na ingestão.
+
+A avaliação periódica (``alerts.evaluate_rules``, a cada 300s) relê os
+últimos valores que o IngestView acabou de gravar, então um alerta pode
+chegar com até 5 minutos de atraso. Aqui as leituras do lote são
+comparadas na hora com os thresholds das regras habilitadas:
+
+- ``build_index``: mapeia (device mqtt_client_id, tag do sensor) para as
+  condições que referenciam o sensor - uma entrada por RuleParameter, ou
+  pelos campos legados da Rule; tags de sensores virtuais mapeiam para os
+  devices do ativo;
+- ``get_index``: índice do schema atual, cacheado em ``alert_rule_index:{schema}``
+  e invalidado pelos signals de Rule/RuleParameter/Sensor;
+- ``match_readings``: condições verdadeiras para um lote de Reading (sem
+  consultas ao banco; condições com duration alimentam o estado de janela
+  com todas as leituras do lote e só contam quando sustentadas);
+- ``dispatch``: enfileira as condições verdadeiras na task
+  ``alerts.evaluate_triggered_conditions`` (cooldown, criação do alerta e
+  notificações).
+
+A task periódica continua como rede de segurança (leituras fora do
+IngestView, índice invalidado no meio de um lote etc.); o cooldown evita
+alertas duplicados entre os dois caminhos.
+"""
+import logging
+
+from django.core.cache import cache
+from django.db import connection
+from django.utils import timezone
+
+from .evaluation import MAX_READING_AGE, OPERATORS, build_conditions
+
+logger = logging.getLogger(__name__)
+
+INDEX_CACHE_TIMEOUT = 3600
+
+
+def index_cache_key(schema):
+    return f"alert_rule_index:{schema}"
+
+
+def invalidate_index(schema=None):
+    cache.delete(index_cache_key(schema or connection.schema_name))
+
+
+def build_index():
+    """
+    Compila as regras habilitadas do schema atual.
+
+    Returns:
+        Dict {device_id: {sensor_tag: [(rule_id, parameter_id, parameter_key,
+        operator, threshold, duration, kind, window), ...]}} (parameter_id
+        None = regra legada; duration em segundos)
+    """
+    from apps.alerts.models import Rule
+    from apps.assets.models import Sensor, VirtualSensor
+
+    rules = Rule.objects.filter(enabled=True).prefetch_related('parameters')
+    conditions = build_conditions(rules)
+    if not conditions:
+        return {}
+
+    tags = {condition.sensor_tag for condition in conditions}
+    devices_by_tag = {}
+    sensors = Sensor.objects.filter(tag__in=tags).values_list('tag', 'device__mqtt_client_id')
+    # Sensores virtuais não têm linha em sensors: a série derivada é gravada
+    # em um device do ativo (apps.ingest.services.virtual)
+    virtual_sensors = VirtualSensor.objects.filter(
+        tag__in=tags, asset__devices__isnull=False
+    ).values_list('tag', 'asset__devices__mqtt_client_id')
+    for tag, device_id in [*sensors, *virtual_sensors]:
+        devices_by_tag.setdefault(tag, set()).add(device_id)
+
+    index = {}
+    for condition in conditions:
+        entry = (
+            condition.rule.id,
+            condition.parameter.id if condition.parameter is not None else None,
+            condition.parameter_key,
+            condition.operator,
+            condition.threshold,
+            condition.duration,
+            condition.kind,
+            condition.window,
+        )
+        for device_id in devices_by_tag.get(condition.sensor_tag, ()):
+            index.setdefault(device_id, {}).setdefault(condition.sensor_tag, []).append(entry)
+    return index
+
+
+def get_index():
+    """Índice do schema atual (cacheado)."""
+    key = index_cache_key(connection.schema_name)
+    index = cache.get(key)
+    if index is None:
+        index = build_index()
+        cache.set(key, index, timeout=INDEX_CACHE_TIMEOUT)
+    return index
+
+
+def match_readings(readings, index=None, now=None):
+    """
+    Condições verdadeiras para um lote de Reading.
+
+    Leituras mais antigas que MAX_READING_AGE são ignoradas (como na
+    avaliação periódica). Condições sem duration usam a leitura mais
+    recente de cada (device, sensor) do lote; condições com duration
+    observam todas as leituras do lote, em ordem, e contam quando
+    sustentadas após a última. Condições de anomalia incorporam todas as
+    leituras do lote à linha de base.
+
+    Returns:
+        Lista de dicts {rule_id, parameter_id, parameter_key, value, ts}
+        (serializáveis para a task)
+    """
+    from .anomaly import evaluate as evaluate_anomalies
+    from .duration import track
+
+    index = get_index() if index is None else index
+    if not index:
+        return []
+
+    oldest = (now or timezone.now()) - MAX_READING_AGE
+    by_sensor = {}
+    for reading in readings:
+        if reading.value is None or reading.ts < oldest:
+            continue
+        if reading.sensor_id not in index.get(reading.device_id, {}):
+            continue
+        by_sensor.setdefault((reading.device_id, reading.sensor_id), []).append(reading)
+
+    for sensor_readings in by_sensor.values():
+        sensor_readings.sort(key=lambda reading: reading.ts)
+
+    # Anomalias: cada leitura do lote atualiza a linha de base do parâmetro
+    statistical = [
+        (rule_id, parameter_key, sensor_tag, ('device', device_id), kind, window, operator, threshold,
+         [(reading.ts, float(reading.value)) for reading in sensor_readings])
+        for (device_id, sensor_tag), sensor_readings in by_sensor.items()
+        for rule_id, _, parameter_key, operator, threshold, _, kind, window in index[device_id][sensor_tag]
+        if kind != 'threshold'
+    ]
+    anomaly_flags = evaluate_anomalies(statistical) if statistical else {}
+
+    candidates = []
+    observations = []
+    for (device_id, sensor_tag), sensor_readings in by_sensor.items():
+        newest = sensor_readings[-1]
+        for rule_id, parameter_id, parameter_key, operator, threshold, duration, kind, window in index[device_id][sensor_tag]:
+            if kind == 'threshold':
+                compare = OPERATORS[operator]
+                flags = [bool(compare(float(reading.value), threshold)) for reading in sensor_readings]
+            else:
+                flags = anomaly_flags[(rule_id, parameter_key)]
+            if duration > 0:
+                observations.extend(
+                    (rule_id, parameter_key, duration, reading.ts, flag)
+                    for reading, flag in zip(sensor_readings, flags)
+                )
+            elif not flags[-1]:
+                continue
+            candidates.append((rule_id, parameter_id, parameter_key, duration, newest))
+
+    sustained = track(observations) if observations else set()
+
+    return [
+        {
+            'rule_id': rule_id,
+            'parameter_id': parameter_id,
+            'parameter_key': parameter_key,
+            'value': float(reading.value),
+            'ts': reading.ts.isoformat(),
+        }
+        for rule_id, parameter_id, parameter_key, duration, reading in candidates
+        if duration == 0 or (rule_id, parameter_key) in sustained
+    ]
+
+
+def dispatch(readings, tenant):
+    """
+    Avalia o lote contra o índice e enfileira as condições verdadeiras.
+
+    Chamar dentro do schema do tenant; a task é enviada após o commit.
+
+    Returns:
+        Número de condições verdadeiras
+    """
+    from django.db import transaction
+    from apps.alerts.tasks import evaluate_triggered_conditions_task
+
+    try:
+        matches = match_readings(readings)
+    except Exception as e:
+        # A avaliação periódica cobre a falha
+        logger.error(f"❌ Rule index evaluation failed for tenant {tenant.slug}: {e}")
+        return 0
+
+    if matches:
+        transaction.on_commit(
+            lambda: evaluate_triggered_conditions_task.delay(tenant.schema_name, tenant.slug, matches)
+        )
+        logger.info(f"🚨 {len(matches)} rule conditions met at ingest for tenant {tenant.slug}")
+    return len(matches)
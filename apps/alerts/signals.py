@@ -0,0 +1,102 @@
+"""
+Signals para app de Alerts.
+
+Responsável por:
+- Manter AlertCooldownState em dia a cada transição de Alert (criação,
+  reconhecimento, resolução, exclusão)
+- Aplicar as mesmas transições aos contadores de alertas (AlertCounter),
+  na transação do alerta
+- Invalidar o índice compilado de regras (avaliação na ingestão) quando
+  Rule/RuleParameter/Sensor/VirtualSensor muda
+"""
+
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from apps.alerts.models import Alert, Rule, RuleParameter
+from apps.alerts.services.cooldown import refresh_cooldown_state
+from apps.alerts.services.counters import apply_transition, site_for
+from apps.alerts.services.rule_index import invalidate_index
+from apps.assets.models import Sensor, VirtualSensor
+
+
+@receiver(post_save, sender=Alert)
+def refresh_cooldown_state_on_save(sender, instance, **kwargs):
+    """
+    Recalcula o estado de cooldown do par (regra, parâmetro) do alerta.
+    """
+    if instance.rule_id is None:
+        return
+    refresh_cooldown_state(instance.rule_id, instance.parameter_key)
+
+
+@receiver(post_delete, sender=Alert)
+def refresh_cooldown_state_on_delete(sender, instance, **kwargs):
+    """
+    Recalcula o estado de cooldown quando um alerta é removido (limpeza).
+    """
+    if instance.rule_id is None:
+        return
+    refresh_cooldown_state(instance.rule_id, instance.parameter_key)
+
+
+@receiver(post_save, sender=Alert)
+def update_alert_counters_on_save(sender, instance, created, **kwargs):
+    """
+    Aplica a transição (novo alerta, mudança de estado ou severidade) aos
+    contadores. Instâncias sem o estado carregado do banco ficam para a
+    reconciliação periódica.
+    """
+    current = (instance.severity, instance.state)
+    if created:
+        previous = None
+    elif hasattr(instance, '_counted_as'):
+        previous = instance._counted_as
+    else:
+        return
+    if previous != current:
+        apply_transition(instance.asset_tag, site_for(instance), previous, current)
+    instance._counted_as = current
+
+
+@receiver(post_delete, sender=Alert)
+def update_alert_counters_on_delete(sender, instance, **kwargs):
+    """
+    Remove o alerta dos contadores (limpeza de alertas antigos, exclusão).
+    """
+    previous = getattr(instance, '_counted_as', (instance.severity, instance.state))
+    apply_transition(instance.asset_tag, site_for(instance), previous, None)
+
+
+@receiver(post_save, sender=Rule)
+@receiver(post_delete, sender=Rule)
+@receiver(post_save, sender=RuleParameter)
+@receiver(post_delete, sender=RuleParameter)
+def invalidate_rule_index(sender, instance, **kwargs):
+    """
+    Regra criada/alterada/removida: o índice é recompilado na próxima leitura.
+    """
+    invalidate_index()
+
+
+@receiver(post_save, sender=Sensor)
+@receiver(post_delete, sender=Sensor)
+def invalidate_rule_index_on_sensor(sender, instance, update_fields=None, **kwargs):
+    """
+    Sensor novo/movido muda o device das condições que referenciam a tag.
+    Atualizações parciais (ex: update_last_reading) não invalidam.
+    """
+    if update_fields and not {'tag', 'device'} & set(update_fields):
+        return
+    invalidate_index()
+
+
+@receiver(post_save, sender=VirtualSensor)
+@receiver(post_delete, sender=VirtualSensor)
+def invalidate_rule_index_on_virtual_sensor(sender, instance, update_fields=None, **kwargs):
+    """
+    Sensor virtual novo/movido muda os devices das condições sobre a tag.
+    """
+    if update_fields and not {'tag', 'asset'} & set(update_fields):
+        return
+    invalidate_index()
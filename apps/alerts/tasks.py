@@ -22,8 +22,22 @@ DEFAULT_ALERT_COOLDOWN_MINUTES = 60  # 1 hour between alerts for same variable
 ACKNOWLEDGED_CHECK_INTERVAL_MINUTES = 60  # Check every 1 hour if alert still acknowledged
 RESOLVED_COOLDOWN_MINUTES = 30  # Can generate new alert 30 min after resolution
 
+# Parallel evaluation (one task per tenant / rule block)
+RULE_CHUNK_SIZE = 200  # Tenants with more enabled rules are split into blocks
+TENANT_SOFT_TIME_LIMIT = 120  # Partial result returned after 2 min
+TENANT_TIME_LIMIT = 150  # Worker process killed after 2.5 min
+TENANT_TASK_EXPIRES = 240  # Discard if not started before the next cycle (300s)
+RUN_RETENTION_DAYS = 14  # ops.RuleEvaluationRun history
 
-def check_alert_cooldown(rule, parameter_key: str) -> Tuple[bool, str]:
+# Notification delivery (alerts.deliver_notifications)
+NOTIFICATION_MAX_RETRIES = 3  # Per failed recipient
+NOTIFICATION_RETRY_DELAY = 60  # Seconds, doubled on each retry
+
+# Old alert cleanup (alerts.cleanup_old_alerts)
+CLEANUP_BATCH_SIZE = 5000  # Alerts deleted per transaction
+
+
+def check_alert_cooldown(rule, parameter_key: str, states=None) -> Tuple[bool, str]:
     """
     Check if a new alert can be generated for the given rule and parameter.
     
@@ -33,14 +47,26 @@ def check_alert_cooldown(rule, parameter_key: str) -> Tuple[bool, str]:
     3. If there's a resolved alert within 30 minutes -> NO
     4. Otherwise -> YES, can generate alert
     
+    The checks read the AlertCooldownState of the pair (kept up to date by
+    the Alert signals) instead of querying the alerts table.
+    
     Args:
         rule: Rule model instance
         parameter_key: The parameter/sensor key to check
+        states: {(rule_id, parameter_key): AlertCooldownState} preloaded with
+            load_cooldown_states (None = load this pair only)
     
     Returns:
         Tuple[bool, str]: (can_generate_alert, reason)
     """
-    from apps.alerts.models import Alert
+    from apps.alerts.services.cooldown import load_cooldown_states
+    
+    if states is None:
+        states = load_cooldown_states([rule.id])
+    state = states.get((rule.id, parameter_key))
+    if state is None:
+        # No alerts for this pair yet
+        return True, "OK"
     
     now = timezone.now()
     
@@ -51,31 +77,16 @@ def check_alert_cooldown(rule, parameter_key: str) -> Tuple[bool, str]:
     
     # 1. Check for active (unacknowledged) alerts within cooldown period
     cooldown_period = timedelta(minutes=cooldown_minutes)
-    active_alert = Alert.objects.filter(
-        rule=rule,
-        parameter_key=parameter_key,
-        acknowledged=False,
-        resolved=False,
-        triggered_at__gte=now - cooldown_period
-    ).first()
-    
-    if active_alert:
-        time_since = (now - active_alert.triggered_at).total_seconds() / 60
+    if state.open_triggered_at and state.open_triggered_at >= now - cooldown_period:
+        time_since = (now - state.open_triggered_at).total_seconds() / 60
         remaining = cooldown_minutes - time_since
         return False, f"Active alert exists (triggered {time_since:.0f}min ago, cooldown remaining: {remaining:.0f}min)"
     
     # 2. Check for acknowledged (not resolved) alerts - blocks new alerts
     # Check every hour if still acknowledged
-    acknowledged_alert = Alert.objects.filter(
-        rule=rule,
-        parameter_key=parameter_key,
-        acknowledged=True,
-        resolved=False
-    ).order_by('-acknowledged_at').first()
-    
-    if acknowledged_alert:
+    if state.acknowledged_open:
         # Calculate time since last check (using acknowledged_at as reference)
-        time_since_ack = (now - acknowledged_alert.acknowledged_at).total_seconds() / 60 if acknowledged_alert.acknowledged_at else 0
+        time_since_ack = (now - state.acknowledged_at).total_seconds() / 60 if state.acknowledged_at else 0
         check_interval = ACKNOWLEDGED_CHECK_INTERVAL_MINUTES
         
         # Only log/re-evaluate every hour, don't create new alerts while acknowledged
@@ -83,15 +94,8 @@ def check_alert_cooldown(rule, parameter_key: str) -> Tuple[bool, str]:
     
     # 3. Check for recently resolved alerts (within 30 minutes)
     resolved_cooldown = timedelta(minutes=RESOLVED_COOLDOWN_MINUTES)
-    recently_resolved = Alert.objects.filter(
-        rule=rule,
-        parameter_key=parameter_key,
-        resolved=True,
-        resolved_at__gte=now - resolved_cooldown
-    ).first()
-    
-    if recently_resolved:
-        time_since_resolved = (now - recently_resolved.resolved_at).total_seconds() / 60
+    if state.resolved_at and state.resolved_at >= now - resolved_cooldown:
+        time_since_resolved = (now - state.resolved_at).total_seconds() / 60
         remaining = RESOLVED_COOLDOWN_MINUTES - time_since_resolved
         return False, f"Alert was recently resolved ({time_since_resolved:.0f}min ago), cooldown remaining: {remaining:.0f}min"
     
@@ -100,410 +104,651 @@ def check_alert_cooldown(rule, parameter_key: str) -> Tuple[bool, str]:
 
 
 @shared_task(name='alerts.evaluate_rules')
-def evaluate_rules_task():
+def evaluate_rules_task(inline=False):
     """
-    Periodic task that evaluates all enabled rules against current telemetry data.
+    Periodic dispatcher for rule evaluation (every 5 minutes).
     
-    ⚠️ KNOWN LIMITATION (Nov 2025):
-    This task evaluates ALL tenants sequentially in a single Celery worker.
-    A slow tenant can block others. Audit recommendation: "Dividir em tarefas por 
-    tenant ou processar em blocos (chunking)."
+    Fans out one ``alerts.evaluate_tenant_rules`` task per tenant (or per
+    block of RULE_CHUNK_SIZE rules for large tenants) and collects the
+    totals in a chord callback (``alerts.collect_rule_evaluation``), which
+    also records per-tenant duration in ops.RuleEvaluationRun.
     
-    FUTURE ENHANCEMENT:
-    - Split into per-tenant Celery tasks: evaluate_rules_for_tenant.delay(tenant_id)
-    - Use Celery groups/chords for parallel execution
-    - Add timeout per tenant (e.g., 30s max)
+    Each tenant task has its own soft/hard time limits, so a slow tenant
+    no longer delays the others or makes the next beat tick expire.
+    
+    Args:
+        inline: evaluate synchronously in this process (scripts/shell)
     
-    For each rule:
-    1. Get the latest telemetry data for the equipment
-    2. Check if the condition is met (threshold exceeded)
-    3. Check if enough time has passed since last alert (cooldown)
-    4. Create alert if condition is met
-    5. Send notifications to users
+    Returns:
+        dict: tenants and tasks dispatched (or the collected totals when inline)
     """
-    import time
+    from celery import chord
     from apps.alerts.models import Rule
-    from apps.alerts.services import NotificationService
     from apps.tenants.models import Tenant
-    from apps.assets.models import Sensor
     from django_tenants.utils import schema_context
     
-    logger.info("Starting rule evaluation task...")
+    started_at = timezone.now().isoformat()
+    signatures = []
+    tenant_count = 0
+    
+    for tenant in Tenant.objects.exclude(slug='public'):
+        # 🔧 Usar schema_name (não slug) - suporta tenants com hífen
+        with schema_context(tenant.schema_name):
+            rule_ids = list(Rule.objects.filter(enabled=True).order_by('id').values_list('id', flat=True))
+        
+        if not rule_ids:
+            logger.debug(f"No enabled rules found for tenant {tenant.slug}")
+            continue
+        
+        tenant_count += 1
+        if len(rule_ids) <= RULE_CHUNK_SIZE:
+            # None = todas as regras habilitadas no momento da execução
+            chunks = [None]
+        else:
+            chunks = [rule_ids[i:i + RULE_CHUNK_SIZE] for i in range(0, len(rule_ids), RULE_CHUNK_SIZE)]
+        
+        for index, chunk in enumerate(chunks):
+            signatures.append(
+                evaluate_tenant_rules_task.s(tenant.schema_name, tenant.slug, chunk, index)
+                .set(expires=TENANT_TASK_EXPIRES)
+            )
     
-    evaluated_count = 0
-    triggered_count = 0
-    error_count = 0
+    if not signatures:
+        logger.info("Rule evaluation: no tenants with enabled rules")
+        return {'tenants': 0, 'tasks': 0}
     
-    # 🔒 PERFORMANCE FIX #6: Prefetch to avoid N+1 queries
-    # Previously: Looped tenants synchronously, N+1 queries for parameters/readings
-    # Now: Prefetch related data and prepare for parallel execution
-    tenants = Tenant.objects.exclude(slug='public').all()
+    if inline:
+        results = [signature.apply().get() for signature in signatures]
+        return collect_rule_evaluation(results, started_at)
     
-    for tenant in tenants:
-        # 🔧 MONITORING: Track per-tenant execution time to identify bottlenecks
-        tenant_start_time = time.time()
-        
-        try:
-            # 🔧 Usar schema_name (não slug) - suporta tenants com hífen
-            with schema_context(tenant.schema_name):
-                # 🔒 PREFETCH parameters and equipment to avoid N+1 queries
-                rules = Rule.objects.filter(enabled=True).select_related(
-                    'equipment',
-                    'equipment__site'
-                ).prefetch_related(
-                    'parameters',  # Prefetch all rule parameters at once
-                    'equipment__devices',  # Prefetch devices
-                    'equipment__devices__sensors'  # Prefetch sensors
-                )
-                
-                if not rules.exists():
-                    logger.debug(f"No enabled rules found for tenant {tenant.slug}")
-                    continue
-                
-                enabled_rule_ids = list(rules.values_list('id', 'name', 'enabled'))
+    chord(signatures)(collect_rule_evaluation.s(started_at))
+    logger.info(f"Rule evaluation dispatched: {len(signatures)} tasks for {tenant_count} tenants")
+    
+    return {'tenants': tenant_count, 'tasks': len(signatures)}
+
+
+@shared_task(
+    name='alerts.evaluate_tenant_rules',
+    bind=True,
+    soft_time_limit=TENANT_SOFT_TIME_LIMIT,
+    time_limit=TENANT_TIME_LIMIT
+)
+def evaluate_tenant_rules_task(self, schema_name, tenant_slug, rule_ids=None, chunk=0):
+    """
+    Evaluate the enabled rules of one tenant (or one block of its rules).
+    
+    For the whole block (see evaluate_rules):
+    1. Get the latest value of every referenced sensor in one query
+    2. Check all conditions at once (vectorized threshold comparison)
+    3. For conditions met: check cooldown and create the alert
+    4. Queue notifications (delivered by alerts.deliver_notifications)
+    
+    A condition that fails (bad template, database error) is counted in
+    ``errors`` without aborting the block. On the soft time limit the
+    remaining conditions are skipped and the partial totals are returned
+    with ``timed_out`` set (the chord still completes); alerts created
+    before the limit are already counted and their notifications queued.
+    
+    Args:
+        schema_name: tenant schema
+        tenant_slug: tenant slug (logs/metrics)
+        rule_ids: rule ids of this block (None = all enabled rules)
+        chunk: block index
+    
+    Returns:
+        dict: tenant, chunk, started_at, duration_ms, rules, evaluated,
+        triggered, errors, timed_out
+    """
+    import time
+    from celery.exceptions import SoftTimeLimitExceeded
+    from apps.alerts.models import Rule
+    from apps.alerts.services import NotificationService
+    from django_tenants.utils import schema_context
+    
+    # 🔧 MONITORING: Track per-tenant execution time to identify bottlenecks
+    tenant_start_time = time.monotonic()
+    stats = {
+        'tenant': tenant_slug,
+        'chunk': chunk,
+        'started_at': timezone.now().isoformat(),
+        'rules': 0,
+        'evaluated': 0,
+        'triggered': 0,
+        'errors': 0,
+        'timed_out': False,
+    }
+    
+    try:
+        with schema_context(schema_name):
+            # 🔒 PREFETCH parameters and equipment to avoid N+1 queries
+            rules = Rule.objects.filter(enabled=True).select_related(
+                'equipment',
+                'equipment__site',
+                'created_by',  # Cooldown preference
+            ).prefetch_related(
+                'parameters',  # Prefetch all rule parameters at once
+            )
+            if rule_ids is not None:
+                rules = rules.filter(id__in=rule_ids)
+            rules = list(rules)
+            stats['rules'] = len(rules)
+            
+            logger.info(f"📋 Evaluating {len(rules)} ENABLED rules for tenant {tenant_slug} (block {chunk})")
+            
+            # 🔒 OPTIMIZATION: Reuse NotificationService instance (avoid recreating per rule)
+            # (only plans recipients and queues one delivery task per channel)
+            notification_service = NotificationService()
+            
+            def notify(alert):
+                # Counted and queued as soon as it is created, so alerts
+                # created before a time limit are never left unnotified
+                stats['triggered'] += 1
                 logger.info(
-                    f"📋 Evaluating {rules.count()} ENABLED rules for tenant {tenant.slug}: "
-                    f"{', '.join([f'#{r[0]} {r[1]} (enabled={r[2]})' for r in enabled_rule_ids])}"
+                    f"Alert {alert.id} triggered for rule {alert.rule_id} "
+                    f"on equipment {alert.asset_tag} in tenant {tenant_slug}"
                 )
                 
-                # 🔒 OPTIMIZATION: Reuse NotificationService instance (avoid recreating per rule)
-                notification_service = NotificationService()
-                
-                for rule in rules:
-                    try:
-                        evaluated_count += 1
-                        
-                        # Evaluate the rule
-                        alert = evaluate_single_rule(rule)
-                        
-                        if alert:
-                            triggered_count += 1
-                            logger.info(
-                                f"Alert {alert.id} triggered for rule {rule.id} "
-                                f"({rule.name}) on equipment {rule.equipment.tag} "
-                                f"in tenant {tenant.slug}"
-                            )
-                            
-                            # Send notifications
-                            try:
-                                results = notification_service.send_alert_notifications(alert)
-                                logger.info(
-                                    f"Notifications sent for alert {alert.id}: "
-                                    f"{len(results['sent'])} sent, "
-                                    f"{len(results['failed'])} failed, "
-                                    f"{len(results['skipped'])} skipped"
-                                )
-                            except Exception as e:
-                                logger.error(
-                                    f"Failed to send notifications for alert {alert.id}: {str(e)}"
-                                )
-                                error_count += 1
-                                
-                    except Exception as e:
-                        logger.error(f"Error evaluating rule {rule.id} in tenant {tenant.slug}: {str(e)}")
-                        error_count += 1
-                        
-        except Exception as e:
-            logger.error(f"Error processing tenant {tenant.slug}: {str(e)}")
-            error_count += 1
-            continue
-        finally:
-            # 🔧 MONITORING: Log per-tenant execution time (identify slow tenants)
-            tenant_duration = time.time() - tenant_start_time
-            if tenant_duration > 5.0:  # Warn if tenant takes >5s
-                logger.warning(
-                    f"⚠️ Slow tenant detected: {tenant.slug} took {tenant_duration:.2f}s "
-                    f"to evaluate {rules.count() if 'rules' in locals() else 0} rules"
-                )
-            else:
-                logger.debug(f"Tenant {tenant.slug} evaluated in {tenant_duration:.2f}s")
+                # Queue notifications (delivery never blocks evaluation)
+                try:
+                    notification_service.queue_alert_notifications(alert)
+                except SoftTimeLimitExceeded:
+                    raise
+                except Exception as e:
+                    logger.error(
+                        f"Failed to queue notifications for alert {alert.id}: {str(e)}"
+                    )
+                    stats['errors'] += 1
+            
+            # 📊 One snapshot query + vectorized comparison for the whole block
+            evaluate_rules(rules, on_created=notify, stats=stats)
+    
+    except SoftTimeLimitExceeded:
+        stats['timed_out'] = True
+        logger.error(
+            f"⏱️ Rule evaluation for tenant {tenant_slug} (block {chunk}) hit the soft time limit "
+            f"after {stats['evaluated']}/{stats['rules']} rules"
+        )
+    except Exception as e:
+        logger.error(f"Error processing tenant {tenant_slug}: {str(e)}")
+        stats['errors'] += 1
+    
+    tenant_duration = time.monotonic() - tenant_start_time
+    stats['duration_ms'] = int(tenant_duration * 1000)
+    
+    # 🔧 MONITORING: Log per-tenant execution time (identify slow tenants)
+    if tenant_duration > 5.0:  # Warn if tenant takes >5s
+        logger.warning(
+            f"⚠️ Slow tenant detected: {tenant_slug} took {tenant_duration:.2f}s "
+            f"to evaluate {stats['evaluated']} rules"
+        )
+    else:
+        logger.debug(f"Tenant {tenant_slug} evaluated in {tenant_duration:.2f}s")
+    
+    return stats
+
+
+@shared_task(name='alerts.collect_rule_evaluation')
+def collect_rule_evaluation(results, started_at=None):
+    """
+    Chord callback: aggregate the per-tenant results of one evaluation cycle
+    and record each tenant's duration in ops.RuleEvaluationRun.
+    
+    Returns:
+        dict: evaluated, triggered, errors, tenants, timed_out (tenant slugs)
+    """
+    from django.utils.dateparse import parse_datetime
+    from apps.ops.models import RuleEvaluationRun
+    
+    results = [result for result in results if result]
+    
+    totals = {
+        'evaluated': sum(result['evaluated'] for result in results),
+        'triggered': sum(result['triggered'] for result in results),
+        'errors': sum(result['errors'] for result in results),
+        'tenants': len({result['tenant'] for result in results}),
+        'timed_out': sorted({result['tenant'] for result in results if result['timed_out']}),
+    }
+    
+    try:
+        RuleEvaluationRun.objects.bulk_create([
+            RuleEvaluationRun(
+                tenant_slug=result['tenant'],
+                chunk=result['chunk'],
+                started_at=parse_datetime(result['started_at']),
+                duration_ms=result['duration_ms'],
+                rule_count=result['rules'],
+                evaluated=result['evaluated'],
+                triggered=result['triggered'],
+                errors=result['errors'],
+                timed_out=result['timed_out'],
+            )
+            for result in results
+        ])
+        RuleEvaluationRun.objects.filter(
+            started_at__lt=timezone.now() - timedelta(days=RUN_RETENTION_DAYS)
+        ).delete()
+    except Exception as e:
+        logger.error(f"Failed to record rule evaluation runs: {str(e)}")
     
     logger.info(
-        f"Rule evaluation completed: "
-        f"{evaluated_count} evaluated, "
-        f"{triggered_count} triggered, "
-        f"{error_count} errors"
+        f"Rule evaluation completed (cycle {started_at}): "
+        f"{totals['evaluated']} evaluated, "
+        f"{totals['triggered']} triggered, "
+        f"{totals['errors']} errors, "
+        f"{len(totals['timed_out'])} tenants timed out"
     )
     
-    return {
-        'evaluated': evaluated_count,
-        'triggered': triggered_count,
-        'errors': error_count
-    }
+    return totals
 
 
-def evaluate_single_rule(rule):
+def evaluate_rules(rules, on_created=None, stats=None):
     """
-    Evaluate a single rule against current telemetry data.
+    Evaluate a set of rules against a snapshot of the latest readings.
+    
+    All conditions are compared in one vectorized pass
+    (apps.alerts.services.evaluation); only the conditions that are met
+    go through the cooldown check and alert creation.
     Suporta tanto regras com múltiplos parâmetros quanto regras antigas (formato único).
     
     Args:
-        rule: Rule model instance
+        rules: Rule instances (parameters/equipment prefetched)
+        on_created: see create_alerts
+        stats: task stats dict; ``evaluated`` is set once the block is
+            compared, ``errors`` counts failed conditions
     
     Returns:
-        Alert instance if condition is met and alert was created, None otherwise
+        List of created Alert instances
     """
-    from apps.alerts.models import Alert
-    from apps.ingest.models import Reading
-    from apps.assets.models import Sensor
-    from django.db.models import Prefetch
-    
-    # Verificar se a regra tem parâmetros novos (múltiplos) ou usa formato antigo
-    parameters = rule.parameters.all()
-    
-    # Se não tem parâmetros novos mas tem campos antigos, avaliar no formato antigo
-    if not parameters.exists() and rule.parameter_key:
-        return evaluate_single_rule_legacy(rule)
-    
-    # 🔧 PERFORMANCE FIX: Prefetch related data to avoid N+1 queries
-    # Load all sensors with their devices in one query
-    # 🔧 PERFORMANCE FIX (Nov 2025): Extract sensor tags and prefetch in one query
-    # Audit finding: "Faz Sensor.objects.get() dentro de um loop, ignorando o 
-    # sensors_dict já criado."
-    sensor_tags = []
-    sensor_id_to_tag = {}  # Map sensor_X IDs to tags
-    
-    for param in parameters:
-        sensor_tag = param.parameter_key
-        if param.parameter_key.startswith('sensor_'):
-            try:
-                sensor_id = int(param.parameter_key.replace('sensor_', ''))
-                # Store for later mapping
-                sensor_id_to_tag[sensor_id] = param.parameter_key
-                # Will be resolved after prefetch
-                sensor_tag = None
-            except ValueError:
-                pass
-        if sensor_tag:
-            sensor_tags.append(sensor_tag)
-    
-    # Prefetch sensors by ID if needed
-    if sensor_id_to_tag:
-        sensors_by_id = {
-            s.id: s.tag 
-            for s in Sensor.objects.filter(id__in=sensor_id_to_tag.keys()).only('id', 'tag')
-        }
-        for sensor_id, param_key in sensor_id_to_tag.items():
-            if sensor_id in sensors_by_id:
-                sensor_tags.append(sensors_by_id[sensor_id])
-    
-    # Prefetch all sensors with devices in ONE query (eliminates N+1)
-    sensors_dict = {
-        sensor.tag: sensor 
-        for sensor in Sensor.objects.filter(tag__in=sensor_tags).select_related('device')
-    }
+    from apps.alerts.services.evaluation import build_conditions, find_triggered, load_snapshot
     
-    # Avaliar cada parâmetro da regra
-    alerts_created = []
+    rules = list(rules)
+    conditions = build_conditions(rules)
+    snapshot = load_snapshot(condition.sensor_tag for condition in conditions)
+    triggered = find_triggered(conditions, snapshot)
+    if stats is not None:
+        stats['evaluated'] = len(rules)
     
-    for param in parameters:
-        # Check cooldown com lógica avançada
-        can_alert, reason = check_alert_cooldown(rule, param.parameter_key)
-        
-        if not can_alert:
-            logger.debug(
-                f"Rule {rule.id} parameter {param.parameter_key} cannot trigger: {reason}"
-            )
-            continue
+    logger.info(
+        f"📊 Snapshot evaluation: {len(conditions)} conditions, "
+        f"{len(snapshot)} sensors with readings, {len(triggered)} met"
+    )
     
-        # ✅ FIXED: Use prefetched sensors_dict (no more queries in loop)
-        sensor_tag = param.parameter_key
-        if param.parameter_key.startswith('sensor_'):
-            try:
-                sensor_id = int(param.parameter_key.replace('sensor_', ''))
-                # Get from prefetched map (not DB query)
-                if sensor_id in sensors_by_id:
-                    sensor_tag = sensors_by_id[sensor_id]
-                else:
-                    logger.warning(
-                        f"Sensor ID {sensor_id} not found for parameter_key {param.parameter_key}"
-                    )
-                    continue
-            except (ValueError, KeyError):
-                logger.warning(
-                    f"Could not parse sensor ID from parameter_key: {param.parameter_key}"
-                )
-                continue
-        
-        # ✅ Use sensor prefetched from dictionary (O(1) lookup, no DB query)
-        sensor_obj = sensors_dict.get(sensor_tag)
-        if not sensor_obj or not sensor_obj.device or not sensor_obj.device.mqtt_client_id:
-            logger.warning(
-                f"No valid device/mqtt_client_id found for sensor {sensor_tag}"
-            )
-            continue
-        
-        device = sensor_obj.device
-        
-        latest_reading = Reading.objects.filter(
-            device_id=device.mqtt_client_id,
-            sensor_id=sensor_tag
-        ).order_by('-ts').first()
-        
-        if not latest_reading:
-            logger.info(
-                f"⚠️ Rule {rule.id} - No reading found for sensor {sensor_tag} (device: {device.mqtt_client_id})"
-            )
-            continue
-        
-        # Check if reading is recent enough (within last 15 minutes)
-        # IMPORTANTE: reading.ts vem do PostgreSQL em UTC, mas precisamos comparar
-        # usando o horário real (ambos em UTC). A idade é calculada em UTC.
-        now = timezone.now()  # UTC
-        time_diff = now - latest_reading.ts
-        
-        if time_diff > timedelta(minutes=15):
-            logger.info(
-                f"⚠️ Rule {rule.id} - Reading too old for {param.parameter_key}: "
-                f"reading={latest_reading.ts}, now={now}, "
-                f"diff={time_diff.total_seconds()/60:.1f} min"
+    return create_alerts(triggered, on_created=on_created, stats=stats)
+
+
+def create_alerts(triggered, on_created=None, stats=None):
+    """
+    Create the alerts for conditions that are met, respecting the cooldown.
+    
+    Shared by the periodic evaluation and the ingest-time evaluation
+    (alerts.evaluate_triggered_conditions). Each condition is isolated: a
+    failure is logged (and counted in ``stats['errors']``) and the next
+    condition is processed.
+    
+    Args:
+        triggered: list of (Condition, value, ts)
+        on_created: called with each Alert right after it is created
+            (notifications are queued there)
+        stats: task stats dict with an ``errors`` counter
+    
+    Returns:
+        List of created Alert instances
+    """
+    from celery.exceptions import SoftTimeLimitExceeded
+    from apps.alerts.services.cooldown import load_cooldown_states
+    
+    # Estado de cooldown de todas as regras disparadas em uma consulta
+    states = load_cooldown_states(condition.rule.id for condition, _, _ in triggered)
+    
+    alerts_created = []
+    for condition, value, ts in triggered:
+        try:
+            alert = _create_alert(condition, value, states)
+        except SoftTimeLimitExceeded:
+            raise
+        except Exception as e:
+            logger.error(
+                f"Error creating alert for rule {condition.rule.id} "
+                f"parameter {condition.parameter_key}: {str(e)}"
             )
+            if stats is not None:
+                stats['errors'] += 1
             continue
         
-        logger.info(
-            f"✅ Rule {rule.id} - Reading is fresh for {param.parameter_key}: "
-            f"value={latest_reading.value}, age={time_diff.total_seconds()/60:.1f} min"
-        )
-        
-        # Get the value to compare
-        value = latest_reading.value
-        
-        # Evaluate the condition
-        condition_met = evaluate_condition(
-            value,
-            param.operator,
-            param.threshold
-        )
-        
-        if not condition_met:
-            logger.info(
-                f"⚠️ Rule {rule.id} parameter {param.parameter_key} condition NOT MET: "
-                f"{value} {param.operator} {param.threshold} = False"
-            )
+        if alert is None:
             continue
-        
-        logger.info(
-            f"✅ Rule {rule.id} parameter {param.parameter_key} condition MET: "
-            f"{value} {param.operator} {param.threshold} = True - Creating alert!"
-        )
-        
-        # Condition is met - create alert
-        # Gerar mensagem a partir do template
-        message = generate_alert_message_from_template(
-            param.message_template,
-            param,
-            latest_reading,
-            value
-        )
-        
-        alert = Alert.objects.create(
-            rule=rule,
-            asset_tag=rule.equipment.tag,
-            severity=param.severity,
-            parameter_key=param.parameter_key,
-            parameter_value=value,
-            threshold=param.threshold,
-            message=message
-        )
-        
-        logger.info(
-            f"Alert {alert.id} created for rule {rule.id} parameter {param.parameter_key}: "
-            f"{value} {param.operator} {param.threshold}"
-        )
-        
         alerts_created.append(alert)
+        if on_created is not None:
+            on_created(alert)
     
-    # Retornar o primeiro alerta criado (ou None se nenhum foi criado)
-    return alerts_created[0] if alerts_created else None
+    return alerts_created
 
 
-def evaluate_single_rule_legacy(rule):
+def _create_alert(condition, value, states):
     """
-    Evaluate a single rule in the old format (single parameter).
-    Mantido para compatibilidade com regras antigas.
+    Create the alert of one met condition (None while in cooldown).
+    
+    ``states`` is updated so the same key is blocked for the rest of the block.
     """
-    from apps.alerts.models import Alert
-    from apps.ingest.models import Reading
-    from apps.assets.models import Sensor  # 🔧 Import necessário para buscar device correto
+    from apps.alerts.models import Alert, AlertCooldownState
     
-    # Check cooldown com lógica avançada
-    can_alert, reason = check_alert_cooldown(rule, rule.parameter_key)
+    rule = condition.rule
+    param = condition.parameter
     
+    # Check cooldown com lógica avançada (apenas para condições verdadeiras)
+    can_alert, reason = check_alert_cooldown(rule, condition.parameter_key, states)
     if not can_alert:
         logger.debug(
-            f"Rule {rule.id} cannot trigger: {reason}"
+            f"Rule {rule.id} parameter {condition.parameter_key} cannot trigger: {reason}"
         )
         return None
     
-    try:
-        # 🔧 CORRIGIDO: Buscar sensor por tag (não por sensor_id que não existe no modelo)
-        # parameter_key contém o tag do sensor
-        sensor_obj = Sensor.objects.select_related('device').filter(
-            tag=rule.parameter_key
-        ).first()
-        
-        if not sensor_obj or not sensor_obj.device or not sensor_obj.device.mqtt_client_id:
-            logger.debug(
-                f"No valid sensor/device found for parameter_key {rule.parameter_key}"
-            )
-            return None
-        
-        # Buscar a leitura mais recente usando o tag do sensor
-        latest_reading = Reading.objects.filter(
-            device_id=sensor_obj.device.mqtt_client_id,
-            sensor_id=rule.parameter_key
-        ).order_by('-ts').first()
-        
-        if not latest_reading:
-            logger.debug(
-                f"No telemetry data found for equipment {rule.equipment.tag} "
-                f"parameter {rule.parameter_key} (device: {sensor_obj.device.mqtt_client_id})"
+    logger.info(
+        f"✅ Rule {rule.id} parameter {condition.parameter_key} condition MET: "
+        f"{value} {condition.operator} {condition.threshold} = True - Creating alert!"
+    )
+    
+    if param is not None:
+        # Gerar mensagem a partir do template
+        message = generate_alert_message_from_template(param.message_template, param, None, value)
+        severity = param.severity
+    else:
+        message = generate_alert_message(rule, None, value)
+        severity = rule.severity
+    
+    alert = Alert.objects.create(
+        rule=rule,
+        asset_tag=rule.equipment.tag,
+        severity=severity,
+        parameter_key=condition.parameter_key,
+        parameter_value=value,
+        threshold=condition.threshold,
+        message=message
+    )
+    # O signal já gravou o novo estado; o mapa do ciclo também precisa
+    # bloquear a mesma chave se ela aparecer de novo neste bloco
+    states[(rule.id, condition.parameter_key)] = AlertCooldownState(
+        rule_id=rule.id,
+        parameter_key=condition.parameter_key,
+        open_triggered_at=alert.triggered_at,
+    )
+    
+    logger.info(
+        f"Alert {alert.id} created for rule {rule.id} parameter {condition.parameter_key}: "
+        f"{value} {condition.operator} {condition.threshold}"
+    )
+    
+    return alert
+
+
+@shared_task(name='alerts.evaluate_triggered_conditions')
+def evaluate_triggered_conditions_task(schema_name, tenant_slug, matches):
+    """
+    Create and notify the alerts for conditions met at ingest time.
+    
+    Called by apps.alerts.services.rule_index.dispatch (IngestView) with the
+    conditions that matched the compiled rule index; the rules are reloaded
+    so disabled rules and changed thresholds are respected.
+    
+    Args:
+        schema_name: tenant schema
+        tenant_slug: tenant slug (logs)
+        matches: dicts {rule_id, parameter_id, parameter_key, value, ts}
+    
+    Returns:
+        dict: matched, triggered, errors
+    """
+    from datetime import datetime
+    from apps.alerts.models import Rule
+    from apps.alerts.services import NotificationService
+    from apps.alerts.services.evaluation import OPERATORS, Condition
+    from django_tenants.utils import schema_context
+    
+    stats = {'matched': len(matches), 'triggered': 0, 'errors': 0}
+    
+    with schema_context(schema_name):
+        rules = Rule.objects.filter(
+            enabled=True,
+            id__in={match['rule_id'] for match in matches}
+        ).select_related(
+            'equipment',
+            'created_by',
+        ).prefetch_related('parameters').in_bulk()
+        
+        triggered = []
+        for match in matches:
+            rule = rules.get(match['rule_id'])
+            if rule is None:
+                continue
+            if match['parameter_id'] is None:
+                param = None
+                operator, threshold, duration = rule.operator, rule.threshold, rule.duration
+                kind, window = 'threshold', 0
+            else:
+                param = next((p for p in rule.parameters.all() if p.id == match['parameter_id']), None)
+                if param is None:
+                    continue
+                operator, threshold, duration = param.operator, param.threshold, param.duration
+                kind, window = param.kind, param.window
+            
+            if operator not in OPERATORS or threshold is None:
+                continue
+            # Threshold pode ter mudado entre o índice e a task (duração e
+            # anomalias já avaliadas na ingestão)
+            if kind == 'threshold' and not OPERATORS[operator](match['value'], threshold):
+                continue
+            
+            condition = Condition(
+                rule, param, match['parameter_key'], None, operator, float(threshold), (duration or 0) * 60,
+                kind, window
             )
-            return None
+            triggered.append((condition, match['value'], datetime.fromisoformat(match['ts'])))
         
-        # Check if reading is recent enough (within last 15 minutes)
-        # Comparação direta em UTC (ambos timestamps são UTC)
-        now = timezone.now()
-        time_diff = now - latest_reading.ts
+        notification_service = NotificationService()
         
-        if time_diff > timedelta(minutes=15):
-            logger.debug(
-                f"Latest telemetry reading is too old: reading={latest_reading.ts}, now={now}, "
-                f"diff={time_diff.total_seconds()/60:.1f} min for rule {rule.id}"
+        def notify(alert):
+            stats['triggered'] += 1
+            logger.info(
+                f"⚡ Alert {alert.id} triggered at ingest for rule {alert.rule_id} "
+                f"on equipment {alert.asset_tag} in tenant {tenant_slug}"
             )
-            return None
-        
-        value = latest_reading.value
-        
-        condition_met = evaluate_condition(value, rule.operator, rule.threshold)
+            try:
+                notification_service.queue_alert_notifications(alert)
+            except Exception as e:
+                logger.error(f"Failed to queue notifications for alert {alert.id}: {str(e)}")
+                stats['errors'] += 1
         
-        if not condition_met:
-            logger.debug(
-                f"Rule {rule.id} condition not met: {value} {rule.operator} {rule.threshold} = False"
-            )
-            return None
+        create_alerts(triggered, on_created=notify, stats=stats)
+    
+    return stats
+
+
+@shared_task(
+    name='alerts.deliver_notifications',
+    bind=True,
+    max_retries=NOTIFICATION_MAX_RETRIES
+)
+def deliver_notifications_task(self, schema_name, alert_id, channel, user_ids):
+    """
+    Deliver one alert to a list of users on one channel.
+    
+    Queued by NotificationService.queue_alert_notifications on the
+    channel's queue (settings.ALERT_NOTIFICATION_QUEUES). Emails share an
+    SMTP connection; only the recipients that failed are retried, with
+    exponential backoff, on the same queue.
+    
+    Args:
+        schema_name: tenant schema
+        alert_id: Alert id
+        channel: email | in_app | sms | whatsapp
+        user_ids: recipients
+    
+    Returns:
+        dict: alert, channel, sent, failed, skipped, retrying
+    """
+    from apps.accounts.models import User
+    from apps.alerts.models import Alert
+    from apps.alerts.services import NotificationService
+    from django_tenants.utils import schema_context
+    
+    stats = {'alert': alert_id, 'channel': channel, 'sent': 0, 'failed': 0, 'skipped': 0, 'retrying': 0}
+    
+    with schema_context(schema_name):
+        alert = Alert.objects.select_related('rule').filter(pk=alert_id).first()
+        if alert is None or alert.rule is None:
+            logger.warning(f"Alert {alert_id} no longer available, notifications dropped")
+            return stats
         
-        alert = Alert.objects.create(
-            rule=rule,
-            asset_tag=rule.equipment.tag,
-            severity=rule.severity,
-            parameter_key=rule.parameter_key,
-            parameter_value=value,
-            threshold=rule.threshold,
-            message=generate_alert_message(rule, latest_reading, value)
+        users = list(User.objects.filter(id__in=user_ids, is_active=True))
+        results = NotificationService().deliver(channel, alert, users)
+    
+    stats['sent'] = len(results['sent'])
+    stats['failed'] = len(results['failed'])
+    stats['skipped'] = len(results['skipped'])
+    
+    failed_ids = [item['user_id'] for item in results['failed']]
+    if failed_ids and self.request.retries < self.max_retries:
+        stats['retrying'] = len(failed_ids)
+        logger.warning(
+            f"Retrying {channel} notifications of alert {alert_id} for {len(failed_ids)} recipients "
+            f"(attempt {self.request.retries + 1}/{self.max_retries})"
         )
-        
-        logger.info(
-            f"Alert {alert.id} created for rule {rule.id}: {value} {rule.operator} {rule.threshold}"
+        raise self.retry(
+            args=(schema_name, alert_id, channel, failed_ids),
+            countdown=NOTIFICATION_RETRY_DELAY * 2 ** self.request.retries,
+            queue=getattr(settings, 'ALERT_NOTIFICATION_QUEUES', {}).get(channel),
         )
-        
-        return alert
-        
-    except Exception as e:
-        logger.error(
-            f"Error evaluating rule {rule.id} for equipment {rule.equipment.tag}: {str(e)}"
+    
+    return stats
+
+
+@shared_task(
+    name='alerts.flush_alert_digest',
+    bind=True,
+    max_retries=NOTIFICATION_MAX_RETRIES
+)
+def flush_alert_digest_task(self, schema_name, digest_id, alert_ids=None):
+    """
+    Send an alert digest when its window closes.
+    
+    Scheduled (eta = AlertDigest.flush_at) on the channel's queue when the
+    first alert of a user/site opens the window, and by the periodic sweep
+    (alerts.flush_due_alert_digests) for digests left open. The digest is
+    closed before delivery; a failed delivery is retried with the same
+    alerts (``alert_ids``).
+    
+    Args:
+        schema_name: tenant schema
+        digest_id: AlertDigest id
+        alert_ids: alerts to resend (retries only)
+    
+    Returns:
+        dict: digest, channel, coalesced, suppressed, alert_ids, sent, failed
+    """
+    from apps.alerts.services.digest import flush
+    from django_tenants.utils import schema_context
+    
+    with schema_context(schema_name):
+        stats = flush(digest_id, alert_ids)
+    
+    if stats['failed'] and self.request.retries < self.max_retries:
+        logger.warning(
+            f"Retrying alert digest {digest_id} "
+            f"(attempt {self.request.retries + 1}/{self.max_retries})"
         )
-        return None
+        raise self.retry(
+            args=(schema_name, digest_id, stats['alert_ids']),
+            countdown=NOTIFICATION_RETRY_DELAY * 2 ** self.request.retries,
+            queue=getattr(settings, 'ALERT_NOTIFICATION_QUEUES', {}).get(stats['channel']),
+        )
+    
+    return stats
+
+
+@shared_task(name='alerts.flush_due_alert_digests')
+def flush_due_alert_digests_task():
+    """
+    Periodic sweep for digests whose scheduled flush did not run (worker
+    restarts lose ``eta`` tasks in flight).
+    
+    Returns:
+        dict: tenants, digests queued
+    """
+    from apps.alerts.services.digest import due_digests
+    from apps.tenants.models import Tenant
+    from django_tenants.utils import schema_context
+    
+    queues = getattr(settings, 'ALERT_NOTIFICATION_QUEUES', {})
+    queued = 0
+    tenants = 0
+    for tenant in Tenant.objects.exclude(slug='public'):
+        with schema_context(tenant.schema_name):
+            digests = due_digests()
+        if not digests:
+            continue
+        tenants += 1
+        for digest_id, channel in digests:
+            flush_alert_digest_task.apply_async(
+                args=(tenant.schema_name, digest_id),
+                queue=queues.get(channel),
+            )
+        queued += len(digests)
+    
+    if queued:
+        logger.warning(f"📬 {queued} overdue alert digests queued in {tenants} tenants")
+    return {'tenants': tenants, 'digests': queued}
+
+
+@shared_task(name='alerts.backtest_rule')
+def backtest_rule_task(schema_name, spec):
+    """
+    Backtest of a draft rule over a historical window (long windows or
+    ``background`` requests from RuleViewSet.backtest).
+    
+    Args:
+        schema_name: tenant schema
+        spec: dict {parameters, start, end (ISO), cooldown_minutes, equipment}
+    
+    Returns:
+        dict: apps.alerts.services.backtest.run_backtest result plus ``schema``
+        (checked when the result is fetched)
+    """
+    from datetime import datetime
+    from apps.alerts.services.backtest import run_backtest
+    from django_tenants.utils import schema_context
+    
+    with schema_context(schema_name):
+        result = run_backtest(
+            spec['parameters'],
+            datetime.fromisoformat(spec['start']),
+            datetime.fromisoformat(spec['end']),
+            spec['cooldown_minutes'],
+            spec.get('equipment'),
+        )
+    result['schema'] = schema_name
+    return result
+
+
+def evaluate_single_rule(rule):
+    """
+    Evaluate a single rule against current telemetry data.
+    
+    Args:
+        rule: Rule model instance
+    
+    Returns:
+        First Alert created for the rule, None otherwise
+    """
+    alerts = evaluate_rules([rule])
+    return alerts[0] if alerts else None
+
+
+def evaluate_single_rule_legacy(rule):
+    """
+    Evaluate a single rule in the old format (single parameter).
+    Mantido para compatibilidade com regras antigas.
+    """
+    return evaluate_single_rule(rule)
 
 
 def evaluate_condition(value, operator, threshold):
@@ -614,26 +859,82 @@ def generate_alert_message(rule, reading, value):
         return f"Alert triggered for rule: {rule.name}"
 
 
+@shared_task(name='alerts.reconcile_alert_counters')
+def reconcile_alert_counters_task():
+    """
+    Periodic reconciliation of the precomputed alert counters (AlertCounter)
+    with alerts_alert, for every tenant.
+    
+    Counters are maintained on each Alert transition; this corrects drift
+    from changes made outside the ORM (queryset.update, manual SQL).
+    
+    Returns:
+        dict: tenants checked, counters corrected
+    """
+    from apps.alerts.services.counters import reconcile
+    from apps.tenants.models import Tenant
+    from django_tenants.utils import schema_context
+    
+    stats = {'tenants': 0, 'corrected': 0}
+    for tenant in Tenant.objects.exclude(slug='public'):
+        with schema_context(tenant.schema_name):
+            corrected = reconcile()
+        stats['tenants'] += 1
+        stats['corrected'] += corrected
+        if corrected:
+            logger.warning(f"🔢 {corrected} alert counters corrected for tenant {tenant.slug}")
+    
+    return stats
+
+
 @shared_task(name='alerts.cleanup_old_alerts')
 def cleanup_old_alerts_task(days=90):
     """
     Clean up old resolved alerts to keep the database lean.
     
+    Alerts are deleted in batches of CLEANUP_BATCH_SIZE ids, without the
+    per-alert signals: each batch removes the rows that reference the
+    alerts (digest memberships - the only relation to Alert, checked by
+    CleanupOldAlertsTests) and then the alerts, in one transaction. The
+    cooldown state of the affected (rule, parameter) pairs and the alert
+    counters are recalculated once afterwards.
+    
     Args:
         days: Number of days to keep resolved alerts (default: 90)
     
     Returns:
         Number of alerts deleted
     """
-    from apps.alerts.models import Alert
+    from django.db import connection, transaction
+    from apps.alerts.models import Alert, AlertDigest
+    from apps.alerts.services.cooldown import refresh_cooldown_state
+    from apps.alerts.services.counters import reconcile
     
     cutoff_date = timezone.now() - timedelta(days=days)
     
     # Delete old resolved alerts
-    deleted_count, _ = Alert.objects.filter(
+    old_alerts = Alert.objects.filter(
         resolved=True,
         resolved_at__lt=cutoff_date
-    ).delete()
+    )
+    pairs = set(
+        old_alerts.filter(rule__isnull=False).values_list('rule_id', 'parameter_key').distinct()
+    )
+    alert_ids = list(old_alerts.values_list('id', flat=True))
+    
+    deleted_count = 0
+    for start in range(0, len(alert_ids), CLEANUP_BATCH_SIZE):
+        batch = alert_ids[start:start + CLEANUP_BATCH_SIZE]
+        with transaction.atomic():
+            AlertDigest.alerts.through.objects.filter(alert_id__in=batch).delete()
+            with connection.cursor() as cursor:
+                cursor.execute("DELETE FROM alerts_alert WHERE id = ANY(%s)", [batch])
+                deleted_count += cursor.rowcount
+    
+    if deleted_count:
+        for rule_id, parameter_key in pairs:
+            refresh_cooldown_state(rule_id, parameter_key)
+        reconcile()
     
     logger.info(f"Cleaned up {deleted_count} old alerts (resolved before {cutoff_date})")
     
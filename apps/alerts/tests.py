@@ -1,3 +1,1267 @@
-from django.test import TestCase
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from celery.exceptions import SoftTimeLimitExceeded
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+from django.utils import timezone
+from django_tenants.test.cases import TenantTestCase
+
+from apps.alerts.models import Alert, AlertCooldownState, AlertDigest, Rule, RuleParameter
+from apps.alerts.services import anomaly, backtest, counters
+from apps.alerts.services.cooldown import load_cooldown_states, refresh_cooldown_state
+from apps.alerts.services.duration import is_sustained, lock_states, observe, state_cache_key, track
+from apps.alerts.services.evaluation import OPERATORS, Condition, find_triggered
+from apps.alerts.services.rule_index import build_index, get_index, match_readings
+from apps.assets.models import Asset, Device, Sensor, Site, VirtualSensor
+from apps.ingest.models import Reading
+from apps.ingest.services import latest, series, virtual
+
+
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+START = datetime(2025, 1, 1, 12, 0, tzinfo=dt_timezone.utc)
+
+
+def run(samples, duration_minutes=5):
+    """Aplica (minuto, met) em ordem; retorna o sustained após cada leitura."""
+    state = None
+    results = []
+    for minute, met in samples:
+        ts = (START + timedelta(minutes=minute)).timestamp()
+        state, sustained = observe(state, ts, met, duration_minutes * 60)
+        results.append(sustained)
+    return results
+
+
+class DurationStateTests(SimpleTestCase):
+    """Janela de duração incremental (apps.alerts.services.duration)."""
+
+    def test_sustained_violation_fires_after_duration(self):
+        results = run([(minute, True) for minute in range(7)])
+        self.assertEqual(results, [False] * 5 + [True, True])
+
+    def test_flapping_signal_never_fires(self):
+        results = run([(minute, minute % 2 == 0) for minute in range(30)])
+        self.assertFalse(any(results))
+
+    def test_flapping_every_few_minutes_never_fires(self):
+        # Quatro minutos acima, um abaixo: nunca completa 5 minutos
+        results = run([(minute, minute % 5 != 4) for minute in range(40)])
+        self.assertFalse(any(results))
+
+    def test_single_spike_does_not_fire(self):
+        results = run([(0, False), (1, True), (2, False), (3, False)])
+        self.assertFalse(any(results))
+
+    def test_ok_reading_resets_window(self):
+        samples = [(minute, True) for minute in range(4)] + [(4, False)]
+        samples += [(minute, True) for minute in range(5, 11)]
+        results = run(samples)
+        # Nova violação começa no minuto 5: sustentada a partir do minuto 10
+        self.assertEqual(results.index(True), len(samples) - 1)
+
+    def test_duplicate_and_out_of_order_readings_are_ignored(self):
+        state, _ = observe(None, START.timestamp(), True, 300)
+        later = (START + timedelta(minutes=3)).timestamp()
+        state, _ = observe(state, later, True, 300)
+        # Leitura antiga "ok" chegando atrasada não reinicia a violação
+        state, _ = observe(state, (START + timedelta(minutes=1)).timestamp(), False, 300)
+        self.assertEqual(state['since'], START.timestamp())
+        # Mesma leitura observada de novo (ingestão + avaliação periódica)
+        state, sustained = observe(state, later, True, 300)
+        self.assertEqual(state['last_seen'], later)
+        self.assertFalse(sustained)
+
+    def test_gap_without_readings_restarts_window(self):
+        results = run([(0, True), (1, True), (30, True), (31, True)])
+        self.assertFalse(any(results))
+
+    def test_zero_duration_fires_on_first_reading(self):
+        self.assertEqual(run([(0, True)], duration_minutes=0), [True])
+        self.assertFalse(is_sustained(None, 0))
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class SustainedEvaluationTests(SimpleTestCase):
+    """Avaliação na ingestão e periódica alimentando o mesmo estado."""
+
+    def setUp(self):
+        cache.clear()
+        self.index = {'dev-1': {'temp': [(1, 10, 'temp', '>', 30.0, 300, 'threshold', 0)]}}
+
+    def readings(self, samples):
+        return [
+            SimpleNamespace(device_id='dev-1', sensor_id='temp', value=value, ts=START + timedelta(minutes=minute))
+            for minute, value in samples
+        ]
+
+    def test_ingest_flapping_batch_does_not_match(self):
+        batch = self.readings([(minute, 35.0 if minute % 2 else 25.0) for minute in range(10)])
+        now = START + timedelta(minutes=10)
+        self.assertEqual(match_readings(batch, self.index, now=now), [])
+
+    def test_ingest_sustained_across_batches_matches(self):
+        now = START + timedelta(minutes=10)
+        first = self.readings([(minute, 35.0) for minute in range(3)])
+        second = self.readings([(minute, 36.0) for minute in range(3, 6)])
+        self.assertEqual(match_readings(first, self.index, now=now), [])
+        matches = match_readings(second, self.index, now=now)
+        self.assertEqual(len(matches), 1)
+        self.assertEqual(matches[0]['rule_id'], 1)
+        self.assertEqual(matches[0]['value'], 36.0)
+
+    def test_ingest_batch_out_of_order_is_sorted(self):
+        batch = self.readings([(5, 35.0), (0, 35.0), (3, 35.0)])
+        now = START + timedelta(minutes=10)
+        self.assertEqual(len(match_readings(batch, self.index, now=now)), 1)
+
+    def test_periodic_snapshot_reuses_ingest_state(self):
+        now = START + timedelta(minutes=6)
+        match_readings(self.readings([(minute, 35.0) for minute in range(5)]), self.index, now=now)
+
+        rule = SimpleNamespace(id=1)
+        condition = Condition(rule, None, 'temp', 'temp', '>', 30.0, 300)
+        # Mesmo timestamp já observado na ingestão: não conta de novo
+        snapshot = {'temp': (35.0, START + timedelta(minutes=4))}
+        self.assertEqual(find_triggered([condition], snapshot, now=now), [])
+
+        snapshot = {'temp': (35.0, START + timedelta(minutes=5))}
+        triggered = find_triggered([condition], snapshot, now=now)
+        self.assertEqual([item[0] for item in triggered], [condition])
+
+    def test_periodic_ok_reading_resets_state(self):
+        rule = SimpleNamespace(id=1)
+        condition = Condition(rule, None, 'temp', 'temp', '>', 30.0, 300)
+        for minute, value in [(0, 35.0), (3, 20.0), (6, 35.0)]:
+            now = START + timedelta(minutes=minute)
+            self.assertEqual(find_triggered([condition], {'temp': (value, now)}, now=now), [])
+
+
+class AnomalyBaselineTests(SimpleTestCase):
+    """Linhas de base EWMA e mediana/MAD (apps.alerts.services.anomaly)."""
+
+    def seeded(self, kind, values, window=60):
+        values = np.asarray(values, dtype=np.float64)
+        ts = np.arange(len(values), dtype=np.float64) * 60
+        return anomaly.seed_state(kind, window, ts, values)
+
+    def feed(self, state, values, operator='!=', k=3.0):
+        start = state['last_seen'] or 0.0
+        return [
+            anomaly.observe(state, start + 60 * (i + 1), value, operator, k)
+            for i, value in enumerate(values)
+        ]
+
+    def test_noise_around_baseline_is_not_flagged(self):
+        rng = np.random.default_rng(0)
+        for kind in anomaly.KINDS:
+            state = self.seeded(kind, rng.normal(20, 0.5, 300))
+            flags = self.feed(state, rng.normal(20, 0.5, 200), k=4.0)
+            self.assertFalse(any(flags), kind)
+
+    def test_step_change_is_flagged(self):
+        rng = np.random.default_rng(1)
+        for kind in anomaly.KINDS:
+            state = self.seeded(kind, rng.normal(20, 0.5, 300))
+            self.assertTrue(self.feed(state, [26.0])[0], kind)
+
+    def test_operator_selects_band_side(self):
+        rng = np.random.default_rng(2)
+        state = self.seeded('ewma', rng.normal(20, 0.5, 300))
+        self.assertFalse(self.feed(state, [14.0], operator='>')[0])
+        self.assertTrue(self.feed(state, [13.0], operator='<')[0])
+
+    def test_mad_seed_ignores_outliers(self):
+        values = np.full(300, 20.0) + np.random.default_rng(3).normal(0, 0.5, 300)
+        values[::25] = 500.0
+        state = self.seeded('mad', values)
+        self.assertAlmostEqual(state['center'], 20.0, delta=0.5)
+        self.assertTrue(self.feed(state, [30.0])[0])
+
+    def test_no_flags_before_min_samples(self):
+        state = self.seeded('ewma', [20.0] * (anomaly.MIN_SAMPLES - 1))
+        self.assertFalse(self.feed(state, [100.0])[0])
+
+    def test_reading_already_seen_does_not_update(self):
+        state = self.seeded('ewma', np.linspace(19, 21, 300))
+        count = state['count']
+        flag = anomaly.observe(state, state['last_seen'], 100.0, '!=', 3.0)
+        self.assertFalse(flag)
+        self.assertEqual(state['count'], count)
+
+
+class AlertsTenantTestCase(TenantTestCase):
+    """TestCase no schema de um tenant de teste com um chiller e seus sensores."""
+
+    @classmethod
+    def setup_tenant(cls, tenant):
+        tenant.name = 'Test'
+        tenant.slug = 'test'
+
+    def setUp(self):
+        cache.clear()
+        series.clear_local_cache()
+        self.site = Site.objects.create(name='Site A')
+        self.asset = Asset.objects.create(tag='CH-001', name='Chiller 1', site=self.site, asset_type='CHILLER')
+        self.device = Device.objects.create(
+            name='Gateway', serial_number='SN-001', asset=self.asset, mqtt_client_id='gw-001'
+        )
+        for tag in ('CH-001-TEMP-RETURN', 'CH-001-TEMP-SUPPLY'):
+            Sensor.objects.create(tag=tag, device=self.device, metric_type='temp_return', unit='celsius')
+
+    def rule(self, parameter_key, operator='>', threshold=5.0, duration=0, **kwargs):
+        rule = Rule.objects.create(name=f'Rule {parameter_key}', equipment=self.asset)
+        RuleParameter.objects.create(
+            rule=rule, parameter_key=parameter_key, operator=operator, threshold=threshold,
+            duration=duration, **kwargs
+        )
+        return rule
+
+    def ingest(self, values, ts=None):
+        """Grava um lote {tag: valor} como a IngestView (com derivados)."""
+        ts = ts or timezone.now()
+        readings = [
+            Reading(device_id='gw-001', sensor_id=tag, value=value, labels={}, ts=ts, asset_tag='CH-001')
+            for tag, value in values.items()
+        ]
+        series.insert_readings(readings)
+        latest.upsert_latest(readings)
+        derived = virtual.derive(readings)
+        if derived:
+            series.insert_readings(derived)
+            latest.upsert_latest(derived)
+        return readings + derived
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class VirtualSensorRuleTests(AlertsTenantTestCase):
+    """Regras sobre sensores virtuais (sem linha em sensors)."""
+
+    def setUp(self):
+        super().setUp()
+        VirtualSensor.objects.create(
+            asset=self.asset, tag='CH-001-DELTA-T',
+            expression='{CH-001-TEMP-RETURN} - {CH-001-TEMP-SUPPLY}',
+        )
+        self.delta_rule = self.rule('CH-001-DELTA-T', '>', 5.0)
+
+    def test_index_maps_virtual_tag_to_asset_devices(self):
+        index = build_index()
+        self.assertIn('CH-001-DELTA-T', index['gw-001'])
+        self.assertEqual(index['gw-001']['CH-001-DELTA-T'][0][0], self.delta_rule.id)
+
+    def test_new_virtual_sensor_invalidates_index(self):
+        rule = self.rule('CH-001-COP', '<', 3.0)
+        self.assertNotIn('CH-001-COP', get_index().get('gw-001', {}))
+        VirtualSensor.objects.create(asset=self.asset, tag='CH-001-COP', expression='{CH-001-TEMP-RETURN} / 2')
+        self.assertEqual(get_index()['gw-001']['CH-001-COP'][0][0], rule.id)
+
+    def test_rule_on_virtual_tag_fires_at_ingest(self):
+        readings = self.ingest({'CH-001-TEMP-RETURN': 13.0, 'CH-001-TEMP-SUPPLY': 6.0})
+        matches = match_readings(readings, build_index())
+        self.assertEqual([(match['rule_id'], match['value']) for match in matches], [(self.delta_rule.id, 7.0)])
+
+    def test_rule_on_virtual_tag_fires_in_periodic_evaluation(self):
+        from apps.alerts.tasks import evaluate_rules
+
+        self.ingest({'CH-001-TEMP-RETURN': 13.0, 'CH-001-TEMP-SUPPLY': 6.0})
+        alerts = evaluate_rules(Rule.objects.prefetch_related('parameters').select_related('equipment'))
+        self.assertEqual([(alert.rule_id, alert.parameter_value) for alert in alerts], [(self.delta_rule.id, 7.0)])
+        self.assertEqual(Alert.objects.get().parameter_key, 'CH-001-DELTA-T')
+
+    def test_virtual_tag_below_threshold_does_not_fire(self):
+        from apps.alerts.tasks import evaluate_rules
+
+        readings = self.ingest({'CH-001-TEMP-RETURN': 10.0, 'CH-001-TEMP-SUPPLY': 6.0})
+        self.assertEqual(match_readings(readings, build_index()), [])
+        self.assertEqual(evaluate_rules(Rule.objects.prefetch_related('parameters')), [])
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class CreateAlertsIsolationTests(AlertsTenantTestCase):
+    """Falha ou time limit em uma condição não perde os alertas do bloco."""
+
+    def setUp(self):
+        super().setUp()
+        self.return_rule = self.rule('CH-001-TEMP-RETURN', '>', 5.0)
+        self.supply_rule = self.rule('CH-001-TEMP-SUPPLY', '>', 5.0)
+        self.ingest({'CH-001-TEMP-RETURN': 12.0, 'CH-001-TEMP-SUPPLY': 7.0})
+        self.queued = []
+        patcher = mock.patch(
+            'apps.alerts.services.NotificationService.queue_alert_notifications',
+            autospec=True,
+            side_effect=lambda service, alert, users=None: self.queued.append(alert.rule_id),
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def fail_on(self, parameter_key, exception):
+        """Template que falha para um parâmetro."""
+        from apps.alerts import tasks
+
+        real = tasks.generate_alert_message_from_template
+
+        def generate(template, param, reading, value):
+            if param.parameter_key == parameter_key:
+                raise exception
+            return real(template, param, reading, value)
+
+        return mock.patch('apps.alerts.tasks.generate_alert_message_from_template', side_effect=generate)
+
+    def evaluate_tenant(self):
+        from apps.alerts.tasks import evaluate_tenant_rules_task
+
+        return evaluate_tenant_rules_task.apply(args=(self.tenant.schema_name, 'test')).get()
+
+    def test_failing_condition_does_not_abort_block(self):
+        with self.fail_on('CH-001-TEMP-RETURN', KeyError('sensor')):
+            stats = self.evaluate_tenant()
+        self.assertEqual((stats['triggered'], stats['errors'], stats['timed_out']), (1, 1, False))
+        self.assertEqual(list(Alert.objects.values_list('rule_id', flat=True)), [self.supply_rule.id])
+        self.assertEqual(self.queued, [self.supply_rule.id])
+
+    def test_notifications_queued_as_alerts_are_created(self):
+        stats = self.evaluate_tenant()
+        self.assertEqual(stats['triggered'], 2)
+        self.assertEqual(sorted(self.queued), sorted([self.return_rule.id, self.supply_rule.id]))
+
+    def test_soft_time_limit_keeps_created_alerts(self):
+        from apps.alerts import tasks
+
+        real = tasks.generate_alert_message_from_template
+        calls = []
+
+        def generate(template, param, reading, value):
+            # Time limit na segunda condição: a primeira já foi criada e notificada
+            calls.append(param.rule_id)
+            if len(calls) == 2:
+                raise SoftTimeLimitExceeded()
+            return real(template, param, reading, value)
+
+        with mock.patch('apps.alerts.tasks.generate_alert_message_from_template', side_effect=generate):
+            stats = self.evaluate_tenant()
+        self.assertTrue(stats['timed_out'])
+        self.assertEqual((stats['evaluated'], stats['triggered']), (2, 1))
+        self.assertEqual(self.queued, calls[:1])
+        self.assertEqual(list(Alert.objects.values_list('rule_id', flat=True)), calls[:1])
+
+    def test_ingest_task_isolates_conditions(self):
+        from apps.alerts.tasks import evaluate_triggered_conditions_task
+
+        matches = [
+            {'rule_id': rule.id, 'parameter_id': rule.parameters.get().id, 'parameter_key': key,
+             'value': 12.0, 'ts': timezone.now().isoformat()}
+            for rule, key in ((self.return_rule, 'CH-001-TEMP-RETURN'), (self.supply_rule, 'CH-001-TEMP-SUPPLY'))
+        ]
+        with self.fail_on('CH-001-TEMP-RETURN', ValueError('template')):
+            stats = evaluate_triggered_conditions_task.apply(args=(self.tenant.schema_name, 'test', matches)).get()
+        self.assertEqual((stats['triggered'], stats['errors']), (1, 1))
+        self.assertEqual(self.queued, [self.supply_rule.id])
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class RuleEvaluationFanOutTests(AlertsTenantTestCase):
+    """Fan-out por tenant/bloco de regras e agregação no callback do chord."""
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch('apps.alerts.services.NotificationService.queue_alert_notifications')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def dispatch(self, chunk_size):
+        """Roda o dispatcher com o chord mockado; devolve (retorno, assinaturas, callback)."""
+        from apps.alerts.tasks import evaluate_rules_task
+
+        with mock.patch('apps.alerts.tasks.RULE_CHUNK_SIZE', chunk_size), \
+                mock.patch('celery.chord') as chord:
+            result = evaluate_rules_task.apply().get()
+        if not chord.called:
+            return result, [], None
+        signatures = [s for s in chord.call_args.args[0] if s.args[0] == self.tenant.schema_name]
+        callback = chord.return_value.call_args.args[0]
+        return result, signatures, callback
+
+    def run_result(self, tenant, chunk=0, evaluated=1, triggered=0, errors=0, timed_out=False, started_at=None):
+        return {
+            'tenant': tenant, 'chunk': chunk,
+            'started_at': (started_at or timezone.now()).isoformat(),
+            'rules': evaluated, 'evaluated': evaluated, 'triggered': triggered,
+            'errors': errors, 'timed_out': timed_out, 'duration_ms': 40,
+        }
+
+    def test_large_tenant_split_in_rule_chunks(self):
+        from apps.alerts.tasks import TENANT_TASK_EXPIRES
+
+        ids = [self.rule('CH-001-TEMP-RETURN', '>', float(i)).id for i in range(5)]
+        Rule.objects.filter(id=self.rule('CH-001-TEMP-SUPPLY', '>', 1.0).id).update(enabled=False)
+
+        result, signatures, callback = self.dispatch(chunk_size=2)
+
+        self.assertEqual(
+            [s.args for s in signatures],
+            [(self.tenant.schema_name, 'test', ids[0:2], 0),
+             (self.tenant.schema_name, 'test', ids[2:4], 1),
+             (self.tenant.schema_name, 'test', ids[4:5], 2)],
+        )
+        self.assertTrue(all(s.options['expires'] == TENANT_TASK_EXPIRES for s in signatures))
+        self.assertEqual(callback.task, 'alerts.collect_rule_evaluation')
+        self.assertEqual(len(callback.args), 1)
+        self.assertEqual(result, {'tenants': 1, 'tasks': 3})
+
+    def test_chunk_boundary_keeps_single_task(self):
+        # Exatamente RULE_CHUNK_SIZE regras: uma task que avalia todas (None)
+        self.rule('CH-001-TEMP-RETURN', '>', 1.0)
+        self.rule('CH-001-TEMP-SUPPLY', '>', 1.0)
+
+        result, signatures, _ = self.dispatch(chunk_size=2)
+
+        self.assertEqual([s.args for s in signatures], [(self.tenant.schema_name, 'test', None, 0)])
+        self.assertEqual(result, {'tenants': 1, 'tasks': 1})
+
+    def test_no_enabled_rules_dispatches_nothing(self):
+        Rule.objects.filter(id=self.rule('CH-001-TEMP-RETURN', '>', 1.0).id).update(enabled=False)
+
+        result, signatures, callback = self.dispatch(chunk_size=2)
+
+        self.assertEqual((result, signatures, callback), ({'tenants': 0, 'tasks': 0}, [], None))
+
+    def test_inline_run_aggregates_chunks_and_records_runs(self):
+        from apps.alerts.tasks import evaluate_rules_task
+        from apps.ops.models import RuleEvaluationRun
+
+        self.rule('CH-001-TEMP-RETURN', '>', 5.0)
+        self.rule('CH-001-TEMP-SUPPLY', '>', 5.0)
+        self.rule('CH-001-TEMP-RETURN', '>', 50.0)
+        self.ingest({'CH-001-TEMP-RETURN': 12.0, 'CH-001-TEMP-SUPPLY': 7.0})
+
+        with mock.patch('apps.alerts.tasks.RULE_CHUNK_SIZE', 2):
+            totals = evaluate_rules_task.apply(kwargs={'inline': True}).get()
+
+        runs = list(RuleEvaluationRun.objects.filter(tenant_slug='test').order_by('chunk'))
+        self.assertEqual([(run.chunk, run.rule_count) for run in runs], [(0, 2), (1, 1)])
+        self.assertEqual(totals['triggered'], 2)
+        self.assertEqual(Alert.objects.count(), 2)
+        self.assertEqual(totals['evaluated'], sum(run.evaluated for run in runs))
+        self.assertEqual(totals['triggered'], sum(run.triggered for run in runs))
+        self.assertEqual((totals['tenants'], totals['errors'], totals['timed_out']), (1, 0, []))
+
+    def test_collect_aggregates_and_records_runs(self):
+        from apps.alerts.tasks import collect_rule_evaluation
+        from apps.ops.models import RuleEvaluationRun
+
+        results = [
+            self.run_result('acme', chunk=0, evaluated=3, triggered=1),
+            self.run_result('acme', chunk=1, evaluated=2, errors=1, timed_out=True),
+            None,  # task expirada/sem retorno
+            self.run_result('beta', evaluated=4, triggered=2),
+        ]
+
+        totals = collect_rule_evaluation.apply(args=(results, timezone.now().isoformat())).get()
+
+        self.assertEqual(totals, {'evaluated': 9, 'triggered': 3, 'errors': 1, 'tenants': 2, 'timed_out': ['acme']})
+        self.assertEqual(
+            list(RuleEvaluationRun.objects.order_by('tenant_slug', 'chunk').values_list(
+                'tenant_slug', 'chunk', 'rule_count', 'evaluated', 'triggered', 'errors', 'timed_out', 'duration_ms')),
+            [('acme', 0, 3, 3, 1, 0, False, 40), ('acme', 1, 2, 2, 0, 1, True, 40), ('beta', 0, 4, 4, 2, 0, False, 40)],
+        )
+
+    def test_collect_purges_runs_past_retention(self):
+        from apps.alerts.tasks import collect_rule_evaluation
+        from apps.ops.models import RuleEvaluationRun
+
+        collect_rule_evaluation.apply(args=([
+            self.run_result('old', started_at=timezone.now() - timedelta(days=15)),
+            self.run_result('recent', started_at=timezone.now() - timedelta(days=13)),
+            self.run_result('acme'),
+        ],)).get()
+
+        self.assertEqual(sorted(RuleEvaluationRun.objects.values_list('tenant_slug', flat=True)), ['acme', 'recent'])
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class StateLockTests(SimpleTestCase):
+    """Ler-modificar-gravar do estado de duração sob lock por chave."""
+
+    def setUp(self):
+        cache.clear()
+        self.key = state_cache_key('public', 1, 'temp')
+
+    def test_concurrent_update_waits_for_lock(self):
+        first = START.timestamp()
+        result = {}
+
+        def ingest():
+            result['sustained'] = track([(1, 'temp', 300, START + timedelta(minutes=5), True)])
+
+        with lock_states([self.key]):
+            worker = threading.Thread(target=ingest)
+            worker.start()
+            time.sleep(0.1)
+            # Bloqueada: a atualização periódica em curso não é sobrescrita
+            self.assertTrue(worker.is_alive())
+            state, _ = observe(None, first, True, 300)
+            cache.set(self.key, state)
+        worker.join(5)
+
+        # A leitura da ingestão foi aplicada sobre o estado gravado sob lock
+        self.assertEqual(cache.get(self.key)['since'], first)
+        self.assertEqual(result['sustained'], {(1, 'temp')})
+
+    def test_lock_released_on_error(self):
+        with self.assertRaises(RuntimeError):
+            with lock_states([self.key]):
+                raise RuntimeError
+        self.assertIsNone(cache.get(f'{self.key}:lock'))
+
+    def test_expired_lock_taken_by_other_worker_is_kept(self):
+        with lock_states([self.key]):
+            cache.set(f'{self.key}:lock', 'other-worker')
+        self.assertEqual(cache.get(f'{self.key}:lock'), 'other-worker')
+
+    def test_redis_release_compares_and_deletes_atomically(self):
+        from django.core.cache.backends.redis import RedisSerializer
+        from apps.alerts.services import duration
+
+        script = mock.Mock()
+        client = SimpleNamespace(
+            get_client=mock.Mock(return_value=mock.Mock(register_script=mock.Mock(return_value=script))),
+            _serializer=RedisSerializer(),
+        )
+        with mock.patch.object(duration, 'cache', mock.Mock(_cache=client, make_and_validate_key=lambda key: f'p:{key}')):
+            duration._release(['a:lock', 'b:lock'], 'token')
+
+        client.get_client.return_value.register_script.assert_called_once_with(duration.RELEASE_SCRIPT)
+        script.assert_called_once_with(keys=['p:a:lock', 'p:b:lock'], args=[RedisSerializer().dumps('token')])
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class AnomalyWarmupScopeTests(AlertsTenantTestCase):
+    """Semeadura da linha de base só com o histórico do equipamento da regra."""
+
+    def setUp(self):
+        super().setUp()
+        other = Asset.objects.create(tag='CH-002', name='Chiller 2', site=self.site, asset_type='CHILLER')
+        Device.objects.create(name='Gateway 2', serial_number='SN-002', asset=other, mqtt_client_id='gw-002')
+        self.now = timezone.now()
+        start = self.now - timedelta(hours=2)
+        # Mesma tag em dois equipamentos com níveis bem diferentes
+        for device_id, asset_tag, level in (('gw-001', 'CH-001', 20.0), ('gw-002', 'CH-002', 100.0)):
+            series.insert_readings([
+                Reading(device_id=device_id, sensor_id='temp', value=level + (minute % 3) * 0.1,
+                        labels={}, ts=start + timedelta(minutes=minute), asset_tag=asset_tag)
+                for minute in range(100)
+            ])
+
+    def test_warmup_reads_only_the_scope(self):
+        for scope in (('device', 'gw-001'), ('equipment', self.asset.id)):
+            ts, values = anomaly.load_warmup('temp', scope, self.now, 500)
+            self.assertEqual(len(values), 100, scope)
+            self.assertLess(values.max(), 21.0, scope)
+
+    def test_seeded_baseline_ignores_other_equipment(self):
+        item = (1, 'temp', 'temp', ('device', 'gw-001'), 'mad', 60, '!=', 4.0, [(self.now, 20.1)])
+        flags = anomaly.evaluate([item])
+        self.assertEqual(flags[(1, 'temp')], [False])
+        state = cache.get(anomaly.state_cache_key(self.tenant.schema_name, 1, 'temp'))
+        self.assertAlmostEqual(state['center'], 20.1, delta=0.2)
+
+
+class AlertCounterTestCase(AlertsTenantTestCase):
+    """Regras em dois equipamentos do mesmo site e helpers de alertas."""
+
+    def setUp(self):
+        super().setUp()
+        self.rule_obj = self.rule('temp', threshold=5.0)
+        other = Asset.objects.create(tag='CH-002', name='Chiller 2', site=self.site, asset_type='CHILLER')
+        self.other_rule = Rule.objects.create(name='Rule CH-002', equipment=other)
+
+    def alert(self, rule=None, severity='High'):
+        rule = rule or self.rule_obj
+        return Alert.objects.create(
+            rule=rule, message='x', severity=severity, asset_tag=rule.equipment.tag,
+            parameter_key='temp', parameter_value=10.0, threshold=5.0,
+        )
+
+    def transition(self, alert, **fields):
+        # Recarregado do banco: o signal aplica a diferença do estado carregado
+        alert = Alert.objects.get(pk=alert.pk)
+        for name, value in fields.items():
+            setattr(alert, name, value)
+        alert.save()
+        return alert
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class AlertCounterTests(AlertCounterTestCase):
+    """Contadores de alertas (apps.alerts.services.counters) mantidos pelos signals."""
+
+    def test_new_alerts_count_in_every_scope(self):
+        self.alert()
+        self.alert(severity='Critical')
+
+        for scope, key in (('asset', 'CH-001'), ('site', self.site.id), ('tenant', '')):
+            counts = counters.read(scope, key)
+            self.assertEqual((counts['total'], counts['active']), (2, 2), scope)
+            self.assertEqual(counts['by_severity']['Critical']['active'], 1, scope)
+        self.assertEqual(counters.read('site', self.site.id)['assets_with_active_alerts'], 1)
+
+    def test_assets_active_tracks_assets_with_active_alerts(self):
+        first = self.alert()
+        second = self.alert()
+        self.alert(rule=self.other_rule)
+        self.assertEqual(counters.read('tenant')['assets_with_active_alerts'], 2)
+
+        # CH-001 continua com um alerta ativo
+        self.transition(first, acknowledged=True, acknowledged_at=timezone.now())
+        self.assertEqual(counters.read('site', self.site.id)['assets_with_active_alerts'], 2)
+
+        self.transition(second, resolved=True, resolved_at=timezone.now())
+        counts = counters.read('site', self.site.id)
+        self.assertEqual(counts['assets_with_active_alerts'], 1)
+        self.assertEqual(
+            (counts['active'], counts['acknowledged'], counts['resolved']), (1, 1, 1)
+        )
+        self.assertEqual(counters.read('site', self.site.id)['by_severity']['High']['active'], 1)
+
+    def test_delete_and_reconcile(self):
+        alert = self.alert()
+        self.alert(rule=self.other_rule)
+        Alert.objects.get(pk=alert.pk).delete()
+        self.assertEqual(counters.read('asset', 'CH-001')['total'], 0)
+        self.assertEqual(counters.read('tenant')['assets_with_active_alerts'], 1)
+        self.assertEqual(counters.reconcile(), 0)
+
+        # Alteração fora do ORM é corrigida pela reconciliação
+        Alert.objects.filter(asset_tag='CH-002').update(acknowledged=True)
+        self.assertEqual(counters.read('tenant')['active'], 1)
+        self.assertGreater(counters.reconcile(), 0)
+        self.assertEqual(counters.read('tenant')['acknowledged'], 1)
+        self.assertEqual(counters.read('tenant')['assets_with_active_alerts'], 0)
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class CleanupOldAlertsTests(AlertCounterTestCase):
+    """alerts.cleanup_old_alerts: exclusão em lote e recálculo dos derivados."""
+
+    def test_deletes_old_resolved_alerts_and_reconciles(self):
+        from apps.alerts.tasks import cleanup_old_alerts_task
+
+        old = [self.transition(self.alert(), resolved=True, resolved_at=timezone.now()) for _ in range(3)]
+        Alert.objects.filter(pk__in=[alert.pk for alert in old]).update(
+            resolved_at=timezone.now() - timedelta(days=120)
+        )
+        recent = self.transition(self.alert(), resolved=True, resolved_at=timezone.now())
+        active = self.alert()
+        digest = AlertDigest.objects.create(
+            user=self.user(), site=self.site, channel='email', flush_at=timezone.now()
+        )
+        digest.alerts.add(old[0], active)
+
+        deleted = cleanup_old_alerts_task.apply(args=(90,)).get()
+
+        self.assertEqual(deleted, 3)
+        self.assertEqual(set(Alert.objects.values_list('pk', flat=True)), {recent.pk, active.pk})
+        self.assertEqual(list(digest.alerts.all()), [active])
+        counts = counters.read('asset', 'CH-001')
+        self.assertEqual((counts['active'], counts['resolved']), (1, 1))
+        self.assertEqual(counters.reconcile(), 0)
+        state = AlertCooldownState.objects.get(rule=self.rule_obj, parameter_key='temp')
+        self.assertEqual(state.resolved_at, Alert.objects.get(pk=recent.pk).resolved_at)
+
+    def test_deletes_in_batches(self):
+        from apps.alerts.tasks import cleanup_old_alerts_task
+
+        old = [self.transition(self.alert(), resolved=True, resolved_at=timezone.now()) for _ in range(5)]
+        Alert.objects.filter(pk__in=[alert.pk for alert in old]).update(
+            resolved_at=timezone.now() - timedelta(days=120)
+        )
+        with mock.patch('apps.alerts.tasks.CLEANUP_BATCH_SIZE', 2):
+            self.assertEqual(cleanup_old_alerts_task.apply(args=(90,)).get(), 5)
+        self.assertFalse(Alert.objects.exists())
+        self.assertEqual(counters.reconcile(), 0)
+
+    def test_digest_is_the_only_relation_to_alert(self):
+        # A limpeza apaga as dependências explicitamente: nova relação com
+        # Alert precisa ser incluída em cleanup_old_alerts_task
+        self.assertEqual(
+            [(rel.related_model, rel.field.name) for rel in Alert._meta.related_objects],
+            [(AlertDigest, 'alerts')],
+        )
+
+    def test_nothing_to_delete(self):
+        from apps.alerts.tasks import cleanup_old_alerts_task
+
+        self.alert()
+        with mock.patch.object(counters, 'reconcile') as reconcile:
+            self.assertEqual(cleanup_old_alerts_task.apply(args=(90,)).get(), 0)
+        reconcile.assert_not_called()
+
+    def user(self):
+        from django.contrib.auth import get_user_model
+
+        return get_user_model().objects.create_user(username='digest', email='digest@example.com', password='x')
+
+
+def legacy_cooldown(rule, parameter_key):
+    """check_alert_cooldown anterior: três consultas em alerts_alert."""
+    from apps.alerts.tasks import DEFAULT_ALERT_COOLDOWN_MINUTES, RESOLVED_COOLDOWN_MINUTES
+
+    now = timezone.now()
+    alerts = Alert.objects.filter(rule=rule, parameter_key=parameter_key)
+    if alerts.filter(
+        acknowledged=False, resolved=False,
+        triggered_at__gte=now - timedelta(minutes=DEFAULT_ALERT_COOLDOWN_MINUTES),
+    ).exists():
+        return False, 'Active alert exists'
+    if alerts.filter(acknowledged=True, resolved=False).exists():
+        return False, 'Alert is acknowledged but not resolved'
+    if alerts.filter(resolved=True, resolved_at__gte=now - timedelta(minutes=RESOLVED_COOLDOWN_MINUTES)).exists():
+        return False, 'Alert was recently resolved'
+    return True, 'OK'
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class CooldownStateTests(AlertsTenantTestCase):
+    """check_alert_cooldown sobre AlertCooldownState decide como as três consultas."""
+
+    # (minutos desde o disparo, estado, minutos desde reconhecimento/resolução)
+    SCENARIOS = {
+        'none': [],
+        'active_recent': [(10, 'active', None)],
+        'active_expired': [(120, 'active', None)],
+        'acknowledged': [(300, 'acknowledged', 200)],
+        'resolved_recent': [(50, 'resolved', 10)],
+        'resolved_expired': [(100, 'resolved', 45)],
+        'expired_and_resolved': [(120, 'active', None), (90, 'resolved', 40)],
+        'resolved_then_active': [(90, 'resolved', 60), (5, 'active', None)],
+    }
+
+    def setUp(self):
+        super().setUp()
+        self.rule_obj = self.rule('temp')
+
+    def create(self, parameter_key, alerts):
+        now = timezone.now()
+        for triggered, state, changed in alerts:
+            alert = Alert.objects.create(
+                rule=self.rule_obj, message='x', severity='High', asset_tag='CH-001',
+                parameter_key=parameter_key, parameter_value=10.0, threshold=5.0,
+            )
+            fields = {'triggered_at': now - timedelta(minutes=triggered)}
+            if state == 'acknowledged':
+                fields.update(acknowledged=True, acknowledged_at=now - timedelta(minutes=changed))
+            elif state == 'resolved':
+                fields.update(resolved=True, resolved_at=now - timedelta(minutes=changed))
+            # Datas no passado: gravadas fora do ORM e o estado recalculado
+            Alert.objects.filter(pk=alert.pk).update(**fields)
+        refresh_cooldown_state(self.rule_obj.id, parameter_key)
+
+    def test_parity_with_alert_queries(self):
+        from apps.alerts.tasks import check_alert_cooldown
+
+        for name, alerts in self.SCENARIOS.items():
+            self.create(name, alerts)
+        states = load_cooldown_states([self.rule_obj.id])
+
+        for name in self.SCENARIOS:
+            with self.subTest(name):
+                allowed, reason = check_alert_cooldown(self.rule_obj, name, states)
+                self.assertEqual((allowed, reason.split(' (')[0]), legacy_cooldown(self.rule_obj, name))
+
+    def test_signals_keep_state_current(self):
+        from apps.alerts.tasks import check_alert_cooldown
+
+        alert = Alert.objects.create(
+            rule=self.rule_obj, message='x', severity='High', asset_tag='CH-001',
+            parameter_key='temp', parameter_value=10.0, threshold=5.0,
+        )
+        self.assertFalse(check_alert_cooldown(self.rule_obj, 'temp')[0])
+
+        alert.acknowledged, alert.acknowledged_at = True, timezone.now()
+        alert.save()
+        self.assertTrue(check_alert_cooldown(self.rule_obj, 'temp')[1].startswith('Alert is acknowledged'))
+
+        alert.resolved, alert.resolved_at = True, timezone.now() - timedelta(hours=1)
+        alert.save()
+        self.assertEqual(check_alert_cooldown(self.rule_obj, 'temp'), (True, 'OK'))
+
+        alert.delete()
+        self.assertFalse(AlertCooldownState.objects.filter(rule=self.rule_obj).exists())
+
+    def test_states_load_in_one_query(self):
+        self.create('a', [(10, 'active', None)])
+        self.create('b', [(10, 'resolved', 5)])
+        with self.assertNumQueries(1):
+            states = load_cooldown_states([self.rule_obj.id])
+        self.assertEqual(set(states), {(self.rule_obj.id, 'a'), (self.rule_obj.id, 'b')})
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class RuleIndexTests(AlertsTenantTestCase):
+    """Avaliação na ingestão pelo índice compilado (apps.alerts.services.rule_index)."""
+
+    def setUp(self):
+        super().setUp()
+        self.high = self.rule('CH-001-TEMP-RETURN', '>', 10.0)
+        self.queued = []
+        patcher = mock.patch(
+            'apps.alerts.services.NotificationService.queue_alert_notifications',
+            autospec=True,
+            side_effect=lambda service, alert, users=None: self.queued.append(alert.rule_id),
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def readings(self, values, device_id='gw-001', sensor_id='CH-001-TEMP-RETURN'):
+        now = timezone.now()
+        return [
+            Reading(device_id=device_id, sensor_id=sensor_id, value=value, labels={},
+                    ts=now - timedelta(minutes=minutes_ago))
+            for minutes_ago, value in values
+        ]
+
+    def test_index_contains_enabled_rules_only(self):
+        disabled = self.rule('CH-001-TEMP-SUPPLY', '<', 2.0)
+        disabled.enabled = False
+        disabled.save()
+
+        index = build_index()
+        self.assertEqual(list(index), ['gw-001'])
+        self.assertEqual(list(index['gw-001']), ['CH-001-TEMP-RETURN'])
+        self.assertEqual(
+            index['gw-001']['CH-001-TEMP-RETURN'][0][:7],
+            (self.high.id, self.high.parameters.get().id, 'CH-001-TEMP-RETURN', '>', 10.0, 0, 'threshold'),
+        )
+
+    def test_rule_changes_invalidate_cached_index(self):
+        self.assertEqual(get_index()['gw-001']['CH-001-TEMP-RETURN'][0][4], 10.0)
+        parameter = self.high.parameters.get()
+        parameter.threshold = 20.0
+        parameter.save()
+        self.assertEqual(get_index()['gw-001']['CH-001-TEMP-RETURN'][0][4], 20.0)
+
+        self.high.enabled = False
+        self.high.save()
+        self.assertEqual(get_index(), {})
+
+    def test_match_uses_newest_fresh_reading(self):
+        index = build_index()
+        # Mais recente abaixo do limite: não dispara
+        self.assertEqual(match_readings(self.readings([(2, 15.0), (1, 8.0)]), index), [])
+        # Leitura antiga demais e device/sensor fora do índice são ignorados
+        self.assertEqual(match_readings(self.readings([(60, 15.0)]), index), [])
+        self.assertEqual(match_readings(self.readings([(1, 15.0)], device_id='gw-999'), index), [])
+        self.assertEqual(match_readings(self.readings([(1, 15.0)], sensor_id='other'), index), [])
+
+        matches = match_readings(self.readings([(2, 8.0), (1, 15.0)]), index)
+        self.assertEqual(
+            [(match['rule_id'], match['parameter_key'], match['value']) for match in matches],
+            [(self.high.id, 'CH-001-TEMP-RETURN', 15.0)],
+        )
+
+    def test_dispatch_queues_matches_after_commit(self):
+        from apps.alerts.services import rule_index
+
+        with mock.patch('apps.alerts.tasks.evaluate_triggered_conditions_task.delay') as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assertEqual(rule_index.dispatch(self.readings([(1, 15.0)]), self.tenant), 1)
+                delay.assert_not_called()
+        schema_name, slug, matches = delay.call_args.args
+        self.assertEqual((schema_name, slug, len(matches)), (self.tenant.schema_name, 'test', 1))
+
+    def test_task_rechecks_threshold_and_cooldown(self):
+        from apps.alerts.tasks import evaluate_triggered_conditions_task
+
+        matches = match_readings(self.readings([(1, 15.0)]), build_index())
+        parameter = self.high.parameters.get()
+        parameter.threshold = 20.0
+        parameter.save()
+
+        def run():
+            return evaluate_triggered_conditions_task.apply(args=(self.tenant.schema_name, 'test', matches)).get()
+
+        self.assertEqual(run()['triggered'], 0)
+
+        parameter.threshold = 10.0
+        parameter.save()
+        self.assertEqual(run()['triggered'], 1)
+        self.assertEqual(self.queued, [self.high.id])
+        # Cooldown: o mesmo parâmetro não gera outro alerta
+        self.assertEqual(run()['triggered'], 0)
+        self.assertEqual(Alert.objects.count(), 1)
+
+
+class BacktestMaskTests(SimpleTestCase):
+    """Backtest vetorizado (apps.alerts.services.backtest) x estado incremental."""
+
+    def incremental(self, ts, values, operator, threshold, duration_seconds):
+        compare = OPERATORS[operator]
+        state, flags = None, []
+        for moment, value in zip(ts, values):
+            state, sustained = observe(state, moment, bool(compare(value, threshold)), duration_seconds)
+            flags.append(sustained)
+        return flags
+
+    def test_sustained_mask_matches_duration_state(self):
+        rng = np.random.default_rng(7)
+        steps = rng.choice([60, 60, 60, 120, 1200], size=400)
+        ts = START.timestamp() + np.cumsum(steps).astype(np.float64)
+        values = rng.normal(10.0, 3.0, size=400)
+        for duration in (0, 300, 600):
+            with self.subTest(duration=duration):
+                mask = backtest.sustained_mask(ts, values, '>', 9.0, duration)
+                self.assertEqual(mask.tolist(), self.incremental(ts, values, '>', 9.0, duration))
+
+    def test_gap_breaks_the_run(self):
+        ts = np.array([0, 60, 120, 1200 + 120, 1200 + 180, 1200 + 480], dtype=np.float64)
+        values = np.full(6, 20.0)
+        mask = backtest.sustained_mask(ts, values, '>', 10.0, 120)
+        self.assertEqual(mask.tolist(), [False, False, True, False, False, True])
+
+    def test_nan_never_meets(self):
+        ts = np.arange(3, dtype=np.float64) * 60
+        mask = backtest.sustained_mask(ts, np.array([20.0, np.nan, 20.0]), '!=', 0.0)
+        self.assertEqual(mask.tolist(), [True, False, True])
+
+    def test_apply_cooldown(self):
+        ts = np.arange(12, dtype=np.float64) * 60
+        candidates = np.ones(12, dtype=bool)
+        candidates[[4, 5]] = False
+        self.assertEqual(backtest.apply_cooldown(ts, candidates, 300).tolist(), [0, 6, 11])
+        self.assertEqual(backtest.apply_cooldown(ts, candidates, 0).tolist(), np.flatnonzero(candidates).tolist())
+        self.assertEqual(backtest.apply_cooldown(ts, np.zeros(12, dtype=bool), 300).tolist(), [])
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class RunBacktestTests(AlertsTenantTestCase):
+    """run_backtest sobre o histórico gravado."""
+
+    def setUp(self):
+        super().setUp()
+        self.start = timezone.now().replace(microsecond=0) - timedelta(hours=2)
+        # Uma leitura por minuto durante 1h: acima de 10 nos minutos 10-29 e 40-44
+        series.insert_readings([
+            Reading(device_id='gw-001', sensor_id='CH-001-TEMP-RETURN', labels={}, asset_tag='CH-001',
+                    value=15.0 if 10 <= minute < 30 or 40 <= minute < 45 else 5.0,
+                    ts=self.start + timedelta(minutes=minute))
+            for minute in range(60)
+        ])
+
+    def backtest(self, duration=0, cooldown=15, **kwargs):
+        parameters = [
+            {'parameter_key': 'CH-001-TEMP-RETURN', 'operator': '>', 'threshold': 10.0, 'duration': duration},
+            {'parameter_key': 'missing', 'operator': '>', 'threshold': 1.0},
+        ]
+        return backtest.run_backtest(
+            parameters, self.start, self.start + timedelta(hours=1), cooldown, equipment_id=self.asset.id, **kwargs
+        )
+
+    def test_counts_alerts_with_cooldown_and_duration(self):
+        result = self.backtest()
+        found, missing = result['parameters']
+        self.assertEqual((found['readings'], found['met'], found['alert_count']), (60, 25, 3))
+        self.assertEqual(found['device_id'], 'gw-001')
+        self.assertEqual(missing['error'], 'Sensor not found')
+        self.assertEqual(result['total_alerts'], 3)
+        self.assertIsNone(result['archive_horizon'])
+
+        # 10 minutos sustentados: só a primeira violação (20 min) dispara
+        found = self.backtest(duration=10)['parameters'][0]
+        self.assertEqual((found['sustained'], found['alert_count']), (10, 1))
+        self.assertEqual(found['alerts'][0]['value'], 15.0)
+
+    def test_flags_archive_horizon_inside_window(self):
+        horizon = self.start + timedelta(minutes=30)
+        with mock.patch('apps.ingest.services.archive.get_archive_horizon', return_value=horizon):
+            self.assertEqual(self.backtest()['archive_horizon'], horizon.isoformat())
+
+
+class NotificationTestCase(AlertCounterTestCase):
+    """Usuários com preferências de notificação e regra com ações."""
+
+    def setUp(self):
+        super().setUp()
+        self.rule_obj.actions = ['EMAIL', 'IN_APP', 'SMS']
+        self.rule_obj.save()
+        self.users = [self.create_user(name) for name in ('ana', 'bruno', 'carla')]
+
+    def create_user(self, name, **preferences):
+        from django.contrib.auth import get_user_model
+        from apps.alerts.models import NotificationPreference
+
+        user = get_user_model().objects.create_user(username=name, email=f'{name}@example.com', password='x')
+        if preferences:
+            NotificationPreference.objects.create(user=user, **preferences)
+        return user
+
+    def set_preferences(self, user, **fields):
+        from apps.alerts.models import NotificationPreference
+
+        NotificationPreference.objects.update_or_create(user=user, defaults=fields)
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class NotificationServiceTests(NotificationTestCase):
+    """Planejamento e enfileiramento das notificações (NotificationService)."""
+
+    def setUp(self):
+        super().setUp()
+        from apps.alerts.services import NotificationService
+
+        self.service = NotificationService()
+
+    def test_plan_splits_recipients_by_channel(self):
+        ana, bruno, carla = self.users
+        self.set_preferences(bruno, push_enabled=False, sms_enabled=True, phone_number='+5511999990000')
+        self.set_preferences(carla, high_alerts=False)
+
+        recipients, skipped, preferences = self.service.plan_notifications(self.alert(), self.users)
+
+        self.assertEqual(recipients, {'email': [ana, bruno], 'in_app': [ana]})
+        self.assertEqual(
+            [(item['user'], item['channel']) for item in skipped],
+            [('bruno@example.com', 'sms'), ('carla@example.com', 'all')],
+        )
+        self.assertEqual(skipped[0]['reason'], 'SMS notifications disabled in settings')
+        self.assertEqual(set(preferences), {user.id for user in self.users})
+
+    def test_preferences_loaded_in_bulk(self):
+        from apps.alerts.models import NotificationPreference
+
+        self.set_preferences(self.users[0], low_alerts=True)
+        # Leitura, criação das que faltam e releitura, para qualquer número de usuários
+        with self.assertNumQueries(3):
+            preferences = self.service.load_preferences(self.users)
+        self.assertEqual(NotificationPreference.objects.count(), 3)
+        self.assertTrue(preferences[self.users[0].id].low_alerts)
+        self.assertFalse(preferences[self.users[1].id].low_alerts)
+
+        with self.assertNumQueries(1):
+            self.service.load_preferences(self.users)
+
+    def test_queue_one_task_per_channel(self):
+        from apps.alerts.tasks import deliver_notifications_task
+
+        for user in self.users:
+            self.set_preferences(user, digest_window_minutes=0)
+        alert = self.alert()
+
+        with mock.patch.object(deliver_notifications_task, 'apply_async') as apply_async:
+            result = self.service.queue_alert_notifications(alert, self.users)
+
+        self.assertEqual(result['queued'], {'email': 3, 'in_app': 3})
+        self.assertEqual(result['coalesced'], {})
+        queued = {call.kwargs['queue']: call.kwargs['args'] for call in apply_async.call_args_list}
+        user_ids = [user.id for user in self.users]
+        self.assertEqual(queued, {
+            'notifications.email': (self.tenant.schema_name, alert.id, 'email', user_ids),
+            'notifications.in_app': (self.tenant.schema_name, alert.id, 'in_app', user_ids),
+        })
+
+    def test_open_digest_holds_email_only(self):
+        from apps.alerts.tasks import deliver_notifications_task
+
+        with mock.patch.object(deliver_notifications_task, 'apply_async'):
+            first = self.service.queue_alert_notifications(self.alert(), self.users)
+            second = self.service.queue_alert_notifications(self.alert(), self.users)
+
+        self.assertEqual(first['queued'], {'email': 3, 'in_app': 3})
+        self.assertEqual(second['queued'], {'in_app': 3})
+        self.assertEqual(second['coalesced'], {'email': 3})
+
+    def test_deliver_retries_only_failed_recipients(self):
+        from smtplib import SMTPException
+        from celery.exceptions import Retry
+        from django.core import mail
+        from apps.alerts.services import NotificationService
+        from apps.alerts.tasks import deliver_notifications_task
+
+        ana, bruno, carla = self.users
+        alert = self.alert()
+        build_email = NotificationService._build_email
+
+        def fail_for_bruno(service, alert, user):
+            if user == bruno:
+                raise SMTPException('mailbox unavailable')
+            return build_email(service, alert, user)
+
+        with mock.patch.object(NotificationService, '_build_email', autospec=True, side_effect=fail_for_bruno), \
+                mock.patch.object(deliver_notifications_task, 'retry', side_effect=Retry()) as retry:
+            deliver_notifications_task.apply(
+                args=(self.tenant.schema_name, alert.id, 'email', [user.id for user in self.users])
+            )
+
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), ['ana@example.com', 'carla@example.com'])
+        self.assertEqual(retry.call_args.kwargs['args'], (self.tenant.schema_name, alert.id, 'email', [bruno.id]))
+        self.assertEqual(retry.call_args.kwargs['queue'], 'notifications.email')
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class DigestTests(NotificationTestCase):
+    """Resumo de notificações (apps.alerts.services.digest)."""
+
+    def setUp(self):
+        super().setUp()
+        from apps.alerts.services import NotificationService
+
+        self.service = NotificationService()
+        self.ana = self.users[0]
+        self.preferences = self.service.load_preferences(self.users)
+
+    def coalesce(self, alert, channel='email', users=None):
+        from apps.alerts.services import digest
+
+        alert = Alert.objects.select_related('rule__equipment').get(pk=alert.pk)
+        return digest.coalesce(alert, channel, users or [self.ana], self.preferences)
+
+    def hold(self, count):
+        """Abre o resumo de ana e retém ``count`` alertas nele."""
+        self.coalesce(self.alert())
+        held = [self.alert() for _ in range(count)]
+        for alert in held:
+            self.coalesce(alert)
+        return AlertDigest.objects.get(user=self.ana), held
+
+    def test_first_alert_opens_digest_and_later_ones_are_held(self):
+        from apps.alerts.services import digest
+
+        first = self.alert()
+        with mock.patch.object(digest, 'schedule_flush') as schedule_flush:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assertEqual(self.coalesce(first), ([self.ana], 0))
+        opened = AlertDigest.objects.get(user=self.ana, site=self.site, channel='email')
+        self.assertAlmostEqual(opened.flush_at - opened.opened_at, timedelta(minutes=10), delta=timedelta(seconds=5))
+        self.assertEqual(schedule_flush.call_args.args, (self.tenant.schema_name, opened))
+        self.assertEqual(list(opened.alerts.all()), [])
+
+        second = self.alert()
+        self.assertEqual(self.coalesce(second), ([], 1))
+        self.assertEqual(self.coalesce(second), ([], 1))
+        self.assertEqual(list(opened.alerts.all()), [second])
+        self.assertEqual(AlertDigest.objects.count(), 1)
+
+    def test_bypass_and_disabled_window(self):
+        bruno = self.users[1]
+        self.preferences[bruno.id].digest_window_minutes = 0
+
+        self.assertEqual(self.coalesce(self.alert(severity='Critical')), ([self.ana], 0))
+        self.assertEqual(self.coalesce(self.alert(), channel='in_app'), ([self.ana], 0))
+        self.assertEqual(self.coalesce(self.alert(), users=[bruno]), ([bruno], 0))
+        self.assertFalse(AlertDigest.objects.exists())
+
+    def test_claim_counts_only_active_alerts(self):
+        from apps.alerts.services import digest
+
+        opened, held = self.hold(3)
+        self.transition(held[0], acknowledged=True)
+
+        claimed, pending = digest.claim(opened.id)
+        self.assertEqual(pending, held[1:])
+        self.assertEqual((claimed.coalesced_count, claimed.suppressed_count), (2, 2))
+        self.assertIsNotNone(claimed.sent_at)
+        # Já enviado
+        self.assertEqual(digest.claim(opened.id), (None, []))
+
+    def test_claim_with_every_alert_handled(self):
+        from apps.alerts.services import digest
+
+        opened, held = self.hold(2)
+        for alert in held:
+            self.transition(alert, resolved=True, resolved_at=timezone.now())
+
+        claimed, pending = digest.claim(opened.id)
+        self.assertEqual(pending, [])
+        self.assertEqual((claimed.coalesced_count, claimed.suppressed_count), (0, 2))
+
+    def test_flush_sends_one_message(self):
+        from django.core import mail
+        from apps.alerts.services import digest
+
+        opened, held = self.hold(3)
+        stats = digest.flush(opened.id)
+
+        self.assertEqual((stats['coalesced'], stats['suppressed'], stats['sent']), (3, 2, 1))
+        self.assertEqual(stats['alert_ids'], [alert.id for alert in held])
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].subject, '[HIGH] 3 alerts at Site A')
+        # Novo alerta depois do envio abre outro resumo
+        self.assertEqual(self.coalesce(self.alert()), ([self.ana], 0))
+
+    def test_due_digests_after_grace(self):
+        from apps.alerts.services import digest
+
+        opened, _ = self.hold(1)
+        self.assertEqual(digest.due_digests(opened.flush_at), [])
+        self.assertEqual(digest.due_digests(opened.flush_at + digest.FLUSH_GRACE), [(opened.id, 'email')])
+        digest.claim(opened.id)
+        self.assertEqual(digest.due_digests(opened.flush_at + digest.FLUSH_GRACE), [])
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class BacktestResultViewTests(AlertsTenantTestCase):
+    """GET /api/alerts/rules/backtest/{task_id}/: estados da task e tenant."""
+
+    TASK_ID = '6f1c2a9e-0b7d-4e55-9a43-1d2f3c4b5a60'
+
+    def setUp(self):
+        super().setUp()
+        from django.contrib.auth import get_user_model
+        from apps.accounts.models import TenantMembership
+
+        self.user = get_user_model().objects.create_user(username='backtest', email='bt@example.com', password='x')
+        TenantMembership.objects.create(user=self.user, tenant=self.tenant, role='admin')
+
+    def request(self, method, path, data=None):
+        from rest_framework.test import APIRequestFactory, force_authenticate
+        from apps.alerts.views import RuleViewSet
+
+        factory = APIRequestFactory()
+        request = factory.post(path, data, format='json') if method == 'post' else factory.get(path)
+        force_authenticate(request, user=self.user)
+        if method == 'post':
+            return RuleViewSet.as_view({'post': 'backtest'})(request)
+        return RuleViewSet.as_view({'get': 'backtest_result'})(request, task_id=self.TASK_ID)
+
+    def submit(self):
+        from apps.alerts.tasks import backtest_rule_task
+
+        with mock.patch.object(backtest_rule_task, 'delay', return_value=SimpleNamespace(id=self.TASK_ID)):
+            response = self.request('post', '/api/alerts/rules/backtest/', {
+                'parameters': [{'parameter_key': 'CH-001-TEMP-RETURN', 'operator': '>', 'threshold': 10}],
+                'background': True,
+            })
+        self.assertEqual(response.status_code, 202)
+
+    def result(self, state, result=None):
+        task = SimpleNamespace(state=state, result=result, ready=lambda: state in ('SUCCESS', 'FAILURE', 'REVOKED'))
+        with mock.patch('celery.result.AsyncResult', return_value=task):
+            return self.request('get', f'/api/alerts/rules/backtest/{self.TASK_ID}/')
+
+    def test_unknown_task_is_not_found(self):
+        self.assertEqual(self.result('SUCCESS', {'schema': self.tenant.schema_name}).status_code, 404)
+
+    def test_pending_and_success(self):
+        self.submit()
+        self.assertEqual(self.result('PENDING').status_code, 202)
+
+        response = self.result('SUCCESS', {'schema': self.tenant.schema_name, 'total_alerts': 3})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {'task_id': self.TASK_ID, 'status': 'SUCCESS', 'total_alerts': 3})
+
+    def test_failed_or_revoked_task_is_a_conflict(self):
+        self.submit()
+        response = self.result('FAILURE', ValueError('Sensor not found'))
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['error'], 'Backtest failed: Sensor not found')
+        self.assertEqual(self.result('REVOKED').status_code, 409)
+
+    def test_foreign_or_unexpected_result_is_not_found(self):
+        self.submit()
+        self.assertEqual(self.result('SUCCESS', {'schema': 'other', 'total_alerts': 3}).status_code, 404)
+        self.assertEqual(self.result('SUCCESS', [1, 2, 3]).status_code, 404)
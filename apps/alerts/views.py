@@ -7,6 +7,7 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.utils import timezone
+from django.core.cache import cache
 from django.db import connection
 from django.db.models import Q, Count
 
@@ -18,6 +19,7 @@ from .serializers import (
     ResolveAlertSerializer,
     NotificationPreferenceSerializer,
     AlertStatisticsSerializer,
+    RuleBacktestSerializer,
 )
 from apps.accounts.permissions import IsTenantMember, CanWrite
 
@@ -35,8 +37,14 @@ class RuleViewSet(viewsets.ModelViewSet):
     partial_update: Atualizar parcialmente regra
     destroy: Deletar regra
     toggle_status: Ativar/desativar regra
+    backtest: Simular uma regra (rascunho ou salva) sobre o histórico
     """
     
+    # Janelas maiores (ou background=true) rodam na task alerts.backtest_rule
+    BACKTEST_SYNC_MAX_DAYS = 31
+    # Backtests em background do tenant consultáveis por task_id (result_expires do Celery)
+    BACKTEST_RESULT_TIMEOUT = 86400
+    
     serializer_class = RuleSerializer
     permission_classes = [IsAuthenticated, IsTenantMember]
     
@@ -103,6 +111,101 @@ class RuleViewSet(viewsets.ModelViewSet):
             'rule': serializer.data
         })
     
+    @action(detail=False, methods=['post'])
+    def backtest(self, request):
+        """
+        Quantos alertas uma configuração de regra teria gerado.
+        
+        POST /api/alerts/rules/backtest/
+        
+        Body:
+            {
+                "parameters": [
+                    {"parameter_key": "sensor_12", "operator": ">", "threshold": 30, "duration": 5}
+                ],
+                "equipment": 3,             # Opcional (resolve tags do equipamento)
+                "rule": 7,                  # Opcional: usa os parâmetros da regra salva
+                "cooldown_minutes": 60,     # Opcional (padrão: preferência do usuário)
+                "start": "...", "end": "...",  # Opcional (padrão: últimos 7 dias)
+                "background": false         # Opcional: força a execução na task
+            }
+        
+        Janelas de até BACKTEST_SYNC_MAX_DAYS dias respondem na hora; as
+        demais retornam 202 com task_id (resultado em backtest/{task_id}/).
+        """
+        from apps.alerts.services.backtest import run_backtest
+        from apps.alerts.tasks import DEFAULT_ALERT_COOLDOWN_MINUTES, backtest_rule_task
+        
+        serializer = RuleBacktestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        
+        cooldown_minutes = data.get('cooldown_minutes')
+        if cooldown_minutes is None:
+            cooldown_minutes = (
+                getattr(request.user, 'alert_cooldown_minutes', None) or DEFAULT_ALERT_COOLDOWN_MINUTES
+            )
+        parameters = [dict(param) for param in data['parameters']]
+        
+        window_days = (data['end'] - data['start']).total_seconds() / 86400
+        if data['background'] or window_days > self.BACKTEST_SYNC_MAX_DAYS:
+            task = backtest_rule_task.delay(connection.schema_name, {
+                'parameters': parameters,
+                'start': data['start'].isoformat(),
+                'end': data['end'].isoformat(),
+                'cooldown_minutes': cooldown_minutes,
+                'equipment': data.get('equipment'),
+            })
+            cache.set(self._backtest_cache_key(task.id), True, timeout=self.BACKTEST_RESULT_TIMEOUT)
+            return Response({'task_id': task.id, 'status': 'PENDING'}, status=status.HTTP_202_ACCEPTED)
+        
+        result = run_backtest(
+            parameters, data['start'], data['end'], cooldown_minutes, data.get('equipment')
+        )
+        return Response(result)
+    
+    @action(detail=False, methods=['get'], url_path=r'backtest/(?P<task_id>[0-9a-f-]+)')
+    def backtest_result(self, request, task_id=None):
+        """
+        Resultado de um backtest em background.
+        
+        GET /api/alerts/rules/backtest/{task_id}/
+        
+        404 para task_id não iniciado por este tenant (ou expirado) e para
+        resultados que não são de backtest; 409 para backtest que falhou
+        ou foi cancelado.
+        """
+        from celery.result import AsyncResult
+        
+        not_found = Response({'error': 'Backtest not found'}, status=status.HTTP_404_NOT_FOUND)
+        if not cache.get(self._backtest_cache_key(task_id)):
+            return not_found
+        
+        task = AsyncResult(task_id)
+        if task.state in ('FAILURE', 'REVOKED'):
+            error = task.result
+            if task.state == 'REVOKED':
+                message = 'Backtest was cancelled'
+            else:
+                logger.error(f"❌ Rule backtest {task_id} failed: {error!r}")
+                message = f"Backtest failed: {error}" if str(error) else f"Backtest failed: {type(error).__name__}"
+            return Response(
+                {'task_id': task_id, 'status': task.state, 'error': message},
+                status=status.HTTP_409_CONFLICT
+            )
+        if not task.ready():
+            return Response({'task_id': task_id, 'status': task.state}, status=status.HTTP_202_ACCEPTED)
+        
+        result = task.result
+        # Resultados de outros tenants ou de outras tasks não são expostos
+        if task.state != 'SUCCESS' or not isinstance(result, dict) or result.get('schema') != connection.schema_name:
+            return not_found
+        result = {key: value for key, value in result.items() if key != 'schema'}
+        return Response({'task_id': task_id, 'status': task.state, **result})
+    
+    def _backtest_cache_key(self, task_id):
+        return f"rule_backtest:{connection.schema_name}:{task_id}"
+    
     @action(detail=False, methods=['get'])
     def statistics(self, request):
         """Retorna estatísticas das regras"""
@@ -289,21 +392,35 @@ class AlertViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['get'])
     def statistics(self, request):
-        """Retorna estatísticas dos alertas"""
-        queryset = self.get_queryset()
+        """
+        Retorna estatísticas dos alertas.
+        
+        Sem filtros, lê os contadores do tenant (AlertCounter); com filtros,
+        conta o queryset filtrado em uma única agregação.
+        """
+        from apps.alerts.services.counters import SEVERITIES, read as read_counters
+        
+        params = request.query_params
+        if not any(params.get(name) for name in ('status', 'severity', 'rule_id', 'asset_tag')):
+            counts = read_counters('tenant')
+            by_severity = {severity: counts['by_severity'][severity]['total'] for severity in SEVERITIES}
+        else:
+            counts = self.get_queryset().aggregate(
+                total=Count('id'),
+                active=Count('id', filter=Q(acknowledged=False, resolved=False)),
+                acknowledged=Count('id', filter=Q(acknowledged=True, resolved=False)),
+                resolved=Count('id', filter=Q(resolved=True)),
+                **{severity: Count('id', filter=Q(severity=severity)) for severity in SEVERITIES}
+            )
+            by_severity = {severity: counts[severity] for severity in SEVERITIES}
         
         # Padronizar severidades em MAIÚSCULAS para consistência com frontend
         stats = {
-            'total': queryset.count(),
-            'active': queryset.filter(acknowledged=False, resolved=False).count(),
-            'acknowledged': queryset.filter(acknowledged=True, resolved=False).count(),
-            'resolved': queryset.filter(resolved=True).count(),
-            'by_severity': {
-                'CRITICAL': queryset.filter(severity='Critical').count(),
-                'HIGH': queryset.filter(severity='High').count(),
-                'MEDIUM': queryset.filter(severity='Medium').count(),
-                'LOW': queryset.filter(severity='Low').count(),
-            }
+            'total': counts['total'],
+            'active': counts['active'],
+            'acknowledged': counts['acknowledged'],
+            'resolved': counts['resolved'],
+            'by_severity': {severity.upper(): count for severity, count in by_severity.items()},
         }
         
         serializer = AlertStatisticsSerializer(stats)
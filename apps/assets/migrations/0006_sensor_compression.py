@@ -0,0 +1,49 @@
+# Per-sensor ingest compression (deadband / swinging door)
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("assets", "0005_asset_sector_asset_subsection"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="sensor",
+            name="compression_mode",
+            field=models.CharField(
+                choices=[
+                    ("none", "Sem compressão"),
+                    ("deadband_abs", "Deadband absoluto"),
+                    ("deadband_pct", "Deadband percentual"),
+                    ("swinging_door", "Swinging door"),
+                ],
+                default="none",
+                help_text="Descarta amostras redundantes antes de gravar (histórico reconstruído por step-hold)",
+                max_length=20,
+                verbose_name="Compressão",
+            ),
+        ),
+        migrations.AddField(
+            model_name="sensor",
+            name="compression_deviation",
+            field=models.FloatField(
+                blank=True,
+                help_text="Desvio tolerado: na unidade do sensor (absoluto/swinging door) ou em % (percentual)",
+                null=True,
+                validators=[django.core.validators.MinValueValidator(0.0)],
+                verbose_name="Desvio de Compressão",
+            ),
+        ),
+        migrations.AddField(
+            model_name="sensor",
+            name="compression_max_interval",
+            field=models.PositiveIntegerField(
+                default=900,
+                help_text="Grava ao menos uma amostra a cada N segundos, mesmo sem variação",
+                verbose_name="Heartbeat (s)",
+            ),
+        ),
+    ]
@@ -0,0 +1,82 @@
+# Derived sensors evaluated at ingest (apps.ingest.services.virtual)
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("assets", "0006_sensor_compression"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="VirtualSensor",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                (
+                    "tag",
+                    models.CharField(
+                        help_text="Identificador da série derivada (ex: CH-001-DELTA-T)",
+                        max_length=200,
+                        verbose_name="Tag",
+                    ),
+                ),
+                (
+                    "name",
+                    models.CharField(
+                        blank=True,
+                        help_text="Nome para exibição (ex: Delta-T Água Gelada)",
+                        max_length=200,
+                        verbose_name="Nome",
+                    ),
+                ),
+                (
+                    "expression",
+                    models.TextField(
+                        help_text="Expressão sobre tags do ativo entre chaves, ex: {CH-001-TEMP-RETURN} - {CH-001-TEMP-SUPPLY}",
+                        verbose_name="Expressão",
+                    ),
+                ),
+                (
+                    "unit",
+                    models.CharField(
+                        blank=True,
+                        help_text="Unidade do valor derivado (ex: °C, kW/kW)",
+                        max_length=50,
+                        verbose_name="Unidade",
+                    ),
+                ),
+                (
+                    "tolerance_seconds",
+                    models.PositiveIntegerField(
+                        default=60,
+                        help_text="Diferença máxima entre os timestamps das entradas para calcular um ponto",
+                        verbose_name="Tolerância (s)",
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("is_active", models.BooleanField(default=True, verbose_name="Ativo")),
+                (
+                    "asset",
+                    models.ForeignKey(
+                        help_text="Ativo ao qual o sensor virtual pertence",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="virtual_sensors",
+                        to="assets.asset",
+                        verbose_name="Asset",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Sensor Virtual",
+                "verbose_name_plural": "Sensores Virtuais",
+                "db_table": "virtual_sensors",
+                "ordering": ["asset", "tag"],
+                "constraints": [
+                    models.UniqueConstraint(fields=("asset", "tag"), name="unique_virtual_sensor_tag"),
+                ],
+            },
+        ),
+    ]
@@ -563,6 +563,14 @@ class Sensor(models.Model):
         ('maintenance_reminder', 'Lembrete de Manutenção'),
     ]
     
+    # Compressão na ingestão (ver apps.ingest.services.compression)
+    COMPRESSION_CHOICES = [
+        ('none', 'Sem compressão'),
+        ('deadband_abs', 'Deadband absoluto'),
+        ('deadband_pct', 'Deadband percentual'),
+        ('swinging_door', 'Swinging door'),
+    ]
+    
     # Identificação
     tag = models.CharField(
         'Tag',
@@ -645,6 +653,27 @@ class Sensor(models.Model):
         help_text='Timestamp da última medição recebida'
     )
     
+    # Compressão de amostras redundantes na ingestão
+    compression_mode = models.CharField(
+        'Compressão',
+        max_length=20,
+        choices=COMPRESSION_CHOICES,
+        default='none',
+        help_text='Descarta amostras redundantes antes de gravar (histórico reconstruído por step-hold)'
+    )
+    compression_deviation = models.FloatField(
+        'Desvio de Compressão',
+        null=True,
+        blank=True,
+        validators=[MinValueValidator(0.0)],
+        help_text='Desvio tolerado: na unidade do sensor (absoluto/swinging door) ou em % (percentual)'
+    )
+    compression_max_interval = models.PositiveIntegerField(
+        'Heartbeat (s)',
+        default=900,
+        help_text='Grava ao menos uma amostra a cada N segundos, mesmo sem variação'
+    )
+    
     # Metadata
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -687,3 +716,91 @@ class Sensor(models.Model):
         self.is_online = True
         self.save(update_fields=['last_value', 'last_reading_at', 'is_online', 'updated_at'])
 
+
+
+class VirtualSensor(models.Model):
+    """
+    Sensor virtual (derivado) de um Asset.
+    
+    Valor calculado a partir de outros sensores do ativo por uma expressão
+    (ver apps.ingest.services.virtual), gravado como série comum na
+    ingestão - consultável no histórico e utilizável em regras de alerta.
+    
+    Exemplos (chiller):
+        - Delta-T: {CH-001-TEMP-RETURN} - {CH-001-TEMP-SUPPLY}
+        - COP: {CH-001-COOLING-KW} / {CH-001-POWER-KW}
+    """
+    
+    asset = models.ForeignKey(
+        Asset,
+        on_delete=models.CASCADE,
+        related_name='virtual_sensors',
+        verbose_name='Asset',
+        help_text='Ativo ao qual o sensor virtual pertence'
+    )
+    
+    tag = models.CharField(
+        'Tag',
+        max_length=200,
+        help_text='Identificador da série derivada (ex: CH-001-DELTA-T)'
+    )
+    
+    name = models.CharField(
+        'Nome',
+        max_length=200,
+        blank=True,
+        help_text='Nome para exibição (ex: Delta-T Água Gelada)'
+    )
+    
+    expression = models.TextField(
+        'Expressão',
+        help_text='Expressão sobre tags do ativo entre chaves, ex: {CH-001-TEMP-RETURN} - {CH-001-TEMP-SUPPLY}'
+    )
+    
+    unit = models.CharField(
+        'Unidade',
+        max_length=50,
+        blank=True,
+        help_text='Unidade do valor derivado (ex: °C, kW/kW)'
+    )
+    
+    tolerance_seconds = models.PositiveIntegerField(
+        'Tolerância (s)',
+        default=60,
+        help_text='Diferença máxima entre os timestamps das entradas para calcular um ponto'
+    )
+    
+    # Metadata
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    is_active = models.BooleanField('Ativo', default=True)
+    
+    class Meta:
+        db_table = 'virtual_sensors'
+        ordering = ['asset', 'tag']
+        verbose_name = 'Sensor Virtual'
+        verbose_name_plural = 'Sensores Virtuais'
+        constraints = [
+            models.UniqueConstraint(fields=['asset', 'tag'], name='unique_virtual_sensor_tag'),
+        ]
+    
+    def __str__(self):
+        return f"{self.tag} = {self.expression}"
+    
+    @property
+    def inputs(self):
+        """Tags dos sensores usados na expressão."""
+        from apps.ingest.services.virtual import compile_expression
+        
+        return list(compile_expression(self.expression).inputs)
+    
+    def clean(self):
+        from django.core.exceptions import ValidationError
+        from apps.ingest.services.virtual import compile_expression
+        
+        try:
+            inputs = compile_expression(self.expression).inputs
+        except ValueError as exc:
+            raise ValidationError({'expression': str(exc)})
+        if self.tag in inputs:
+            raise ValidationError({'expression': 'A expressão não pode referenciar o próprio sensor virtual.'})
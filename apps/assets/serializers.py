@@ -9,10 +9,11 @@ Classes:
     AssetSerializer: Serializer para Assets com informações aninhadas
     DeviceSerializer: Serializer para Devices com contadores
     SensorSerializer: Serializer para Sensors com lookup de nomes
+    VirtualSensorSerializer: Serializer para Sensores Virtuais com validação da expressão
 """
 
 from rest_framework import serializers
-from .models import Site, Asset, Device, Sensor
+from .models import Site, Asset, Device, Sensor, VirtualSensor
 
 
 class SiteSerializer(serializers.ModelSerializer):
@@ -357,29 +358,31 @@ class AssetCompleteSerializer(serializers.ModelSerializer):
             ...
         }
         """
-        from apps.ingest.models import Reading
-        from django.db.models import Max
+        from apps.ingest.services.latest import get_latest_map
         
         readings = {}
         
         # Buscar sensores ativos do asset
-        sensors = Sensor.objects.filter(
+        sensors = list(Sensor.objects.filter(
             device__asset=obj,
             is_active=True
-        ).select_related('device')
+        ).select_related('device'))
+        
+        # Últimas leituras de todos os sensores em uma única consulta (reading_latest)
+        # Chave da série: (device.mqtt_client_id, sensor.tag)
+        latest_by_series = get_latest_map(
+            (sensor.device.mqtt_client_id, sensor.tag) for sensor in sensors
+        )
         
         for sensor in sensors:
-            # Buscar última leitura (campo timestamp é 'ts', não 'time')
-            last_reading = Reading.objects.filter(
-                sensor_id=sensor.id
-            ).order_by('-ts').first()
+            last_reading = latest_by_series.get((sensor.device.mqtt_client_id, sensor.tag))
             
             if last_reading:
                 metric_key = sensor.metric_type.lower() if sensor.metric_type else f'sensor_{sensor.id}'
                 readings[metric_key] = {
                     'sensor_id': sensor.id,
                     'sensor_name': sensor.name,
-                    'value': float(last_reading.value) if last_reading.value else None,
+                    'value': float(last_reading.value) if last_reading.value is not None else None,
                     'unit': sensor.unit or '',
                     'timestamp': last_reading.ts.isoformat() if last_reading.ts else None,
                     'is_online': sensor.is_online,
@@ -388,14 +391,20 @@ class AssetCompleteSerializer(serializers.ModelSerializer):
         return readings
     
     def get_alert_count(self, obj):
-        """Número de alertas ativos (não resolvidos e não reconhecidos)."""
-        from apps.alerts.models import Alert
+        """
+        Número de alertas ativos (não resolvidos e não reconhecidos), do contador do ativo.
+        🔧 PERFORMANCE: Uses annotated 'active_alert_count' from complete() if available.
+        """
+        from apps.alerts.models import AlertCounter
         
-        return Alert.objects.filter(
-            asset_tag=obj.tag,
-            resolved=False,
-            acknowledged=False
-        ).count()
+        if hasattr(obj, 'active_alert_count'):
+            return obj.active_alert_count or 0
+        active = AlertCounter.objects.filter(
+            scope='asset',
+            key=obj.tag,
+            severity=''
+        ).values_list('active', flat=True).first()
+        return active or 0
 
 
 class DeviceListSerializer(serializers.ModelSerializer):
@@ -695,6 +704,76 @@ class SensorSerializer(serializers.ModelSerializer):
         return data
 
 
+class VirtualSensorSerializer(serializers.ModelSerializer):
+    """
+    Serializer para o modelo VirtualSensor.
+    
+    Campos adicionais:
+        - asset_tag: Tag do ativo (read-only)
+        - inputs: Tags usadas na expressão (read-only)
+    
+    A expressão é validada (sintaxe e funções permitidas) e deve referenciar
+    apenas sensores do próprio ativo.
+    """
+    
+    asset_tag = serializers.CharField(source='asset.tag', read_only=True)
+    inputs = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = VirtualSensor
+        fields = [
+            'id',
+            'asset',
+            'asset_tag',
+            'tag',
+            'name',
+            'expression',
+            'inputs',
+            'unit',
+            'tolerance_seconds',
+            'is_active',
+            'created_at',
+            'updated_at',
+        ]
+        read_only_fields = ['id', 'asset_tag', 'inputs', 'created_at', 'updated_at']
+    
+    def get_inputs(self, obj):
+        try:
+            return obj.inputs
+        except ValueError:
+            return []
+    
+    def validate(self, data):
+        """Valida a expressão contra os sensores do ativo."""
+        from apps.ingest.services.virtual import compile_expression
+        
+        asset = data.get('asset') or getattr(self.instance, 'asset', None)
+        tag = data.get('tag') or getattr(self.instance, 'tag', None)
+        expression = data.get('expression') or getattr(self.instance, 'expression', None)
+        
+        try:
+            inputs = compile_expression(expression).inputs
+        except ValueError as exc:
+            raise serializers.ValidationError({'expression': str(exc)})
+        
+        if tag in inputs:
+            raise serializers.ValidationError({
+                'expression': 'A expressão não pode referenciar o próprio sensor virtual.'
+            })
+        
+        known = set(
+            Sensor.objects.filter(device__asset=asset, tag__in=inputs).values_list('tag', flat=True)
+        ) | set(
+            VirtualSensor.objects.filter(asset=asset, tag__in=inputs).values_list('tag', flat=True)
+        )
+        unknown = [tag for tag in inputs if tag not in known]
+        if unknown:
+            raise serializers.ValidationError({
+                'expression': f"Sensores não encontrados no ativo: {', '.join(unknown)}"
+            })
+        return data
+
+
 class SensorBulkCreateSerializer(serializers.Serializer):
     """
     Serializer para criação em massa de sensores.
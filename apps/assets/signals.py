@@ -5,6 +5,8 @@ Responsável por:
 - Atualizar cache de última leitura do Sensor quando TelemetryReading é criado
 - Atualizar status de Device quando conecta/desconecta no EMQX
 - Invalidar cache de timezone quando Site é atualizado
+- Invalidar cache de compressão quando Sensor é atualizado
+- Invalidar definições de sensores virtuais quando VirtualSensor/Sensor muda
 """
 
 from django.db.models.signals import post_save, post_delete
@@ -13,7 +15,7 @@ from django.utils import timezone
 from django.core.cache import cache
 from django.db import connection
 
-from apps.assets.models import Site
+from apps.assets.models import Sensor, Site, VirtualSensor
 
 
 @receiver(post_save, sender=Site)
@@ -45,6 +47,50 @@ def invalidate_site_timezone_cache_on_delete(sender, instance, **kwargs):
     print(f"✅ Cache do timezone invalidado para Site deletado '{instance.name}' (tenant: {schema_name})")
 
 
+@receiver(post_save, sender=Sensor)
+@receiver(post_delete, sender=Sensor)
+def invalidate_sensor_compression_cache(sender, instance, update_fields=None, **kwargs):
+    """
+    Invalida a configuração de compressão (deadband/swinging door) do device
+    do sensor, usada pela ingestão.
+    Atualizações parciais sem campos da configuração não invalidam.
+    """
+    from apps.ingest.services.compression import config_cache_key
+
+    if update_fields and not {
+        'compression_mode', 'compression_deviation', 'compression_max_interval',
+        'tag', 'device', 'is_active',
+    } & set(update_fields):
+        return
+    schema_name = connection.schema_name
+    cache.delete(config_cache_key(schema_name, instance.device.mqtt_client_id))
+
+
+@receiver(post_save, sender=VirtualSensor)
+@receiver(post_delete, sender=VirtualSensor)
+def invalidate_virtual_sensor_definitions(sender, instance, **kwargs):
+    """
+    Invalida as definições de sensores virtuais do ativo, usadas pela
+    ingestão.
+    """
+    from apps.ingest.services.virtual import definitions_cache_key
+
+    cache.delete(definitions_cache_key(connection.schema_name, instance.asset.tag))
+
+
+@receiver(post_save, sender=Sensor)
+def invalidate_virtual_sensor_devices(sender, instance, update_fields=None, **kwargs):
+    """
+    Sensor novo/movido pode mudar o device das séries derivadas do ativo.
+    Atualizações parciais (ex: update_last_reading) não invalidam.
+    """
+    from apps.ingest.services.virtual import definitions_cache_key
+
+    if update_fields and not {'tag', 'device'} & set(update_fields):
+        return
+    cache.delete(definitions_cache_key(connection.schema_name, instance.device.asset.tag))
+
+
 # Signal será conectado quando integrarmos com apps.ingest
 # @receiver(post_save, sender='ingest.TelemetryReading')
 # def update_sensor_last_reading(sender, instance, created, **kwargs):
@@ -1,3 +1,103 @@
-from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django_tenants.test.cases import TenantTestCase
+from rest_framework.test import APIRequestFactory, force_authenticate
 
-# Create your tests here.
+from apps.assets.models import Asset, Device, Sensor, Site
+from apps.assets.views import AssetViewSet
+from apps.ingest.services import compression
+
+
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+class AssetsTenantTestCase(TenantTestCase):
+    """TestCase no schema de um tenant de teste com um site/ativo/device."""
+
+    @classmethod
+    def setup_tenant(cls, tenant):
+        tenant.name = 'Test'
+        tenant.slug = 'test'
+
+    def setUp(self):
+        cache.clear()
+        self.site = Site.objects.create(name='Site A')
+        self.asset = Asset.objects.create(tag='CH-001', name='Chiller 1', site=self.site, asset_type='CHILLER')
+        self.device = Device.objects.create(
+            name='Gateway', serial_number='SN-001', asset=self.asset, mqtt_client_id='gw-001'
+        )
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class CompressionConfigSignalTests(AssetsTenantTestCase):
+    """Invalidação da configuração de compressão ao salvar Sensor."""
+
+    def setUp(self):
+        super().setUp()
+        self.sensor = Sensor.objects.create(
+            tag='temp', device=self.device, metric_type='temp_supply', unit='celsius',
+            compression_mode='deadband_abs', compression_deviation=0.5,
+        )
+        self.key = compression.config_cache_key(connection.schema_name, 'gw-001')
+
+    def test_config_is_cached_per_device(self):
+        configs = compression.get_device_configs(['gw-001'])
+        self.assertEqual(configs['gw-001'], {'temp': ('deadband_abs', 0.5, 900)})
+        self.assertIsNotNone(cache.get(self.key))
+
+    def test_last_reading_update_keeps_config(self):
+        compression.get_device_configs(['gw-001'])
+        self.sensor.update_last_reading(21.5)
+        self.assertIsNotNone(cache.get(self.key))
+
+    def test_compression_change_invalidates(self):
+        compression.get_device_configs(['gw-001'])
+        self.sensor.compression_deviation = 1.0
+        self.sensor.save(update_fields=['compression_deviation'])
+        self.assertIsNone(cache.get(self.key))
+        self.assertEqual(compression.get_device_configs(['gw-001'])['gw-001']['temp'][1], 1.0)
+
+    def test_deactivation_and_delete_invalidate(self):
+        compression.get_device_configs(['gw-001'])
+        self.sensor.is_active = False
+        self.sensor.save(update_fields=['is_active'])
+        self.assertEqual(compression.get_device_configs(['gw-001'])['gw-001'], {})
+
+        self.sensor.delete()
+        self.assertIsNone(cache.get(self.key))
+
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class AssetCompleteAlertCountTests(AssetsTenantTestCase):
+    """GET /api/assets/complete/: alert_count anotado, sem consulta por ativo."""
+
+    def test_alert_count_is_loaded_with_the_page(self):
+        from apps.alerts.models import Alert
+
+        for tag in ('CH-002', 'CH-003'):
+            Asset.objects.create(tag=tag, name=tag, site=self.site, asset_type='CHILLER')
+        for tag, count in (('CH-001', 2), ('CH-003', 1)):
+            for _ in range(count):
+                Alert.objects.create(
+                    message='x', severity='High', asset_tag=tag,
+                    parameter_key='temp', parameter_value=10.0, threshold=5.0,
+                )
+        user = get_user_model().objects.create_user(username='assets', email='assets@example.com', password='x')
+        request = APIRequestFactory().get('/api/assets/complete/')
+        force_authenticate(request, user=user)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = AssetViewSet.as_view({'get': 'complete'})(request)
+
+        self.assertEqual(response.status_code, 200)
+        results = response.data['results'] if 'results' in response.data else response.data
+        self.assertEqual({row['tag']: row['alert_count'] for row in results}, {'CH-001': 2, 'CH-002': 0, 'CH-003': 1})
+        # Contador só como subquery da consulta dos ativos (e da contagem da página)
+        self.assertFalse([
+            query['sql'] for query in queries.captured_queries
+            if query['sql'].startswith('SELECT "alerts_counter"')
+        ])
@@ -8,12 +8,13 @@ Endpoints disponíveis:
     /api/assets/ - CRUD de assets
     /api/devices/ - CRUD de devices
     /api/sensors/ - CRUD de sensors
+    /api/virtual-sensors/ - CRUD de sensores virtuais (derivados)
 """
 
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 
-from .views import SiteViewSet, AssetViewSet, DeviceViewSet, SensorViewSet
+from .views import SiteViewSet, AssetViewSet, DeviceViewSet, SensorViewSet, VirtualSensorViewSet
 
 # Configuração do router
 router = DefaultRouter()
@@ -21,6 +22,7 @@ router.register(r'sites', SiteViewSet, basename='site')
 router.register(r'assets', AssetViewSet, basename='asset')
 router.register(r'devices', DeviceViewSet, basename='device')
 router.register(r'sensors', SensorViewSet, basename='sensor')
+router.register(r'virtual-sensors', VirtualSensorViewSet, basename='virtual-sensor')
 
 # URLs da aplicação
 app_name = 'assets'
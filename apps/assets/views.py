@@ -9,6 +9,7 @@ Classes:
     AssetViewSet: CRUD para Assets com filtros avançados e ações customizadas
     DeviceViewSet: CRUD para Devices com filtros e listagem de sensors
     SensorViewSet: CRUD para Sensors com filtros por métricas
+    VirtualSensorViewSet: CRUD para Sensores Virtuais com backfill do histórico
 """
 
 from django.utils import timezone
@@ -19,7 +20,7 @@ from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
 
 from apps.accounts.permissions import CanWrite
-from .models import Site, Asset, Device, Sensor
+from .models import Site, Asset, Device, Sensor, VirtualSensor
 from .serializers import (
     SiteSerializer,
     AssetSerializer,
@@ -29,6 +30,7 @@ from .serializers import (
     SensorSerializer,
     SensorListSerializer,
     SensorBulkCreateSerializer,
+    VirtualSensorSerializer,
 )
 
 
@@ -232,18 +234,11 @@ class SiteViewSet(viewsets.ModelViewSet):
             online=Count('id', filter=Q(is_online=True))
         )
         
-        # Estatísticas de alertas - ativos com alertas ativos (não resolvidos e não reconhecidos)
-        from apps.alerts.models import Alert
+        # Estatísticas de alertas - ativos com alertas ativos (não resolvidos e não reconhecidos),
+        # lidos dos contadores do site (AlertCounter)
+        from apps.alerts.services.counters import read as read_alert_counters
         
-        # Buscar tags dos assets do site
-        asset_tags = list(Asset.objects.filter(site=site).values_list('tag', flat=True))
-        
-        # Contar quantos assets únicos têm alertas ativos (não resolvidos e não reconhecidos)
-        assets_with_alerts = Alert.objects.filter(
-            asset_tag__in=asset_tags,
-            resolved=False,
-            acknowledged=False
-        ).values('asset_tag').distinct().count()
+        assets_with_alerts = read_alert_counters('site', site.id)['assets_with_active_alerts']
         
         # Montar resposta
         stats = {
@@ -425,6 +420,7 @@ class AssetViewSet(viewsets.ModelViewSet):
         Response: Lista de assets com dados completos
         """
         from django.db.models import Count, Q, Prefetch, Subquery, OuterRef
+        from apps.alerts.models import AlertCounter
         from .serializers import AssetCompleteSerializer
         
         # Aplicar filtros
@@ -466,9 +462,17 @@ class AssetViewSet(viewsets.ModelViewSet):
             is_active=True
         ).values('device__asset').annotate(cnt=Count('id')).values('cnt')
         
+        # Alertas ativos do contador pré-computado do ativo (AlertCounter)
+        active_alerts_subquery = AlertCounter.objects.filter(
+            scope='asset',
+            key=OuterRef('tag'),
+            severity=''
+        ).values('active')[:1]
+        
         queryset = queryset.annotate(
             online_device_count=Subquery(online_devices_subquery),
             online_sensor_count=Subquery(online_sensors_subquery),
+            active_alert_count=Subquery(active_alerts_subquery),
         )
         
         # Paginação
@@ -764,3 +768,60 @@ class SensorViewSet(viewsets.ModelViewSet):
             'last_reading_at': sensor.last_reading_at,
             'is_online': sensor.is_online,
         })
+
+
+class VirtualSensorViewSet(viewsets.ModelViewSet):
+    """
+    ViewSet para gerenciamento de Sensores Virtuais (derivados).
+    
+    Endpoints:
+        GET /api/virtual-sensors/ - Lista sensores virtuais
+        POST /api/virtual-sensors/ - Cria sensor virtual
+        GET /api/virtual-sensors/{id}/ - Detalhes
+        PUT/PATCH /api/virtual-sensors/{id}/ - Atualiza
+        DELETE /api/virtual-sensors/{id}/ - Remove (a série já gravada é mantida)
+        POST /api/virtual-sensors/{id}/backfill/ - Recalcula o histórico
+    
+    Filtros:
+        - asset: Filtra por asset
+        - is_active: Filtra por status
+    """
+    
+    queryset = VirtualSensor.objects.select_related('asset').all()
+    serializer_class = VirtualSensorSerializer
+    permission_classes = [IsAuthenticated, CanWrite]
+    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filterset_fields = ['asset', 'is_active']
+    search_fields = ['tag', 'name', 'expression']
+    ordering_fields = ['tag', 'created_at']
+    ordering = ['tag']
+    
+    @action(detail=True, methods=['post'])
+    def backfill(self, request, pk=None):
+        """
+        Agenda o cálculo do histórico do sensor virtual.
+        
+        POST /api/virtual-sensors/{id}/backfill/
+        
+        Body:
+            {"days": 30}  # Opcional (1 a 365)
+        """
+        from django.db import connection
+        from apps.ingest.tasks import backfill_virtual_sensor
+        
+        virtual_sensor = self.get_object()
+        try:
+            days = int(request.data.get('days', 30))
+        except (TypeError, ValueError):
+            days = 0
+        if not 1 <= days <= 365:
+            return Response(
+                {'error': 'Campo "days" deve estar entre 1 e 365.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        task = backfill_virtual_sensor.delay(connection.schema_name, virtual_sensor.pk, days)
+        return Response(
+            {'task_id': task.id, 'virtual_sensor': virtual_sensor.tag, 'days': days},
+            status=status.HTTP_202_ACCEPTED
+        )
@@ -0,0 +1,239 @@
+"""
+Keyset (cursor) pagination for large hypertables.
+
+PageNumberPagination runs COUNT(*) over the filtered range and uses OFFSET,
+which scans every skipped row: deep pages get slower as the table grows.
+Keyset pagination filters on the last row seen, e.g.
+
+    WHERE (ts, device_id, sensor_id) < (:ts, :device_id, :sensor_id)
+    ORDER BY ts DESC, device_id DESC, sensor_id DESC
+    LIMIT :page_size
+
+so every page costs the same as the first. Cursors are opaque
+(base64-encoded JSON) and the total is an optional planner estimate
+(EXPLAIN row count) instead of an exact count.
+"""
+import base64
+import binascii
+import json
+import logging
+from collections import OrderedDict
+
+from django.db import connection
+from django.db.models import DateTimeField, Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+logger = logging.getLogger(__name__)
+
+
+def encode_cursor(values, reverse=False):
+    """Encode keyset values (datetimes as ISO-8601) into an opaque token."""
+    payload = {
+        'v': [value.isoformat() if hasattr(value, 'isoformat') else value for value in values],
+    }
+    if reverse:
+        payload['r'] = 1
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """
+    Decode a token created by encode_cursor.
+
+    Returns:
+        Tuple (values, reverse)
+
+    Raises:
+        ValueError: if the token is malformed
+    """
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        values = payload['v']
+        if not isinstance(values, list):
+            raise ValueError('Invalid cursor values')
+        return values, bool(payload.get('r'))
+    except (binascii.Error, json.JSONDecodeError, KeyError, TypeError, UnicodeDecodeError) as e:
+        raise ValueError(f'Invalid cursor: {e}')
+
+
+def estimate_count(sql, params=None):
+    """
+    Estimated number of rows returned by ``sql`` (planner statistics).
+
+    Uses EXPLAIN (FORMAT JSON) -> "Plan Rows" of the top node. Cheap and
+    good enough to show "~N results" on screens over hypertables.
+    """
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+    except Exception as e:
+        logger.warning(f"⚠️ Could not estimate row count: {e}")
+        return None
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset pagination over a composite, descending ordering.
+
+    Subclasses set ``ordering`` to the keyset columns (all descending,
+    last column(s) must make the key unique).
+
+    Query params:
+    - cursor: opaque token from the previous response (next/previous)
+    - page_size: rows per page (default 50, max 1000)
+    - estimate: "true" to include estimated_total (planner estimate)
+    """
+
+    ordering = ('-ts',)
+    page_size = 50
+    max_page_size = 1000
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    estimate_query_param = 'estimate'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.fields = [field.lstrip('-') for field in self.ordering]
+
+        self.estimated_total = None
+        if request.query_params.get(self.estimate_query_param, '').lower() in ('1', 'true', 'yes'):
+            sql, params = queryset.order_by().query.sql_with_params()
+            self.estimated_total = estimate_count(sql, params)
+
+        token = request.query_params.get(self.cursor_query_param)
+        reverse = False
+        if token:
+            try:
+                values, reverse = decode_cursor(token)
+                values = self._parse_values(queryset.model, values)
+            except ValueError:
+                raise NotFound(self.invalid_cursor_message)
+            queryset = queryset.filter(self._keyset_filter(values, reverse))
+
+        # Página "anterior" percorre a ordem inversa e depois reverte
+        if reverse:
+            order = list(self.fields)
+        else:
+            order = [f'-{field}' for field in self.fields]
+
+        rows = list(queryset.order_by(*order)[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        self.has_next = has_more if not reverse else True
+        self.has_previous = bool(token) if not reverse else has_more
+        self.first_row = rows[0] if rows else None
+        self.last_row = rows[-1] if rows else None
+        return rows
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def _parse_values(self, model, values):
+        if len(values) != len(self.fields):
+            raise ValueError('Cursor does not match ordering')
+        parsed = []
+        for name, value in zip(self.fields, values):
+            field = model._meta.get_field(name)
+            if isinstance(field, DateTimeField):
+                value = parse_datetime(value) if isinstance(value, str) else None
+                if value is None:
+                    raise ValueError(f'Invalid datetime for {name}')
+            else:
+                value = field.to_python(value)
+            parsed.append(value)
+        return parsed
+
+    def _keyset_filter(self, values, reverse):
+        """
+        Row comparison (f1, f2, ...) < (v1, v2, ...) expressed in the ORM.
+
+        The leading-column bound (f1 <= v1) is ANDed explicitly so the planner
+        can start the index scan at the cursor position.
+        """
+        lookup = 'gt' if reverse else 'lt'
+        bound = 'gte' if reverse else 'lte'
+        condition = Q()
+        for i, name in enumerate(self.fields):
+            equal = {self.fields[j]: values[j] for j in range(i)}
+            condition |= Q(**equal, **{f'{name}__{lookup}': values[i]})
+        return Q(**{f'{self.fields[0]}__{bound}': values[0]}) & condition
+
+    def _row_values(self, row):
+        return [getattr(row, field) for field in self.fields]
+
+    def get_next_link(self):
+        if not self.has_next or self.last_row is None:
+            return None
+        token = encode_cursor(self._row_values(self.last_row))
+        return replace_query_param(self.base_url, self.cursor_query_param, token)
+
+    def get_previous_link(self):
+        if not self.has_previous or self.first_row is None:
+            return None
+        token = encode_cursor(self._row_values(self.first_row), reverse=True)
+        return replace_query_param(self.base_url, self.cursor_query_param, token)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('estimated_total', self.estimated_total),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'estimated_total': {'type': 'integer', 'nullable': True},
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Opaque pagination cursor (from next/previous links)',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.page_size_query_param,
+                'required': False,
+                'in': 'query',
+                'description': f'Rows per page (default {self.page_size}, max {self.max_page_size})',
+                'schema': {'type': 'integer'},
+            },
+            {
+                'name': self.estimate_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Include estimated_total from planner statistics',
+                'schema': {'type': 'boolean'},
+            },
+        ]
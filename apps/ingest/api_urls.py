@@ -11,7 +11,9 @@ from .api_views_extended import (
     LatestReadingsView,
     DeviceHistoryView,
     DeviceSummaryView,
-    AssetTelemetryHistoryView
+    DeviceStatesView,
+    AssetTelemetryHistoryView,
+    BatchHistoryView
 )
 
 app_name = 'telemetry'
@@ -30,7 +32,11 @@ urlpatterns = [
     path('latest/<str:device_id>/', LatestReadingsView.as_view(), name='latest-readings'),
     path('history/<str:device_id>/', DeviceHistoryView.as_view(), name='device-history'),
     path('device/<str:device_id>/summary/', DeviceSummaryView.as_view(), name='device-summary'),
+    path('device/<str:device_id>/states/', DeviceStatesView.as_view(), name='device-states'),
     
     # Asset-centric endpoints (MQTT topic hierarchy source of truth)
     path('assets/<str:asset_tag>/history/', AssetTelemetryHistoryView.as_view(), name='asset-history'),
+    
+    # Batch history (many devices/assets, one query)
+    path('batch/history/', BatchHistoryView.as_view(), name='batch-history'),
 ]
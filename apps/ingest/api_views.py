@@ -20,6 +20,7 @@ from .serializers import (
     TimeSeriesPointSerializer
 )
 from .filters import TelemetryFilter, ReadingFilter
+from .pagination import TelemetryKeysetPagination, ReadingKeysetPagination
 
 
 class TelemetryListView(generics.ListAPIView):
@@ -32,10 +33,12 @@ class TelemetryListView(generics.ListAPIView):
     - timestamp_from (ISO-8601)
     - timestamp_to (ISO-8601)
     
-    Returns paginated results (default: 200 per page).
+    Returns keyset-paginated results (cursor, default: 50 per page).
+    Pass estimate=true for an estimated total (no COUNT(*)).
     """
     serializer_class = TelemetrySerializer
     filterset_class = TelemetryFilter
+    pagination_class = TelemetryKeysetPagination
     ordering = ['-timestamp']
     
     def get_queryset(self):
@@ -55,10 +58,12 @@ class ReadingListView(generics.ListAPIView):
     - value_min (numeric threshold)
     - value_max (numeric threshold)
     
-    Returns paginated results (default: 200 per page).
+    Returns keyset-paginated results (cursor, default: 50 per page).
+    Pass estimate=true for an estimated total (no COUNT(*)).
     """
     serializer_class = ReadingSerializer
     filterset_class = ReadingFilter
+    pagination_class = ReadingKeysetPagination
     ordering = ['-ts']
     
     def get_queryset(self):
@@ -229,7 +234,8 @@ class TimeSeriesAggregateView(APIView):
                    max(value) AS max_value,
                    last(value, ts) AS last_value,
                    count(*) AS count
-            FROM reading
+            FROM reading_point
+            JOIN reading_series ON reading_series.id = reading_point.series_id
             WHERE 1=1
               AND (%(device_id)s IS NULL OR device_id = %(device_id)s)
               AND (%(sensor_id)s IS NULL OR sensor_id = %(sensor_id)s)
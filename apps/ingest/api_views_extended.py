@@ -5,8 +5,11 @@ Provides convenient endpoints for:
 - Latest readings per device
 - Historical data for specific devices/sensors
 - Device summary with all sensors
+- State summary (on-time, cycles) for binary/enumerated sensors
+- Batch history for many devices/assets
 """
 import json
+import numpy as np
 from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.response import Response
@@ -17,7 +20,8 @@ from drf_spectacular.utils import extend_schema, OpenApiParameter
 from drf_spectacular.types import OpenApiTypes
 
 from .models import Reading
-from .serializers import ReadingSerializer
+from .serializers import ReadingSerializer, BatchHistoryRequestSerializer
+from .services import archive, batch_history, calendar_rollup, compression, gapfill, history_cache, states, statistics
 
 
 class LatestReadingsView(APIView):
@@ -62,15 +66,13 @@ class LatestReadingsView(APIView):
         """Get latest readings for device."""
         sensor_id = request.query_params.get('sensor_id')
         
-        # Query para pegar última leitura de cada sensor
-        # Usa DISTINCT ON do PostgreSQL para eficiência
+        # Última leitura de cada sensor vem de reading_latest (mantida na ingestão)
         sql = """
-            SELECT DISTINCT ON (sensor_id)
-                   id, device_id, sensor_id, value, labels, ts, created_at
-            FROM reading
+            SELECT id, device_id, sensor_id, value, labels, ts, updated_at AS created_at
+            FROM reading_latest
             WHERE device_id = %s
-              AND (%s IS NULL OR sensor_id = %s)
-            ORDER BY sensor_id, ts DESC
+              AND (%s::text IS NULL OR sensor_id = %s)
+            ORDER BY sensor_id
         """
         
         with connection.cursor() as cursor:
@@ -111,6 +113,8 @@ class DeviceHistoryView(APIView):
     - to (optional): End time (ISO-8601)
     - interval (optional): Aggregation interval (1m, 5m, 1h, raw)
     - limit (optional): Max results (default 500, max 5000)
+    - fill (optional): Gap filling of aggregated intervals (none, null, previous, linear)
+    - max_gap (optional): Largest gap filled by previous/linear
     """
     
     MAX_LIMIT = 5000
@@ -132,6 +136,10 @@ class DeviceHistoryView(APIView):
         - Range 1h-6h → 1m
         - Range 6h-24h → 5m
         - Range > 24h → 1h
+        
+        Aggregated buckets are aligned to the interval; settled buckets are
+        served from cache. Responses carry ETag/Last-Modified headers; send
+        If-None-Match or If-Modified-Since to receive 304 Not Modified.
         """,
         parameters=[
             OpenApiParameter(
@@ -177,6 +185,21 @@ class DeviceHistoryView(APIView):
                 required=False,
                 description=f'Max results (default {DEFAULT_LIMIT}, max {MAX_LIMIT})'
             ),
+            OpenApiParameter(
+                name='fill',
+                type=OpenApiTypes.STR,
+                location=OpenApiParameter.QUERY,
+                required=False,
+                enum=list(gapfill.FILL_MODES),
+                description='Gap filling for aggregated intervals: none (default), null, previous, linear'
+            ),
+            OpenApiParameter(
+                name='max_gap',
+                type=OpenApiTypes.STR,
+                location=OpenApiParameter.QUERY,
+                required=False,
+                description='Largest gap filled by previous/linear (seconds or 15m, 2h, 1d; default: 10 buckets)'
+            ),
         ],
         responses={
             200: OpenApiTypes.OBJECT,
@@ -196,6 +219,17 @@ class DeviceHistoryView(APIView):
         from_str = request.query_params.get('from')
         to_str = request.query_params.get('to')
         interval = request.query_params.get('interval', 'auto')
+        fill = request.query_params.get('fill', 'none')
+        
+        if fill not in gapfill.FILL_MODES:
+            return Response(
+                {'detail': f'Invalid fill: {fill}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            max_gap = gapfill.parse_max_gap(request.query_params.get('max_gap'))
+        except ValueError as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
         # Default time range: last 24 hours
         now = timezone.now()
@@ -221,6 +255,12 @@ class DeviceHistoryView(APIView):
             else:
                 interval = '1h'
         
+        if interval != 'raw' and interval not in history_cache.BUCKET_SECONDS:
+            return Response(
+                {'detail': f'Invalid interval: {interval}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
         # Limit
         try:
             limit = min(
@@ -240,108 +280,75 @@ class DeviceHistoryView(APIView):
                 # Filter by specific sensors
                 placeholders = ','.join(['%s'] * len(sensor_ids))
                 sql = f"""
-                    SELECT ts, sensor_id, value
-                    FROM reading
-                    WHERE device_id = %s
-                      AND sensor_id IN ({placeholders})
-                      AND ts >= %s
-                      AND ts <= %s
-                    ORDER BY ts ASC
+                    SELECT p.ts, s.sensor_id, p.value
+                    FROM reading_series s
+                    JOIN reading_point p ON p.series_id = s.id
+                    WHERE s.device_id = %s
+                      AND s.sensor_id IN ({placeholders})
+                      AND p.ts >= %s
+                      AND p.ts <= %s
+                    ORDER BY p.ts ASC
                     LIMIT %s
                 """
                 params = [device_id] + sensor_ids + [ts_from, ts_to, limit]
             else:
                 # All sensors
                 sql = """
-                    SELECT ts, sensor_id, value
-                    FROM reading
-                    WHERE device_id = %s
-                      AND ts >= %s
-                      AND ts <= %s
-                    ORDER BY ts ASC
+                    SELECT p.ts, s.sensor_id, p.value
+                    FROM reading_series s
+                    JOIN reading_point p ON p.series_id = s.id
+                    WHERE s.device_id = %s
+                      AND p.ts >= %s
+                      AND p.ts <= %s
+                    ORDER BY p.ts ASC
                     LIMIT %s
                 """
                 params = [device_id, ts_from, ts_to, limit]
-        else:
-            # With aggregation - ORDER BY ASC for chronological charts
-            bucket_interval = {'1m': '1 minute', '5m': '5 minutes', '1h': '1 hour'}[interval]
             
-            if sensor_ids:
-                # Filter by specific sensors
-                placeholders = ','.join(['%s'] * len(sensor_ids))
-                sql = f"""
-                    SELECT time_bucket(%(bucket_interval)s, ts) AS bucket,
-                           sensor_id,
-                           avg(value) AS avg_value,
-                           min(value) AS min_value,
-                           max(value) AS max_value,
-                           last(value, ts) AS last_value,
-                           count(*) AS count
-                    FROM reading
-                    WHERE device_id = %(device_id)s
-                      AND sensor_id IN ({placeholders})
-                      AND ts >= %(ts_from)s
-                      AND ts <= %(ts_to)s
-                    GROUP BY bucket, sensor_id
-                    ORDER BY bucket ASC
-                    LIMIT %(limit)s
-                """
-                # Use named params for aggregation
-                params = {
-                    'bucket_interval': bucket_interval,
-                    'device_id': device_id,
-                    'ts_from': ts_from,
-                    'ts_to': ts_to,
-                    'limit': limit
-                }
-                # Convert to positional for IN clause
-                sql_positional = sql.replace('%(bucket_interval)s', f"'{bucket_interval}'")
-                sql_positional = sql_positional.replace('%(device_id)s', '%s')
-                sql_positional = sql_positional.replace('%(ts_from)s', '%s')
-                sql_positional = sql_positional.replace('%(ts_to)s', '%s')
-                sql_positional = sql_positional.replace('%(limit)s', '%s')
-                sql = sql_positional
-                params = [device_id] + sensor_ids + [ts_from, ts_to, limit]
-            else:
-                # All sensors
-                sql = f"""
-                    SELECT time_bucket(%(bucket_interval)s, ts) AS bucket,
-                           sensor_id,
-                           avg(value) AS avg_value,
-                           min(value) AS min_value,
-                           max(value) AS max_value,
-                           last(value, ts) AS last_value,
-                           count(*) AS count
-                    FROM reading
-                    WHERE device_id = %(device_id)s
-                      AND ts >= %(ts_from)s
-                      AND ts <= %(ts_to)s
-                    GROUP BY bucket, sensor_id
-                    ORDER BY bucket ASC
-                    LIMIT %(limit)s
-                """
-                params = {
-                    'bucket_interval': bucket_interval,
-                    'device_id': device_id,
-                    'ts_from': ts_from,
-                    'ts_to': ts_to,
-                    'limit': limit
-                }
-        
-        # Execute query
-        with connection.cursor() as cursor:
-            if interval == 'raw':
-                cursor.execute(sql, params)
-            else:
+            with connection.cursor() as cursor:
                 cursor.execute(sql, params)
+                columns = [col[0] for col in cursor.description]
+                rows = cursor.fetchall()
             
-            columns = [col[0] for col in cursor.description]
-            rows = cursor.fetchall()
-        
-        # Convert to dicts
-        data = [dict(zip(columns, row)) for row in rows]
+            # Convert to dicts
+            data = [dict(zip(columns, row)) for row in rows]
+            
+            # Faixa arquivada (Parquet no MinIO) vem antes dos dados quentes
+            cold = archive.read_archived_rows('device', device_id, ts_from, ts_to, sensor_ids)
+            if cold:
+                data = sorted(cold + data, key=lambda row: (row['ts'], row['sensor_id']))[:limit]
+            last_modified = max((row['ts'] for row in data), default=None)
+            
+            # Sensores comprimidos: valor segurado no início da janela (step-hold)
+            seeded = compression.seed_raw_rows(data, 'device', device_id, ts_from, sensor_ids)
+            if len(seeded) != len(data):
+                data = sorted(seeded, key=lambda row: (row['ts'], row['sensor_id']))[:limit]
+            
+            # Binários/enumerados: renderizados a partir das transições de estado
+            state_rows = states.raw_rows('device', device_id, ts_from, ts_to, sensor_ids)
+            if state_rows:
+                data = sorted(data + state_rows, key=lambda row: (row['ts'], row['sensor_id']))[:limit]
+                last_modified = max(filter(None, [last_modified] + [row['ts'] for row in state_rows]))
+        else:
+            # With aggregation - buckets assentados vêm do cache (Redis),
+            # apenas os buckets abertos são recalculados
+            data, last_modified = history_cache.get_history_buckets(
+                'device', device_id, interval, ts_from, ts_to, sensor_ids
+            )
+            # Sensores comprimidos: buckets sem amostra gravada seguram o último valor
+            data = compression.fill_step_hold_buckets(
+                data, 'device', device_id, interval, ts_from, ts_to, sensor_ids
+            )
+            # Binários/enumerados: buckets ponderados pelo tempo em cada estado
+            state_rows = states.bucket_rows('device', device_id, interval, ts_from, ts_to, sensor_ids)
+            if state_rows:
+                data = sorted(data + state_rows, key=lambda row: (row['bucket'], row['sensor_id']))
+                last_modified = max(filter(None, [last_modified] + [row['bucket'] for row in state_rows]))
+            # Série densa por sensor (buckets vazios conforme fill/max_gap)
+            data = gapfill.fill_buckets(data, interval, ts_from, ts_to, fill, max_gap)
+            data = data[:limit]
         
-        return Response({
+        response = Response({
             'device_id': device_id,
             'sensor_ids': sensor_ids if sensor_ids else None,  # Return list of requested sensors
             'interval': interval,
@@ -350,6 +357,7 @@ class DeviceHistoryView(APIView):
             'count': len(data),
             'data': data
         })
+        return history_cache.conditional_response(request, response, data, last_modified)
 
 
 class DeviceSummaryView(APIView):
@@ -360,6 +368,8 @@ class DeviceSummaryView(APIView):
     - Device status (online/offline based on last reading)
     - List of all sensors with their latest readings
     - Statistics (total readings in last 24h, avg interval)
+    - Per-sensor 24h statistics (``metrics`` selects the set, see
+      apps.ingest.services.statistics)
     """
     
     @extend_schema(
@@ -369,6 +379,10 @@ class DeviceSummaryView(APIView):
         - Status (online if reading < 5 minutes old)
         - All sensors with latest readings
         - 24-hour statistics
+        
+        metrics (comma-separated or "all"): basic (default), percentiles
+        (p5/p50/p95), histogram, time_in_range (vs. sensor thresholds
+        min/max) and rate (max rise/fall per minute).
         """,
         parameters=[
             OpenApiParameter(
@@ -378,6 +392,13 @@ class DeviceSummaryView(APIView):
                 required=True,
                 description='Device identifier'
             ),
+            OpenApiParameter(
+                name='metrics',
+                type=OpenApiTypes.STR,
+                location=OpenApiParameter.QUERY,
+                required=False,
+                description='Statistics per sensor: basic,percentiles,histogram,time_in_range,rate or all (default: basic)'
+            ),
         ],
         responses={
             200: OpenApiTypes.OBJECT,
@@ -386,30 +407,24 @@ class DeviceSummaryView(APIView):
     )
     def get(self, request, device_id):
         """Get device summary."""
+        try:
+            metrics = statistics.parse_metrics(request.query_params.get('metrics'))
+        except ValueError as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
         now = timezone.now()
         online_threshold = now - timedelta(minutes=5)
         stats_window = now - timedelta(hours=24)
         
-        # Get latest reading per sensor
+        # Get latest reading per sensor (reading_latest, mantida na ingestão)
         sql_latest = """
-            SELECT DISTINCT ON (sensor_id)
-                   sensor_id,
+            SELECT sensor_id,
                    value,
                    labels,
                    ts
-            FROM reading
-            WHERE device_id = %s
-            ORDER BY sensor_id, ts DESC
-        """
-        
-        # Get 24h statistics
-        sql_stats = """
-            SELECT COUNT(*) as total_readings,
-                   COUNT(DISTINCT sensor_id) as sensor_count,
-                   EXTRACT(EPOCH FROM (MAX(ts) - MIN(ts))) / NULLIF(COUNT(*), 0) as avg_interval_seconds
-            FROM reading
+            FROM reading_latest
             WHERE device_id = %s
-              AND ts >= %s
+            ORDER BY sensor_id
         """
         
         with connection.cursor() as cursor:
@@ -417,34 +432,15 @@ class DeviceSummaryView(APIView):
             cursor.execute(sql_latest, [device_id])
             latest_columns = [col[0] for col in cursor.description]
             latest_rows = cursor.fetchall()
-            
-            if not latest_rows:
-                return Response(
-                    {'detail': 'Device not found or no readings'},
-                    status=status.HTTP_404_NOT_FOUND
-                )
-            
-            # Statistics
-            cursor.execute(sql_stats, [device_id, stats_window])
-            stats_row = cursor.fetchone()
-            
-            # 🔧 Executar consulta de stats por sensor DENTRO do contexto
-            stats_24h_sql = """
-                SELECT 
-                    sensor_id,
-                    AVG(value) as avg_value,
-                    MIN(value) as min_value,
-                    MAX(value) as max_value,
-                    STDDEV(value) as stddev_value,
-                    COUNT(*) as count
-                FROM reading
-                WHERE device_id = %s
-                  AND ts >= %s
-                GROUP BY sensor_id
-            """
-            cursor.execute(stats_24h_sql, [device_id, stats_window])
-            stats_24h_rows = cursor.fetchall()
-            stats_24h_columns = [desc[0] for desc in cursor.description]
+        
+        if not latest_rows:
+            return Response(
+                {'detail': 'Device not found or no readings'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        # 📊 Janela de 24h lida uma vez; métricas calculadas em NumPy (cacheadas)
+        stats_by_sensor, totals = statistics.get_device_statistics(device_id, stats_window, now, metrics)
         
         # Convert to dicts
         sensors = []
@@ -479,29 +475,11 @@ class DeviceSummaryView(APIView):
                 'statistics_24h': None,  # Will be filled below with SQL aggregates
             })
         
-        # 🔧 stats_24h_rows já foi executada dentro do contexto do cursor acima
-        # Build stats dict by sensor_id
-        stats_by_sensor = {}
-        for row in stats_24h_rows:
-            stats_dict = dict(zip(stats_24h_columns, row))
-            stats_by_sensor[stats_dict['sensor_id']] = {
-                'avg': float(stats_dict['avg_value']) if stats_dict['avg_value'] is not None else None,
-                'min': float(stats_dict['min_value']) if stats_dict['min_value'] is not None else None,
-                'max': float(stats_dict['max_value']) if stats_dict['max_value'] is not None else None,
-                'stddev': float(stats_dict['stddev_value']) if stats_dict['stddev_value'] is not None else None,
-                'count': int(stats_dict['count']) if stats_dict['count'] is not None else 0,
-            }
-        
         # Attach statistics to sensors
+        empty_stats = statistics.compute_sensor(np.empty(0), np.empty(0), metrics)
         for sensor in sensors:
             sensor_id = sensor['sensor_id']
-            sensor['statistics_24h'] = stats_by_sensor.get(sensor_id, {
-                'avg': None,
-                'min': None,
-                'max': None,
-                'stddev': None,
-                'count': 0,
-            })
+            sensor['statistics_24h'] = stats_by_sensor.get(sensor_id, empty_stats)
         
         # Device status (uppercase for frontend compatibility)
         device_status = 'ONLINE' if last_seen >= online_threshold else 'OFFLINE'
@@ -509,14 +487,16 @@ class DeviceSummaryView(APIView):
         sensors_total = len(sensors)
         
         # Format statistics
-        total_readings, sensor_count, avg_interval = stats_row
+        total_readings = totals['total_readings']
+        sensor_count = totals['sensor_count']
+        avg_interval = totals['avg_interval_seconds']
         avg_readings_per_hour = round((total_readings or 0) / 24, 2) if total_readings else 0
         
         # Tratar avg_interval None (pode acontecer com NULLIF ou sem leituras)
         avg_interval_seconds = float(avg_interval) if avg_interval is not None else None
         avg_interval_str = f"{int(avg_interval)}s" if avg_interval is not None else 'N/A'
         
-        statistics = {
+        summary_stats = {
             'total_readings_24h': total_readings or 0,
             'sensor_count': sensor_count or sensors_total,
             'avg_interval': avg_interval_str,
@@ -538,7 +518,98 @@ class DeviceSummaryView(APIView):
             'status': device_status,
             'last_seen': last_seen.isoformat() if last_seen else None,
             'sensors': sensors,
-            'statistics': statistics
+            'statistics': summary_stats
+        })
+
+
+class DeviceStatesView(APIView):
+    """
+    State summary for binary/enumerated sensors of a device.
+    
+    Computed from the state-transition store (reading_state): time spent
+    in each state, number of cycles (entries into the state) and the
+    current state per sensor.
+    
+    Query parameters:
+    - sensor_id (optional, repeatable): Filter by sensor
+    - from (optional): Start time (ISO-8601, default: 24h ago)
+    - to (optional): End time (ISO-8601, default: now)
+    """
+    
+    @extend_schema(
+        summary="Get state summary for device",
+        description="""
+        Returns, per binary/enumerated sensor, seconds spent in each state,
+        cycle counts and the current state within the requested window.
+        """,
+        parameters=[
+            OpenApiParameter(
+                name='device_id',
+                type=OpenApiTypes.STR,
+                location=OpenApiParameter.PATH,
+                required=True,
+                description='Device identifier'
+            ),
+            OpenApiParameter(
+                name='sensor_id',
+                type=OpenApiTypes.STR,
+                location=OpenApiParameter.QUERY,
+                required=False,
+                description='Filter by specific sensor (repeatable)'
+            ),
+            OpenApiParameter(
+                name='from',
+                type=OpenApiTypes.DATETIME,
+                location=OpenApiParameter.QUERY,
+                required=False,
+                description='Start time (ISO-8601, default: 24h ago)'
+            ),
+            OpenApiParameter(
+                name='to',
+                type=OpenApiTypes.DATETIME,
+                location=OpenApiParameter.QUERY,
+                required=False,
+                description='End time (ISO-8601, default: now)'
+            ),
+        ],
+        responses={
+            200: OpenApiTypes.OBJECT,
+            400: OpenApiTypes.OBJECT,
+        }
+    )
+    def get(self, request, device_id):
+        """Get state summary for device."""
+        sensor_ids = request.query_params.getlist('sensor_id')
+        from_str = request.query_params.get('from')
+        to_str = request.query_params.get('to')
+        
+        now = timezone.now()
+        ts_to = timezone.datetime.fromisoformat(to_str.replace('Z', '+00:00')) if to_str else now
+        ts_from = timezone.datetime.fromisoformat(from_str.replace('Z', '+00:00')) if from_str else (now - timedelta(hours=24))
+        
+        if ts_from >= ts_to:
+            return Response(
+                {'detail': 'Invalid time range: from must be before to'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        summary = states.summarize('device', device_id, ts_from, ts_to, sensor_ids)
+        
+        sensors = []
+        for sensor_id in sorted(summary):
+            current = states.state_at('device', device_id, sensor_id, min(ts_to, now))
+            sensors.append({
+                'sensor_id': sensor_id,
+                'current_state': current['state'] if current else None,
+                'current_since': current['since'].isoformat() if current else None,
+                'states': summary[sensor_id],
+            })
+        
+        return Response({
+            'device_id': device_id,
+            'from': ts_from.isoformat(),
+            'to': ts_to.isoformat(),
+            'sensors': sensors,
         })
 
 
@@ -554,6 +625,8 @@ class AssetTelemetryHistoryView(APIView):
     - to: End timestamp (ISO 8601)
     - sensor_id: Filter by specific sensor(s) (can be multiple)
     - interval: Aggregation level (raw, 1m, 5m, 1h, auto)
+    - calendar: Calendar aggregation in the site timezone (day, week, month)
+    - fill / max_gap: Gap filling of aggregated intervals (none, null, previous, linear)
     """
     
     @extend_schema(
@@ -563,6 +636,9 @@ class AssetTelemetryHistoryView(APIView):
         from MQTT topic hierarchy. This is more reliable than device_id.
         
         Example: GET /api/telemetry/assets/CHILLER-001/history/?from=2025-11-01T00:00:00Z&to=2025-11-02T00:00:00Z
+        
+        Responses carry ETag/Last-Modified headers; send If-None-Match or
+        If-Modified-Since to receive 304 Not Modified when nothing changed.
         """,
         parameters=[
             OpenApiParameter(
@@ -600,6 +676,29 @@ class AssetTelemetryHistoryView(APIView):
                 required=False,
                 description='Aggregation interval: raw, 1m, 5m, 15m, 1h, auto (default)'
             ),
+            OpenApiParameter(
+                name='fill',
+                type=OpenApiTypes.STR,
+                location=OpenApiParameter.QUERY,
+                required=False,
+                enum=list(gapfill.FILL_MODES),
+                description='Gap filling for aggregated intervals: none (default), null, previous, linear'
+            ),
+            OpenApiParameter(
+                name='max_gap',
+                type=OpenApiTypes.STR,
+                location=OpenApiParameter.QUERY,
+                required=False,
+                description='Largest gap filled by previous/linear (seconds or 15m, 2h, 1d; default: 10 buckets)'
+            ),
+            OpenApiParameter(
+                name='calendar',
+                type=OpenApiTypes.STR,
+                location=OpenApiParameter.QUERY,
+                required=False,
+                enum=list(calendar_rollup.PERIODS),
+                description='Calendar aggregation in the site timezone (day, ISO week, month); overrides interval'
+            ),
         ],
         responses={
             200: OpenApiTypes.OBJECT,
@@ -618,6 +717,17 @@ class AssetTelemetryHistoryView(APIView):
         to_str = request.query_params.get('to')
         sensor_ids = request.query_params.getlist('sensor_id')
         interval = request.query_params.get('interval', 'auto')
+        fill = request.query_params.get('fill', 'none')
+        
+        if fill not in gapfill.FILL_MODES:
+            return Response(
+                {'error': f'Invalid fill: {fill}. Use one of: {", ".join(gapfill.FILL_MODES)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            max_gap = gapfill.parse_max_gap(request.query_params.get('max_gap'))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
         # Parse timestamps
         try:
@@ -635,6 +745,34 @@ class AssetTelemetryHistoryView(APIView):
         if timezone.is_naive(ts_to):
             ts_to = timezone.make_aware(ts_to)
         
+        # 📅 Agregação por calendário local do site (dia/semana/mês)
+        period = request.query_params.get('calendar')
+        if period:
+            if period not in calendar_rollup.PERIODS:
+                return Response(
+                    {'error': f'Invalid calendar: {period}. Use one of: {", ".join(calendar_rollup.PERIODS)}'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            rows, tz_name = calendar_rollup.get_calendar_series(asset_tag, period, ts_from, ts_to, sensor_ids)
+            data = [
+                {
+                    **row,
+                    'period_start': row['period_start'].isoformat(),
+                    'period_end': row['period_end'].isoformat(),
+                }
+                for row in rows
+            ]
+            response = Response({
+                'asset_tag': asset_tag,
+                'from': ts_from.isoformat(),
+                'to': ts_to.isoformat(),
+                'calendar': period,
+                'timezone': tz_name,
+                'count': len(data),
+                'data': data,
+            }, status=status.HTTP_200_OK)
+            return history_cache.conditional_response(request, response, data)
+        
         # Calculate time range and determine interval
         time_range_hours = (ts_to - ts_from).total_seconds() / 3600
         
@@ -675,14 +813,34 @@ class AssetTelemetryHistoryView(APIView):
             queryset = queryset.order_by('sensor_id', 'ts')[:MAX_RAW_RESULTS]
             data = list(queryset.values('sensor_id', 'ts', 'value'))
             
+            # Faixa arquivada (Parquet no MinIO) é combinada aos dados quentes
+            cold = archive.read_archived_rows('asset', asset_tag, ts_from, ts_to, sensor_ids)
+            if cold:
+                data = sorted(cold + data, key=lambda row: (row['sensor_id'], row['ts']))[:MAX_RAW_RESULTS]
+            last_modified = max((reading['ts'] for reading in data), default=None)
+            
+            # Sensores comprimidos: valor segurado no início da janela (step-hold)
+            seeded = compression.seed_raw_rows(data, 'asset', asset_tag, ts_from, sensor_ids)
+            if len(seeded) != len(data):
+                data = sorted(seeded, key=lambda row: (row['sensor_id'], row['ts']))[:MAX_RAW_RESULTS]
+            
+            # Binários/enumerados: renderizados a partir das transições de estado
+            state_rows = states.raw_rows('asset', asset_tag, ts_from, ts_to, sensor_ids)
+            if state_rows:
+                data = sorted(data + state_rows, key=lambda row: (row['sensor_id'], row['ts']))[:MAX_RAW_RESULTS]
+                last_modified = max(filter(None, [last_modified] + [row['ts'] for row in state_rows]))
+            
             # Format for frontend
             result = []
             for reading in data:
-                result.append({
+                item = {
                     'sensor_id': reading['sensor_id'],
                     'ts': reading['ts'].isoformat(),
                     'value': reading['value']
-                })
+                }
+                if reading.get('state') is not None:
+                    item['state'] = reading['state']
+                result.append(item)
             
             # Warn if limit was reached
             if len(result) >= MAX_RAW_RESULTS:
@@ -694,56 +852,42 @@ class AssetTelemetryHistoryView(APIView):
                 }, status=status.HTTP_200_OK)
         else:
             # Aggregate data using time_bucket with limit
-            interval_map = {
-                '1m': '1 minute',
-                '5m': '5 minutes',
-                '15m': '15 minutes',
-                '1h': '1 hour',
-            }
-            bucket_interval = interval_map.get(interval, '5 minutes')
-            
-            sql = """
-                SELECT 
-                    sensor_id,
-                    time_bucket(%s::interval, ts) AS bucket,
-                    AVG(value) AS avg_value,
-                    MIN(value) AS min_value,
-                    MAX(value) AS max_value,
-                    COUNT(*) AS count
-                FROM reading
-                WHERE asset_tag = %s
-                  AND ts >= %s
-                  AND ts <= %s
-                  AND (%s IS NULL OR sensor_id = ANY(%s))
-                GROUP BY sensor_id, bucket
-                ORDER BY sensor_id, bucket
-                LIMIT %s
-            """
+            if interval not in history_cache.BUCKET_SECONDS:
+                interval = '5m'
             
-            with connection.cursor() as cursor:
-                cursor.execute(sql, [
-                    bucket_interval,
-                    asset_tag,
-                    ts_from,
-                    ts_to,
-                    None if not sensor_ids else sensor_ids,
-                    sensor_ids or [],
-                    MAX_AGG_RESULTS  # Add limit to query
-                ])
-                columns = [col[0] for col in cursor.description]
-                rows = cursor.fetchall()
+            # Buckets assentados vêm do cache (Redis); apenas os abertos são recalculados
+            rows, last_modified = history_cache.get_history_buckets(
+                'asset', asset_tag, interval, ts_from, ts_to, sensor_ids
+            )
+            # Sensores comprimidos: buckets sem amostra gravada seguram o último valor
+            rows = compression.fill_step_hold_buckets(
+                rows, 'asset', asset_tag, interval, ts_from, ts_to, sensor_ids
+            )
+            # Binários/enumerados: buckets ponderados pelo tempo em cada estado
+            state_rows = states.bucket_rows('asset', asset_tag, interval, ts_from, ts_to, sensor_ids)
+            if state_rows:
+                rows.extend(state_rows)
+                last_modified = max(filter(None, [last_modified] + [row['bucket'] for row in state_rows]))
+            # Série densa por sensor (buckets vazios conforme fill/max_gap)
+            rows = gapfill.fill_buckets(rows, interval, ts_from, ts_to, fill, max_gap)
+            rows.sort(key=lambda row: (row['sensor_id'], row['bucket']))
+            rows = rows[:MAX_AGG_RESULTS]
             
             result = []
-            for row in rows:
-                row_dict = dict(zip(columns, row))
-                result.append({
+            for row_dict in rows:
+                item = {
                     'sensor_id': row_dict['sensor_id'],
                     'ts': row_dict['bucket'].isoformat() if hasattr(row_dict['bucket'], 'isoformat') else row_dict['bucket'],
                     'avg_value': float(row_dict['avg_value']) if row_dict['avg_value'] is not None else None,
                     'min_value': float(row_dict['min_value']) if row_dict['min_value'] is not None else None,
                     'max_value': float(row_dict['max_value']) if row_dict['max_value'] is not None else None,
                     'count': row_dict['count']
-                })
+                }
+                if row_dict.get('state') is not None:
+                    item['state'] = row_dict['state']
+                if row_dict.get('filled') is not None:
+                    item['filled'] = row_dict['filled']
+                result.append(item)
             
             # Warn if limit was reached for aggregated data
             if len(result) >= MAX_AGG_RESULTS:
@@ -756,7 +900,7 @@ class AssetTelemetryHistoryView(APIView):
         
         logger.info(f"✅ Found {len(result)} data points for asset {asset_tag}")
         
-        return Response({
+        response = Response({
             'asset_tag': asset_tag,
             'from': ts_from.isoformat(),
             'to': ts_to.isoformat(),
@@ -764,3 +908,135 @@ class AssetTelemetryHistoryView(APIView):
             'count': len(result),
             'data': result
         })
+        return history_cache.conditional_response(request, response, result, last_modified)
+
+
+class BatchHistoryView(APIView):
+    """
+    Get historical data for many devices/assets in one request.
+    
+    Site dashboards used to call DeviceHistoryView / AssetTelemetryHistoryView
+    once per device. This endpoint answers every selector with a single
+    set-based query and returns results grouped by selector.
+    
+    Body:
+    - selectors: list of {device_id | asset_tag, sensor_ids?}
+    - from / to (optional): shared time range (default: last 24h)
+    - interval (optional): raw, 1m, 5m, 15m, 1h, auto (default)
+    - limit (optional): max rows per selector (default 500, max 5000)
+    """
+    
+    MAX_LIMIT = 5000
+    DEFAULT_LIMIT = 500
+    MAX_SENSORS_PER_SELECTOR = 50
+    
+    @extend_schema(
+        summary="Get historical data for many devices/assets",
+        description="""
+        Batch version of the device/asset history endpoints.
+        
+        Every selector shares the same time range and interval. Limits and
+        permission checks apply per selector: a selector referencing a device
+        or asset not registered in the current tenant returns status
+        "not_found" without failing the whole request.
+        
+        Example body:
+        {
+            "from": "2025-11-01T00:00:00Z",
+            "to": "2025-11-02T00:00:00Z",
+            "interval": "5m",
+            "selectors": [
+                {"device_id": "gw-001", "sensor_ids": ["temp_supply"]},
+                {"asset_tag": "CHILLER-001"}
+            ]
+        }
+        """,
+        request=BatchHistoryRequestSerializer,
+        responses={
+            200: OpenApiTypes.OBJECT,
+            400: OpenApiTypes.OBJECT,
+        }
+    )
+    def post(self, request):
+        """Get historical data for many selectors."""
+        from apps.assets.models import Asset, Device
+        
+        serializer = BatchHistoryRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+        
+        ts_to = params.get('to') or timezone.now()
+        ts_from = params.get('from') or (ts_to - timedelta(hours=24))
+        if ts_from >= ts_to:
+            return Response(
+                {'detail': 'Invalid time range: from must be before to'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        interval = params['interval']
+        if interval == 'auto':
+            time_diff = ts_to - ts_from
+            if time_diff <= timedelta(hours=1):
+                interval = 'raw'
+            elif time_diff <= timedelta(hours=6):
+                interval = '1m'
+            elif time_diff <= timedelta(hours=24):
+                interval = '5m'
+            else:
+                interval = '1h'
+        
+        limit = min(params.get('limit', self.DEFAULT_LIMIT), self.MAX_LIMIT)
+        
+        # 🔒 Permissão por seletor: device/asset precisa estar cadastrado no tenant
+        selectors = params['selectors']
+        device_ids = {s['device_id'] for s in selectors if s.get('device_id')}
+        asset_tags = {s['asset_tag'] for s in selectors if s.get('asset_tag')}
+        known_devices = set(
+            Device.objects.filter(mqtt_client_id__in=device_ids).values_list('mqtt_client_id', flat=True)
+        ) if device_ids else set()
+        known_assets = set(
+            Asset.objects.filter(tag__in=asset_tags).values_list('tag', flat=True)
+        ) if asset_tags else set()
+        
+        results = []
+        allowed = []
+        for idx, selector in enumerate(selectors):
+            scope, key = ('device', selector['device_id']) if selector.get('device_id') else ('asset', selector['asset_tag'])
+            sensor_ids = selector.get('sensor_ids') or []
+            entry = {
+                'device_id' if scope == 'device' else 'asset_tag': key,
+                'sensor_ids': sensor_ids or None,
+            }
+            results.append(entry)
+            
+            if key not in (known_devices if scope == 'device' else known_assets):
+                entry.update({'status': 'not_found', 'detail': f'Unknown {scope}: {key}'})
+                continue
+            if len(sensor_ids) > self.MAX_SENSORS_PER_SELECTOR:
+                entry.update({
+                    'status': 'invalid',
+                    'detail': f'Maximum {self.MAX_SENSORS_PER_SELECTOR} sensors per selector'
+                })
+                continue
+            
+            allowed.append({'idx': idx, 'scope': scope, 'key': key, 'sensor_ids': sensor_ids})
+        
+        # Uma única consulta para todos os seletores permitidos
+        rows_by_selector = batch_history.fetch_batch_history(allowed, interval, ts_from, ts_to, limit)
+        
+        for idx, rows in rows_by_selector.items():
+            results[idx].update({
+                'status': 'ok',
+                'count': len(rows),
+                'truncated': len(rows) >= limit,
+                'data': rows,
+            })
+        
+        return Response({
+            'from': ts_from.isoformat(),
+            'to': ts_to.isoformat(),
+            'interval': interval,
+            'limit': limit,
+            'count': len(results),
+            'results': results,
+        })
@@ -0,0 +1,73 @@
+"""
+Comando para arquivar chunks antigos da hypertable reading em Parquet (MinIO).
+
+Uso:
+    python manage.py archive_reading_chunks                        # Tenants com archive_after_days
+    python manage.py archive_reading_chunks --tenant umc           # Apenas um tenant
+    python manage.py archive_reading_chunks --older-than-days 180  # Ignora o valor do tenant
+    python manage.py archive_reading_chunks --dry-run              # Apenas lista os chunks
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from django_tenants.utils import schema_context
+
+from apps.ingest.services.archive import archive_chunks, list_archivable_chunks
+from apps.tenants.models import Tenant
+
+
+class Command(BaseCommand):
+    help = 'Arquiva chunks antigos de reading em Parquet no MinIO e remove-os do banco'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tenant', type=str, help='Slug do tenant (default: todos)')
+        parser.add_argument(
+            '--older-than-days',
+            type=int,
+            default=None,
+            help='Horizonte em dias (default: Tenant.archive_after_days)'
+        )
+        parser.add_argument('--max-chunks', type=int, default=None, help='Máximo de chunks por tenant')
+        parser.add_argument('--dry-run', action='store_true', help='Apenas lista os chunks elegíveis')
+
+    def handle(self, *args, **options):
+        tenants = Tenant.objects.exclude(slug='public')
+        if options['tenant']:
+            tenants = tenants.filter(slug=options['tenant'])
+
+        mode = 'DRY-RUN' if options['dry_run'] else 'ARQUIVAMENTO'
+        self.stdout.write(self.style.WARNING(f'\n🗄️ Arquivando chunks de reading ({mode})\n'))
+
+        for tenant in tenants:
+            days = options['older_than_days'] or tenant.archive_after_days
+            if not days:
+                self.stdout.write(f'  {tenant.slug}: archive_after_days não configurado, ignorado')
+                continue
+
+            horizon = timezone.now() - timedelta(days=days)
+            with schema_context(tenant.schema_name):
+                if options['dry_run']:
+                    chunks = list_archivable_chunks(horizon)
+                    if options['max_chunks']:
+                        chunks = chunks[:options['max_chunks']]
+                    self.stdout.write(f'  {tenant.slug}: {len(chunks)} chunks anteriores a {horizon:%Y-%m-%d}')
+                    for chunk in chunks:
+                        self.stdout.write(
+                            f"    {chunk['chunk_name']}  [{chunk['range_start']:%Y-%m-%d %H:%M} → "
+                            f"{chunk['range_end']:%Y-%m-%d %H:%M})"
+                        )
+                    continue
+
+                stats = archive_chunks(horizon, max_chunks=options['max_chunks'])
+
+            ratio = f"{stats['hot_bytes'] / stats['parquet_bytes']:.1f}x" if stats['parquet_bytes'] else '-'
+            style = self.style.ERROR if stats['errors'] else self.style.SUCCESS
+            self.stdout.write(style(
+                f"  {tenant.slug}: {stats['archived']}/{stats['candidates']} chunks, "
+                f"{stats['rows']} leituras, {stats['hot_bytes']} → {stats['parquet_bytes']} bytes ({ratio})"
+            ))
+            for error in stats['errors']:
+                self.stdout.write(self.style.ERROR(f"    ❌ {error['chunk']}: {error['error']}"))
+
+        self.stdout.write(self.style.SUCCESS('\n✅ Concluído\n'))
@@ -0,0 +1,68 @@
+"""
+Comando para calcular o histórico de sensores virtuais (derivados).
+
+Uso:
+    python manage.py backfill_virtual_sensors --tenant umc                    # Todos os sensores virtuais
+    python manage.py backfill_virtual_sensors --tenant umc --asset CH-001     # Apenas um ativo
+    python manage.py backfill_virtual_sensors --tenant umc --tag CH-001-COP   # Apenas um sensor virtual
+    python manage.py backfill_virtual_sensors --tenant umc --days 90          # Janela maior (default: 30)
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from django_tenants.utils import schema_context
+
+from apps.ingest.services.virtual import backfill
+from apps.tenants.models import Tenant
+
+
+class Command(BaseCommand):
+    help = 'Calcula o histórico de sensores virtuais a partir das leituras das entradas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tenant', type=str, help='Slug do tenant (default: todos)')
+        parser.add_argument('--asset', type=str, help='Tag do ativo')
+        parser.add_argument('--tag', type=str, help='Tag do sensor virtual')
+        parser.add_argument('--days', type=int, default=30, help='Dias de histórico (default: 30)')
+
+    def handle(self, *args, **options):
+        from apps.assets.models import VirtualSensor
+
+        tenants = Tenant.objects.exclude(slug='public')
+        if options['tenant']:
+            tenants = tenants.filter(slug=options['tenant'])
+
+        ts_to = timezone.now()
+        ts_from = ts_to - timedelta(days=options['days'])
+
+        self.stdout.write(self.style.WARNING(f"\n🧮 Backfill de sensores virtuais ({options['days']} dias)\n"))
+
+        totals = {'evaluated': 0, 'inserted': 0}
+        for tenant in tenants:
+            with schema_context(tenant.schema_name):
+                virtual_sensors = VirtualSensor.objects.select_related('asset').filter(is_active=True)
+                if options['asset']:
+                    virtual_sensors = virtual_sensors.filter(asset__tag=options['asset'])
+                if options['tag']:
+                    virtual_sensors = virtual_sensors.filter(tag=options['tag'])
+
+                for virtual_sensor in virtual_sensors:
+                    try:
+                        stats = backfill(virtual_sensor, ts_from, ts_to)
+                    except ValueError as exc:
+                        self.stdout.write(self.style.ERROR(
+                            f"  {tenant.slug} {virtual_sensor.asset.tag}/{virtual_sensor.tag}: {exc}"
+                        ))
+                        continue
+
+                    for key in totals:
+                        totals[key] += stats[key]
+                    self.stdout.write(self.style.SUCCESS(
+                        f"  {tenant.slug} {virtual_sensor.asset.tag}/{virtual_sensor.tag}: "
+                        f"avaliados={stats['evaluated']}, inseridos={stats['inserted']}"
+                    ))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"\n✅ Total: avaliados={totals['evaluated']}, inseridos={totals['inserted']}\n"
+        ))
@@ -0,0 +1,113 @@
+"""
+Benchmark da camada fria (Parquet no MinIO) versus a hypertable reading.
+
+Relata o espaço ocupado pelos chunks arquivados (antes/depois) e mede a
+latência de consultas agregadas nas três situações:
+  - hot: janela inteiramente no banco
+  - cold: janela inteiramente arquivada
+  - span: janela que cruza o horizonte de arquivamento
+
+Uso:
+    python manage.py benchmark_archive --tenant umc
+    python manage.py benchmark_archive --tenant umc --asset-tag CH-001 --hours 24 --runs 5
+"""
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count, Max, Min, Sum
+from django.utils import timezone
+from django_tenants.utils import schema_context
+
+from apps.ingest.services import archive, history_cache
+from apps.tenants.models import Tenant
+
+
+class Command(BaseCommand):
+    help = 'Mede espaço e latência da camada fria (Parquet) versus a hypertable reading'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tenant', type=str, required=True, help='Slug do tenant')
+        parser.add_argument('--asset-tag', type=str, help='Asset consultado (default: o mais recente)')
+        parser.add_argument('--hours', type=int, default=24, help='Tamanho da janela consultada')
+        parser.add_argument('--interval', type=str, default='5m', choices=list(history_cache.BUCKET_SECONDS))
+        parser.add_argument('--runs', type=int, default=5, help='Execuções por cenário')
+
+    def handle(self, *args, **options):
+        from apps.ingest.models import ArchivedChunk, ReadingLatest
+
+        tenant = Tenant.objects.filter(slug=options['tenant']).first()
+        if tenant is None:
+            raise CommandError(f"Tenant '{options['tenant']}' não encontrado")
+
+        with schema_context(tenant.schema_name):
+            totals = ArchivedChunk.objects.aggregate(
+                chunks=Count('id'),
+                rows=Sum('row_count'),
+                hot_bytes=Sum('hot_bytes'),
+                parquet_bytes=Sum('parquet_bytes'),
+                oldest=Min('range_start'),
+                horizon=Max('range_end'),
+            )
+
+            self.stdout.write(self.style.WARNING(f'\n📊 Camada fria - {tenant.slug}\n'))
+            if not totals['chunks']:
+                self.stdout.write('  Nenhum chunk arquivado.\n')
+                return
+
+            hot_bytes = totals['hot_bytes'] or 0
+            parquet_bytes = totals['parquet_bytes'] or 0
+            self.stdout.write(f"  Chunks arquivados:  {totals['chunks']}")
+            self.stdout.write(f"  Faixa:              {totals['oldest']:%Y-%m-%d} → {totals['horizon']:%Y-%m-%d}")
+            self.stdout.write(f"  Leituras:           {totals['rows']}")
+            self.stdout.write(f"  PostgreSQL (antes): {hot_bytes / 1024 / 1024:.1f} MiB")
+            self.stdout.write(f"  Parquet:            {parquet_bytes / 1024 / 1024:.1f} MiB")
+            if parquet_bytes:
+                self.stdout.write(f"  Compressão:         {hot_bytes / parquet_bytes:.1f}x")
+            if totals['rows']:
+                self.stdout.write(f"  Bytes/leitura:      {hot_bytes / totals['rows']:.1f} → {parquet_bytes / totals['rows']:.1f}")
+
+            asset_tag = options['asset_tag']
+            if not asset_tag:
+                latest = ReadingLatest.objects.exclude(asset_tag__isnull=True).order_by('-ts').first()
+                if latest is None:
+                    raise CommandError('Nenhum asset encontrado; use --asset-tag')
+                asset_tag = latest.asset_tag
+
+            window = timedelta(hours=options['hours'])
+            horizon = totals['horizon']
+            scenarios = [
+                ('hot', timezone.now() - window, timezone.now()),
+                ('cold', horizon - window, horizon),
+                ('span', horizon - window / 2, horizon + window / 2),
+            ]
+
+            self.stdout.write(self.style.WARNING(
+                f"\n⏱️  Latência ({asset_tag}, janela {options['hours']}h, intervalo {options['interval']}, "
+                f"{options['runs']} execuções)\n"
+            ))
+            for name, ts_from, ts_to in scenarios:
+                timings = []
+                buckets = 0
+                for _ in range(options['runs']):
+                    started = time.perf_counter()
+                    rows = history_cache.query_buckets(
+                        'asset', asset_tag, options['interval'], ts_from, ts_to, end_inclusive=True
+                    )
+                    timings.append((time.perf_counter() - started) * 1000)
+                    buckets = len(rows)
+                self.stdout.write(
+                    f"  {name:<5} mediana={statistics.median(timings):8.1f} ms  "
+                    f"min={min(timings):8.1f} ms  max={max(timings):8.1f} ms  buckets={buckets}"
+                )
+
+            # Leitura bruta da camada fria (pruning de row groups/colunas)
+            started = time.perf_counter()
+            table = archive.read_archived('asset', asset_tag, horizon - window, horizon)
+            elapsed = (time.perf_counter() - started) * 1000
+            self.stdout.write(
+                f"  raw   {elapsed:8.1f} ms  leituras={table.num_rows if table is not None else 0}"
+            )
+
+        self.stdout.write(self.style.SUCCESS('\n✅ Benchmark concluído\n'))
@@ -0,0 +1,238 @@
+"""
+Benchmark do conjunto de índices de telemetry/reading_point.
+
+Mede, no schema de um tenant, a taxa de inserção da ingestão e a latência
+das principais consultas de leitura em dois cenários:
+  - legacy:  índices removidos na migração 0010 recriados temporariamente
+  - current: índices atuais
+
+Cada cenário roda dentro de uma transação revertida ao final: linhas
+sintéticas e índices temporários nunca persistem. A criação dos índices
+legados bloqueia escrita nas tabelas durante o teste - rode fora do pico.
+
+Uso:
+    python manage.py benchmark_indexes --tenant umc
+    python manage.py benchmark_indexes --tenant umc --rows 50000 --runs 7
+"""
+import json
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from django_tenants.utils import schema_context
+
+from apps.tenants.models import Tenant
+
+LEGACY_INDEXES_SQL = """
+    CREATE INDEX _bench_telemetry_device ON telemetry (device_id);
+    CREATE INDEX _bench_telemetry_device_like ON telemetry (device_id varchar_pattern_ops);
+    CREATE INDEX _bench_telemetry_topic ON telemetry (topic);
+    CREATE INDEX _bench_telemetry_topic_like ON telemetry (topic varchar_pattern_ops);
+    CREATE INDEX _bench_telemetry_ts ON telemetry (timestamp);
+    CREATE INDEX _bench_telemetry_topic_ts ON telemetry (topic, timestamp);
+    CREATE INDEX _bench_telemetry_id ON telemetry (id);
+"""
+
+# Formatos extraídos de api_views.py, api_views_extended.py, ops/views.py e alerts
+READ_QUERIES = [
+    (
+        'telemetry keyset (device)',
+        """
+        SELECT id, device_id, topic, payload, timestamp FROM telemetry
+        WHERE device_id = %(device_id)s
+        ORDER BY timestamp DESC, id DESC LIMIT 50
+        """,
+    ),
+    (
+        'telemetry keyset (todos)',
+        """
+        SELECT id, device_id, topic, payload, timestamp FROM telemetry
+        ORDER BY timestamp DESC, id DESC LIMIT 50
+        """,
+    ),
+    (
+        'telemetry topic icontains',
+        """
+        SELECT id FROM telemetry
+        WHERE UPPER(topic::text) LIKE UPPER(%(topic_like)s)
+          AND timestamp >= %(hour_ago)s
+        ORDER BY timestamp DESC, id DESC LIMIT 50
+        """,
+    ),
+    (
+        'device history raw 1h',
+        """
+        SELECT p.ts, s.sensor_id, p.value
+        FROM reading_series s JOIN reading_point p ON p.series_id = s.id
+        WHERE s.device_id = %(device_id)s AND p.ts >= %(hour_ago)s AND p.ts <= %(now)s
+        ORDER BY p.ts LIMIT 500
+        """,
+    ),
+    (
+        'asset history 5m 24h',
+        """
+        SELECT time_bucket('5 minutes', p.ts) AS bucket, s.sensor_id,
+               avg(p.value), min(p.value), max(p.value), last(p.value, p.ts), count(*)
+        FROM reading_point p JOIN reading_series s ON s.id = p.series_id
+        WHERE s.asset_tag = %(asset_tag)s AND p.ts >= %(day_ago)s AND p.ts < %(now)s
+        GROUP BY 1, 2
+        """,
+    ),
+    (
+        'ops telemetry 1m (todos) 1h',
+        """
+        SELECT time_bucket('1 minute', ts) AS bucket, device_id, sensor_id, avg(value), count(*)
+        FROM reading
+        WHERE ts >= %(hour_ago)s
+        GROUP BY 1, 2, 3
+        ORDER BY 1 DESC, 2 DESC, 3 DESC LIMIT 51
+        """,
+    ),
+    (
+        'ops sensor detail',
+        """
+        SELECT ts, device_id, sensor_id, value FROM reading
+        WHERE sensor_id = %(sensor_id)s
+        ORDER BY ts DESC LIMIT 100
+        """,
+    ),
+    (
+        'latest por device',
+        """
+        SELECT sensor_id, value, ts FROM reading_latest
+        WHERE device_id = %(device_id)s
+        """,
+    ),
+]
+
+
+class Command(BaseCommand):
+    help = 'Compara ingestão e latência de leitura com o conjunto de índices antigo e o atual'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tenant', type=str, required=True, help='Slug do tenant')
+        parser.add_argument('--rows', type=int, default=20000, help='Mensagens sintéticas inseridas por cenário')
+        parser.add_argument('--sensors', type=int, default=8, help='Pontos por mensagem')
+        parser.add_argument('--batch', type=int, default=100, help='Mensagens por lote de INSERT')
+        parser.add_argument('--runs', type=int, default=5, help='Execuções por consulta')
+
+    def handle(self, *args, **options):
+        tenant = Tenant.objects.filter(slug=options['tenant']).first()
+        if tenant is None:
+            raise CommandError(f"Tenant '{options['tenant']}' não encontrado")
+
+        with schema_context(tenant.schema_name):
+            params = self._sample_params()
+            results = {}
+            for scenario in ('legacy', 'current'):
+                self.stdout.write(f'  ⏳ Cenário {scenario}...')
+                results[scenario] = self._run(scenario, params, options)
+
+        self._report(tenant.slug, results, options)
+
+    def _sample_params(self):
+        now = timezone.now()
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                SELECT device_id, sensor_id, COALESCE(asset_tag, '')
+                FROM reading_latest ORDER BY ts DESC LIMIT 1
+            """)
+            row = cursor.fetchone()
+        if row is None:
+            raise CommandError('Tenant sem leituras (reading_latest vazio)')
+        device_id, sensor_id, asset_tag = row
+        return {
+            'device_id': device_id,
+            'sensor_id': sensor_id,
+            'asset_tag': asset_tag,
+            'topic_like': f'%{device_id}%',
+            'now': now,
+            'hour_ago': now - timedelta(hours=1),
+            'day_ago': now - timedelta(days=1),
+        }
+
+    def _run(self, scenario, params, options):
+        result = {}
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                if scenario == 'legacy':
+                    cursor.execute(LEGACY_INDEXES_SQL)
+
+                cursor.execute("""
+                    SELECT COUNT(*) FROM pg_indexes
+                    WHERE schemaname = current_schema()
+                      AND tablename IN ('telemetry', 'reading_point')
+                """)
+                result['indexes'] = cursor.fetchone()[0]
+
+                result['insert_seconds'] = self._insert(cursor, options)
+
+                result['queries'] = {}
+                for name, sql in READ_QUERIES:
+                    timings = []
+                    for _ in range(options['runs']):
+                        started = time.perf_counter()
+                        cursor.execute(sql, params)
+                        cursor.fetchall()
+                        timings.append((time.perf_counter() - started) * 1000)
+                    result['queries'][name] = statistics.median(timings)
+
+            # Nada do benchmark persiste
+            transaction.set_rollback(True)
+        return result
+
+    def _insert(self, cursor, options):
+        """Insere mensagens + pontos sintéticos como a ingestão (lotes multi-VALUES)."""
+        base = timezone.now() - timedelta(days=2)
+        payload = json.dumps({'sensors': [{'sensor_id': f's{i}', 'value': 1.0} for i in range(options['sensors'])]})
+        started = time.perf_counter()
+        for offset in range(0, options['rows'], options['batch']):
+            count = min(options['batch'], options['rows'] - offset)
+            telemetry_params = []
+            point_params = []
+            for i in range(offset, offset + count):
+                ts = base + timedelta(milliseconds=i * 250)
+                device = f'_bench-{i % 50:02d}'
+                telemetry_params.extend([device, f'tenants/bench/devices/{device}/data', payload, ts, ts])
+                for sensor in range(options['sensors']):
+                    # series_id negativo: nunca colide com séries reais
+                    point_params.extend([-(1 + (i % 50) * options['sensors'] + sensor), ts, float(i % 100)])
+            cursor.execute(
+                "INSERT INTO telemetry (device_id, topic, payload, timestamp, created_at) VALUES "
+                + ', '.join(['(%s, %s, %s::jsonb, %s, %s)'] * count),
+                telemetry_params
+            )
+            cursor.execute(
+                "INSERT INTO reading_point (series_id, ts, value) VALUES "
+                + ', '.join(['(%s, %s, %s)'] * (count * options['sensors']))
+                + " ON CONFLICT (series_id, ts) DO NOTHING",
+                point_params
+            )
+        return time.perf_counter() - started
+
+    def _report(self, slug, results, options):
+        legacy, current = results['legacy'], results['current']
+        messages = options['rows']
+        points = messages * options['sensors']
+
+        self.stdout.write(self.style.WARNING(f'\n📊 Índices - {slug} ({options["runs"]} execuções por consulta)\n'))
+        self.stdout.write(f"  {'':<30} {'legacy':>12} {'current':>12}")
+        self.stdout.write(f"  {'Índices (telemetry+points)':<30} {legacy['indexes']:>12} {current['indexes']:>12}")
+        self.stdout.write(
+            f"  {'Ingestão (mensagens/s)':<30} {messages / legacy['insert_seconds']:>12.0f} "
+            f"{messages / current['insert_seconds']:>12.0f}"
+        )
+        self.stdout.write(
+            f"  {'Ingestão (pontos/s)':<30} {points / legacy['insert_seconds']:>12.0f} "
+            f"{points / current['insert_seconds']:>12.0f}"
+        )
+        self.stdout.write('\n  Latência mediana (ms):')
+        for name, _ in READ_QUERIES:
+            before = legacy['queries'][name]
+            after = current['queries'][name]
+            self.stdout.write(f"  {name:<30} {before:>12.1f} {after:>12.1f}")
+
+        self.stdout.write(self.style.SUCCESS('\n✅ Benchmark concluído (transações revertidas)\n'))
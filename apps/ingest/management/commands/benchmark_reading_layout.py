@@ -0,0 +1,298 @@
+"""
+Benchmark do layout de leituras: hypertable larga (antigo ``reading``)
+versus séries + pontos estreitos (reading_series + reading_point).
+
+Cria tabelas temporárias no schema do tenant com o mesmo DDL/índices de
+cada layout, insere o mesmo conjunto sintético em lotes (como a ingestão)
+e relata bytes por linha, tamanho de índices, taxa de inserção e a
+latência de uma consulta agregada típica. As tabelas são removidas ao
+final (use --keep para inspecioná-las).
+
+Uso:
+    python manage.py benchmark_reading_layout --tenant umc
+    python manage.py benchmark_reading_layout --tenant umc --devices 50 --sensors 8 --hours 48
+"""
+import json
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+from django_tenants.utils import schema_context
+
+from apps.tenants.models import Tenant
+
+WIDE_DDL = """
+    CREATE TABLE _bench_reading_wide (
+        id bigserial,
+        device_id varchar(255) NOT NULL,
+        sensor_id varchar(255) NOT NULL,
+        asset_tag varchar(255),
+        tenant varchar(255),
+        site varchar(255),
+        value double precision NOT NULL,
+        labels jsonb NOT NULL,
+        ts timestamptz NOT NULL,
+        created_at timestamptz NOT NULL
+    );
+    SELECT create_hypertable('_bench_reading_wide', 'ts', chunk_time_interval => INTERVAL '1 day');
+    CREATE INDEX ON _bench_reading_wide (device_id);
+    CREATE INDEX ON _bench_reading_wide (sensor_id);
+    CREATE INDEX ON _bench_reading_wide (asset_tag);
+    CREATE INDEX ON _bench_reading_wide (tenant);
+    CREATE INDEX ON _bench_reading_wide (site);
+    CREATE INDEX ON _bench_reading_wide (device_id, sensor_id, ts);
+    CREATE INDEX ON _bench_reading_wide (sensor_id, ts);
+    CREATE INDEX ON _bench_reading_wide (id);
+    CREATE INDEX ON _bench_reading_wide (asset_tag, ts);
+    CREATE INDEX ON _bench_reading_wide (tenant, asset_tag, ts);
+    CREATE INDEX ON _bench_reading_wide (site, asset_tag, ts);
+    CREATE UNIQUE INDEX ON _bench_reading_wide (device_id, sensor_id, ts);
+"""
+
+NARROW_DDL = """
+    CREATE TABLE _bench_reading_series (
+        id serial PRIMARY KEY,
+        device_id varchar(255) NOT NULL,
+        sensor_id varchar(255) NOT NULL,
+        asset_tag varchar(255),
+        tenant varchar(255),
+        site varchar(255),
+        labels jsonb NOT NULL
+    );
+    CREATE UNIQUE INDEX ON _bench_reading_series (
+        device_id, sensor_id, COALESCE(asset_tag, ''), COALESCE(tenant, ''), COALESCE(site, ''), labels
+    );
+    CREATE INDEX ON _bench_reading_series (asset_tag);
+    CREATE TABLE _bench_reading_point (
+        series_id integer NOT NULL,
+        ts timestamptz NOT NULL,
+        value double precision NOT NULL,
+        PRIMARY KEY (series_id, ts)
+    );
+    SELECT create_hypertable(
+        '_bench_reading_point', 'ts',
+        chunk_time_interval => INTERVAL '1 day',
+        create_default_indexes => FALSE
+    );
+"""
+
+DROP_SQL = """
+    DROP TABLE IF EXISTS _bench_reading_wide;
+    DROP TABLE IF EXISTS _bench_reading_point;
+    DROP TABLE IF EXISTS _bench_reading_series;
+"""
+
+WIDE_QUERY = """
+    SELECT time_bucket('5 minutes', ts) AS bucket, sensor_id, avg(value), min(value), max(value), count(*)
+    FROM _bench_reading_wide
+    WHERE device_id = %s AND ts >= %s AND ts <= %s
+    GROUP BY 1, 2
+"""
+
+NARROW_QUERY = """
+    SELECT time_bucket('5 minutes', p.ts) AS bucket, s.sensor_id, avg(p.value), min(p.value), max(p.value), count(*)
+    FROM _bench_reading_series s
+    JOIN _bench_reading_point p ON p.series_id = s.id
+    WHERE s.device_id = %s AND p.ts >= %s AND p.ts <= %s
+    GROUP BY 1, 2
+"""
+
+
+class Command(BaseCommand):
+    help = 'Compara o layout largo de leituras com séries + pontos estreitos (bytes, índices, inserção)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tenant', type=str, required=True, help='Slug do tenant (schema usado no teste)')
+        parser.add_argument('--devices', type=int, default=20)
+        parser.add_argument('--sensors', type=int, default=10, help='Sensores por device')
+        parser.add_argument('--hours', type=int, default=24, help='Horas de dados sintéticos')
+        parser.add_argument('--step', type=int, default=60, help='Intervalo entre amostras (s)')
+        parser.add_argument('--batch', type=int, default=500, help='Linhas por INSERT')
+        parser.add_argument('--keep', action='store_true', help='Não remove as tabelas de teste')
+
+    def handle(self, *args, **options):
+        tenant = Tenant.objects.filter(slug=options['tenant']).first()
+        if tenant is None:
+            raise CommandError(f"Tenant '{options['tenant']}' não encontrado")
+
+        start = (timezone.now() - timedelta(hours=options['hours'])).replace(second=0, microsecond=0)
+        steps = options['hours'] * 3600 // options['step']
+        series = []
+        for d in range(options['devices']):
+            for s in range(options['sensors']):
+                series.append({
+                    'device_id': f'bench-device-{d:04d}',
+                    'sensor_id': f'bench-sensor-{d:04d}-{s:02d}',
+                    'asset_tag': f'BENCH-{d:04d}',
+                    'tenant': tenant.slug,
+                    'site': 'BENCH',
+                    'labels': json.dumps({
+                        'name': f'Sensor {s}',
+                        'type': 'temperature',
+                        'unit': '°C',
+                        'value_type': 'float',
+                    }),
+                })
+        total_rows = len(series) * steps
+
+        self.stdout.write(self.style.WARNING(
+            f"\n📊 Benchmark de layout - {tenant.slug}: {len(series)} séries × {steps} amostras = {total_rows} linhas\n"
+        ))
+
+        with schema_context(tenant.schema_name):
+            with connection.cursor() as cursor:
+                cursor.execute(DROP_SQL)
+                cursor.execute(WIDE_DDL)
+                cursor.execute(NARROW_DDL)
+            try:
+                wide = self._run_wide(series, start, steps, options)
+                narrow = self._run_narrow(series, start, steps, options)
+                self._report(total_rows, wide, narrow)
+            finally:
+                if not options['keep']:
+                    with connection.cursor() as cursor:
+                        cursor.execute(DROP_SQL)
+
+        self.stdout.write(self.style.SUCCESS('\n✅ Benchmark concluído\n'))
+
+    def _samples(self, series, start, steps, step):
+        for i in range(steps):
+            ts = start + timedelta(seconds=i * step)
+            for index, item in enumerate(series):
+                yield index, item, ts, 20.0 + (i + index) % 100 / 10.0
+
+    def _insert(self, sql_template, placeholder, rows, batch):
+        started = time.perf_counter()
+        with connection.cursor() as cursor:
+            for offset in range(0, len(rows), batch):
+                chunk = rows[offset:offset + batch]
+                params = [value for row in chunk for value in row]
+                cursor.execute(sql_template.format(values=', '.join([placeholder] * len(chunk))), params)
+        return time.perf_counter() - started
+
+    def _sizes(self, tables):
+        table_bytes = index_bytes = 0
+        with connection.cursor() as cursor:
+            for table, is_hypertable in tables:
+                if is_hypertable:
+                    cursor.execute(
+                        "SELECT table_bytes + COALESCE(toast_bytes, 0), index_bytes FROM hypertable_detailed_size(%s)",
+                        [table]
+                    )
+                    row = cursor.fetchone()
+                else:
+                    cursor.execute(
+                        "SELECT pg_table_size(%s::regclass), pg_indexes_size(%s::regclass)",
+                        [table, table]
+                    )
+                    row = cursor.fetchone()
+                table_bytes += row[0] or 0
+                index_bytes += row[1] or 0
+        return table_bytes, index_bytes
+
+    def _query(self, sql, series, start, options):
+        timings = []
+        with connection.cursor() as cursor:
+            for item in series[:5]:
+                begun = time.perf_counter()
+                cursor.execute(sql, [item['device_id'], start, start + timedelta(hours=options['hours'])])
+                cursor.fetchall()
+                timings.append((time.perf_counter() - begun) * 1000)
+        return sorted(timings)[len(timings) // 2]
+
+    def _run_wide(self, series, start, steps, options):
+        now = timezone.now()
+        rows = [
+            (item['device_id'], item['sensor_id'], item['asset_tag'], item['tenant'],
+             item['site'], value, item['labels'], ts, now)
+            for _, item, ts, value in self._samples(series, start, steps, options['step'])
+        ]
+        elapsed = self._insert(
+            """
+            INSERT INTO _bench_reading_wide
+                (device_id, sensor_id, asset_tag, tenant, site, value, labels, ts, created_at)
+            VALUES {values}
+            ON CONFLICT DO NOTHING
+            """,
+            '(%s, %s, %s, %s, %s, %s, %s::jsonb, %s, %s)',
+            rows,
+            options['batch'],
+        )
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE _bench_reading_wide")
+        table_bytes, index_bytes = self._sizes([('_bench_reading_wide', True)])
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                SELECT COUNT(*) FROM pg_indexes
+                WHERE schemaname = current_schema() AND tablename = '_bench_reading_wide'
+            """)
+            indexes = cursor.fetchone()[0]
+        query_ms = self._query(WIDE_QUERY, series, start, options)
+        return {
+            'seconds': elapsed, 'table_bytes': table_bytes, 'index_bytes': index_bytes,
+            'indexes': indexes, 'query_ms': query_ms,
+        }
+
+    def _run_narrow(self, series, start, steps, options):
+        # Séries criadas antes (na ingestão real vêm do cache de series_id)
+        ids = []
+        with connection.cursor() as cursor:
+            for item in series:
+                cursor.execute(
+                    """
+                    INSERT INTO _bench_reading_series (device_id, sensor_id, asset_tag, tenant, site, labels)
+                    VALUES (%s, %s, %s, %s, %s, %s::jsonb)
+                    RETURNING id
+                    """,
+                    [item['device_id'], item['sensor_id'], item['asset_tag'], item['tenant'], item['site'], item['labels']]
+                )
+                ids.append(cursor.fetchone()[0])
+
+        rows = [
+            (ids[index], ts, value)
+            for index, _, ts, value in self._samples(series, start, steps, options['step'])
+        ]
+        elapsed = self._insert(
+            """
+            INSERT INTO _bench_reading_point (series_id, ts, value)
+            VALUES {values}
+            ON CONFLICT (series_id, ts) DO NOTHING
+            """,
+            '(%s, %s, %s)',
+            rows,
+            options['batch'],
+        )
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE _bench_reading_point")
+            cursor.execute("ANALYZE _bench_reading_series")
+        table_bytes, index_bytes = self._sizes([
+            ('_bench_reading_point', True),
+            ('_bench_reading_series', False),
+        ])
+        query_ms = self._query(NARROW_QUERY, series, start, options)
+        return {
+            'seconds': elapsed, 'table_bytes': table_bytes, 'index_bytes': index_bytes,
+            'indexes': 1, 'query_ms': query_ms,
+        }
+
+    def _report(self, total_rows, wide, narrow):
+        def line(label, before, after, fmt):
+            ratio = f'{before / after:.1f}x' if after else '-'
+            self.stdout.write(f"  {label:<24} {fmt(before):>14} {fmt(after):>14}   {ratio}")
+
+        self.stdout.write(f"  {'':<24} {'largo':>14} {'séries+pontos':>14}   antes/depois")
+        line('Bytes/linha (heap)', wide['table_bytes'] / total_rows, narrow['table_bytes'] / total_rows, lambda v: f'{v:.1f}')
+        line('Bytes/linha (índices)', wide['index_bytes'] / total_rows, narrow['index_bytes'] / total_rows, lambda v: f'{v:.1f}')
+        line('Índices (MiB)', wide['index_bytes'] / 1048576, narrow['index_bytes'] / 1048576, lambda v: f'{v:.1f}')
+        line('Total (MiB)', (wide['table_bytes'] + wide['index_bytes']) / 1048576,
+             (narrow['table_bytes'] + narrow['index_bytes']) / 1048576, lambda v: f'{v:.1f}')
+        self.stdout.write(f"  {'B-trees por INSERT':<24} {wide['indexes']:>14} {narrow['indexes']:>14}")
+        self.stdout.write(
+            f"  {'Inserção (linhas/s)':<24} {total_rows / wide['seconds']:>14.0f} "
+            f"{total_rows / narrow['seconds']:>14.0f}   {wide['seconds'] / narrow['seconds']:.1f}x mais rápido"
+        )
+        self.stdout.write(
+            f"  {'Consulta 5m/device (ms)':<24} {wide['query_ms']:>14.1f} {narrow['query_ms']:>14.1f}"
+        )
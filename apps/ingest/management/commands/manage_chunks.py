@@ -0,0 +1,70 @@
+"""
+Relatório e ajuste do chunk_time_interval das hypertables por tenant.
+
+Mostra, por tenant e hypertable: quantidade de chunks, tamanho total e
+médio, intervalo atual e recomendado (TIMESCALE_CHUNK_SIZING['TARGET_MB'])
+e o tempo de planejamento das consultas representativas.
+
+Uso:
+    python manage.py manage_chunks                       # Relatório de todos os tenants
+    python manage.py manage_chunks --tenant umc          # Apenas um tenant
+    python manage.py manage_chunks --apply               # Aplica os intervalos recomendados
+    python manage.py manage_chunks --target-mb 512 --no-planning
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django_tenants.utils import schema_context
+
+from apps.ingest.services import chunks
+from apps.tenants.models import Tenant
+
+
+def _mb(value):
+    return f"{value / 1024 / 1024:.1f} MB"
+
+
+class Command(BaseCommand):
+    help = 'Relata chunks por tenant e ajusta chunk_time_interval para o tamanho alvo'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tenant', type=str, help='Slug do tenant (default: todos)')
+        parser.add_argument('--target-mb', type=int, default=None, help='Tamanho alvo por chunk (MB)')
+        parser.add_argument('--apply', action='store_true', help='Aplica os intervalos recomendados')
+        parser.add_argument('--no-planning', action='store_true', help='Não mede tempo de planejamento')
+
+    def handle(self, *args, **options):
+        if options['target_mb']:
+            settings.TIMESCALE_CHUNK_SIZING = {
+                **getattr(settings, 'TIMESCALE_CHUNK_SIZING', {}),
+                'TARGET_MB': options['target_mb'],
+            }
+
+        tenants = Tenant.objects.exclude(slug='public')
+        if options['tenant']:
+            tenants = tenants.filter(slug=options['tenant'])
+
+        mode = 'APLICANDO' if options['apply'] else 'RELATÓRIO'
+        self.stdout.write(self.style.WARNING(f'\n📐 Chunks das hypertables ({mode})\n'))
+
+        for tenant in tenants:
+            self.stdout.write(self.style.MIGRATE_HEADING(f'  {tenant.slug}'))
+            with schema_context(tenant.schema_name):
+                stats = chunks.tune_chunk_intervals(apply=options['apply'])
+                for table in stats:
+                    recommended = table['recommended'] or '-'
+                    line = (
+                        f"    {table['hypertable']:<16} chunks={table['chunks']:<6} "
+                        f"total={_mb(table['total_bytes']):<12} médio={_mb(table['avg_chunk_bytes']):<12} "
+                        f"intervalo={table['interval']} → {recommended}"
+                    )
+                    if table['changed']:
+                        action = 'aplicado' if options['apply'] else 'sugerido'
+                        self.stdout.write(self.style.SUCCESS(f"{line}  ({action})"))
+                    else:
+                        self.stdout.write(line)
+
+                    if not options['no_planning']:
+                        for name, ms in chunks.planning_times(table['hypertable']).items():
+                            self.stdout.write(f"      planejamento {name:<24} {ms:.2f} ms")
+
+        self.stdout.write(self.style.SUCCESS('\n✅ Concluído\n'))
@@ -0,0 +1,63 @@
+"""
+Comando para verificar e corrigir divergências entre reading_latest e reading.
+
+Uso:
+    python manage.py repair_reading_latest                 # Todos os tenants
+    python manage.py repair_reading_latest --tenant umc    # Apenas um tenant
+    python manage.py repair_reading_latest --dry-run       # Apenas relatório
+    python manage.py repair_reading_latest --since-hours 6 # Apenas janela recente
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from django_tenants.utils import schema_context
+
+from apps.ingest.services.latest import repair_latest
+from apps.tenants.models import Tenant
+
+
+class Command(BaseCommand):
+    help = 'Verifica e corrige divergências entre reading_latest e a hypertable reading'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tenant', type=str, help='Slug do tenant (default: todos)')
+        parser.add_argument(
+            '--since-hours',
+            type=int,
+            default=None,
+            help='Considera apenas leituras das últimas N horas (default: histórico completo)'
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Apenas relata, sem corrigir')
+
+    def handle(self, *args, **options):
+        tenants = Tenant.objects.exclude(slug='public')
+        if options['tenant']:
+            tenants = tenants.filter(slug=options['tenant'])
+
+        since = None
+        if options['since_hours']:
+            since = timezone.now() - timedelta(hours=options['since_hours'])
+
+        mode = 'DRY-RUN' if options['dry_run'] else 'REPARO'
+        self.stdout.write(self.style.WARNING(f'\n🔍 Verificando reading_latest ({mode})\n'))
+
+        totals = {'missing': 0, 'stale': 0, 'orphans': 0, 'repaired': 0}
+
+        for tenant in tenants:
+            with schema_context(tenant.schema_name):
+                stats = repair_latest(since=since, dry_run=options['dry_run'])
+
+            for key in totals:
+                totals[key] += stats[key]
+
+            style = self.style.SUCCESS if not (stats['missing'] or stats['stale'] or stats['orphans']) else self.style.WARNING
+            self.stdout.write(style(
+                f"  {tenant.slug}: ausentes={stats['missing']}, desatualizados={stats['stale']}, "
+                f"órfãos={stats['orphans']}, corrigidos={stats['repaired']}"
+            ))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"\n✅ Total: ausentes={totals['missing']}, desatualizados={totals['stale']}, "
+            f"órfãos={totals['orphans']}, corrigidos={totals['repaired']}\n"
+        ))
@@ -0,0 +1,49 @@
+# Latest-value table maintained on ingest (newest timestamp wins)
+# Backfilled once from the reading hypertable.
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ingest', '0006_alter_reading_asset_tag_alter_reading_site_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReadingLatest',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('device_id', models.CharField(help_text='Device identifier (from MQTT client)', max_length=255)),
+                ('sensor_id', models.CharField(help_text='Sensor identifier (e.g., temp_001, humidity_002)', max_length=255)),
+                ('asset_tag', models.CharField(blank=True, db_index=True, help_text='Asset identifier extracted from MQTT topic (e.g., CHILLER-001)', max_length=255, null=True)),
+                ('value', models.FloatField(help_text='Latest numeric sensor reading value')),
+                ('labels', models.JSONField(blank=True, default=dict, help_text='Labels of the latest reading (unit, type, etc.)')),
+                ('ts', models.DateTimeField(help_text='Timestamp of the latest reading')),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now, help_text='When this row was last upserted')),
+            ],
+            options={
+                'verbose_name': 'Latest Reading',
+                'verbose_name_plural': 'Latest Readings',
+                'db_table': 'reading_latest',
+                'constraints': [
+                    models.UniqueConstraint(fields=('device_id', 'sensor_id'), name='unique_latest_per_sensor'),
+                ],
+            },
+        ),
+
+        # Backfill: última leitura de cada (device_id, sensor_id)
+        migrations.RunSQL(
+            sql="""
+                INSERT INTO reading_latest (device_id, sensor_id, asset_tag, value, labels, ts, updated_at)
+                SELECT DISTINCT ON (device_id, sensor_id)
+                       device_id, sensor_id, asset_tag, value, labels, ts, NOW()
+                FROM reading
+                ORDER BY device_id, sensor_id, ts DESC
+                ON CONFLICT (device_id, sensor_id) DO NOTHING;
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
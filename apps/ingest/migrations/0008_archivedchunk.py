@@ -0,0 +1,35 @@
+# Cold tier: metadata of reading chunks archived to Parquet (MinIO)
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ingest', '0007_reading_latest'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedChunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('chunk_name', models.CharField(help_text='TimescaleDB chunk (schema.table) that was archived', max_length=255)),
+                ('range_start', models.DateTimeField(db_index=True, help_text='Chunk time range start (inclusive)')),
+                ('range_end', models.DateTimeField(db_index=True, help_text='Chunk time range end (exclusive)')),
+                ('bucket', models.CharField(help_text='MinIO bucket', max_length=255)),
+                ('object_name', models.CharField(help_text='Parquet object path inside the bucket', max_length=500, unique=True)),
+                ('row_count', models.BigIntegerField(help_text='Rows written to the Parquet object')),
+                ('parquet_bytes', models.BigIntegerField(help_text='Size of the Parquet object')),
+                ('hot_bytes', models.BigIntegerField(blank=True, help_text='Size of the chunk in PostgreSQL (table + indexes) before drop', null=True)),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now, help_text='When the chunk was archived')),
+            ],
+            options={
+                'verbose_name': 'Archived Chunk',
+                'verbose_name_plural': 'Archived Chunks',
+                'db_table': 'reading_archived_chunk',
+                'ordering': ['range_start'],
+            },
+        ),
+    ]
@@ -0,0 +1,155 @@
+# Compact series-id schema for readings:
+#   reading_series  - one row per device/sensor/labels combination
+#   reading_point   - narrow hypertable (series_id, ts, value)
+#   reading         - compatibility VIEW with the original wide columns
+#
+# Existing rows are copied inside the migration. Very large tenants can
+# archive old chunks first (archive_reading_chunks) to shorten the copy.
+# Per-sample labels (original_value, state) are not part of the series
+# identity (apps.ingest.services.series.VOLATILE_LABELS).
+
+import django.db.models.functions.comparison
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ingest', '0008_archivedchunk'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReadingSeries',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('device_id', models.CharField(help_text='Device identifier (from MQTT client)', max_length=255)),
+                ('sensor_id', models.CharField(help_text='Sensor identifier (e.g., temp_001, humidity_002)', max_length=255)),
+                ('asset_tag', models.CharField(blank=True, db_index=True, help_text='Asset identifier extracted from MQTT topic (e.g., CHILLER-001)', max_length=255, null=True)),
+                ('tenant', models.CharField(blank=True, help_text='Tenant identifier extracted from MQTT topic (e.g., umc)', max_length=255, null=True)),
+                ('site', models.CharField(blank=True, help_text='Site identifier extracted from MQTT topic (e.g., UMC)', max_length=255, null=True)),
+                ('labels', models.JSONField(blank=True, default=dict, help_text='Sensor metadata (name, type, unit, value_type)')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, help_text='When the series was first seen')),
+            ],
+            options={
+                'verbose_name': 'Reading Series',
+                'verbose_name_plural': 'Reading Series',
+                'db_table': 'reading_series',
+                'constraints': [
+                    models.UniqueConstraint(
+                        models.F('device_id'),
+                        models.F('sensor_id'),
+                        django.db.models.functions.comparison.Coalesce('asset_tag', models.Value('')),
+                        django.db.models.functions.comparison.Coalesce('tenant', models.Value('')),
+                        django.db.models.functions.comparison.Coalesce('site', models.Value('')),
+                        models.F('labels'),
+                        name='unique_reading_series',
+                    ),
+                ],
+            },
+        ),
+
+        # Fato estreito: 4 + 8 + 8 bytes por linha; PK (series_id, ts) e,
+        # após a cópia, um índice em ts DESC
+        migrations.RunSQL(
+            sql="""
+                CREATE TABLE reading_point (
+                    series_id integer NOT NULL,
+                    ts timestamptz NOT NULL,
+                    value double precision NOT NULL,
+                    CONSTRAINT reading_point_pkey PRIMARY KEY (series_id, ts)
+                );
+                SELECT create_hypertable(
+                    'reading_point',
+                    'ts',
+                    chunk_time_interval => INTERVAL '1 day',
+                    create_default_indexes => FALSE
+                );
+            """,
+            reverse_sql="DROP TABLE IF EXISTS reading_point;",
+        ),
+
+        # Backfill: séries distintas e pontos da hypertable antiga
+        migrations.RunSQL(
+            sql="""
+                INSERT INTO reading_series (device_id, sensor_id, asset_tag, tenant, site, labels, created_at)
+                SELECT device_id, sensor_id, asset_tag, tenant, site,
+                       COALESCE(labels, '{}'::jsonb) - ARRAY['original_value', 'state'], MIN(ts)
+                FROM reading
+                GROUP BY device_id, sensor_id, asset_tag, tenant, site,
+                         COALESCE(labels, '{}'::jsonb) - ARRAY['original_value', 'state']
+                ON CONFLICT DO NOTHING;
+
+                INSERT INTO reading_point (series_id, ts, value)
+                SELECT s.id, r.ts, r.value
+                FROM reading r
+                JOIN reading_series s
+                  ON s.device_id = r.device_id
+                 AND s.sensor_id = r.sensor_id
+                 AND COALESCE(s.asset_tag, '') = COALESCE(r.asset_tag, '')
+                 AND COALESCE(s.tenant, '') = COALESCE(r.tenant, '')
+                 AND COALESCE(s.site, '') = COALESCE(r.site, '')
+                 AND s.labels = COALESCE(r.labels, '{}'::jsonb) - ARRAY['original_value', 'state']
+                ON CONFLICT DO NOTHING;
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+
+        # Listagem e paginação por keyset (ORDER BY ts DESC sem filtro de
+        # série) - o índice padrão da hypertable, criado depois da cópia
+        migrations.RunSQL(
+            sql="CREATE INDEX IF NOT EXISTS reading_point_ts_idx ON reading_point (ts DESC);",
+            reverse_sql="DROP INDEX IF EXISTS reading_point_ts_idx;",
+        ),
+
+        # A hypertable larga vira uma VIEW de compatibilidade
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(
+                    sql="""
+                        DROP TABLE reading;
+                        CREATE VIEW reading AS
+                        SELECT p.series_id,
+                               s.device_id,
+                               s.sensor_id,
+                               s.asset_tag,
+                               s.tenant,
+                               s.site,
+                               p.value,
+                               s.labels,
+                               p.ts,
+                               p.ts AS created_at
+                        FROM reading_point p
+                        JOIN reading_series s ON s.id = p.series_id;
+                    """,
+                    reverse_sql="-- Cannot restore the wide reading hypertable safely",
+                ),
+            ],
+            state_operations=[
+                migrations.DeleteModel(name='Reading'),
+                migrations.CreateModel(
+                    name='Reading',
+                    fields=[
+                        ('series_id', models.IntegerField(help_text='Series identifier (reading_series.id)', primary_key=True, serialize=False)),
+                        ('device_id', models.CharField(help_text='Device identifier (from MQTT client)', max_length=255)),
+                        ('sensor_id', models.CharField(help_text='Sensor identifier (e.g., temp_001, humidity_002)', max_length=255)),
+                        ('asset_tag', models.CharField(blank=True, help_text='Asset identifier extracted from MQTT topic (e.g., CHILLER-001)', max_length=255, null=True)),
+                        ('tenant', models.CharField(blank=True, help_text='Tenant identifier extracted from MQTT topic (e.g., umc)', max_length=255, null=True)),
+                        ('site', models.CharField(blank=True, help_text='Site identifier extracted from MQTT topic (e.g., UMC)', max_length=255, null=True)),
+                        ('value', models.FloatField(help_text='Numeric sensor reading value')),
+                        ('labels', models.JSONField(blank=True, default=dict, help_text='Optional metadata (location, unit, etc.)')),
+                        ('ts', models.DateTimeField(help_text='Measurement timestamp (used for TimescaleDB partitioning)')),
+                        ('created_at', models.DateTimeField(default=django.utils.timezone.now, help_text='Same as ts (kept for API compatibility)')),
+                    ],
+                    options={
+                        'verbose_name': 'Reading',
+                        'verbose_name_plural': 'Readings',
+                        'db_table': 'reading',
+                        'ordering': ['-ts'],
+                        'managed': False,
+                    },
+                ),
+            ],
+        ),
+    ]
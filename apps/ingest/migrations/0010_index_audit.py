@@ -0,0 +1,61 @@
+# Leaner index set driven by the actual query shapes
+#
+# telemetry (8 B-trees -> 2):
+#   keep  telemetry_timestamp_idx (hypertable default, timestamp DESC) - keyset list
+#   keep  (device_id, timestamp)                                       - list by device
+#   drop  device_id, device_id_like  - prefix of (device_id, timestamp)
+#   drop  topic, topic_like, (topic, timestamp) - topic filter is icontains
+#   drop  timestamp                  - duplicate of the hypertable default
+#   drop  telemetry_id_idx           - no lookups by id alone
+#
+# reading_point (2 B-trees):
+#   keep  reading_point_pkey (series_id, ts) - history of a series/device
+#   keep  reading_point_ts_idx (ts DESC)     - reading list, keyset seek and
+#         time-range scans without a series filter (BRIN cannot serve
+#         ORDER BY ts DESC LIMIT n nor the seek predicate)
+#   Plans checked in apps.ingest.tests.IndexCoverageTests.
+# reading_series: sensor_id (ops screens filter by sensor only).
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ingest', '0009_reading_series_point'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='telemetry',
+            name='telemetry_topic_5ba748_idx',
+        ),
+        migrations.AlterField(
+            model_name='telemetry',
+            name='device_id',
+            field=models.CharField(help_text='MQTT client ID (device identifier)', max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='telemetry',
+            name='timestamp',
+            field=models.DateTimeField(help_text='Timestamp from EMQX broker (when message was received)'),
+        ),
+        migrations.AlterField(
+            model_name='telemetry',
+            name='topic',
+            field=models.CharField(help_text='Full MQTT topic path (e.g., tenants/umc/devices/001/sensors/temp)', max_length=500),
+        ),
+        migrations.RunSQL(
+            sql="DROP INDEX IF EXISTS telemetry_id_idx;",
+            reverse_sql="CREATE INDEX IF NOT EXISTS telemetry_id_idx ON telemetry (id);",
+        ),
+        migrations.AddIndex(
+            model_name='readingseries',
+            index=models.Index(fields=['sensor_id'], name='reading_series_sensor_idx'),
+        ),
+        # Created in 0009; ensured here for databases migrated before it
+        migrations.RunSQL(
+            sql="CREATE INDEX IF NOT EXISTS reading_point_ts_idx ON reading_point (ts DESC);",
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
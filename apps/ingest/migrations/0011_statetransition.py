@@ -0,0 +1,40 @@
+# State-transition store for binary/enumerated sensors (one row per change)
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ingest', '0010_index_audit'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StateTransition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('device_id', models.CharField(help_text='Device identifier (from MQTT client)', max_length=255)),
+                ('sensor_id', models.CharField(help_text='Sensor identifier (e.g., door_001, compressor_run)', max_length=255)),
+                ('asset_tag', models.CharField(blank=True, help_text='Asset identifier extracted from MQTT topic (e.g., CHILLER-001)', max_length=255, null=True)),
+                ('state', models.CharField(help_text='State label (on/off for booleans, original string for enums)', max_length=255)),
+                ('value', models.FloatField(blank=True, help_text='Numeric value of the state (1/0 for booleans, NULL for enums)', null=True)),
+                ('started_at', models.DateTimeField(help_text='Timestamp of the first sample in this state')),
+                ('ended_at', models.DateTimeField(blank=True, help_text='Start of the next transition (NULL while current)', null=True)),
+                ('duration_seconds', models.FloatField(blank=True, help_text='ended_at - started_at, filled when the transition is closed', null=True)),
+            ],
+            options={
+                'verbose_name': 'State Transition',
+                'verbose_name_plural': 'State Transitions',
+                'db_table': 'reading_state',
+                'ordering': ['device_id', 'sensor_id', 'started_at'],
+                'indexes': [
+                    models.Index(fields=['asset_tag', 'sensor_id', 'started_at'], name='reading_state_asset_idx'),
+                    models.Index(condition=models.Q(('ended_at__isnull', True)), fields=['device_id', 'sensor_id'], name='reading_state_open_idx'),
+                ],
+                'constraints': [
+                    models.UniqueConstraint(fields=('device_id', 'sensor_id', 'started_at'), name='unique_state_transition'),
+                ],
+            },
+        ),
+    ]
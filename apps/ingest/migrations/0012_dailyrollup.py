@@ -0,0 +1,40 @@
+# Daily per-sensor rollups aligned to the site's local calendar
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ingest', '0011_statetransition'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('asset_tag', models.CharField(help_text='Asset identifier extracted from MQTT topic (e.g., CHILLER-001)', max_length=255)),
+                ('sensor_id', models.CharField(help_text='Sensor identifier', max_length=255)),
+                ('day', models.DateField(help_text='Local calendar day (site timezone)')),
+                ('timezone_name', models.CharField(help_text='IANA timezone used to align the day', max_length=64)),
+                ('avg_value', models.FloatField()),
+                ('min_value', models.FloatField()),
+                ('max_value', models.FloatField()),
+                ('first_value', models.FloatField()),
+                ('last_value', models.FloatField()),
+                ('count', models.IntegerField()),
+                ('computed_at', models.DateTimeField(default=django.utils.timezone.now, help_text='When the rollup was computed')),
+            ],
+            options={
+                'verbose_name': 'Daily Rollup',
+                'verbose_name_plural': 'Daily Rollups',
+                'db_table': 'reading_daily_rollup',
+                'ordering': ['asset_tag', 'day', 'sensor_id'],
+                'constraints': [
+                    models.UniqueConstraint(fields=('asset_tag', 'timezone_name', 'day', 'sensor_id'), name='unique_daily_rollup'),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,81 @@
+# Series catalog: per-series first/last timestamp, count, min/max and
+# interval estimate on reading_series, maintained by ingest.
+# Backfill covers points still in reading_point (archived chunks are not read).
+
+from django.db import migrations, models
+
+
+BACKFILL_SQL = """
+    UPDATE reading_series s
+    SET first_ts = c.first_ts,
+        last_ts = c.last_ts,
+        sample_count = c.sample_count,
+        value_sum = c.value_sum,
+        min_value = c.min_value,
+        max_value = c.max_value,
+        interval_seconds = CASE
+            WHEN c.sample_count > 1
+            THEN EXTRACT(EPOCH FROM (c.last_ts - c.first_ts)) / (c.sample_count - 1)
+        END
+    FROM (
+        SELECT series_id,
+               min(ts) AS first_ts,
+               max(ts) AS last_ts,
+               count(*) AS sample_count,
+               coalesce(sum(value), 0) AS value_sum,
+               min(value) AS min_value,
+               max(value) AS max_value
+        FROM reading_point
+        GROUP BY series_id
+    ) c
+    WHERE s.id = c.series_id;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ingest', '0012_dailyrollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='readingseries',
+            name='first_ts',
+            field=models.DateTimeField(blank=True, help_text='Oldest sample timestamp', null=True),
+        ),
+        migrations.AddField(
+            model_name='readingseries',
+            name='last_ts',
+            field=models.DateTimeField(blank=True, help_text='Newest sample timestamp', null=True),
+        ),
+        migrations.AddField(
+            model_name='readingseries',
+            name='sample_count',
+            field=models.BigIntegerField(default=0, help_text='Samples stored (lifetime)'),
+        ),
+        migrations.AddField(
+            model_name='readingseries',
+            name='value_sum',
+            field=models.FloatField(default=0, help_text='Sum of stored values (avg = value_sum / sample_count)'),
+        ),
+        migrations.AddField(
+            model_name='readingseries',
+            name='min_value',
+            field=models.FloatField(blank=True, help_text='Lowest value observed', null=True),
+        ),
+        migrations.AddField(
+            model_name='readingseries',
+            name='max_value',
+            field=models.FloatField(blank=True, help_text='Highest value observed', null=True),
+        ),
+        migrations.AddField(
+            model_name='readingseries',
+            name='interval_seconds',
+            field=models.FloatField(blank=True, help_text='Estimated sample interval (EWMA)', null=True),
+        ),
+        migrations.RunSQL(
+            sql=BACKFILL_SQL,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -1,4 +1,6 @@
 from django.db import models
+from django.db.models import Q, Value
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 
 
@@ -11,7 +13,11 @@ class Telemetry(models.Model):
     hypertable for efficient time-series queries.
     
     Note: Uses auto-incrementing BigAutoField as PK (not timestamp)
-    to avoid TimescaleDB constraint issues. Indexes include timestamp.
+    to avoid TimescaleDB constraint issues.
+    
+    Indexes (see migration 0010): the hypertable default (timestamp DESC)
+    for the keyset list and (device_id, timestamp) for per-device lists.
+    The topic filter is icontains, which a B-tree cannot serve.
     """
     
     # Auto-incrementing ID (standard Django)
@@ -20,14 +26,12 @@ class Telemetry(models.Model):
     # Device identification
     device_id = models.CharField(
         max_length=255,
-        db_index=True,
         help_text="MQTT client ID (device identifier)"
     )
     
     # MQTT topic where message was published
     topic = models.CharField(
         max_length=500,
-        db_index=True,
         help_text="Full MQTT topic path (e.g., tenants/umc/devices/001/sensors/temp)"
     )
     
@@ -38,7 +42,6 @@ class Telemetry(models.Model):
     
     # Timestamp from EMQX (Unix milliseconds) - used for TimescaleDB partitioning
     timestamp = models.DateTimeField(
-        db_index=True,
         help_text="Timestamp from EMQX broker (when message was received)"
     )
     
@@ -55,7 +58,6 @@ class Telemetry(models.Model):
         verbose_name_plural = 'Telemetry'
         indexes = [
             models.Index(fields=['device_id', 'timestamp']),
-            models.Index(fields=['topic', 'timestamp']),
         ]
         # Note: TimescaleDB hypertable will be created via migration RunSQL
     
@@ -63,38 +65,168 @@ class Telemetry(models.Model):
         return f"{self.device_id} - {self.topic} @ {self.timestamp}"
 
 
-class Reading(models.Model):
+class ReadingSeries(models.Model):
     """
-    Structured sensor readings for TimescaleDB Continuous Aggregates.
+    Series dimension for the reading_point hypertable.
     
-    This model stores normalized sensor readings with numeric values,
-    optimized for time-series aggregations (avg, min, max, percentiles).
-    Continuous Aggregates (1m/5m/1h) are created on this table.
+    One row per device/sensor/labels combination. The strings and the
+    labels blob that are identical for every sample of a sensor live here
+    once; reading_point stores only (series_id, ts, value).
     
-    Use this for numeric sensor data (temperature, humidity, etc.).
-    Use Telemetry for raw MQTT messages with complex payloads.
+    Series ids are resolved on ingest through a cache
+    (apps.ingest.services.series).
     
-    Note: No explicit primary key to avoid TimescaleDB constraint issues.
-    Django will create default 'id' field, indexes provide uniqueness.
+    The row doubles as the series catalog: first/last timestamp, sample
+    count, value sum, observed min/max and a sample interval estimate are
+    updated on every ingest batch, so "which series exist / since when"
+    lookups never scan reading_point. Counts are lifetime totals (archived
+    chunks included).
     """
     
-    # Device & Sensor identification
+    id = models.AutoField(primary_key=True)
+    
     device_id = models.CharField(
         max_length=255,
-        db_index=True,
         help_text="Device identifier (from MQTT client)"
     )
     
     sensor_id = models.CharField(
+        max_length=255,
+        help_text="Sensor identifier (e.g., temp_001, humidity_002)"
+    )
+    
+    asset_tag = models.CharField(
         max_length=255,
         db_index=True,
+        null=True,
+        blank=True,
+        help_text="Asset identifier extracted from MQTT topic (e.g., CHILLER-001)"
+    )
+    
+    tenant = models.CharField(
+        max_length=255,
+        null=True,
+        blank=True,
+        help_text="Tenant identifier extracted from MQTT topic (e.g., umc)"
+    )
+    
+    site = models.CharField(
+        max_length=255,
+        null=True,
+        blank=True,
+        help_text="Site identifier extracted from MQTT topic (e.g., UMC)"
+    )
+    
+    labels = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text="Sensor metadata (name, type, unit, value_type)"
+    )
+    
+    created_at = models.DateTimeField(
+        default=timezone.now,
+        help_text="When the series was first seen"
+    )
+    
+    # Catálogo (mantido pela ingestão)
+    first_ts = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="Oldest sample timestamp"
+    )
+    
+    last_ts = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="Newest sample timestamp"
+    )
+    
+    sample_count = models.BigIntegerField(
+        default=0,
+        help_text="Samples stored (lifetime)"
+    )
+    
+    value_sum = models.FloatField(
+        default=0,
+        help_text="Sum of stored values (avg = value_sum / sample_count)"
+    )
+    
+    min_value = models.FloatField(
+        null=True,
+        blank=True,
+        help_text="Lowest value observed"
+    )
+    
+    max_value = models.FloatField(
+        null=True,
+        blank=True,
+        help_text="Highest value observed"
+    )
+    
+    interval_seconds = models.FloatField(
+        null=True,
+        blank=True,
+        help_text="Estimated sample interval (EWMA)"
+    )
+    
+    class Meta:
+        db_table = 'reading_series'
+        verbose_name = 'Reading Series'
+        verbose_name_plural = 'Reading Series'
+        indexes = [
+            # Telas do Ops filtram apenas por sensor_id
+            models.Index(fields=['sensor_id'], name='reading_series_sensor_idx'),
+        ]
+        constraints = [
+            # Expressões COALESCE: NULL conta como valor na identidade da série
+            models.UniqueConstraint(
+                'device_id',
+                'sensor_id',
+                Coalesce('asset_tag', Value('')),
+                Coalesce('tenant', Value('')),
+                Coalesce('site', Value('')),
+                'labels',
+                name='unique_reading_series',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"#{self.id} {self.device_id}/{self.sensor_id}"
+
+
+class Reading(models.Model):
+    """
+    Structured sensor readings (read-only compatibility view).
+    
+    ``reading`` is a view joining the narrow reading_point hypertable
+    (series_id, ts, value) with reading_series, exposing the original
+    wide columns so ORM filters and ad-hoc SQL keep working. Writes go
+    through apps.ingest.services.series.insert_readings; instances are
+    still used in memory as value carriers on the ingest path.
+    
+    Note: series_id is declared as primary key only to satisfy the ORM;
+    it is NOT unique per row (a series has many points).
+    """
+    
+    series_id = models.IntegerField(
+        primary_key=True,
+        help_text="Series identifier (reading_series.id)"
+    )
+    
+    # Device & Sensor identification
+    device_id = models.CharField(
+        max_length=255,
+        help_text="Device identifier (from MQTT client)"
+    )
+    
+    sensor_id = models.CharField(
+        max_length=255,
         help_text="Sensor identifier (e.g., temp_001, humidity_002)"
     )
     
     # MQTT Topic Hierarchy (source of truth)
     asset_tag = models.CharField(
         max_length=255,
-        db_index=True,
         null=True,
         blank=True,
         help_text="Asset identifier extracted from MQTT topic (e.g., CHILLER-001)"
@@ -102,7 +234,6 @@ class Reading(models.Model):
     
     tenant = models.CharField(
         max_length=255,
-        db_index=True,
         null=True,
         blank=True,
         help_text="Tenant identifier extracted from MQTT topic (e.g., umc)"
@@ -110,7 +241,6 @@ class Reading(models.Model):
     
     site = models.CharField(
         max_length=255,
-        db_index=True,
         null=True,
         blank=True,
         help_text="Site identifier extracted from MQTT topic (e.g., UMC)"
@@ -121,46 +251,295 @@ class Reading(models.Model):
         help_text="Numeric sensor reading value"
     )
     
-    # Optional labels for filtering (JSON)
+    # Series labels (from reading_series)
     labels = models.JSONField(
         default=dict,
         blank=True,
         help_text="Optional metadata (location, unit, etc.)"
     )
     
-    # Timestamp (partition column for hypertable)
+    # Timestamp (partition column of reading_point)
     ts = models.DateTimeField(
-        db_index=True,
         help_text="Measurement timestamp (used for TimescaleDB partitioning)"
     )
     
-    # Internal timestamp
+    # Exposed as ts by the view (reading_point has no insert timestamp)
     created_at = models.DateTimeField(
         default=timezone.now,
-        help_text="When record was inserted into database"
+        help_text="Same as ts (kept for API compatibility)"
     )
     
     class Meta:
+        managed = False
         db_table = 'reading'
         ordering = ['-ts']
         verbose_name = 'Reading'
         verbose_name_plural = 'Readings'
+    
+    def __str__(self):
+        return f"{self.sensor_id} = {self.value} @ {self.ts}"
+
+
+class ReadingLatest(models.Model):
+    """
+    Latest reading per (device_id, sensor_id).
+    
+    Maintained by the ingest write path with an upsert where the newest
+    timestamp wins (see apps.ingest.services.latest). "Current state"
+    readers (latest endpoint, device summary, asset cards, rule
+    evaluation) read from here instead of scanning the reading hypertable.
+    
+    Use `python manage.py repair_reading_latest` to fix drift against `reading`.
+    """
+    
+    device_id = models.CharField(
+        max_length=255,
+        help_text="Device identifier (from MQTT client)"
+    )
+    
+    sensor_id = models.CharField(
+        max_length=255,
+        help_text="Sensor identifier (e.g., temp_001, humidity_002)"
+    )
+    
+    asset_tag = models.CharField(
+        max_length=255,
+        db_index=True,
+        null=True,
+        blank=True,
+        help_text="Asset identifier extracted from MQTT topic (e.g., CHILLER-001)"
+    )
+    
+    value = models.FloatField(
+        help_text="Latest numeric sensor reading value"
+    )
+    
+    labels = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text="Labels of the latest reading (unit, type, etc.)"
+    )
+    
+    ts = models.DateTimeField(
+        help_text="Timestamp of the latest reading"
+    )
+    
+    updated_at = models.DateTimeField(
+        default=timezone.now,
+        help_text="When this row was last upserted"
+    )
+    
+    class Meta:
+        db_table = 'reading_latest'
+        verbose_name = 'Latest Reading'
+        verbose_name_plural = 'Latest Readings'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['device_id', 'sensor_id'],
+                name='unique_latest_per_sensor'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.device_id}/{self.sensor_id} = {self.value} @ {self.ts}"
+
+
+class ArchivedChunk(models.Model):
+    """
+    Reading hypertable chunk exported to Parquet (cold tier, MinIO).
+    
+    Written by apps.ingest.services.archive before the chunk is dropped.
+    The read path uses these rows to find which Parquet objects cover a
+    time range and merges them with the hot data still in PostgreSQL.
+    """
+    
+    chunk_name = models.CharField(
+        max_length=255,
+        help_text="TimescaleDB chunk (schema.table) that was archived"
+    )
+    
+    range_start = models.DateTimeField(
+        db_index=True,
+        help_text="Chunk time range start (inclusive)"
+    )
+    
+    range_end = models.DateTimeField(
+        db_index=True,
+        help_text="Chunk time range end (exclusive)"
+    )
+    
+    bucket = models.CharField(
+        max_length=255,
+        help_text="MinIO bucket"
+    )
+    
+    object_name = models.CharField(
+        max_length=500,
+        unique=True,
+        help_text="Parquet object path inside the bucket"
+    )
+    
+    row_count = models.BigIntegerField(
+        help_text="Rows written to the Parquet object"
+    )
+    
+    parquet_bytes = models.BigIntegerField(
+        help_text="Size of the Parquet object"
+    )
+    
+    hot_bytes = models.BigIntegerField(
+        null=True,
+        blank=True,
+        help_text="Size of the chunk in PostgreSQL (table + indexes) before drop"
+    )
+    
+    archived_at = models.DateTimeField(
+        default=timezone.now,
+        help_text="When the chunk was archived"
+    )
+    
+    class Meta:
+        db_table = 'reading_archived_chunk'
+        ordering = ['range_start']
+        verbose_name = 'Archived Chunk'
+        verbose_name_plural = 'Archived Chunks'
+    
+    def __str__(self):
+        return f"{self.chunk_name} [{self.range_start} → {self.range_end}) → {self.object_name}"
+
+
+class StateTransition(models.Model):
+    """
+    State changes of binary/enumerated sensors (door contacts, run signals).
+    
+    Readings whose labels.value_type is boolean or string are not stored
+    sample by sample in reading_point: a row is written only when the
+    state changes. The previous row is closed with ended_at/duration
+    when the next transition arrives; the open row (ended_at NULL) is the
+    current state. Written and queried by apps.ingest.services.states.
+    """
+    
+    device_id = models.CharField(
+        max_length=255,
+        help_text="Device identifier (from MQTT client)"
+    )
+    
+    sensor_id = models.CharField(
+        max_length=255,
+        help_text="Sensor identifier (e.g., door_001, compressor_run)"
+    )
+    
+    asset_tag = models.CharField(
+        max_length=255,
+        null=True,
+        blank=True,
+        help_text="Asset identifier extracted from MQTT topic (e.g., CHILLER-001)"
+    )
+    
+    state = models.CharField(
+        max_length=255,
+        help_text="State label (on/off for booleans, original string for enums)"
+    )
+    
+    value = models.FloatField(
+        null=True,
+        blank=True,
+        help_text="Numeric value of the state (1/0 for booleans, NULL for enums)"
+    )
+    
+    started_at = models.DateTimeField(
+        help_text="Timestamp of the first sample in this state"
+    )
+    
+    ended_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="Start of the next transition (NULL while current)"
+    )
+    
+    duration_seconds = models.FloatField(
+        null=True,
+        blank=True,
+        help_text="ended_at - started_at, filled when the transition is closed"
+    )
+    
+    class Meta:
+        db_table = 'reading_state'
+        ordering = ['device_id', 'sensor_id', 'started_at']
+        verbose_name = 'State Transition'
+        verbose_name_plural = 'State Transitions'
         indexes = [
-            models.Index(fields=['device_id', 'sensor_id', 'ts']),
-            models.Index(fields=['sensor_id', 'ts']),
-            models.Index(fields=['id']),  # For queries by ID
-            # MQTT Hierarchy indexes for efficient asset-based queries
-            models.Index(fields=['asset_tag', 'ts'], name='reading_asset_ts_idx'),
-            models.Index(fields=['tenant', 'asset_tag', 'ts'], name='reading_tenant_asset_ts_idx'),
-            models.Index(fields=['site', 'asset_tag', 'ts'], name='reading_site_asset_ts_idx'),
+            models.Index(fields=['asset_tag', 'sensor_id', 'started_at'], name='reading_state_asset_idx'),
+            # Estado atual por série (apenas linhas abertas)
+            models.Index(
+                fields=['device_id', 'sensor_id'],
+                condition=Q(ended_at__isnull=True),
+                name='reading_state_open_idx',
+            ),
         ]
         constraints = [
             models.UniqueConstraint(
-                fields=['device_id', 'sensor_id', 'ts'],
-                name='unique_reading_per_sensor_timestamp'
+                fields=['device_id', 'sensor_id', 'started_at'],
+                name='unique_state_transition',
             ),
         ]
-        # Note: TimescaleDB hypertable + Continuous Aggregates via migration
     
     def __str__(self):
-        return f"{self.sensor_id} = {self.value} @ {self.ts}"
+        return f"{self.device_id}/{self.sensor_id} = {self.state} @ {self.started_at}"
+
+
+class DailyRollup(models.Model):
+    """
+    Per-sensor aggregate of one local calendar day of an asset.
+    
+    Days are aligned to the site's timezone (Site.timezone). Only closed
+    days are stored; weeks and months are combined from these rows and
+    the open day is computed live (apps.ingest.services.calendar).
+    Rows are deleted when late readings reach an already rolled-up day.
+    """
+    
+    asset_tag = models.CharField(
+        max_length=255,
+        help_text="Asset identifier extracted from MQTT topic (e.g., CHILLER-001)"
+    )
+    
+    sensor_id = models.CharField(
+        max_length=255,
+        help_text="Sensor identifier"
+    )
+    
+    day = models.DateField(
+        help_text="Local calendar day (site timezone)"
+    )
+    
+    timezone_name = models.CharField(
+        max_length=64,
+        help_text="IANA timezone used to align the day"
+    )
+    
+    avg_value = models.FloatField()
+    min_value = models.FloatField()
+    max_value = models.FloatField()
+    first_value = models.FloatField()
+    last_value = models.FloatField()
+    count = models.IntegerField()
+    
+    computed_at = models.DateTimeField(
+        default=timezone.now,
+        help_text="When the rollup was computed"
+    )
+    
+    class Meta:
+        db_table = 'reading_daily_rollup'
+        ordering = ['asset_tag', 'day', 'sensor_id']
+        verbose_name = 'Daily Rollup'
+        verbose_name_plural = 'Daily Rollups'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['asset_tag', 'timezone_name', 'day', 'sensor_id'],
+                name='unique_daily_rollup',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.asset_tag}/{self.sensor_id} {self.day} ({self.timezone_name})"
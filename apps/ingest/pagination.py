@@ -0,0 +1,14 @@
+"""
+Keyset pagination classes for the Telemetry API.
+"""
+from apps.common.pagination import KeysetPagination
+
+
+class TelemetryKeysetPagination(KeysetPagination):
+    """Keyset on (timestamp, id) - newest first."""
+    ordering = ('-timestamp', '-id')
+
+
+class ReadingKeysetPagination(KeysetPagination):
+    """Keyset on (ts, series_id) - unique per reading_point primary key."""
+    ordering = ('-ts', '-series_id')
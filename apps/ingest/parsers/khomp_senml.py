@@ -459,6 +459,13 @@ class KhompSenMLParser(PayloadParser):
         if value_type != 'numeric':
             reading['labels']['original_value'] = str(value)
         
+        # 🔀 Binários/enumerados: a ingestão grava apenas mudanças de estado
+        # (reading_state) em vez de uma linha por amostra
+        if value_type == 'boolean':
+            reading['labels']['state'] = 'on' if value else 'off'
+        elif value_type == 'string':
+            reading['labels']['state'] = str(value)
+        
         return reading
     
     def _is_mac_address(self, value: str) -> bool:
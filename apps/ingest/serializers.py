@@ -22,12 +22,22 @@ class TelemetrySerializer(serializers.ModelSerializer):
 
 
 class ReadingSerializer(serializers.ModelSerializer):
-    """Serializer for structured Reading (numeric sensor data)."""
+    """
+    Serializer for structured Reading (numeric sensor data).
+    
+    Readings live in reading_point keyed by (series_id, ts) and have no
+    row id: ``id`` is synthesized as "<series_id>-<ts in µs since epoch>",
+    unique and stable for a point. Rows without a series (reading_latest)
+    keep their own id.
+    """
+    
+    id = serializers.SerializerMethodField()
     
     class Meta:
         model = Reading
         fields = [
             'id',
+            'series_id',
             'device_id',
             'sensor_id',
             'value',
@@ -35,7 +45,14 @@ class ReadingSerializer(serializers.ModelSerializer):
             'ts',
             'created_at'
         ]
-        read_only_fields = ['id', 'created_at']
+        read_only_fields = ['id', 'series_id', 'created_at']
+    
+    def get_id(self, obj):
+        get = obj.get if isinstance(obj, dict) else lambda name: getattr(obj, name, None)
+        series_id, ts = get('series_id'), get('ts')
+        if series_id is None or ts is None:
+            return get('id')
+        return f"{series_id}-{int(ts.timestamp() * 1_000_000)}"
 
 
 class TimeSeriesPointSerializer(serializers.Serializer):
@@ -74,3 +91,76 @@ class TimeSeriesPointSerializer(serializers.Serializer):
         help_text="Number of readings in bucket",
         allow_null=True
     )
+
+
+class HistorySelectorSerializer(serializers.Serializer):
+    """
+    One selector of a batch history request.
+    Exactly one of device_id / asset_tag must be provided.
+    """
+    device_id = serializers.CharField(
+        max_length=255,
+        required=False,
+        help_text="Device identifier (MQTT client ID)"
+    )
+    asset_tag = serializers.CharField(
+        max_length=255,
+        required=False,
+        help_text="Asset tag from MQTT topic hierarchy"
+    )
+    sensor_ids = serializers.ListField(
+        child=serializers.CharField(max_length=255),
+        required=False,
+        default=list,
+        help_text="Sensors to include (empty = all sensors)"
+    )
+    
+    def validate(self, attrs):
+        if bool(attrs.get('device_id')) == bool(attrs.get('asset_tag')):
+            raise serializers.ValidationError(
+                "Provide exactly one of 'device_id' or 'asset_tag'."
+            )
+        return attrs
+
+
+class BatchHistoryRequestSerializer(serializers.Serializer):
+    """Batch history request: many selectors sharing one time range and interval."""
+    
+    MAX_SELECTORS = 100
+    
+    selectors = HistorySelectorSerializer(many=True)
+    # 'from' é palavra reservada em Python: declarado em get_fields()
+    to = serializers.DateTimeField(required=False, help_text="End time (default: now)")
+    interval = serializers.ChoiceField(
+        choices=['auto', 'raw', '1m', '5m', '15m', '1h'],
+        default='auto',
+        help_text="Aggregation interval shared by all selectors"
+    )
+    limit = serializers.IntegerField(
+        required=False,
+        min_value=1,
+        help_text="Max rows per selector"
+    )
+    
+    def get_fields(self):
+        fields = super().get_fields()
+        fields['from'] = serializers.DateTimeField(
+            required=False,
+            help_text="Start time (default: 24h before 'to')"
+        )
+        return fields
+    
+    def validate_selectors(self, value):
+        if not value:
+            raise serializers.ValidationError("At least one selector is required.")
+        if len(value) > self.MAX_SELECTORS:
+            raise serializers.ValidationError(
+                f"Maximum {self.MAX_SELECTORS} selectors per request."
+            )
+        return value
+    
+    def validate(self, attrs):
+        ts_from, ts_to = attrs.get('from'), attrs.get('to')
+        if ts_from and ts_to and ts_from >= ts_to:
+            raise serializers.ValidationError("Invalid time range: from must be before to.")
+        return attrs
@@ -0,0 +1,3 @@
+"""
+Services for telemetry ingestion and time-series queries.
+"""
@@ -0,0 +1,548 @@
+"""
+Camada fria das leituras (hypertable reading_point): chunks antigos em Parquet no MinIO.
+
+Arquivamento (``archive_chunks``): para cada chunk cujo range termina antes
+do horizonte do tenant (``Tenant.archive_after_days``), exporta as linhas
+para um arquivo Parquet particionado por ano/mês, envia ao MinIO, registra
+em ArchivedChunk e só então remove o chunk com ``drop_chunks``.
+
+Leitura (``read_archived`` / ``query_archived_buckets``): localiza os objetos
+que cobrem o intervalo via ArchivedChunk, lê apenas o rodapé do Parquet e
+os column chunks necessários (requisições HTTP Range), descartando row
+groups pelas estatísticas min/max. O resultado é combinado com os dados
+quentes que ainda estão no banco (ver ``merge_buckets``).
+
+Layout dos arquivos:
+    {bucket}/{schema}/reading/year=YYYY/month=MM/{chunk}_{início}_{fim}.parquet
+Linhas ordenadas por asset_tag, device_id, sensor_id, ts - assim as
+estatísticas de cada row group são estreitas para asset_tag/device_id.
+"""
+import io
+import json
+import logging
+import os
+import tempfile
+from collections import OrderedDict
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+
+from apps.common.storage import ensure_bucket_exists, get_minio_client
+
+from .history_cache import BUCKET_SECONDS, SCOPE_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+# Linhas por row group (unidade de leitura/pruning)
+ROW_GROUP_SIZE = 65536
+
+# Linhas buscadas do cursor server-side por vez durante a exportação
+FETCH_SIZE = 10000
+
+# Cache do horizonte arquivado (maior range_end) por schema
+HORIZON_CACHE_TIMEOUT = 300
+
+CHUNKS_SQL = """
+    SELECT chunk_schema, chunk_name, range_start, range_end
+    FROM timescaledb_information.chunks
+    WHERE hypertable_schema = current_schema()
+      AND hypertable_name = 'reading_point'
+      AND range_end <= %s
+    ORDER BY range_start
+"""
+
+EXPORT_SQL = """
+    SELECT p.ts, s.device_id, s.sensor_id, s.asset_tag, p.value, s.labels
+    FROM reading_point p
+    JOIN reading_series s ON s.id = p.series_id
+    WHERE p.ts >= %s AND p.ts < %s
+    ORDER BY s.asset_tag, s.device_id, s.sensor_id, p.ts
+"""
+
+
+def _schema_name():
+    return getattr(connection, 'schema_name', 'public')
+
+
+def _horizon_cache_key(schema):
+    return f"telemetry:archive_horizon:{schema}"
+
+
+def get_archive_bucket():
+    return getattr(settings, 'MINIO_ARCHIVE_BUCKET', 'telemetry-archive')
+
+
+def _arrow_schema():
+    import pyarrow as pa
+
+    return pa.schema([
+        ('ts', pa.timestamp('us', tz='UTC')),
+        ('device_id', pa.string()),
+        ('sensor_id', pa.string()),
+        ('asset_tag', pa.string()),
+        ('value', pa.float64()),
+        ('labels', pa.string()),
+    ])
+
+
+def _to_micros(ts):
+    return int(ts.timestamp() * 1_000_000)
+
+
+def _from_micros(micros):
+    return datetime.fromtimestamp(micros / 1_000_000, tz=dt_timezone.utc)
+
+
+def object_name_for(schema, chunk_name, range_start, range_end):
+    """Caminho do objeto Parquet (particionado por ano/mês do início do chunk)."""
+    return (
+        f"{schema}/reading/year={range_start:%Y}/month={range_start:%m}/"
+        f"{chunk_name}_{range_start:%Y%m%dT%H%M%S}_{range_end:%Y%m%dT%H%M%S}.parquet"
+    )
+
+
+# =============================================================================
+# Arquivamento
+# =============================================================================
+
+def list_archivable_chunks(horizon):
+    """Chunks de reading_point no schema atual que terminam antes de ``horizon``."""
+    with connection.cursor() as cursor:
+        cursor.execute(CHUNKS_SQL, [horizon])
+        columns = [col[0] for col in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def _export_chunk(range_start, range_end, path):
+    """
+    Exporta as linhas do range para ``path`` em Parquet (zstd).
+
+    Returns:
+        Número de linhas escritas
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = _arrow_schema()
+    rows_written = 0
+    buffer = []
+
+    def flush(writer):
+        columns = list(zip(*buffer))
+        table = pa.Table.from_arrays(
+            [
+                pa.array(columns[0], type=schema.field('ts').type),
+                pa.array(columns[1], type=pa.string()),
+                pa.array(columns[2], type=pa.string()),
+                pa.array(columns[3], type=pa.string()),
+                pa.array(columns[4], type=pa.float64()),
+                pa.array(columns[5], type=pa.string()),
+            ],
+            schema=schema,
+        )
+        writer.write_table(table, row_group_size=ROW_GROUP_SIZE)
+        buffer.clear()
+
+    with pq.ParquetWriter(path, schema, compression='zstd', write_statistics=True) as writer:
+        # Cursor server-side: o chunk inteiro nunca fica em memória
+        with transaction.atomic(), connection.chunked_cursor() as cursor:
+            cursor.execute(EXPORT_SQL, [range_start, range_end])
+            while True:
+                rows = cursor.fetchmany(FETCH_SIZE)
+                if not rows:
+                    break
+                for ts, device_id, sensor_id, asset_tag, value, labels in rows:
+                    if labels is not None and not isinstance(labels, str):
+                        labels = json.dumps(labels)
+                    buffer.append((ts, device_id, sensor_id, asset_tag, value, labels))
+                rows_written += len(rows)
+                if len(buffer) >= ROW_GROUP_SIZE:
+                    flush(writer)
+        if buffer:
+            flush(writer)
+
+    return rows_written
+
+
+def archive_chunk(chunk, bucket=None):
+    """
+    Arquiva um chunk: exporta, envia ao MinIO, confere e remove do banco.
+
+    O drop acontece na mesma transação que registra o ArchivedChunk, com o
+    chunk bloqueado para escrita e a contagem conferida novamente - se
+    chegaram leituras atrasadas durante a exportação, nada é removido.
+
+    Returns:
+        ArchivedChunk criado
+    """
+    from apps.ingest.models import ArchivedChunk
+
+    bucket = bucket or get_archive_bucket()
+    schema = _schema_name()
+    chunk_table = f'"{chunk["chunk_schema"]}"."{chunk["chunk_name"]}"'
+    range_start, range_end = chunk['range_start'], chunk['range_end']
+    object_name = object_name_for(schema, chunk['chunk_name'], range_start, range_end)
+
+    fd, path = tempfile.mkstemp(suffix='.parquet')
+    os.close(fd)
+    client = get_minio_client()
+    uploaded = False
+    try:
+        row_count = _export_chunk(range_start, range_end, path)
+        parquet_bytes = os.path.getsize(path)
+
+        client.fput_object(bucket, object_name, path, content_type='application/vnd.apache.parquet')
+        uploaded = True
+        if client.stat_object(bucket, object_name).size != parquet_bytes:
+            raise RuntimeError(f"Uploaded object size mismatch for {object_name}")
+
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute(f"LOCK TABLE {chunk_table} IN EXCLUSIVE MODE")
+                cursor.execute(f"SELECT COUNT(*) FROM {chunk_table}")
+                current_rows = cursor.fetchone()[0]
+                if current_rows != row_count:
+                    raise RuntimeError(
+                        f"Chunk {chunk['chunk_name']} changed during export "
+                        f"({row_count} exported, {current_rows} now)"
+                    )
+                cursor.execute("SELECT pg_total_relation_size(%s::regclass)", [chunk_table])
+                hot_bytes = cursor.fetchone()[0]
+
+                archived = ArchivedChunk.objects.create(
+                    chunk_name=f"{chunk['chunk_schema']}.{chunk['chunk_name']}",
+                    range_start=range_start,
+                    range_end=range_end,
+                    bucket=bucket,
+                    object_name=object_name,
+                    row_count=row_count,
+                    parquet_bytes=parquet_bytes,
+                    hot_bytes=hot_bytes,
+                )
+                cursor.execute(
+                    "SELECT drop_chunks('reading_point', older_than => %s, newer_than => %s)",
+                    [range_end, range_start]
+                )
+    except Exception:
+        if uploaded:
+            try:
+                client.remove_object(bucket, object_name)
+            except Exception as e:
+                logger.warning(f"⚠️ Could not remove orphan archive object {object_name}: {e}")
+        raise
+    finally:
+        os.remove(path)
+
+    cache.delete(_horizon_cache_key(schema))
+    logger.info(
+        f"🗄️ Archived {archived.chunk_name}: {row_count} rows, "
+        f"{hot_bytes} → {parquet_bytes} bytes ({object_name})"
+    )
+    return archived
+
+
+def archive_chunks(horizon, dry_run=False, max_chunks=None):
+    """
+    Arquiva (em ordem cronológica) os chunks do schema atual anteriores a
+    ``horizon``. Para no primeiro erro para manter a faixa arquivada contígua.
+
+    Returns:
+        dict com candidates, archived, rows, hot_bytes, parquet_bytes, errors
+    """
+    stats = {
+        'candidates': 0,
+        'archived': 0,
+        'rows': 0,
+        'hot_bytes': 0,
+        'parquet_bytes': 0,
+        'errors': [],
+    }
+
+    chunks = list_archivable_chunks(horizon)
+    if max_chunks:
+        chunks = chunks[:max_chunks]
+    stats['candidates'] = len(chunks)
+
+    if dry_run or not chunks:
+        return stats
+
+    bucket = ensure_bucket_exists(get_archive_bucket())
+    for chunk in chunks:
+        try:
+            archived = archive_chunk(chunk, bucket=bucket)
+        except Exception as e:
+            logger.error(f"❌ Failed to archive chunk {chunk['chunk_name']}: {e}", exc_info=True)
+            stats['errors'].append({'chunk': chunk['chunk_name'], 'error': str(e)})
+            break
+        stats['archived'] += 1
+        stats['rows'] += archived.row_count
+        stats['hot_bytes'] += archived.hot_bytes or 0
+        stats['parquet_bytes'] += archived.parquet_bytes
+
+    return stats
+
+
+# =============================================================================
+# Leitura
+# =============================================================================
+
+class MinioRangeFile(io.RawIOBase):
+    """
+    Arquivo somente-leitura sobre um objeto do MinIO usando HTTP Range.
+
+    O leitor Parquet faz seek/read apenas no rodapé e nos column chunks
+    dos row groups selecionados; o objeto nunca é baixado por inteiro.
+    """
+
+    def __init__(self, client, bucket, object_name, size):
+        super().__init__()
+        self.client = client
+        self.bucket = bucket
+        self.object_name = object_name
+        self.size = size
+        self.position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            self.position = offset
+        elif whence == io.SEEK_CUR:
+            self.position += offset
+        elif whence == io.SEEK_END:
+            self.position = self.size + offset
+        return self.position
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self.size - self.position
+        size = min(size, self.size - self.position)
+        if size <= 0:
+            return b''
+        response = self.client.get_object(self.bucket, self.object_name, offset=self.position, length=size)
+        try:
+            data = response.read()
+        finally:
+            response.close()
+            response.release_conn()
+        self.position += len(data)
+        return data
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+def get_archive_horizon():
+    """
+    Maior range_end arquivado no schema atual (ou None).
+
+    Consultas que começam depois do horizonte não tocam a camada fria.
+    """
+    from apps.ingest.models import ArchivedChunk
+    from django.db.models import Max
+
+    key = _horizon_cache_key(_schema_name())
+    horizon = cache.get(key)
+    if horizon is None:
+        horizon = ArchivedChunk.objects.aggregate(horizon=Max('range_end'))['horizon'] or ''
+        cache.set(key, horizon, timeout=HORIZON_CACHE_TIMEOUT)
+    return horizon or None
+
+
+def _stats_overlap(statistics, low, high):
+    """True se [min, max] do row group pode conter valores em [low, high]."""
+    if statistics is None or not statistics.has_min_max:
+        return True
+    return not (statistics.max_raw < low or statistics.min_raw > high)
+
+
+def _as_stat_value(value):
+    return value.encode() if isinstance(value, str) else value
+
+
+def _select_row_groups(metadata, scope_column, keys, ts_low, ts_high):
+    """Índices dos row groups cujas estatísticas podem conter keys/ts."""
+    names = [metadata.schema.column(i).name for i in range(metadata.num_columns)]
+    key_index = names.index(scope_column)
+    ts_index = names.index('ts')
+    encoded_keys = [_as_stat_value(key) for key in keys]
+
+    selected = []
+    for i in range(metadata.num_row_groups):
+        row_group = metadata.row_group(i)
+        if not _stats_overlap(row_group.column(ts_index).statistics, ts_low, ts_high):
+            continue
+        key_stats = row_group.column(key_index).statistics
+        if key_stats is not None and key_stats.has_min_max:
+            if not any(key_stats.min_raw <= key <= key_stats.max_raw for key in encoded_keys):
+                continue
+        selected.append(i)
+    return selected
+
+
+def read_archived(scope, keys, ts_from, ts_to, sensor_ids=None, end_inclusive=True):
+    """
+    Lê da camada fria as leituras de ``scope`` (device/asset) entre ts_from e ts_to.
+
+    Args:
+        scope: 'device' ou 'asset'
+        keys: device_id/asset_tag (str ou lista)
+        sensor_ids: filtra sensores (opcional)
+        end_inclusive: ts <= ts_to (True) ou ts < ts_to
+
+    Returns:
+        pyarrow.Table com colunas ts, sensor_id, value (ou None se nada arquivado)
+    """
+    from apps.ingest.models import ArchivedChunk
+
+    horizon = get_archive_horizon()
+    if horizon is None or ts_from >= horizon:
+        return None
+
+    chunks = list(ArchivedChunk.objects.filter(range_start__lte=ts_to, range_end__gt=ts_from))
+    if not chunks:
+        return None
+
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+
+    if isinstance(keys, str):
+        keys = [keys]
+    column = SCOPE_COLUMNS[scope]
+    ts_low = _to_micros(ts_from)
+    ts_high = _to_micros(ts_to)
+    client = get_minio_client()
+
+    tables = []
+    for chunk in chunks:
+        source = MinioRangeFile(client, chunk.bucket, chunk.object_name, chunk.parquet_bytes)
+        parquet_file = pq.ParquetFile(source)
+        row_groups = _select_row_groups(parquet_file.metadata, column, keys, ts_low, ts_high)
+        if not row_groups:
+            continue
+
+        table = parquet_file.read_row_groups(row_groups, columns=['ts', column, 'sensor_id', 'value'])
+        ts_column = table['ts']
+        mask = pc.and_(
+            pc.is_in(table[column], value_set=pa.array(keys, type=pa.string())),
+            pc.and_(
+                pc.greater_equal(ts_column, pa.scalar(ts_from, type=ts_column.type)),
+                (pc.less_equal if end_inclusive else pc.less)(ts_column, pa.scalar(ts_to, type=ts_column.type)),
+            ),
+        )
+        if sensor_ids:
+            mask = pc.and_(mask, pc.is_in(table['sensor_id'], value_set=pa.array(list(sensor_ids), type=pa.string())))
+        table = table.filter(mask).select(['ts', 'sensor_id', 'value'])
+        if table.num_rows:
+            tables.append(table)
+
+    if not tables:
+        return None
+    return pa.concat_tables(tables)
+
+
+def read_archived_rows(scope, key, ts_from, ts_to, sensor_ids=None):
+    """
+    Leituras brutas arquivadas como dicts {ts, sensor_id, value}, ordenadas
+    por ts, sensor_id (mesmo formato do caminho raw das views de histórico).
+    """
+    table = read_archived(scope, key, ts_from, ts_to, sensor_ids)
+    if table is None:
+        return []
+    table = table.sort_by([('ts', 'ascending'), ('sensor_id', 'ascending')])
+    return table.to_pylist()
+
+
+def query_archived_buckets(scope, key, interval, start, end, sensor_ids=None, end_inclusive=False):
+    """
+    Agregação por bucket sobre a camada fria, no formato de
+    ``history_cache.query_buckets``:
+    (bucket, sensor_id, avg, min, max, last, count, last_ts).
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    table = read_archived(scope, key, start, end, sensor_ids, end_inclusive=end_inclusive)
+    if table is None:
+        return []
+
+    width = BUCKET_SECONDS[interval] * 1_000_000
+    micros = pc.cast(table['ts'], pa.int64())
+    # Divisão inteira: mesmo alinhamento de floor_bucket/time_bucket
+    buckets = pc.multiply(pc.divide(micros, width), width)
+    table = table.append_column('bucket', buckets).append_column('ts_us', micros)
+
+    # Ordenado por ts: 'last' do group_by (sem threads) é o valor mais recente
+    table = table.sort_by([('ts_us', 'ascending')])
+    grouped = table.group_by(['bucket', 'sensor_id'], use_threads=False).aggregate([
+        ('value', 'mean'),
+        ('value', 'min'),
+        ('value', 'max'),
+        ('value', 'last'),
+        ('value', 'count', pc.CountOptions(mode='all')),
+        ('ts_us', 'max'),
+    ])
+
+    rows = []
+    for row in grouped.to_pylist():
+        rows.append((
+            _from_micros(row['bucket']),
+            row['sensor_id'],
+            row['value_mean'],
+            row['value_min'],
+            row['value_max'],
+            row['value_last'],
+            row['value_count'],
+            _from_micros(row['ts_us_max']),
+        ))
+    rows.sort(key=lambda row: (row[0], row[1]))
+    return rows
+
+
+def _combine(func, a, b):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return func(a, b)
+
+
+def merge_buckets(*row_lists):
+    """
+    Combina agregações parciais do mesmo (bucket, sensor_id) vindas da
+    camada fria e do banco: média ponderada pela contagem, min/max globais
+    e ``last`` pelo maior timestamp.
+    """
+    merged = OrderedDict()
+    for rows in row_lists:
+        for bucket, sensor_id, avg_value, min_value, max_value, last_value, count, last_ts in rows:
+            key = (bucket, sensor_id)
+            current = merged.get(key)
+            if current is None:
+                merged[key] = [avg_value, min_value, max_value, last_value, count, last_ts]
+                continue
+            total = current[4] + count
+            if total:
+                current[0] = ((current[0] or 0) * current[4] + (avg_value or 0) * count) / total
+            current[1] = _combine(min, current[1], min_value)
+            current[2] = _combine(max, current[2], max_value)
+            if last_ts is not None and (current[5] is None or last_ts > current[5]):
+                current[3], current[5] = last_value, last_ts
+            current[4] = total
+
+    return [
+        (bucket, sensor_id, *values)
+        for (bucket, sensor_id), values in sorted(merged.items(), key=lambda item: item[0])
+    ]
@@ -0,0 +1,202 @@
+"""
+Histórico em lote: vários devices/assets em uma única consulta por tier.
+
+Telas de site pintavam 30-80 gráficos com uma requisição (e uma consulta)
+por device. Aqui todos os seletores viajam como um único parâmetro JSONB e
+cada seletor é resolvido por um LATERAL com LIMIT próprio: as séries do
+seletor vêm de reading_series e os pontos da PK (series_id, ts) de reading_point.
+
+Depois da consulta cada seletor recebe, como em DeviceHistoryView, a faixa
+arquivada (camada fria) quando a janela começa antes do horizonte, o valor
+segurado dos sensores comprimidos e as linhas de sensores de estado.
+"""
+import json
+import logging
+
+from django.db import connection
+
+from . import archive, compression, states
+from .history_cache import BUCKET_SECONDS, SCOPE_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+
+# Seletores: [{"idx": 0, "scope": "device", "key": "...", "sensor_ids": [...]}, ...]
+SELECTORS_CTE = """
+    WITH sel AS (
+        SELECT (e->>'idx')::int AS idx,
+               e->>'scope' AS scope,
+               e->>'key' AS key,
+               ARRAY(SELECT jsonb_array_elements_text(e->'sensor_ids')) AS sensor_ids
+        FROM jsonb_array_elements(%(selectors)s::jsonb) AS e
+    )
+"""
+
+RAW_LATERAL = """
+    SELECT s.idx, x.ts, x.sensor_id, x.value
+    FROM sel s
+    CROSS JOIN LATERAL (
+        SELECT p.ts, rs.sensor_id, p.value
+        FROM reading_series rs
+        JOIN reading_point p ON p.series_id = rs.id
+        WHERE rs.{column} = s.key
+          AND (cardinality(s.sensor_ids) = 0 OR rs.sensor_id = ANY(s.sensor_ids))
+          AND rs.last_ts >= %(ts_from)s
+          AND rs.first_ts <= %(ts_to)s
+          AND p.ts >= %(ts_from)s
+          AND p.ts <= %(ts_to)s
+        ORDER BY p.ts, rs.sensor_id
+        LIMIT %(limit)s
+    ) x
+    WHERE s.scope = '{scope}'
+"""
+
+AGG_LATERAL = """
+    SELECT s.idx, x.bucket, x.sensor_id, x.avg_value, x.min_value, x.max_value, x.last_value, x.count,
+           x.last_ts
+    FROM sel s
+    CROSS JOIN LATERAL (
+        SELECT time_bucket(%(bucket)s::interval, p.ts) AS bucket,
+               rs.sensor_id,
+               avg(p.value) AS avg_value,
+               min(p.value) AS min_value,
+               max(p.value) AS max_value,
+               last(p.value, p.ts) AS last_value,
+               count(*) AS count,
+               max(p.ts) AS last_ts
+        FROM reading_series rs
+        JOIN reading_point p ON p.series_id = rs.id
+        WHERE rs.{column} = s.key
+          AND (cardinality(s.sensor_ids) = 0 OR rs.sensor_id = ANY(s.sensor_ids))
+          AND rs.last_ts >= %(ts_from)s
+          AND rs.first_ts <= %(ts_to)s
+          AND p.ts >= %(ts_from)s
+          AND p.ts <= %(ts_to)s
+        GROUP BY 1, 2
+        ORDER BY 1, 2
+        LIMIT %(limit)s
+    ) x
+    WHERE s.scope = '{scope}'
+"""
+
+
+def fetch_batch_history(selectors, interval, ts_from, ts_to, limit):
+    """
+    Busca o histórico de todos os seletores em uma única consulta ao banco
+    e completa cada seletor com a camada fria, step-hold e estados.
+
+    Args:
+        selectors: lista de dicts {idx, scope ('device'|'asset'), key, sensor_ids}
+        interval: 'raw' ou um dos intervalos de BUCKET_SECONDS
+        ts_from, ts_to: janela compartilhada (inclusiva)
+        limit: máximo de linhas por seletor
+
+    Returns:
+        Dict {idx: [rows]} - rows no mesmo formato de DeviceHistoryView
+    """
+    results = {selector['idx']: [] for selector in selectors}
+    if not selectors:
+        return results
+
+    scopes = sorted({selector['scope'] for selector in selectors})
+    template = RAW_LATERAL if interval == 'raw' else AGG_LATERAL
+    order = 'idx, ts, sensor_id' if interval == 'raw' else 'idx, bucket, sensor_id'
+
+    branches = [
+        template.format(column=SCOPE_COLUMNS[scope], scope=scope)
+        for scope in scopes
+    ]
+    sql = SELECTORS_CTE + ' UNION ALL '.join(f'({branch})' for branch in branches) + f' ORDER BY {order}'
+
+    params = {
+        'selectors': json.dumps([
+            {
+                'idx': selector['idx'],
+                'scope': selector['scope'],
+                'key': selector['key'],
+                'sensor_ids': sorted(set(selector.get('sensor_ids') or [])),
+            }
+            for selector in selectors
+        ]),
+        'ts_from': ts_from,
+        'ts_to': ts_to,
+        'limit': limit,
+    }
+    if interval != 'raw':
+        params['bucket'] = f"{BUCKET_SECONDS[interval]} seconds"
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        columns = [col[0] for col in cursor.description]
+        for row in cursor.fetchall():
+            row_dict = dict(zip(columns, row))
+            results[row_dict.pop('idx')].append(row_dict)
+
+    horizon = archive.get_archive_horizon()
+    for selector in selectors:
+        idx = selector['idx']
+        if interval == 'raw':
+            results[idx] = _complete_raw(selector, results[idx], ts_from, ts_to, limit, horizon)
+        else:
+            results[idx] = _complete_buckets(selector, results[idx], interval, ts_from, ts_to, limit, horizon)
+
+    return results
+
+
+def _complete_raw(selector, rows, ts_from, ts_to, limit, horizon):
+    """Faixa arquivada, semente step-hold e estados de um seletor raw."""
+    scope, key = selector['scope'], selector['key']
+    sensor_ids = selector.get('sensor_ids') or None
+
+    if horizon is not None and ts_from < horizon:
+        cold = archive.read_archived_rows(scope, key, ts_from, ts_to, sensor_ids)
+        if cold:
+            rows = sorted(cold + rows, key=lambda row: (row['ts'], row['sensor_id']))[:limit]
+
+    seeded = compression.seed_raw_rows(rows, scope, key, ts_from, sensor_ids)
+    if len(seeded) != len(rows):
+        rows = sorted(seeded, key=lambda row: (row['ts'], row['sensor_id']))[:limit]
+
+    state_rows = states.raw_rows(scope, key, ts_from, ts_to, sensor_ids)
+    if state_rows:
+        rows = sorted(rows + state_rows, key=lambda row: (row['ts'], row['sensor_id']))[:limit]
+    return rows
+
+
+def _complete_buckets(selector, rows, interval, ts_from, ts_to, limit, horizon):
+    """Buckets arquivados, step-hold e estados de um seletor agregado."""
+    scope, key = selector['scope'], selector['key']
+    sensor_ids = selector.get('sensor_ids') or None
+
+    if horizon is not None and ts_from < horizon:
+        cold_rows = archive.query_archived_buckets(
+            scope, key, interval, ts_from, min(ts_to, horizon), sensor_ids,
+            end_inclusive=ts_to <= horizon
+        )
+        if cold_rows:
+            merged = archive.merge_buckets(cold_rows, [
+                (row['bucket'], row['sensor_id'], row['avg_value'], row['min_value'],
+                 row['max_value'], row['last_value'], row['count'], row['last_ts'])
+                for row in rows
+            ])
+            rows = [
+                {
+                    'bucket': bucket,
+                    'sensor_id': sensor_id,
+                    'avg_value': avg_value,
+                    'min_value': min_value,
+                    'max_value': max_value,
+                    'last_value': last_value,
+                    'count': count,
+                }
+                for bucket, sensor_id, avg_value, min_value, max_value, last_value, count, _ in merged
+            ][:limit]
+    for row in rows:
+        row.pop('last_ts', None)
+
+    rows = compression.fill_step_hold_buckets(rows, scope, key, interval, ts_from, ts_to, sensor_ids)
+
+    state_rows = states.bucket_rows(scope, key, interval, ts_from, ts_to, sensor_ids)
+    if state_rows:
+        rows = sorted(rows + state_rows, key=lambda row: (row['bucket'], row['sensor_id']))
+    return rows[:limit]
@@ -0,0 +1,280 @@
+"""
+Agregação por calendário local do site (dia, semana ISO, mês).
+
+Os buckets de history_cache são alinhados em UTC; relatórios como "média
+de ontem" ou "consumo do mês" precisam do dia local do site
+(Site.timezone). Aqui:
+
+- dias locais fechados (fim do dia + SETTLE_SECONDS no passado) são
+  agregados uma única vez em reading_daily_rollup (DailyRollup), sob
+  demanda ou pela task ``ingest.rollup_closed_days``;
+- o dia aberto é calculado ao vivo e nunca gravado;
+- semanas (segunda a domingo) e meses são combinados a partir dos dias.
+
+Leituras atrasadas apagam os rollups a partir do dia afetado
+(``invalidate_from``). Dias anteriores ao horizonte da camada fria sem
+rollup não são recalculados (os pontos já não estão no banco).
+"""
+import logging
+from datetime import datetime, time, timedelta
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.db import connection
+from django.utils import timezone
+
+from .history_cache import _config as _history_config
+
+logger = logging.getLogger(__name__)
+
+PERIODS = ('day', 'week', 'month')
+
+DEFAULT_TIMEZONE = 'America/Sao_Paulo'
+
+DAILY_SQL = """
+    SELECT (p.ts AT TIME ZONE %s)::date AS day,
+           s.sensor_id,
+           avg(p.value),
+           min(p.value),
+           max(p.value),
+           first(p.value, p.ts),
+           last(p.value, p.ts),
+           count(*)
+    FROM reading_point p
+    JOIN reading_series s ON s.id = p.series_id
+    WHERE s.asset_tag = %s
+      AND p.ts >= %s
+      AND p.ts < %s
+    GROUP BY 1, 2
+"""
+
+
+def get_asset_timezone(asset_tag):
+    """IANA timezone do site do ativo (padrão America/Sao_Paulo)."""
+    from apps.assets.models import Asset
+
+    tz_name = Asset.objects.filter(tag=asset_tag).values_list('site__timezone', flat=True).first()
+    try:
+        ZoneInfo(tz_name or DEFAULT_TIMEZONE)
+    except (ZoneInfoNotFoundError, ValueError):
+        logger.warning(f"⚠️ Timezone inválido '{tz_name}' para {asset_tag}, usando {DEFAULT_TIMEZONE}")
+        tz_name = None
+    return tz_name or DEFAULT_TIMEZONE
+
+
+def local_midnight(day, tz):
+    """Instante (aware) do início do dia local."""
+    return datetime.combine(day, time.min, tzinfo=tz)
+
+
+def period_start(day, period):
+    if period == 'week':
+        return day - timedelta(days=day.weekday())
+    if period == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def _next_period(start, period):
+    if period == 'week':
+        return start + timedelta(days=7)
+    if period == 'month':
+        return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return start + timedelta(days=1)
+
+
+def _last_closed_day(tz, now=None):
+    """Último dia local cujo fim + settle já passou."""
+    now = now or timezone.now()
+    settled = now - timedelta(seconds=_history_config()['SETTLE_SECONDS'])
+    return settled.astimezone(tz).date() - timedelta(days=1)
+
+
+def _query_days(asset_tag, tz_name, first_day, last_day):
+    """Agregados diários (dia local) entre first_day e last_day, inclusive."""
+    tz = ZoneInfo(tz_name)
+    with connection.cursor() as cursor:
+        cursor.execute(DAILY_SQL, [
+            tz_name,
+            asset_tag,
+            local_midnight(first_day, tz),
+            local_midnight(last_day + timedelta(days=1), tz),
+        ])
+        return cursor.fetchall()
+
+
+def ensure_daily_rollups(asset_tag, tz_name, first_day, last_day):
+    """
+    Grava os rollups ausentes de dias fechados em [first_day, last_day].
+
+    Returns:
+        Número de linhas (dia, sensor) gravadas
+    """
+    from apps.ingest.models import DailyRollup
+    from .archive import get_archive_horizon
+
+    tz = ZoneInfo(tz_name)
+    last_day = min(last_day, _last_closed_day(tz))
+
+    # Dias parcialmente (ou totalmente) na camada fria não são recalculados
+    horizon = get_archive_horizon()
+    if horizon is not None:
+        horizon_day = horizon.astimezone(tz).date()
+        if local_midnight(horizon_day, tz) < horizon:
+            horizon_day += timedelta(days=1)
+        first_day = max(first_day, horizon_day)
+
+    if first_day > last_day:
+        return 0
+
+    done = set(
+        DailyRollup.objects.filter(
+            asset_tag=asset_tag,
+            timezone_name=tz_name,
+            day__gte=first_day,
+            day__lte=last_day,
+        ).values_list('day', flat=True).distinct()
+    )
+    missing = [
+        first_day + timedelta(days=i)
+        for i in range((last_day - first_day).days + 1)
+        if first_day + timedelta(days=i) not in done
+    ]
+    if not missing:
+        return 0
+
+    missing_set = set(missing)
+    rows = [
+        DailyRollup(
+            asset_tag=asset_tag,
+            sensor_id=sensor_id,
+            day=day,
+            timezone_name=tz_name,
+            avg_value=avg_value,
+            min_value=min_value,
+            max_value=max_value,
+            first_value=first_value,
+            last_value=last_value,
+            count=count,
+        )
+        for day, sensor_id, avg_value, min_value, max_value, first_value, last_value, count
+        in _query_days(asset_tag, tz_name, missing[0], missing[-1])
+        if day in missing_set
+    ]
+    DailyRollup.objects.bulk_create(rows, ignore_conflicts=True)
+    return len(rows)
+
+
+def invalidate_from(asset_tag, ts):
+    """
+    Apaga rollups do ativo a partir do dia de ``ts`` (leitura atrasada).
+
+    Um dia de folga cobre qualquer deslocamento de fuso.
+    """
+    from apps.ingest.models import DailyRollup
+
+    DailyRollup.objects.filter(asset_tag=asset_tag, day__gte=ts.date() - timedelta(days=1)).delete()
+
+
+def _combine(rows):
+    """
+    Combina linhas diárias (ordenadas por dia) de um mesmo sensor/período:
+    (avg, min, max, first, last, count).
+    """
+    count = sum(row[5] for row in rows)
+    return {
+        'avg_value': sum(row[0] * row[5] for row in rows) / count if count else None,
+        'min_value': min(row[1] for row in rows),
+        'max_value': max(row[2] for row in rows),
+        'first_value': rows[0][3],
+        'last_value': rows[-1][4],
+        'count': count,
+    }
+
+
+def get_calendar_series(asset_tag, period, ts_from, ts_to, sensor_ids=None):
+    """
+    Agregados do ativo por dia/semana/mês no calendário local do site.
+
+    O início é alinhado ao período que contém ``ts_from`` e o fim vai até o
+    período que contém ``ts_to`` (limitado a hoje). ``delta`` = último -
+    primeiro valor (consumo de medidores acumulados).
+
+    Returns:
+        Tupla (rows, tz_name): rows ordenadas por período, sensor_id
+    """
+    from apps.ingest.models import DailyRollup
+
+    tz_name = get_asset_timezone(asset_tag)
+    tz = ZoneInfo(tz_name)
+    today = timezone.now().astimezone(tz).date()
+
+    first_day = period_start(ts_from.astimezone(tz).date(), period)
+    last_day = min(_next_period(period_start(ts_to.astimezone(tz).date(), period), period) - timedelta(days=1), today)
+    if first_day > last_day:
+        return [], tz_name
+
+    ensure_daily_rollups(asset_tag, tz_name, first_day, last_day)
+
+    closed = DailyRollup.objects.filter(
+        asset_tag=asset_tag,
+        timezone_name=tz_name,
+        day__gte=first_day,
+        day__lte=last_day,
+    )
+    if sensor_ids:
+        closed = closed.filter(sensor_id__in=sensor_ids)
+
+    by_day = {}
+    for row in closed.values_list('day', 'sensor_id', 'avg_value', 'min_value', 'max_value',
+                                  'first_value', 'last_value', 'count'):
+        by_day[(row[0], row[1])] = row[2:]
+
+    # Dias abertos (não assentados): ao vivo, nunca gravados
+    last_closed = _last_closed_day(tz)
+    if last_day > last_closed:
+        for day, sensor_id, *values in _query_days(asset_tag, tz_name, max(first_day, last_closed + timedelta(days=1)), last_day):
+            if not sensor_ids or sensor_id in sensor_ids:
+                by_day[(day, sensor_id)] = tuple(values)
+
+    grouped = {}
+    for (day, sensor_id) in sorted(by_day):
+        grouped.setdefault((period_start(day, period), sensor_id), []).append(by_day[(day, sensor_id)])
+
+    rows = []
+    for (start, sensor_id), values in sorted(grouped.items()):
+        combined = _combine(values)
+        end = _next_period(start, period)
+        rows.append({
+            'period_start': local_midnight(start, tz),
+            'period_end': local_midnight(end, tz),
+            'sensor_id': sensor_id,
+            **combined,
+            'delta': combined['last_value'] - combined['first_value'],
+            'closed': end - timedelta(days=1) <= last_closed,
+        })
+    return rows, tz_name
+
+
+def rollup_recent_days(days=7):
+    """
+    Garante os rollups dos últimos ``days`` dias fechados de todos os
+    ativos com leituras no schema atual.
+
+    Returns:
+        Dict {assets, rows}
+    """
+    # Catálogo: apenas ativos com pontos na janela
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            SELECT DISTINCT asset_tag FROM reading_series
+            WHERE asset_tag IS NOT NULL AND last_ts >= %s
+        """, [timezone.now() - timedelta(days=days + 1)])
+        asset_tags = [row[0] for row in cursor.fetchall()]
+
+    stats = {'assets': 0, 'rows': 0}
+    for asset_tag in asset_tags:
+        tz_name = get_asset_timezone(asset_tag)
+        last_day = _last_closed_day(ZoneInfo(tz_name))
+        stats['rows'] += ensure_daily_rollups(asset_tag, tz_name, last_day - timedelta(days=days - 1), last_day)
+        stats['assets'] += 1
+    return stats
@@ -0,0 +1,206 @@
+"""
+Dimensionamento de chunks das hypertables do tenant.
+
+telemetry e reading_point nascem com chunk_time_interval de 1 dia. Tenants
+com poucos sensores acumulam milhares de chunks minúsculos (planejamento
+lento, catálogo grande); tenants grandes geram chunks que não cabem na
+memória. Aqui o intervalo é recalculado a partir da taxa de crescimento
+observada nos chunks completos mais recentes:
+
+    intervalo = TARGET_MB / (bytes por segundo)
+
+limitado a [MIN_HOURS, MAX_DAYS] e arredondado para horas (< 1 dia) ou
+dias. O novo intervalo só vale para chunks criados depois da alteração.
+"""
+import json
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Chunks completos usados para estimar a taxa de crescimento
+SAMPLE_CHUNKS = 7
+
+HYPERTABLES_SQL = """
+    SELECT h.hypertable_name, d.time_interval
+    FROM timescaledb_information.hypertables h
+    JOIN timescaledb_information.dimensions d
+      ON d.hypertable_schema = h.hypertable_schema
+     AND d.hypertable_name = h.hypertable_name
+     AND d.dimension_number = 1
+    WHERE h.hypertable_schema = current_schema()
+    ORDER BY h.hypertable_name
+"""
+
+CHUNK_SIZES_SQL = """
+    SELECT c.chunk_name, c.range_start, c.range_end, s.total_bytes
+    FROM timescaledb_information.chunks c
+    JOIN chunks_detailed_size(format('%%I.%%I', current_schema(), %s)::regclass) s
+      ON s.chunk_schema = c.chunk_schema AND s.chunk_name = c.chunk_name
+    WHERE c.hypertable_schema = current_schema()
+      AND c.hypertable_name = %s
+    ORDER BY c.range_start
+"""
+
+# Formatos das consultas mais frequentes (histórico, listas, ops)
+PLANNING_QUERIES = {
+    'telemetry': [
+        (
+            'lista por device 24h',
+            """
+            SELECT id FROM telemetry
+            WHERE device_id = 'x' AND timestamp >= now() - interval '1 day'
+            ORDER BY timestamp DESC, id DESC LIMIT 50
+            """,
+        ),
+    ],
+    'reading_point': [
+        (
+            'série 7d',
+            """
+            SELECT ts, value FROM reading_point
+            WHERE series_id = 0 AND ts >= now() - interval '7 days'
+            ORDER BY ts
+            """,
+        ),
+        (
+            'buckets 1h 30d',
+            """
+            SELECT time_bucket('1 hour', ts), series_id, avg(value)
+            FROM reading_point
+            WHERE ts >= now() - interval '30 days'
+            GROUP BY 1, 2
+            """,
+        ),
+    ],
+}
+
+
+def _config():
+    defaults = {
+        'TARGET_MB': 256,
+        'MIN_HOURS': 1,
+        'MAX_DAYS': 30,
+        'TOLERANCE': 0.25,
+    }
+    return {**defaults, **getattr(settings, 'TIMESCALE_CHUNK_SIZING', {})}
+
+
+def recommend_interval(bytes_per_second, target_bytes, config=None):
+    """
+    Intervalo que produz chunks de ~target_bytes.
+
+    Returns:
+        timedelta (ou None sem taxa de crescimento)
+    """
+    config = config or _config()
+    if not bytes_per_second:
+        return None
+
+    seconds = target_bytes / bytes_per_second
+    seconds = max(seconds, config['MIN_HOURS'] * 3600)
+    seconds = min(seconds, config['MAX_DAYS'] * 86400)
+    if seconds < 86400:
+        return timedelta(hours=max(round(seconds / 3600), 1))
+    return timedelta(days=round(seconds / 86400))
+
+
+def inspect_hypertables():
+    """
+    Chunks e tamanho de cada hypertable do schema atual.
+
+    Returns:
+        Lista de dicts {hypertable, interval, chunks, total_bytes,
+        avg_chunk_bytes, bytes_per_second, recommended}
+    """
+    config = _config()
+    target_bytes = config['TARGET_MB'] * 1024 * 1024
+    now = timezone.now()
+
+    with connection.cursor() as cursor:
+        cursor.execute(HYPERTABLES_SQL)
+        hypertables = cursor.fetchall()
+
+    result = []
+    for name, interval in hypertables:
+        with connection.cursor() as cursor:
+            cursor.execute(CHUNK_SIZES_SQL, [name, name])
+            chunks = cursor.fetchall()
+
+        total_bytes = sum(row[3] or 0 for row in chunks)
+        complete = [row for row in chunks if row[2] <= now][-SAMPLE_CHUNKS:]
+        covered = sum((row[2] - row[1]).total_seconds() for row in complete)
+        bytes_per_second = sum(row[3] or 0 for row in complete) / covered if covered else None
+
+        result.append({
+            'hypertable': name,
+            'interval': interval,
+            'chunks': len(chunks),
+            'total_bytes': total_bytes,
+            'avg_chunk_bytes': total_bytes // len(chunks) if chunks else 0,
+            'bytes_per_second': bytes_per_second,
+            'recommended': recommend_interval(bytes_per_second, target_bytes, config),
+        })
+    return result
+
+
+def needs_change(current, recommended, tolerance=None):
+    """Mudança só quando o desvio relativo passa da tolerância."""
+    if recommended is None or current is None:
+        return False
+    tolerance = _config()['TOLERANCE'] if tolerance is None else tolerance
+    return abs(recommended - current) / current > tolerance
+
+
+def apply_interval(hypertable, interval):
+    """Altera o chunk_time_interval (vale para novos chunks)."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT set_chunk_time_interval(format('%%I.%%I', current_schema(), %s)::regclass, %s::interval)",
+            [hypertable, interval]
+        )
+    logger.info(f"📐 chunk_time_interval de {connection.schema_name}.{hypertable} → {interval}")
+
+
+def tune_chunk_intervals(apply=True):
+    """
+    Recalcula e (opcionalmente) aplica o chunk_time_interval das
+    hypertables do schema atual.
+
+    Returns:
+        Lista de inspect_hypertables() com a chave ``changed``
+    """
+    config = _config()
+    stats = inspect_hypertables()
+    for table in stats:
+        table['changed'] = False
+        if needs_change(table['interval'], table['recommended'], config['TOLERANCE']):
+            if apply:
+                apply_interval(table['hypertable'], table['recommended'])
+            table['changed'] = True
+    return stats
+
+
+def planning_times(hypertable, runs=3):
+    """
+    Tempo de planejamento (ms, mediana) das consultas representativas.
+
+    Returns:
+        Dict {nome: ms}
+    """
+    result = {}
+    for name, sql in PLANNING_QUERIES.get(hypertable, []):
+        timings = []
+        for _ in range(runs):
+            with connection.cursor() as cursor:
+                cursor.execute(f"EXPLAIN (SUMMARY, FORMAT JSON) {sql}")
+                plan = cursor.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            timings.append(plan[0]['Planning Time'])
+        result[name] = sorted(timings)[len(timings) // 2]
+    return result
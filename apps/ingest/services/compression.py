@@ -0,0 +1,386 @@
+"""
+Compressão de amostras na ingestão (deadband / swinging door).
+
+Pontos de HVAC como setpoints e temperaturas ambiente repetem o mesmo
+valor (ou quase) a cada poucos segundos. Sensores com
+``Sensor.compression_mode`` configurado passam por este estágio antes da
+escrita em reading_point:
+
+- deadband_abs / deadband_pct: grava apenas quando o valor se afasta do
+  último valor gravado mais que o desvio (unidade do sensor ou %).
+  Reconstrução: step-hold (o valor vale até a próxima amostra gravada).
+- swinging_door: mantém um "corredor" de inclinações a partir do último
+  ponto gravado; quando o corredor fecha, grava o ponto anterior.
+  Reconstrução: interpolação linear entre pontos gravados (erro da ordem
+  do desvio; ``benchmark_compression`` mede o erro real).
+
+Em todos os modos, ``compression_max_interval`` (heartbeat) garante ao
+menos uma amostra gravada a cada N segundos. Leituras atrasadas (ts menor
+que o estado) são gravadas sem compressão.
+
+O estado de cada série fica no cache compartilhado (Redis) e só é
+atualizado após o commit da ingestão. reading_latest continua recebendo
+todas as amostras.
+"""
+import logging
+import math
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.core.cache import cache
+from django.db import connection, transaction
+
+from .history_cache import BUCKET_SECONDS, SCOPE_COLUMNS, floor_bucket
+
+logger = logging.getLogger(__name__)
+
+MODES = ('deadband_abs', 'deadband_pct', 'swinging_door')
+
+# Configuração por device (invalidada por signal ao salvar Sensor)
+CONFIG_CACHE_TIMEOUT = 300
+
+# Estado por série: perdido o estado, a próxima amostra é gravada
+STATE_CACHE_TIMEOUT = 86400
+
+
+def _schema_name():
+    return getattr(connection, 'schema_name', 'public')
+
+
+def config_cache_key(schema, device_id):
+    return f"sensor_compression:{schema}:{device_id}"
+
+
+def _state_key(schema, device_id, sensor_id):
+    return f"telemetry:compression_state:{schema}:{device_id}:{sensor_id}"
+
+
+def get_device_configs(device_ids):
+    """
+    Configuração de compressão dos sensores de cada device.
+
+    Returns:
+        Dict {device_id: {sensor_tag: (mode, deviation, max_interval)}}
+        (apenas sensores com compressão ativa)
+    """
+    from apps.assets.models import Sensor
+
+    schema = _schema_name()
+    device_ids = set(device_ids)
+    keys = {config_cache_key(schema, device_id): device_id for device_id in device_ids}
+    cached = cache.get_many(list(keys))
+    configs = {keys[key]: value for key, value in cached.items()}
+
+    missing = device_ids - set(configs)
+    if missing:
+        loaded = {device_id: {} for device_id in missing}
+        sensors = Sensor.objects.filter(
+            device__mqtt_client_id__in=missing,
+            is_active=True,
+            compression_mode__in=MODES,
+        ).values_list('device__mqtt_client_id', 'tag', 'compression_mode', 'compression_deviation', 'compression_max_interval')
+        for device_id, tag, mode, deviation, max_interval in sensors:
+            loaded[device_id][tag] = (mode, deviation or 0.0, max_interval)
+        cache.set_many({config_cache_key(schema, device_id): value for device_id, value in loaded.items()},
+                       timeout=CONFIG_CACHE_TIMEOUT)
+        configs.update(loaded)
+
+    return configs
+
+
+# =============================================================================
+# Núcleo (sem I/O): usado pela ingestão e pelo benchmark
+# =============================================================================
+
+def offer(mode, deviation, max_interval, state, ts, value):
+    """
+    Oferece uma amostra ao compressor.
+
+    Args:
+        ts: epoch em segundos (float)
+        state: dict do estado da série (ou None)
+
+    Returns:
+        Tupla (to_store, state): lista de (ts, value) a gravar e novo estado
+    """
+    if state is None:
+        return [(ts, value)], _initial_state(mode, ts, value)
+
+    last_ts = state.get('pts') if state.get('pts') is not None else state['ts']
+    if ts <= last_ts:
+        # Atrasada/reenviada: grava sem alterar o estado
+        return [(ts, value)], state
+
+    if mode == 'swinging_door':
+        return _offer_swinging_door(deviation, max_interval, state, ts, value)
+    return _offer_deadband(mode, deviation, max_interval, state, ts, value)
+
+
+def _initial_state(mode, ts, value):
+    if mode == 'swinging_door':
+        return {'ts': ts, 'v': value, 'up': math.inf, 'lo': -math.inf, 'pts': None, 'pv': None}
+    return {'ts': ts, 'v': value}
+
+
+def _offer_deadband(mode, deviation, max_interval, state, ts, value):
+    threshold = deviation if mode == 'deadband_abs' else abs(state['v']) * deviation / 100.0
+    if abs(value - state['v']) > threshold or ts - state['ts'] >= max_interval:
+        return [(ts, value)], {'ts': ts, 'v': value}
+    return [], state
+
+
+def _offer_swinging_door(deviation, max_interval, state, ts, value):
+    stored = []
+    if ts - state['ts'] >= max_interval:
+        # Heartbeat: fecha o segmento pendente e reinicia no ponto atual
+        if state['pts'] is not None:
+            stored.append((state['pts'], state['pv']))
+        stored.append((ts, value))
+        return stored, _initial_state('swinging_door', ts, value)
+
+    dt = ts - state['ts']
+    up = min(state['up'], (value + deviation - state['v']) / dt)
+    lo = max(state['lo'], (value - deviation - state['v']) / dt)
+
+    if lo > up and state['pts'] is not None:
+        # Corredor fechou: grava o ponto pendente e abre novo corredor a partir dele
+        stored.append((state['pts'], state['pv']))
+        dt = ts - state['pts']
+        state = {
+            'ts': state['pts'],
+            'v': state['pv'],
+            'up': (value + deviation - state['pv']) / dt,
+            'lo': (value - deviation - state['pv']) / dt,
+            'pts': ts,
+            'pv': value,
+        }
+        return stored, state
+
+    return stored, {**state, 'up': up, 'lo': lo, 'pts': ts, 'pv': value}
+
+
+def reconstruct(mode, stored, ts):
+    """
+    Valor reconstruído em ``ts`` a partir dos pontos gravados (ordenados).
+    Step-hold para deadband, linear para swinging door.
+    """
+    import bisect
+
+    times = [point[0] for point in stored]
+    i = bisect.bisect_right(times, ts) - 1
+    if i < 0:
+        return None
+    if mode != 'swinging_door' or i + 1 >= len(stored):
+        return stored[i][1]
+    (t0, v0), (t1, v1) = stored[i], stored[i + 1]
+    return v0 + (v1 - v0) * (ts - t0) / (t1 - t0)
+
+
+# =============================================================================
+# Ingestão
+# =============================================================================
+
+def apply(readings):
+    """
+    Filtra as leituras (Reading não salvos) de sensores com compressão.
+
+    Pontos pendentes do swinging door liberados por amostras novas voltam
+    como Reading adicionais. Em caso de falha do cache, grava tudo.
+
+    Returns:
+        Lista de Reading a gravar
+    """
+    if not readings:
+        return readings
+
+    try:
+        configs = get_device_configs({reading.device_id for reading in readings})
+    except Exception as e:
+        logger.warning(f"⚠️ Compressão desativada neste lote (config): {e}")
+        return readings
+
+    compressed = {}
+    passthrough = []
+    for reading in readings:
+        config = configs.get(reading.device_id, {}).get(reading.sensor_id)
+        if config is None:
+            passthrough.append(reading)
+        else:
+            compressed.setdefault((reading.device_id, reading.sensor_id), []).append(reading)
+
+    if not compressed:
+        return readings
+
+    schema = _schema_name()
+    keys = {_state_key(schema, *series): series for series in compressed}
+    try:
+        states = {keys[key]: value for key, value in cache.get_many(list(keys)).items()}
+    except Exception as e:
+        logger.warning(f"⚠️ Compressão desativada neste lote (estado): {e}")
+        return readings
+
+    to_store = list(passthrough)
+    new_states = {}
+    for series, series_readings in compressed.items():
+        mode, deviation, max_interval = configs[series[0]][series[1]]
+        state = states.get(series)
+        for reading in sorted(series_readings, key=lambda r: r.ts):
+            stored, state = offer(mode, deviation, max_interval, state, reading.ts.timestamp(), reading.value)
+            for ts, value in stored:
+                to_store.append(_reading_at(reading, ts, value))
+        new_states[_state_key(schema, *series)] = state
+
+    # Estado só avança se os pontos foram de fato gravados
+    transaction.on_commit(lambda: cache.set_many(new_states, timeout=STATE_CACHE_TIMEOUT))
+
+    dropped = len(readings) - len(to_store)
+    if dropped > 0:
+        logger.debug(f"🗜️ Compressão: {dropped} de {len(readings)} amostras descartadas")
+    return to_store
+
+
+def _reading_at(template, ts, value):
+    from apps.ingest.models import Reading
+
+    if ts == template.ts.timestamp() and value == template.value:
+        return template
+    return Reading(
+        device_id=template.device_id,
+        sensor_id=template.sensor_id,
+        value=value,
+        labels=template.labels,
+        ts=datetime.fromtimestamp(ts, tz=dt_timezone.utc),
+        asset_tag=template.asset_tag,
+        tenant=template.tenant,
+        site=template.site,
+    )
+
+
+# =============================================================================
+# Leitura: reconstrução step-hold no histórico
+# =============================================================================
+
+def compressed_sensors(scope, key, sensor_ids=None):
+    """
+    Sensores com compressão no escopo (device_id ou asset_tag).
+
+    Returns:
+        Dict {sensor_tag: max_interval}
+    """
+    from apps.assets.models import Sensor
+
+    if scope == 'device':
+        configs = get_device_configs([key]).get(key, {})
+        result = {tag: config[2] for tag, config in configs.items()}
+    else:
+        result = dict(
+            Sensor.objects.filter(
+                device__asset__tag=key,
+                is_active=True,
+                compression_mode__in=MODES,
+            ).values_list('tag', 'compression_max_interval')
+        )
+    if sensor_ids:
+        result = {tag: value for tag, value in result.items() if tag in sensor_ids}
+    return result
+
+
+def seed_values(scope, key, sensors, ts_from):
+    """
+    Último valor gravado antes de ``ts_from`` para cada sensor comprimido.
+
+    A busca é limitada a 2x o heartbeat: sem amostra nesse intervalo o
+    sensor estava offline e nada é "segurado".
+
+    Returns:
+        Dict {sensor_tag: (ts, value)}
+    """
+    if not sensors:
+        return {}
+
+    lookback = timedelta(seconds=2 * max(sensors.values()))
+    sql = f"""
+        SELECT DISTINCT ON (s.sensor_id) s.sensor_id, p.ts, p.value
+        FROM reading_series s
+        JOIN reading_point p ON p.series_id = s.id
+        WHERE s.{SCOPE_COLUMNS[scope]} = %s
+          AND s.sensor_id = ANY(%s)
+          AND p.ts < %s
+          AND p.ts >= %s
+        ORDER BY s.sensor_id, p.ts DESC
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [key, list(sensors), ts_from, ts_from - lookback])
+        return {sensor_id: (ts, value) for sensor_id, ts, value in cursor.fetchall()}
+
+
+def fill_step_hold_buckets(rows, scope, key, interval, ts_from, ts_to, sensor_ids=None):
+    """
+    Completa buckets agregados de sensores comprimidos com o valor segurado.
+
+    Buckets sem amostra gravada recebem o último valor (count=0); buckets
+    com amostras incluem o valor segurado no início em min/max. O valor é
+    segurado por no máximo ``compression_max_interval`` (heartbeat) - além
+    disso o sensor é considerado sem dados.
+
+    Returns:
+        Lista de rows ordenada por bucket, sensor_id
+    """
+    sensors = compressed_sensors(scope, key, sensor_ids)
+    if not sensors:
+        return rows
+
+    from django.utils import timezone
+
+    width = timedelta(seconds=BUCKET_SECONDS[interval])
+    start = floor_bucket(ts_from, interval)
+    end = min(ts_to, timezone.now())
+    seeds = seed_values(scope, key, sensors, start)
+
+    by_key = {(row['bucket'], row['sensor_id']): row for row in rows}
+    filled = list(rows)
+    for sensor_id, max_interval in sensors.items():
+        held_ts, held = seeds.get(sensor_id, (None, None))
+        hold_for = timedelta(seconds=max_interval)
+        bucket = start
+        while bucket <= end:
+            row = by_key.get((bucket, sensor_id))
+            if row is not None:
+                if held is not None and held_ts is not None and bucket - held_ts <= hold_for:
+                    row['min_value'] = min(row['min_value'], held)
+                    row['max_value'] = max(row['max_value'], held)
+                held, held_ts = row['last_value'], bucket + width
+            elif held is not None and bucket - held_ts <= hold_for:
+                filled.append({
+                    'bucket': bucket,
+                    'sensor_id': sensor_id,
+                    'avg_value': held,
+                    'min_value': held,
+                    'max_value': held,
+                    'last_value': held,
+                    'count': 0,
+                })
+            bucket += width
+
+    filled.sort(key=lambda row: (row['bucket'], row['sensor_id']))
+    return filled
+
+
+def seed_raw_rows(rows, scope, key, ts_from, sensor_ids=None):
+    """
+    Acrescenta, para sensores comprimidos, o valor segurado em ``ts_from``
+    (o gráfico começa no valor correto em vez de na primeira amostra gravada).
+
+    Returns:
+        Lista de rows com os pontos semente (sem ordenação)
+    """
+    sensors = compressed_sensors(scope, key, sensor_ids)
+    if not sensors:
+        return rows
+
+    seeds = seed_values(scope, key, sensors, ts_from)
+    present = {(row['sensor_id'], row['ts']) for row in rows}
+    seeded = list(rows)
+    for sensor_id, (_, value) in seeds.items():
+        if (sensor_id, ts_from) not in present:
+            seeded.append({'ts': ts_from, 'sensor_id': sensor_id, 'value': value})
+    return seeded
@@ -0,0 +1,160 @@
+"""
+Preenchimento de lacunas em séries agregadas (equivalente a
+time_bucket_gapfill/locf/interpolate, ausentes no TimescaleDB Apache).
+
+A partir das linhas de history_cache.get_history_buckets, produz uma série
+densa e alinhada aos buckets para cada sensor:
+
+- none:     sem alteração (buckets vazios omitidos)
+- null:     buckets vazios presentes com valores None
+- previous: repete o último bucket com dados (LOCF)
+- linear:   interpola entre os buckets vizinhos com dados
+
+Lacunas maiores que ``max_gap`` não são preenchidas por previous/linear
+(ficam None), para que períodos offline continuem visíveis. Buckets
+preenchidos têm ``count`` 0 e ``filled`` True.
+"""
+import re
+from datetime import timedelta
+
+import numpy as np
+from django.utils import timezone
+
+from .history_cache import BUCKET_SECONDS, floor_bucket
+
+FILL_MODES = ('none', 'null', 'previous', 'linear')
+
+VALUE_COLUMNS = ('avg_value', 'min_value', 'max_value', 'last_value')
+
+# Sem max_gap explícito: até 10 buckets consecutivos são preenchidos
+DEFAULT_MAX_GAP_BUCKETS = 10
+
+_DURATION_RE = re.compile(r'^(\d+)([smhd]?)$')
+_DURATION_UNITS = {'': 1, 's': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_max_gap(value):
+    """
+    Interpreta max_gap ('900', '15m', '2h', '1d').
+
+    Returns:
+        Segundos (int) ou None se ausente
+
+    Raises:
+        ValueError: formato inválido
+    """
+    if not value:
+        return None
+    match = _DURATION_RE.match(value.strip())
+    if not match:
+        raise ValueError(f"Invalid max_gap: {value}. Use seconds or a duration like 15m, 2h, 1d")
+    return int(match.group(1)) * _DURATION_UNITS[match.group(2)]
+
+
+def fill_buckets(rows, interval, ts_from, ts_to, fill='none', max_gap=None):
+    """
+    Densifica as linhas agregadas por sensor.
+
+    Args:
+        rows: dicts {bucket, sensor_id, avg_value, min_value, max_value,
+              last_value, count, ...}
+        interval: chave de BUCKET_SECONDS
+        fill: um de FILL_MODES
+        max_gap: maior lacuna preenchida (segundos); None = 10 buckets
+
+    Returns:
+        Lista de dicts ordenada por bucket, sensor_id
+    """
+    if fill == 'none' or not rows:
+        return rows
+
+    width_seconds = BUCKET_SECONDS[interval]
+    width = timedelta(seconds=width_seconds)
+    start = floor_bucket(ts_from, interval)
+    end = min(ts_to, timezone.now())
+    size = int((end - start) / width) + 1
+    if size <= 0:
+        return rows
+
+    max_gap_buckets = (
+        DEFAULT_MAX_GAP_BUCKETS if max_gap is None else max_gap // width_seconds
+    )
+
+    by_sensor = {}
+    for row in rows:
+        by_sensor.setdefault(row['sensor_id'], []).append(row)
+
+    filled = []
+    for sensor_id, sensor_rows in by_sensor.items():
+        positions = np.array(
+            [int((row['bucket'] - start) / width) for row in sensor_rows], dtype=np.int64
+        )
+        inside = (positions >= 0) & (positions < size)
+        present_rows = [row for row, ok in zip(sensor_rows, inside) if ok]
+        positions = positions[inside]
+        filled.extend(row for row, ok in zip(sensor_rows, inside) if not ok)
+        if not present_rows:
+            continue
+
+        order = np.argsort(positions, kind='stable')
+        positions = positions[order]
+        present_rows = [present_rows[i] for i in order]
+
+        index = np.arange(size)
+        present = np.zeros(size, dtype=bool)
+        present[positions] = True
+
+        # Posição do bucket com dados anterior/seguinte a cada bucket
+        prev_pos = np.maximum.accumulate(np.where(present, index, -1))
+        next_pos = np.minimum.accumulate(np.where(present, index, size)[::-1])[::-1]
+
+        missing = ~present
+        if fill == 'null':
+            fillable = np.zeros(size, dtype=bool)
+        else:
+            gap_len = next_pos - prev_pos - 1
+            interior = (prev_pos >= 0) & (next_pos < size) & (gap_len <= max_gap_buckets)
+            if fill == 'previous':
+                trailing = (prev_pos >= 0) & (next_pos >= size) & (index - prev_pos <= max_gap_buckets)
+                fillable = missing & (interior | trailing)
+            else:
+                fillable = missing & interior
+
+        columns = {}
+        for column in VALUE_COLUMNS:
+            values = np.array(
+                [np.nan if row.get(column) is None else float(row[column]) for row in present_rows]
+            )
+            dense = np.full(size, np.nan)
+            dense[positions] = values
+            if fill == 'previous':
+                dense = np.where(fillable, dense[np.clip(prev_pos, 0, size - 1)], dense)
+            elif fill == 'linear':
+                valid = ~np.isnan(values)
+                if valid.sum() >= 2:
+                    interpolated = np.interp(index, positions[valid], values[valid])
+                    dense = np.where(fillable, interpolated, dense)
+            columns[column] = dense
+
+        row_at = dict(zip(positions.tolist(), present_rows))
+        for i in range(size):
+            if present[i]:
+                filled.append(row_at[i])
+                continue
+            is_filled = bool(fillable[i])
+            item = {
+                'bucket': start + width * i,
+                'sensor_id': sensor_id,
+                'count': 0,
+                'filled': is_filled,
+            }
+            for column in VALUE_COLUMNS:
+                value = columns[column][i]
+                item[column] = None if np.isnan(value) else float(value)
+            previous = row_at.get(int(prev_pos[i]))
+            if is_filled and previous is not None and 'state' in previous:
+                item['state'] = previous['state']
+            filled.append(item)
+
+    filled.sort(key=lambda row: (row['bucket'], row['sensor_id']))
+    return filled
@@ -0,0 +1,297 @@
+"""
+Cache de resultados para consultas históricas agregadas (time_bucket).
+
+Dashboards consultam as mesmas janelas (ex.: últimas 24h) a cada poucos
+segundos. Um bucket cujo fim é anterior a ``now - SETTLE_SECONDS`` não muda
+mais, então fica no Redis indefinidamente; a cada requisição somente os
+buckets ainda abertos são recalculados no TimescaleDB e costurados aos
+buckets cacheados.
+
+Chave de cada bucket: tenant (schema) + escopo (device_id/asset_tag) +
+conjunto de sensores + intervalo + início do bucket + geração do escopo.
+A geração é incrementada quando chegam leituras atrasadas (ver
+``invalidate_scope``), descartando logicamente os buckets já cacheados.
+
+Métricas: contadores globais de hits/misses (por bucket) expostos por
+``get_cache_stats()`` e pelo endpoint do Ops panel.
+"""
+import hashlib
+import json
+import logging
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+logger = logging.getLogger(__name__)
+
+# Largura de cada intervalo suportado, em segundos
+BUCKET_SECONDS = {
+    '1m': 60,
+    '5m': 300,
+    '15m': 900,
+    '1h': 3600,
+}
+
+# Escopos permitidos -> coluna da tabela reading (whitelist para SQL)
+SCOPE_COLUMNS = {
+    'device': 'device_id',
+    'asset': 'asset_tag',
+}
+
+CACHE_KEY_HITS = 'telemetry:history_cache:hits'
+CACHE_KEY_MISSES = 'telemetry:history_cache:misses'
+
+
+def _config():
+    config = {
+        'ENABLED': True,
+        'SETTLE_SECONDS': 120,
+        'TIMEOUT': None,
+        'MAX_BUCKETS': 5000,
+    }
+    config.update(getattr(settings, 'TELEMETRY_HISTORY_CACHE', {}))
+    return config
+
+
+def floor_bucket(ts, interval):
+    """Alinha ``ts`` ao início do bucket (mesmo alinhamento do time_bucket)."""
+    width = BUCKET_SECONDS[interval]
+    epoch = int(ts.timestamp())
+    return datetime.fromtimestamp(epoch - epoch % width, tz=dt_timezone.utc)
+
+
+def _schema_name():
+    return getattr(connection, 'schema_name', 'public')
+
+
+def _generation_key(schema, scope, key):
+    return f"telemetry:history_gen:{schema}:{scope}:{key}"
+
+
+def _sensors_hash(sensor_ids):
+    if not sensor_ids:
+        return 'all'
+    joined = ','.join(sorted(set(sensor_ids)))
+    return hashlib.md5(joined.encode()).hexdigest()[:16]
+
+
+def query_buckets(scope, key, interval, start, end, sensor_ids=None, end_inclusive=False):
+    """
+    Executa a agregação por time_bucket diretamente no banco.
+
+    Trechos anteriores ao horizonte arquivado também são agregados a partir
+    da camada fria (Parquet no MinIO) e combinados aos buckets do banco.
+
+    Returns:
+        Lista de tuplas (bucket, sensor_id, avg, min, max, last, count, last_ts)
+        ordenadas por bucket, sensor_id
+    """
+    column = SCOPE_COLUMNS[scope]
+    width = BUCKET_SECONDS[interval]
+    end_op = '<=' if end_inclusive else '<'
+
+    sensor_clause = ''
+    # first_ts/last_ts do catálogo descartam séries sem pontos na janela
+    params = [timedelta(seconds=width), key, start, end, start, end]
+    if sensor_ids:
+        sensor_clause = 'AND s.sensor_id = ANY(%s)'
+        params.append(list(sensor_ids))
+
+    sql = f"""
+        SELECT time_bucket(%s::interval, p.ts) AS bucket,
+               s.sensor_id,
+               avg(p.value) AS avg_value,
+               min(p.value) AS min_value,
+               max(p.value) AS max_value,
+               last(p.value, p.ts) AS last_value,
+               count(*) AS count,
+               max(p.ts) AS last_ts
+        FROM reading_point p
+        JOIN reading_series s ON s.id = p.series_id
+        WHERE s.{column} = %s
+          AND p.ts >= %s
+          AND p.ts {end_op} %s
+          AND s.last_ts >= %s
+          AND s.first_ts {end_op} %s
+          {sensor_clause}
+        GROUP BY bucket, s.sensor_id
+        ORDER BY bucket, s.sensor_id
+    """
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = [tuple(row) for row in cursor.fetchall()]
+
+    from . import archive
+
+    horizon = archive.get_archive_horizon()
+    if horizon is not None and start < horizon:
+        cold_rows = archive.query_archived_buckets(
+            scope, key, interval, start, min(end, horizon), sensor_ids,
+            end_inclusive=end_inclusive and end <= horizon
+        )
+        if cold_rows:
+            rows = archive.merge_buckets(cold_rows, rows)
+
+    return rows
+
+
+def _increment(key, delta):
+    if delta <= 0:
+        return
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        # Chave expirou/foi removida entre add e incr
+        cache.set(key, delta, timeout=None)
+
+
+def get_history_buckets(scope, key, interval, ts_from, ts_to, sensor_ids=None):
+    """
+    Retorna os buckets agregados de ``scope``/``key`` entre ts_from e ts_to.
+
+    O início é alinhado ao bucket (``floor_bucket(ts_from)``). Buckets
+    assentados vêm do cache; apenas os buckets abertos (ou parcialmente
+    cobertos por ``ts_to``) são calculados ao vivo.
+
+    Returns:
+        Tupla (rows, last_modified):
+        - rows: lista de dicts {bucket, sensor_id, avg_value, min_value,
+          max_value, last_value, count} ordenada por bucket, sensor_id
+        - last_modified: timestamp da leitura mais recente incluída (ou None)
+    """
+    config = _config()
+    width = timedelta(seconds=BUCKET_SECONDS[interval])
+    aligned_from = floor_bucket(ts_from, interval)
+
+    # Fronteira: buckets que terminam antes dela estão assentados e
+    # completamente dentro do intervalo solicitado
+    settled_until = min(ts_to, timezone.now() - timedelta(seconds=config['SETTLE_SECONDS']))
+    boundary = max(floor_bucket(settled_until, interval), aligned_from)
+    bucket_count = int((boundary - aligned_from) / width)
+
+    if not config['ENABLED'] or bucket_count > config['MAX_BUCKETS']:
+        raw_rows = query_buckets(scope, key, interval, aligned_from, ts_to, sensor_ids, end_inclusive=True)
+        return _to_dicts(raw_rows)
+
+    schema = _schema_name()
+    generation = cache.get(_generation_key(schema, scope, key), 0)
+    prefix = (
+        f"telemetry:history:{schema}:{scope}:{key}:{_sensors_hash(sensor_ids)}:"
+        f"{interval}:{generation}"
+    )
+
+    starts = [aligned_from + width * i for i in range(bucket_count)]
+    keys = {start: f"{prefix}:{int(start.timestamp())}" for start in starts}
+    cached = cache.get_many(list(keys.values())) if keys else {}
+
+    missing = [start for start in starts if keys[start] not in cached]
+    if missing:
+        # Uma única consulta cobre todos os buckets ausentes
+        computed = query_buckets(scope, key, interval, missing[0], missing[-1] + width, sensor_ids)
+        by_bucket = {}
+        for row in computed:
+            by_bucket.setdefault(row[0], []).append(row)
+        to_store = {}
+        for start in starts:
+            if missing[0] <= start <= missing[-1]:
+                # Buckets vazios também são cacheados (evita reconsulta)
+                cached[keys[start]] = to_store[keys[start]] = by_bucket.get(start, [])
+        cache.set_many(to_store, timeout=config['TIMEOUT'])
+
+    _increment(CACHE_KEY_HITS, len(starts) - len(missing))
+    _increment(CACHE_KEY_MISSES, len(missing))
+
+    raw_rows = []
+    for start in starts:
+        raw_rows.extend(cached[keys[start]])
+
+    # Buckets abertos: calculados ao vivo
+    if boundary <= ts_to:
+        raw_rows.extend(query_buckets(scope, key, interval, boundary, ts_to, sensor_ids, end_inclusive=True))
+
+    return _to_dicts(raw_rows)
+
+
+def _to_dicts(raw_rows):
+    rows = []
+    last_modified = None
+    for bucket, sensor_id, avg_value, min_value, max_value, last_value, count, last_ts in raw_rows:
+        rows.append({
+            'bucket': bucket,
+            'sensor_id': sensor_id,
+            'avg_value': avg_value,
+            'min_value': min_value,
+            'max_value': max_value,
+            'last_value': last_value,
+            'count': count,
+        })
+        if last_ts is not None and (last_modified is None or last_ts > last_modified):
+            last_modified = last_ts
+    return rows, last_modified
+
+
+def invalidate_scope(scope, key):
+    """
+    Invalida os buckets cacheados de um device/asset do tenant atual.
+
+    Chamado na ingestão quando chegam leituras com timestamp anterior à
+    janela de assentamento (ex.: gateway reenviando dados atrasados).
+    """
+    gen_key = _generation_key(_schema_name(), scope, key)
+    cache.add(gen_key, 0, timeout=None)
+    try:
+        cache.incr(gen_key)
+    except ValueError:
+        cache.set(gen_key, 1, timeout=None)
+
+
+def is_late(ts):
+    """True se ``ts`` cai em um bucket que já pode estar cacheado."""
+    return ts < timezone.now() - timedelta(seconds=_config()['SETTLE_SECONDS'])
+
+
+def get_cache_stats():
+    """Retorna hits, misses e hit ratio (por bucket) do cache de séries."""
+    values = cache.get_many([CACHE_KEY_HITS, CACHE_KEY_MISSES])
+    hits = int(values.get(CACHE_KEY_HITS, 0))
+    misses = int(values.get(CACHE_KEY_MISSES, 0))
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': round(hits / total, 4) if total else None,
+        'settle_seconds': _config()['SETTLE_SECONDS'],
+    }
+
+
+def conditional_response(request, response, data, last_modified=None):
+    """
+    Adiciona ETag/Last-Modified à resposta e devolve 304 quando o cliente
+    já possui a mesma versão (If-None-Match / If-Modified-Since).
+
+    O ETag é fraco e calculado apenas sobre ``data``: os campos ecoados
+    (from/to) mudam a cada polling mesmo quando as séries não mudaram.
+    """
+    body = json.dumps(data, cls=DjangoJSONEncoder, sort_keys=True)
+    etag = 'W/' + quote_etag(hashlib.sha1(body.encode()).hexdigest())
+    last_modified_ts = int(last_modified.timestamp()) if last_modified else None
+
+    response['ETag'] = etag
+    if last_modified_ts is not None:
+        response['Last-Modified'] = http_date(last_modified_ts)
+    patch_cache_control(response, private=True, no_cache=True)
+
+    return get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=last_modified_ts,
+        response=response,
+    )
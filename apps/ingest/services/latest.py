@@ -0,0 +1,194 @@
+"""
+Tabela reading_latest: último valor por (device_id, sensor_id).
+
+A ingestão faz upsert com semântica "timestamp mais novo vence", então
+leituras atrasadas ou reenviadas nunca sobrescrevem um valor mais recente.
+Leitores de "estado atual" consultam esta tabela (O(1) por sensor) em vez
+de varrer a hypertable de leituras com DISTINCT ON / ORDER BY ts DESC.
+"""
+import json
+import logging
+
+from django.db import connection
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+UPSERT_SQL = """
+    INSERT INTO reading_latest (device_id, sensor_id, asset_tag, value, labels, ts, updated_at)
+    VALUES {values}
+    ON CONFLICT (device_id, sensor_id) DO UPDATE
+    SET asset_tag = COALESCE(EXCLUDED.asset_tag, reading_latest.asset_tag),
+        value = EXCLUDED.value,
+        labels = EXCLUDED.labels,
+        ts = EXCLUDED.ts,
+        updated_at = EXCLUDED.updated_at
+    WHERE reading_latest.ts < EXCLUDED.ts
+"""
+
+# Última leitura real de cada série, calculada a partir da hypertable
+TRUTH_SQL = """
+    SELECT DISTINCT ON (s.device_id, s.sensor_id)
+           s.device_id, s.sensor_id, s.asset_tag, p.value, s.labels, p.ts
+    FROM reading_point p
+    JOIN reading_series s ON s.id = p.series_id
+    WHERE (%(since)s::timestamptz IS NULL OR p.ts >= %(since)s::timestamptz)
+    ORDER BY s.device_id, s.sensor_id, p.ts DESC
+"""
+
+# Séries cujas leituras foram todas arquivadas (Parquet) não são órfãs
+ARCHIVE_HORIZON_SQL = """
+    SELECT COALESCE(MAX(range_end), '-infinity'::timestamptz) FROM reading_archived_chunk
+"""
+
+
+def upsert_latest(readings):
+    """
+    Atualiza reading_latest a partir de uma lista de Reading (salvos ou não).
+
+    Dentro do lote, mantém apenas a leitura mais nova de cada série
+    (o ON CONFLICT não pode atualizar a mesma linha duas vezes).
+
+    Returns:
+        Número de séries enviadas para o upsert
+    """
+    newest = {}
+    for reading in readings:
+        key = (reading.device_id, reading.sensor_id)
+        current = newest.get(key)
+        if current is None or reading.ts > current.ts:
+            newest[key] = reading
+
+    if not newest:
+        return 0
+
+    now = timezone.now()
+    params = []
+    for reading in newest.values():
+        params.extend([
+            reading.device_id,
+            reading.sensor_id,
+            reading.asset_tag,
+            reading.value,
+            json.dumps(reading.labels or {}),
+            reading.ts,
+            now,
+        ])
+
+    values = ', '.join(['(%s, %s, %s, %s, %s::jsonb, %s, %s)'] * len(newest))
+    with connection.cursor() as cursor:
+        cursor.execute(UPSERT_SQL.format(values=values), params)
+
+    return len(newest)
+
+
+def get_latest_map(pairs):
+    """
+    Busca o último valor de várias séries em uma única consulta.
+
+    Args:
+        pairs: iterável de (device_id, sensor_id)
+
+    Returns:
+        Dict {(device_id, sensor_id): ReadingLatest}
+    """
+    from apps.ingest.models import ReadingLatest
+
+    pairs = set(pairs)
+    if not pairs:
+        return {}
+
+    device_ids = {device_id for device_id, _ in pairs}
+    sensor_ids = {sensor_id for _, sensor_id in pairs}
+    rows = ReadingLatest.objects.filter(device_id__in=device_ids, sensor_id__in=sensor_ids)
+    return {
+        (row.device_id, row.sensor_id): row
+        for row in rows
+        if (row.device_id, row.sensor_id) in pairs
+    }
+
+
+def repair_latest(since=None, dry_run=False):
+    """
+    Compara reading_latest com as leituras (reading_point) no schema atual e
+    corrige divergências (séries ausentes, valores desatualizados e, sem
+    ``since``, linhas órfãs sem leituras correspondentes).
+
+    Args:
+        since: considera apenas leituras a partir deste datetime (opcional)
+        dry_run: apenas contabiliza, sem alterar a tabela
+
+    Returns:
+        dict com missing, stale, orphans e repaired
+    """
+    stats = {'missing': 0, 'stale': 0, 'orphans': 0, 'repaired': 0}
+    params = {'since': since}
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            WITH truth AS ({TRUTH_SQL})
+            SELECT COUNT(*) FILTER (WHERE l.device_id IS NULL),
+                   COUNT(*) FILTER (
+                       WHERE l.device_id IS NOT NULL
+                         AND (l.ts IS DISTINCT FROM t.ts OR l.value IS DISTINCT FROM t.value)
+                   )
+            FROM truth t
+            LEFT JOIN reading_latest l
+                   ON l.device_id = t.device_id AND l.sensor_id = t.sensor_id
+            -- Com --since, uma linha mais nova que a janela não é divergência
+            WHERE %(since)s::timestamptz IS NULL OR l.ts IS NULL OR l.ts <= t.ts
+        """, params)
+        stats['missing'], stats['stale'] = cursor.fetchone()
+
+        if since is None:
+            cursor.execute(f"""
+                SELECT COUNT(*)
+                FROM reading_latest l
+                WHERE NOT EXISTS (
+                    SELECT 1
+                    FROM reading_series s
+                    JOIN reading_point p ON p.series_id = s.id
+                    WHERE s.device_id = l.device_id
+                      AND s.sensor_id = l.sensor_id
+                )
+                  AND l.ts >= ({ARCHIVE_HORIZON_SQL})
+            """)
+            stats['orphans'] = cursor.fetchone()[0]
+
+        if dry_run:
+            return stats
+
+        # Sobrescreve com a verdade da hypertable (sem a regra "mais novo vence":
+        # aqui a hypertable é a fonte de verdade)
+        cursor.execute(f"""
+            INSERT INTO reading_latest (device_id, sensor_id, asset_tag, value, labels, ts, updated_at)
+            SELECT device_id, sensor_id, asset_tag, value, labels, ts, NOW()
+            FROM ({TRUTH_SQL}) truth
+            ON CONFLICT (device_id, sensor_id) DO UPDATE
+            SET asset_tag = EXCLUDED.asset_tag,
+                value = EXCLUDED.value,
+                labels = EXCLUDED.labels,
+                ts = EXCLUDED.ts,
+                updated_at = EXCLUDED.updated_at
+            WHERE (reading_latest.ts IS DISTINCT FROM EXCLUDED.ts
+                   OR reading_latest.value IS DISTINCT FROM EXCLUDED.value)
+              {'' if since is None else 'AND reading_latest.ts <= EXCLUDED.ts'}
+        """, params)
+        stats['repaired'] = cursor.rowcount
+
+        if since is None and stats['orphans']:
+            cursor.execute(f"""
+                DELETE FROM reading_latest l
+                WHERE NOT EXISTS (
+                    SELECT 1
+                    FROM reading_series s
+                    JOIN reading_point p ON p.series_id = s.id
+                    WHERE s.device_id = l.device_id
+                      AND s.sensor_id = l.sensor_id
+                )
+                  AND l.ts >= ({ARCHIVE_HORIZON_SQL})
+            """)
+            stats['repaired'] += cursor.rowcount
+
+    return stats
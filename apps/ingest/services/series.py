@@ -0,0 +1,268 @@
+"""
+Séries de leitura: resolução de series_id e escrita em reading_point.
+
+Cada combinação device/sensor/asset/tenant/site/labels é uma linha de
+reading_series; a hypertable reading_point guarda apenas
+(series_id, ts, value). Na ingestão, o series_id é resolvido por um cache
+em dois níveis - dicionário local do processo e cache Django (Redis) - e
+só séries novas chegam ao banco (INSERT ... ON CONFLICT DO NOTHING seguido
+de um SELECT das chaves ausentes).
+
+Labels que variam a cada amostra (VOLATILE_LABELS: valor original e estado
+de sensores não numéricos) não fazem parte da identidade da série nem são
+gravados em reading_series - senão cada valor distinto criaria uma série.
+
+reading_series também é o catálogo de séries: cada lote atualiza
+first_ts/last_ts, contagem, soma, min/max e o intervalo estimado das
+séries que receberam pontos (``update_catalog``).
+"""
+import hashlib
+import json
+import logging
+
+from django.core.cache import cache
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+# Máximo de séries no cache local do processo (limpo ao estourar)
+LOCAL_CACHE_MAX = 100000
+
+_local_cache = {}
+
+INSERT_SERIES_SQL = """
+    INSERT INTO reading_series (device_id, sensor_id, asset_tag, tenant, site, labels, created_at,
+                                sample_count, value_sum)
+    VALUES {values}
+    ON CONFLICT DO NOTHING
+"""
+
+SELECT_SERIES_SQL = """
+    SELECT id, device_id, sensor_id, asset_tag, tenant, site, labels
+    FROM reading_series
+    WHERE device_id = ANY(%s) AND sensor_id = ANY(%s)
+"""
+
+INSERT_POINTS_SQL = """
+    INSERT INTO reading_point (series_id, ts, value)
+    VALUES {values}
+    ON CONFLICT (series_id, ts) DO NOTHING
+    RETURNING series_id, ts, value
+"""
+
+# Catálogo: agrega os pontos efetivamente inseridos no lote.
+# interval_seconds é uma EWMA (alpha CATALOG_INTERVAL_ALPHA) do intervalo
+# médio entre o último ponto conhecido e o mais novo do lote.
+UPDATE_CATALOG_SQL = """
+    UPDATE reading_series s
+    SET first_ts = LEAST(s.first_ts, v.first_ts),
+        last_ts = GREATEST(s.last_ts, v.last_ts),
+        sample_count = s.sample_count + v.n,
+        value_sum = s.value_sum + v.total,
+        min_value = LEAST(s.min_value, v.min_value),
+        max_value = GREATEST(s.max_value, v.max_value),
+        interval_seconds = CASE
+            WHEN v.last_ts > COALESCE(s.last_ts, v.first_ts) THEN
+                COALESCE((1 - %(alpha)s) * s.interval_seconds, 0)
+                + CASE WHEN s.interval_seconds IS NULL THEN 1 ELSE %(alpha)s END
+                  * EXTRACT(EPOCH FROM (v.last_ts - COALESCE(s.last_ts, v.first_ts)))
+                  / GREATEST(v.n - CASE WHEN s.last_ts IS NULL THEN 1 ELSE 0 END, 1)
+            ELSE s.interval_seconds
+        END
+    FROM (VALUES {values}) AS v(id, first_ts, last_ts, n, total, min_value, max_value)
+    WHERE s.id = v.id
+"""
+
+CATALOG_INTERVAL_ALPHA = 0.2
+
+# Labels por amostra, fora da identidade da série
+VOLATILE_LABELS = ('original_value', 'state')
+
+
+def _schema_name():
+    return getattr(connection, 'schema_name', 'public')
+
+
+def series_key(device_id, sensor_id, asset_tag=None, tenant=None, site=None, labels=None):
+    """
+    Identidade de uma série (mesma semântica da constraint
+    unique_reading_series), sem os VOLATILE_LABELS.
+    """
+    return (
+        device_id,
+        sensor_id,
+        asset_tag or '',
+        tenant or '',
+        site or '',
+        json.dumps(series_labels(labels), sort_keys=True, separators=(',', ':')),
+    )
+
+
+def series_labels(labels):
+    """Labels gravados na série: os da leitura sem os VOLATILE_LABELS."""
+    return {name: value for name, value in (labels or {}).items() if name not in VOLATILE_LABELS}
+
+
+def _key_for(reading):
+    return series_key(
+        reading.device_id, reading.sensor_id, reading.asset_tag,
+        reading.tenant, reading.site, reading.labels,
+    )
+
+
+def _cache_key(schema, key):
+    digest = hashlib.md5('\x1f'.join(key).encode()).hexdigest()
+    return f"telemetry:series:{schema}:{digest}"
+
+
+def _remember(schema, resolved):
+    if len(_local_cache) + len(resolved) > LOCAL_CACHE_MAX:
+        _local_cache.clear()
+    for key, series_id in resolved.items():
+        _local_cache[(schema, key)] = series_id
+    cache.set_many({_cache_key(schema, key): series_id for key, series_id in resolved.items()}, timeout=None)
+
+
+def resolve_series_ids(readings):
+    """
+    Resolve (criando se preciso) o series_id de cada leitura.
+
+    Returns:
+        Dict {series_key: series_id}
+    """
+    schema = _schema_name()
+    keys = {_key_for(reading): reading for reading in readings}
+
+    resolved = {}
+    missing = []
+    for key in keys:
+        series_id = _local_cache.get((schema, key))
+        if series_id is None:
+            missing.append(key)
+        else:
+            resolved[key] = series_id
+
+    if missing:
+        cache_keys = {_cache_key(schema, key): key for key in missing}
+        found = cache.get_many(list(cache_keys))
+        for cache_key, series_id in found.items():
+            resolved[cache_keys[cache_key]] = series_id
+            _local_cache[(schema, cache_keys[cache_key])] = series_id
+        missing = [key for key in missing if key not in resolved]
+
+    if missing:
+        created = _fetch_or_create(missing, keys)
+        resolved.update(created)
+        # Só publica no cache após o commit: uma série criada em transação
+        # revertida não pode ficar com id em cache
+        transaction.on_commit(lambda: _remember(schema, created))
+
+    return resolved
+
+
+def _fetch_or_create(missing, readings_by_key):
+    params = []
+    for key in missing:
+        reading = readings_by_key[key]
+        params.extend([
+            reading.device_id,
+            reading.sensor_id,
+            reading.asset_tag,
+            reading.tenant,
+            reading.site,
+            key[5],
+        ])
+
+    values = ', '.join(['(%s, %s, %s, %s, %s, %s::jsonb, NOW(), 0, 0)'] * len(missing))
+    wanted = set(missing)
+    resolved = {}
+    with connection.cursor() as cursor:
+        cursor.execute(INSERT_SERIES_SQL.format(values=values), params)
+        cursor.execute(SELECT_SERIES_SQL, [
+            sorted({key[0] for key in missing}),
+            sorted({key[1] for key in missing}),
+        ])
+        for series_id, device_id, sensor_id, asset_tag, tenant, site, labels in cursor.fetchall():
+            if isinstance(labels, str):
+                labels = json.loads(labels)
+            key = series_key(device_id, sensor_id, asset_tag, tenant, site, labels)
+            if key in wanted:
+                resolved[key] = series_id
+
+    logger.info(f"🧬 {len(resolved)} séries resolvidas no banco ({len(missing)} ausentes do cache)")
+    return resolved
+
+
+def insert_readings(readings):
+    """
+    Grava uma lista de Reading (não salvos) em reading_point.
+
+    Pontos duplicados (mesma série e timestamp) são ignorados.
+
+    Returns:
+        Número de pontos efetivamente inseridos
+    """
+    if not readings:
+        return 0
+
+    series_ids = resolve_series_ids(readings)
+
+    # ON CONFLICT não aceita a mesma chave duas vezes no mesmo comando
+    points = {}
+    for reading in readings:
+        points.setdefault((series_ids[_key_for(reading)], reading.ts), reading.value)
+
+    params = []
+    for (series_id, ts), value in points.items():
+        params.extend([series_id, ts, value])
+
+    values = ', '.join(['(%s, %s, %s)'] * len(points))
+    with connection.cursor() as cursor:
+        cursor.execute(INSERT_POINTS_SQL.format(values=values), params)
+        inserted = cursor.fetchall()
+
+    update_catalog(inserted)
+    return len(inserted)
+
+
+def update_catalog(points):
+    """
+    Atualiza o catálogo (reading_series) com pontos recém-inseridos.
+
+    Args:
+        points: lista de (series_id, ts, value)
+    """
+    if not points:
+        return
+
+    stats = {}
+    for series_id, ts, value in points:
+        entry = stats.get(series_id)
+        if entry is None:
+            stats[series_id] = [ts, ts, 1, value or 0.0, value, value]
+            continue
+        entry[0] = min(entry[0], ts)
+        entry[1] = max(entry[1], ts)
+        entry[2] += 1
+        entry[3] += value or 0.0
+        if value is not None:
+            entry[4] = value if entry[4] is None else min(entry[4], value)
+            entry[5] = value if entry[5] is None else max(entry[5], value)
+
+    params = {'alpha': CATALOG_INTERVAL_ALPHA}
+    rows = []
+    for i, (series_id, entry) in enumerate(sorted(stats.items())):
+        keys = [f'{name}{i}' for name in ('id', 'f', 'l', 'n', 't', 'mn', 'mx')]
+        params.update(zip(keys, [series_id, *entry]))
+        rows.append(
+            f"(%({keys[0]})s::int, %({keys[1]})s::timestamptz, %({keys[2]})s::timestamptz, "
+            f"%({keys[3]})s::int, %({keys[4]})s::float8, %({keys[5]})s::float8, %({keys[6]})s::float8)"
+        )
+
+    with connection.cursor() as cursor:
+        cursor.execute(UPDATE_CATALOG_SQL.format(values=', '.join(rows)), params)
+
+
+def clear_local_cache():
+    """Limpa o cache local de séries (ex.: após restaurar um backup)."""
+    _local_cache.clear()
@@ -0,0 +1,299 @@
+"""
+Sensores binários/enumerados: armazenamento por transição de estado.
+
+Contatos de porta e sinais de compressor mudam poucas vezes por dia, mas
+chegam a cada poucos segundos. Leituras com ``labels.value_type`` boolean
+ou string não vão para reading_point: a ingestão grava em reading_state
+(StateTransition) apenas quando o estado muda, fechando a transição
+anterior com ended_at/duration_seconds.
+
+Amostras mais antigas que o estado atual da série (atrasadas/reenviadas)
+são ignoradas. reading_latest continua recebendo todas as amostras.
+
+Helpers de consulta (tempo em estado, ciclos, estado em um instante) e a
+renderização dos históricos (raw e buckets) usam apenas as transições.
+"""
+import hashlib
+import logging
+from datetime import timedelta
+
+from django.db import connection
+from django.utils import timezone
+
+from .history_cache import BUCKET_SECONDS, SCOPE_COLUMNS, floor_bucket
+
+logger = logging.getLogger(__name__)
+
+STATE_VALUE_TYPES = ('boolean', 'string')
+
+# Um lock por série (device, sensor) até o fim da transação: sem linha
+# aberta, FOR UPDATE não bloqueia nada e dois lotes abririam o mesmo estado
+LOCK_SQL = "SELECT pg_advisory_xact_lock(key) FROM unnest(%s::bigint[]) AS key"
+
+OPEN_SQL = """
+    SELECT device_id, sensor_id, state, started_at
+    FROM reading_state
+    WHERE device_id = ANY(%s) AND ended_at IS NULL
+    ORDER BY started_at
+    FOR UPDATE
+"""
+
+CLOSE_SQL = """
+    UPDATE reading_state
+    SET ended_at = %s,
+        duration_seconds = EXTRACT(EPOCH FROM (%s - started_at))
+    WHERE device_id = %s AND sensor_id = %s
+      AND ended_at IS NULL AND started_at < %s
+"""
+
+
+def is_state_reading(reading):
+    """Leitura de sensor binário/enumerado (parser marcou value_type)."""
+    return (reading.labels or {}).get('value_type') in STATE_VALUE_TYPES
+
+
+def _state_of(reading):
+    labels = reading.labels or {}
+    if labels.get('state') is not None:
+        return str(labels['state'])
+    if labels.get('value_type') == 'boolean':
+        return 'on' if reading.value else 'off'
+    return str(labels.get('original_value', reading.value))
+
+
+def _value_of(reading):
+    return reading.value if (reading.labels or {}).get('value_type') == 'boolean' else None
+
+
+def _lock_key(device_id, sensor_id):
+    """Chave bigint estável (entre processos) do advisory lock de uma série."""
+    digest = hashlib.blake2b(f"{device_id}\x1f{sensor_id}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'big', signed=True)
+
+
+def record_transitions(readings):
+    """
+    Grava as mudanças de estado de uma lista de Reading (não salvos).
+
+    Deve rodar dentro da transação da ingestão: cada série é serializada
+    por um advisory lock (também quando ainda não tem linha aberta) e as
+    linhas abertas são bloqueadas (FOR UPDATE) até o commit.
+
+    Returns:
+        Número de transições criadas
+    """
+    from apps.ingest.models import StateTransition
+
+    if not readings:
+        return 0
+
+    by_series = {}
+    for reading in sorted(readings, key=lambda r: r.ts):
+        by_series.setdefault((reading.device_id, reading.sensor_id), []).append(reading)
+
+    with connection.cursor() as cursor:
+        # Ordem fixa das chaves: lotes concorrentes não entram em deadlock
+        cursor.execute(LOCK_SQL, [sorted({_lock_key(*key) for key in by_series})])
+        cursor.execute(OPEN_SQL, [list({device_id for device_id, _ in by_series})])
+        current = {(device_id, sensor_id): (state, started_at)
+                   for device_id, sensor_id, state, started_at in cursor.fetchall()}
+
+    to_insert = []
+    to_close = []
+    for key, series_readings in by_series.items():
+        state = current.get(key)
+        pending = None
+        for reading in series_readings:
+            new_state = _state_of(reading)
+            if state is not None and (reading.ts <= state[1] or new_state == state[0]):
+                continue
+            if pending is not None:
+                pending.ended_at = reading.ts
+                pending.duration_seconds = (reading.ts - pending.started_at).total_seconds()
+            elif state is not None:
+                to_close.append((reading.ts, reading.ts, key[0], key[1], reading.ts))
+            pending = StateTransition(
+                device_id=reading.device_id,
+                sensor_id=reading.sensor_id,
+                asset_tag=reading.asset_tag,
+                state=new_state,
+                value=_value_of(reading),
+                started_at=reading.ts,
+            )
+            to_insert.append(pending)
+            state = (new_state, reading.ts)
+
+    if to_close:
+        with connection.cursor() as cursor:
+            cursor.executemany(CLOSE_SQL, to_close)
+    if to_insert:
+        StateTransition.objects.bulk_create(to_insert, ignore_conflicts=True)
+
+    return len(to_insert)
+
+
+# =============================================================================
+# Consultas
+# =============================================================================
+
+def _scope_filter(scope, key, sensor_ids):
+    where = f"{SCOPE_COLUMNS[scope]} = %s"
+    params = [key]
+    if sensor_ids:
+        where += " AND sensor_id = ANY(%s)"
+        params.append(list(sensor_ids))
+    return where, params
+
+
+def state_at(scope, key, sensor_id, ts):
+    """
+    Estado de um sensor no instante ``ts``.
+
+    Returns:
+        Dict {state, value, since, until} ou None (sem transição anterior)
+    """
+    where, params = _scope_filter(scope, key, [sensor_id])
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            SELECT state, value, started_at, ended_at
+            FROM reading_state
+            WHERE {where} AND started_at <= %s
+            ORDER BY started_at DESC
+            LIMIT 1
+        """, params + [ts])
+        row = cursor.fetchone()
+    if row is None:
+        return None
+    return {'state': row[0], 'value': row[1], 'since': row[2], 'until': row[3]}
+
+
+def summarize(scope, key, ts_from, ts_to, sensor_ids=None):
+    """
+    Tempo em cada estado e número de ciclos (entradas no estado) na janela.
+
+    Transições são recortadas em [ts_from, ts_to); o estado atual conta
+    até agora.
+
+    Returns:
+        Dict {sensor_id: {state: {'seconds': float, 'cycles': int}}}
+    """
+    where, params = _scope_filter(scope, key, sensor_ids)
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            SELECT sensor_id, state,
+                   SUM(GREATEST(EXTRACT(EPOCH FROM (
+                       LEAST(COALESCE(ended_at, now()), %s) - GREATEST(started_at, %s)
+                   )), 0)) AS seconds,
+                   COUNT(*) FILTER (WHERE started_at >= %s) AS cycles
+            FROM reading_state
+            WHERE {where}
+              AND started_at < %s
+              AND (ended_at IS NULL OR ended_at > %s)
+            GROUP BY sensor_id, state
+        """, [ts_to, ts_from, ts_from] + params + [ts_to, ts_from])
+        rows = cursor.fetchall()
+
+    result = {}
+    for sensor_id, state, seconds, cycles in rows:
+        result.setdefault(sensor_id, {})[state] = {'seconds': float(seconds or 0), 'cycles': cycles}
+    return result
+
+
+def on_time(scope, key, sensor_id, ts_from, ts_to, state='on'):
+    """Segundos em ``state`` na janela."""
+    return summarize(scope, key, ts_from, ts_to, [sensor_id]).get(sensor_id, {}).get(state, {}).get('seconds', 0.0)
+
+
+def cycle_count(scope, key, sensor_id, ts_from, ts_to, state='on'):
+    """Quantas vezes o sensor entrou em ``state`` na janela."""
+    return summarize(scope, key, ts_from, ts_to, [sensor_id]).get(sensor_id, {}).get(state, {}).get('cycles', 0)
+
+
+def _transitions(scope, key, ts_from, ts_to, sensor_ids):
+    where, params = _scope_filter(scope, key, sensor_ids)
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            SELECT sensor_id, state, value, started_at, ended_at
+            FROM reading_state
+            WHERE {where}
+              AND started_at <= %s
+              AND (ended_at IS NULL OR ended_at > %s)
+            ORDER BY sensor_id, started_at
+        """, params + [ts_to, ts_from])
+        return cursor.fetchall()
+
+
+def raw_rows(scope, key, ts_from, ts_to, sensor_ids=None):
+    """
+    Pontos de histórico raw a partir das transições.
+
+    Um ponto por transição (o estado vigente em ts_from entra em ts_from)
+    e um ponto final no fim da janela para desenhar o degrau.
+
+    Returns:
+        Lista de dicts {ts, sensor_id, value, state} (sem ordenação)
+    """
+    end = min(ts_to, timezone.now())
+    rows = []
+    last = {}
+    for sensor_id, state, value, started_at, ended_at in _transitions(scope, key, ts_from, ts_to, sensor_ids):
+        rows.append({'ts': max(started_at, ts_from), 'sensor_id': sensor_id, 'value': value, 'state': state})
+        last[sensor_id] = (state, value, ended_at)
+    for sensor_id, (state, value, ended_at) in last.items():
+        tail = min(ended_at, end) if ended_at else end
+        if rows and tail > ts_from:
+            rows.append({'ts': tail, 'sensor_id': sensor_id, 'value': value, 'state': state})
+    return rows
+
+
+def bucket_rows(scope, key, interval, ts_from, ts_to, sensor_ids=None):
+    """
+    Buckets agregados a partir das transições.
+
+    avg_value é ponderado pelo tempo (fração "on" para booleanos), count é
+    o número de transições iniciadas no bucket e ``state`` é o estado no
+    fim do bucket. Enumerados têm valores numéricos None.
+
+    Returns:
+        Lista de dicts no formato de history_cache.get_history_buckets
+        acrescidos de ``state``
+    """
+    width = timedelta(seconds=BUCKET_SECONDS[interval])
+    start = floor_bucket(ts_from, interval)
+    end = min(ts_to, timezone.now())
+
+    buckets = {}
+    for sensor_id, state, value, started_at, ended_at in _transitions(scope, key, start, end, sensor_ids):
+        segment_start = max(started_at, start)
+        segment_end = min(ended_at or end, end)
+        bucket = floor_bucket(segment_start, interval)
+        while bucket < segment_end:
+            overlap = (min(segment_end, bucket + width) - max(segment_start, bucket)).total_seconds()
+            row = buckets.setdefault((bucket, sensor_id), {
+                'bucket': bucket,
+                'sensor_id': sensor_id,
+                'weighted': 0.0,
+                'covered': 0.0,
+                'min_value': None,
+                'max_value': None,
+                'count': 0,
+            })
+            if value is not None:
+                row['weighted'] += value * overlap
+                row['covered'] += overlap
+                row['min_value'] = value if row['min_value'] is None else min(row['min_value'], value)
+                row['max_value'] = value if row['max_value'] is None else max(row['max_value'], value)
+            if bucket <= started_at < bucket + width:
+                row['count'] += 1
+            row['last_value'] = value
+            row['state'] = state
+            bucket += width
+
+    rows = []
+    for row in buckets.values():
+        covered = row.pop('covered')
+        weighted = row.pop('weighted')
+        row['avg_value'] = weighted / covered if covered else None
+        rows.append(row)
+    rows.sort(key=lambda row: (row['bucket'], row['sensor_id']))
+    return rows
@@ -0,0 +1,229 @@
+"""
+Estatísticas vetorizadas de sensores (NumPy) para o resumo do device.
+
+A janela do device é lida uma única vez (uma consulta em reading_point) e
+separada em arrays por sensor; todas as métricas pedidas são calculadas
+sobre esses arrays:
+
+- basic:         count, avg, min, max, stddev (amostral, como STDDEV do Postgres)
+- percentiles:   p5, p50, p95
+- histogram:     HISTOGRAM_BINS faixas entre min e max (edges + counts)
+- time_in_range: segundos abaixo de thresholds.min, acima de thresholds.max e
+                 dentro da faixa (step-hold; lacunas > MAX_GAP_FACTOR x
+                 intervalo mediano não contam)
+- rate:          maior subida e maior queda por minuto
+
+O resultado é cacheado por device, janela e conjunto de métricas; o fim da
+janela é alinhado a CACHE_TIMEOUT para que pollings consecutivos reutilizem
+o mesmo cálculo.
+"""
+import logging
+from datetime import timedelta
+
+import numpy as np
+from django.core.cache import cache
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+METRICS = ('basic', 'percentiles', 'histogram', 'time_in_range', 'rate')
+DEFAULT_METRICS = ('basic',)
+
+HISTOGRAM_BINS = 10
+MAX_GAP_FACTOR = 3
+CACHE_TIMEOUT = 60
+
+WINDOW_SQL = """
+    SELECT s.sensor_id, EXTRACT(EPOCH FROM p.ts)::float8, p.value
+    FROM reading_series s
+    JOIN reading_point p ON p.series_id = s.id
+    WHERE s.device_id = %(device_id)s
+      AND s.last_ts >= %(ts_from)s
+      AND p.ts >= %(ts_from)s
+      AND p.ts < %(ts_to)s
+    ORDER BY s.sensor_id, p.ts
+"""
+
+
+def parse_metrics(value):
+    """
+    Interpreta o parâmetro ``metrics`` (lista separada por vírgula ou 'all').
+
+    Raises:
+        ValueError: métrica desconhecida
+    """
+    if not value:
+        return DEFAULT_METRICS
+    if value == 'all':
+        return METRICS
+    requested = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = [name for name in requested if name not in METRICS]
+    if unknown:
+        raise ValueError(f"Unknown metrics: {', '.join(unknown)}")
+    return tuple(name for name in METRICS if name in requested)
+
+
+def load_window(device_id, ts_from, ts_to):
+    """
+    Leituras do device na janela, separadas por sensor.
+
+    Returns:
+        Dict {sensor_id: (ts, values)} com arrays float64 (ts em epoch)
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(WINDOW_SQL, {'device_id': device_id, 'ts_from': ts_from, 'ts_to': ts_to})
+        rows = cursor.fetchall()
+
+    if not rows:
+        return {}
+
+    sensor_ids, ts, values = zip(*rows)
+    sensor_ids = np.asarray(sensor_ids, dtype=object)
+    ts = np.asarray(ts, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64)
+
+    # Linhas já vêm ordenadas por sensor: fatia nos pontos de troca
+    changes = np.flatnonzero(sensor_ids[1:] != sensor_ids[:-1]) + 1
+    boundaries = [0, *changes.tolist(), len(sensor_ids)]
+
+    return {
+        sensor_ids[start]: (ts[start:end], values[start:end])
+        for start, end in zip(boundaries, boundaries[1:])
+    }
+
+
+def _hold_durations(ts):
+    """Duração de cada amostra até a próxima (a última não conta)."""
+    if len(ts) < 2:
+        return np.zeros(len(ts))
+    dt = np.diff(ts)
+    limit = MAX_GAP_FACTOR * np.median(dt)
+    dt = np.where(dt > limit, 0.0, dt)
+    return np.append(dt, 0.0)
+
+
+def compute_sensor(ts, values, metrics, thresholds=None):
+    """
+    Métricas de um sensor.
+
+    Args:
+        ts: epoch em segundos (ordenado)
+        values: valores
+        metrics: nomes de METRICS
+        thresholds: dict do Sensor ({'min', 'max', ...})
+
+    Returns:
+        Dict com as chaves das métricas pedidas
+    """
+    result = {}
+    count = len(values)
+
+    if 'basic' in metrics:
+        result.update({
+            'avg': float(values.mean()) if count else None,
+            'min': float(values.min()) if count else None,
+            'max': float(values.max()) if count else None,
+            'stddev': float(values.std(ddof=1)) if count > 1 else None,
+            'count': count,
+        })
+
+    if 'percentiles' in metrics:
+        if count:
+            p5, p50, p95 = np.percentile(values, [5, 50, 95])
+            result['percentiles'] = {'p5': float(p5), 'p50': float(p50), 'p95': float(p95)}
+        else:
+            result['percentiles'] = None
+
+    if 'histogram' in metrics:
+        if count:
+            counts, edges = np.histogram(values, bins=HISTOGRAM_BINS)
+            result['histogram'] = {'edges': edges.tolist(), 'counts': counts.tolist()}
+        else:
+            result['histogram'] = None
+
+    if 'time_in_range' in metrics:
+        low = (thresholds or {}).get('min')
+        high = (thresholds or {}).get('max')
+        if count and (low is not None or high is not None):
+            held = _hold_durations(ts)
+            below = values < low if low is not None else np.zeros(count, dtype=bool)
+            above = values > high if high is not None else np.zeros(count, dtype=bool)
+            result['time_in_range'] = {
+                'low': low,
+                'high': high,
+                'below_seconds': float(held[below].sum()),
+                'above_seconds': float(held[above].sum()),
+                'within_seconds': float(held[~(below | above)].sum()),
+            }
+        else:
+            result['time_in_range'] = None
+
+    if 'rate' in metrics:
+        if count > 1:
+            dt = np.diff(ts)
+            valid = dt > 0
+            slopes = np.diff(values)[valid] / dt[valid] * 60.0
+            result['rate'] = {
+                'max_rise_per_min': float(slopes.max()) if slopes.size else None,
+                'max_fall_per_min': float(slopes.min()) if slopes.size else None,
+            }
+        else:
+            result['rate'] = None
+
+    return result
+
+
+def _sensor_thresholds(device_id):
+    from apps.assets.models import Sensor
+
+    return dict(
+        Sensor.objects.filter(device__mqtt_client_id=device_id).values_list('tag', 'thresholds')
+    )
+
+
+def get_device_statistics(device_id, ts_from, ts_to, metrics=DEFAULT_METRICS):
+    """
+    Estatísticas por sensor do device na janela (cacheadas).
+
+    O fim da janela é alinhado para baixo a CACHE_TIMEOUT segundos.
+
+    Returns:
+        Tupla (by_sensor, totals):
+        - by_sensor: {sensor_id: métricas}
+        - totals: {total_readings, sensor_count, avg_interval_seconds}
+    """
+    aligned_to = ts_to - timedelta(seconds=ts_to.timestamp() % CACHE_TIMEOUT)
+    aligned_from = aligned_to - (ts_to - ts_from)
+    schema = getattr(connection, 'schema_name', 'public')
+    key = (
+        f"telemetry:stats:{schema}:{device_id}:{int(aligned_from.timestamp())}:"
+        f"{int(aligned_to.timestamp())}:{','.join(metrics)}"
+    )
+
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
+    window = load_window(device_id, aligned_from, aligned_to)
+    thresholds = _sensor_thresholds(device_id) if 'time_in_range' in metrics else {}
+
+    by_sensor = {
+        sensor_id: compute_sensor(ts, values, metrics, thresholds.get(sensor_id))
+        for sensor_id, (ts, values) in window.items()
+    }
+
+    total = sum(len(values) for _, values in window.values())
+    if total:
+        first = min(ts[0] for ts, _ in window.values())
+        last = max(ts[-1] for ts, _ in window.values())
+        avg_interval = (last - first) / total
+    else:
+        avg_interval = None
+
+    result = (by_sensor, {
+        'total_readings': total,
+        'sensor_count': len(window),
+        'avg_interval_seconds': avg_interval,
+    })
+    cache.set(key, result, timeout=CACHE_TIMEOUT)
+    return result
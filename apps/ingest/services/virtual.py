@@ -0,0 +1,488 @@
+"""
+Sensores virtuais (derivados) por ativo.
+
+Um VirtualSensor define uma expressão sobre tags de sensores do mesmo
+ativo, por exemplo:
+
+    {CH-001-TEMP-RETURN} - {CH-001-TEMP-SUPPLY}            (delta-T)
+    where({CH-001-POWER-KW} > 1, {CH-001-COOLING-KW} / {CH-001-POWER-KW}, 0)
+
+Tags entre chaves (ou identificadores Python válidos) são entradas. A
+expressão é validada por whitelist de nós AST (aritmética, comparações,
+FUNCTIONS) e avaliada com NumPy - o mesmo avaliador serve para um valor
+(ingestão) e para arrays (backfill).
+
+Na ingestão (``derive``), cada lote que traz ao menos uma entrada de um
+sensor virtual calcula um ponto no ts da entrada mais nova; as demais
+entradas vêm do próprio lote ou de reading_latest e precisam estar a até
+``tolerance_seconds`` desse instante. O resultado é gravado como série
+comum em reading_point (labels ``{"virtual": true}``), no device da
+primeira entrada, ficando disponível para históricos e alertas.
+
+``backfill`` recalcula o histórico: alinha as entradas por as-of (última
+amostra até cada instante, dentro da tolerância) e avalia tudo de uma vez.
+"""
+import ast
+import logging
+import re
+from datetime import datetime, timedelta, timezone as dt_timezone
+from functools import lru_cache
+
+import numpy as np
+from django.core.cache import cache
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+# Definições por ativo (invalidadas por signal ao salvar VirtualSensor/Sensor)
+DEFINITIONS_CACHE_TIMEOUT = 300
+
+MAX_EXPRESSION_LENGTH = 500
+MAX_EXPRESSION_NODES = 200
+
+BACKFILL_BATCH_SIZE = 5000
+
+# Sensores virtuais sobre sensores virtuais
+MAX_CHAIN_DEPTH = 3
+
+VIRTUAL_LABELS = {'virtual': True}
+
+FUNCTIONS = {
+    'abs': np.abs,
+    'sqrt': np.sqrt,
+    'log': np.log,
+    'log10': np.log10,
+    'exp': np.exp,
+    'min': lambda *args: np.minimum.reduce(np.broadcast_arrays(*args)),
+    'max': lambda *args: np.maximum.reduce(np.broadcast_arrays(*args)),
+    'clip': np.clip,
+    'where': np.where,
+}
+
+# Número de argumentos aceito por função: (mínimo, máximo; None = sem limite)
+FUNCTION_ARITY = {
+    'abs': (1, 1),
+    'sqrt': (1, 1),
+    'log': (1, 1),
+    'log10': (1, 1),
+    'exp': (1, 1),
+    'min': (1, None),
+    'max': (1, None),
+    'clip': (3, 3),
+    'where': (3, 3),
+}
+
+_BINARY_OPERATORS = {
+    ast.Add: np.add,
+    ast.Sub: np.subtract,
+    ast.Mult: np.multiply,
+    ast.Div: np.true_divide,
+    ast.Pow: np.power,
+    ast.Mod: np.mod,
+}
+
+_UNARY_OPERATORS = {
+    ast.USub: np.negative,
+    ast.UAdd: np.positive,
+}
+
+_COMPARE_OPERATORS = {
+    ast.Lt: np.less,
+    ast.LtE: np.less_equal,
+    ast.Gt: np.greater,
+    ast.GtE: np.greater_equal,
+    ast.Eq: np.equal,
+    ast.NotEq: np.not_equal,
+}
+
+_TAG_RE = re.compile(r'\{([^{}]+)\}')
+
+
+class Expression:
+    """Expressão compilada: ``inputs`` (tags) e ``evaluate``."""
+
+    def __init__(self, source, body, names):
+        self.source = source
+        self._body = body
+        self._names = names
+        self.inputs = tuple(dict.fromkeys(names.values()))
+
+    def evaluate(self, values):
+        """
+        Avalia a expressão.
+
+        Args:
+            values: dict {tag: float ou np.ndarray}
+
+        Returns:
+            np.ndarray float64 (valores não finitos indicam resultado inválido)
+        """
+        with np.errstate(all='ignore'):
+            return np.asarray(self._eval(self._body, values), dtype=np.float64)
+
+    def _eval(self, node, values):
+        if isinstance(node, ast.Constant):
+            return float(node.value)
+        if isinstance(node, ast.Name):
+            return values[self._names[node.id]]
+        if isinstance(node, ast.BinOp):
+            return _BINARY_OPERATORS[type(node.op)](self._eval(node.left, values), self._eval(node.right, values))
+        if isinstance(node, ast.UnaryOp):
+            return _UNARY_OPERATORS[type(node.op)](self._eval(node.operand, values))
+        if isinstance(node, ast.Compare):
+            left = self._eval(node.left, values)
+            result = True
+            for op, comparator in zip(node.ops, node.comparators):
+                right = self._eval(comparator, values)
+                result = np.logical_and(result, _COMPARE_OPERATORS[type(op)](left, right))
+                left = right
+            return result
+        if isinstance(node, ast.Call):
+            return FUNCTIONS[node.func.id](*(self._eval(arg, values) for arg in node.args))
+        raise ValueError(f"Unsupported expression node: {type(node).__name__}")
+
+
+@lru_cache(maxsize=1024)
+def compile_expression(expression):
+    """
+    Valida e compila uma expressão de sensor virtual.
+
+    Raises:
+        ValueError: sintaxe inválida, construção não permitida, função com
+            número de argumentos errado ou sem entradas
+    """
+    if not expression or len(expression) > MAX_EXPRESSION_LENGTH:
+        raise ValueError(f"Expression must have 1 to {MAX_EXPRESSION_LENGTH} characters")
+
+    names = {}
+
+    def _placeholder(match):
+        tag = match.group(1).strip()
+        placeholder = next((name for name, value in names.items() if value == tag), f"_in{len(names)}")
+        names[placeholder] = tag
+        return placeholder
+
+    source = _TAG_RE.sub(_placeholder, expression)
+    try:
+        tree = ast.parse(source, mode='eval')
+    except SyntaxError as exc:
+        raise ValueError(f"Invalid expression: {exc.msg}") from None
+
+    nodes = list(ast.walk(tree))
+    if len(nodes) > MAX_EXPRESSION_NODES:
+        raise ValueError("Expression is too long")
+
+    allowed = (
+        ast.Expression, ast.BinOp, ast.UnaryOp, ast.Compare, ast.Call, ast.Name, ast.Load, ast.Constant,
+        *_BINARY_OPERATORS, *_UNARY_OPERATORS, *_COMPARE_OPERATORS,
+    )
+    function_nodes = {id(node.func) for node in nodes if isinstance(node, ast.Call)}
+    for node in nodes:
+        if not isinstance(node, allowed):
+            raise ValueError(f"Unsupported construct: {type(node).__name__}")
+        if isinstance(node, ast.Constant) and (isinstance(node.value, bool) or not isinstance(node.value, (int, float))):
+            raise ValueError(f"Unsupported constant: {node.value!r}")
+        if isinstance(node, ast.Call):
+            if not isinstance(node.func, ast.Name) or node.func.id not in FUNCTIONS:
+                raise ValueError(f"Unknown function. Allowed: {', '.join(sorted(FUNCTIONS))}")
+            if node.keywords:
+                raise ValueError("Keyword arguments are not supported")
+            minimum, maximum = FUNCTION_ARITY[node.func.id]
+            if len(node.args) < minimum or (maximum is not None and len(node.args) > maximum):
+                expected = minimum if minimum == maximum else f"at least {minimum}"
+                raise ValueError(f"{node.func.id}() takes {expected} argument(s), got {len(node.args)}")
+        if isinstance(node, ast.Name) and id(node) not in function_nodes:
+            # Identificador simples (sem chaves) também é uma tag
+            names.setdefault(node.id, node.id)
+
+    if not names:
+        raise ValueError("Expression must reference at least one sensor tag")
+
+    return Expression(expression, tree.body, names)
+
+
+# =============================================================================
+# Definições por ativo
+# =============================================================================
+
+def _schema_name():
+    return getattr(connection, 'schema_name', 'public')
+
+
+def definitions_cache_key(schema, asset_tag):
+    return f"virtual_sensors:{schema}:{asset_tag}"
+
+
+def _load_definitions(asset_tags):
+    from apps.assets.models import Sensor, VirtualSensor
+
+    loaded = {asset_tag: [] for asset_tag in asset_tags}
+    virtual_sensors = list(
+        VirtualSensor.objects.filter(asset__tag__in=asset_tags, is_active=True)
+        .values_list('asset__tag', 'tag', 'expression', 'tolerance_seconds')
+    )
+
+    devices = {}
+    for asset_tag, tag, device_id in Sensor.objects.filter(
+        device__asset__tag__in=asset_tags
+    ).order_by('device_id').values_list('device__asset__tag', 'tag', 'device__mqtt_client_id'):
+        devices.setdefault((asset_tag, tag), device_id)
+
+    for asset_tag, tag, expression, tolerance in virtual_sensors:
+        try:
+            inputs = compile_expression(expression).inputs
+        except ValueError as exc:
+            logger.warning(f"⚠️ Sensor virtual {asset_tag}/{tag} ignorado: {exc}")
+            continue
+        loaded[asset_tag].append({
+            'tag': tag,
+            'expression': expression,
+            'inputs': inputs,
+            'tolerance': tolerance,
+            'device_id': next((devices[(asset_tag, i)] for i in inputs if (asset_tag, i) in devices), None),
+        })
+    return loaded
+
+
+def get_asset_definitions(asset_tags):
+    """
+    Sensores virtuais ativos de cada ativo (cacheados).
+
+    Returns:
+        Dict {asset_tag: [{tag, expression, inputs, tolerance, device_id}]}
+    """
+    schema = _schema_name()
+    asset_tags = set(asset_tags)
+    keys = {definitions_cache_key(schema, asset_tag): asset_tag for asset_tag in asset_tags}
+    cached = cache.get_many(list(keys))
+    definitions = {keys[key]: value for key, value in cached.items()}
+
+    missing = asset_tags - set(definitions)
+    if missing:
+        loaded = _load_definitions(missing)
+        cache.set_many({definitions_cache_key(schema, asset_tag): value for asset_tag, value in loaded.items()},
+                       timeout=DEFINITIONS_CACHE_TIMEOUT)
+        definitions.update(loaded)
+
+    return definitions
+
+
+# =============================================================================
+# Ingestão
+# =============================================================================
+
+def _latest_inputs(asset_tag, sensor_ids):
+    """Último valor de cada tag do ativo em reading_latest: {tag: (ts, value)}."""
+    from apps.ingest.models import ReadingLatest
+
+    result = {}
+    rows = ReadingLatest.objects.filter(asset_tag=asset_tag, sensor_id__in=sensor_ids).values_list('sensor_id', 'ts', 'value')
+    for sensor_id, ts, value in rows:
+        if value is not None and (sensor_id not in result or ts > result[sensor_id][0]):
+            result[sensor_id] = (ts, value)
+    return result
+
+
+def derive(readings):
+    """
+    Calcula os sensores virtuais afetados por uma lista de Reading numéricos.
+
+    Sensores virtuais que dependem de outros sensores virtuais são
+    calculados em passadas seguintes (até MAX_CHAIN_DEPTH). Chamar depois
+    de ``latest.upsert_latest`` do lote: entradas fora do lote vêm de
+    reading_latest.
+
+    Returns:
+        Lista de Reading (não salvos) dos sensores virtuais
+    """
+    derived = []
+    for _ in range(MAX_CHAIN_DEPTH):
+        new = _derive_once(list(readings) + derived)
+        if not new:
+            break
+        derived.extend(new)
+    return derived
+
+
+def _derive_once(readings):
+    from apps.ingest.models import Reading
+
+    by_asset = {}
+    for reading in readings:
+        if reading.asset_tag:
+            by_asset.setdefault(reading.asset_tag, []).append(reading)
+    if not by_asset:
+        return []
+
+    definitions = get_asset_definitions(by_asset)
+    derived = []
+    for asset_tag, asset_readings in by_asset.items():
+        batch = {}
+        for reading in asset_readings:
+            if reading.sensor_id not in batch or reading.ts > batch[reading.sensor_id].ts:
+                batch[reading.sensor_id] = reading
+
+        affected = [
+            definition for definition in definitions.get(asset_tag, [])
+            if definition['tag'] not in batch and any(tag in batch for tag in definition['inputs'])
+        ]
+        if not affected:
+            continue
+
+        missing = {tag for definition in affected for tag in definition['inputs'] if tag not in batch}
+        stored = _latest_inputs(asset_tag, missing) if missing else {}
+
+        for definition in affected:
+            trigger = max((batch[tag] for tag in definition['inputs'] if tag in batch), key=lambda r: r.ts)
+            tolerance = timedelta(seconds=definition['tolerance'])
+
+            values = {}
+            for tag in definition['inputs']:
+                ts, value = (batch[tag].ts, batch[tag].value) if tag in batch else stored.get(tag, (None, None))
+                if ts is None or abs(ts - trigger.ts) > tolerance:
+                    break
+                values[tag] = value
+            else:
+                # Uma definição com erro não pode bloquear a gravação do lote bruto
+                try:
+                    result = float(compile_expression(definition['expression']).evaluate(values))
+                except Exception as exc:
+                    logger.warning(f"⚠️ Sensor virtual {asset_tag}/{definition['tag']} não calculado: {exc}")
+                    continue
+                if np.isfinite(result):
+                    derived.append(Reading(
+                        device_id=definition['device_id'] or trigger.device_id,
+                        sensor_id=definition['tag'],
+                        value=result,
+                        labels=dict(VIRTUAL_LABELS),
+                        ts=trigger.ts,
+                        asset_tag=asset_tag,
+                        tenant=trigger.tenant,
+                        site=trigger.site,
+                    ))
+
+    return derived
+
+
+# =============================================================================
+# Backfill
+# =============================================================================
+
+INPUTS_SQL = """
+    SELECT s.sensor_id, s.tenant, s.site, EXTRACT(EPOCH FROM p.ts)::float8, p.value
+    FROM reading_series s
+    JOIN reading_point p ON p.series_id = s.id
+    WHERE s.asset_tag = %(asset_tag)s
+      AND s.sensor_id = ANY(%(sensor_ids)s)
+      AND s.last_ts >= %(ts_from)s
+      AND p.ts >= %(ts_from)s
+      AND p.ts < %(ts_to)s
+"""
+
+
+def align_inputs(grid, inputs, tolerance):
+    """
+    Valor as-of de cada entrada em cada instante da grade.
+
+    Args:
+        grid: instantes (epoch, ordenados)
+        inputs: {tag: (ts, values)} com ts ordenado
+        tolerance: idade máxima da amostra (segundos)
+
+    Returns:
+        Tupla ({tag: valores alinhados}, máscara de instantes com todas as entradas)
+    """
+    aligned = {}
+    complete = np.ones(len(grid), dtype=bool)
+    for tag, (ts, values) in inputs.items():
+        idx = np.searchsorted(ts, grid, side='right') - 1
+        valid = idx >= 0
+        safe_idx = np.clip(idx, 0, None)
+        valid &= (grid - ts[safe_idx]) <= tolerance
+        aligned[tag] = np.where(valid, values[safe_idx], np.nan)
+        complete &= valid
+    return aligned, complete
+
+
+def backfill(virtual_sensor, ts_from, ts_to, batch_size=BACKFILL_BATCH_SIZE):
+    """
+    Calcula o histórico de um VirtualSensor em [ts_from, ts_to).
+
+    Pontos já existentes (mesmo ts) são mantidos.
+
+    Returns:
+        Dict {evaluated, inserted}
+    """
+    from apps.ingest.models import Reading
+    from . import calendar_rollup, history_cache, latest, series
+
+    asset_tag = virtual_sensor.asset.tag
+    expression = compile_expression(virtual_sensor.expression)
+    tolerance = virtual_sensor.tolerance_seconds
+    definition = next(
+        (d for d in get_asset_definitions([asset_tag]).get(asset_tag, []) if d['tag'] == virtual_sensor.tag),
+        None,
+    )
+
+    with connection.cursor() as cursor:
+        cursor.execute(INPUTS_SQL, {
+            'asset_tag': asset_tag,
+            'sensor_ids': list(expression.inputs),
+            'ts_from': ts_from - timedelta(seconds=tolerance),
+            'ts_to': ts_to,
+        })
+        rows = cursor.fetchall()
+
+    stats = {'evaluated': 0, 'inserted': 0}
+    by_tag = {}
+    for sensor_id, tenant, site, epoch, value in rows:
+        by_tag.setdefault(sensor_id, []).append((epoch, value))
+    if set(by_tag) != set(expression.inputs):
+        return stats
+
+    inputs = {}
+    for tag, points in by_tag.items():
+        points = np.array(sorted(points), dtype=np.float64)
+        inputs[tag] = (points[:, 0], points[:, 1])
+
+    grid = np.unique(np.concatenate([ts for ts, _ in inputs.values()]))
+    grid = grid[grid >= ts_from.timestamp()]
+    aligned, complete = align_inputs(grid, inputs, tolerance)
+    values = np.broadcast_to(expression.evaluate(aligned), grid.shape)
+    keep = complete & np.isfinite(values)
+    grid, values = grid[keep], values[keep]
+    stats['evaluated'] = len(grid)
+
+    device_id = (definition or {}).get('device_id') or (
+        virtual_sensor.asset.devices.values_list('mqtt_client_id', flat=True).first()
+    )
+    tenant, site = rows[-1][1], rows[-1][2]
+    readings = []
+    for start in range(0, len(grid), batch_size):
+        readings = [
+            Reading(
+                device_id=device_id,
+                sensor_id=virtual_sensor.tag,
+                value=float(value),
+                labels=dict(VIRTUAL_LABELS),
+                ts=datetime.fromtimestamp(epoch, tz=dt_timezone.utc),
+                asset_tag=asset_tag,
+                tenant=tenant,
+                site=site,
+            )
+            for epoch, value in zip(grid[start:start + batch_size], values[start:start + batch_size])
+        ]
+        with transaction.atomic():
+            stats['inserted'] += series.insert_readings(readings)
+
+    if readings:
+        latest.upsert_latest(readings[-1:])
+        history_cache.invalidate_scope('device', device_id)
+        history_cache.invalidate_scope('asset', asset_tag)
+        calendar_rollup.invalidate_from(asset_tag, ts_from)
+
+    logger.info(
+        f"🧮 Backfill {asset_tag}/{virtual_sensor.tag}: "
+        f"avaliados={stats['evaluated']}, inseridos={stats['inserted']}"
+    )
+    return stats
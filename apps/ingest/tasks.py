@@ -0,0 +1,207 @@
+"""
+Celery tasks for telemetry storage maintenance.
+"""
+import logging
+from datetime import timedelta
+
+from celery import shared_task
+from django.utils import timezone
+from django_tenants.utils import schema_context
+
+from apps.tenants.models import Tenant
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(
+    name='ingest.archive_old_chunks',
+    bind=True,
+    max_retries=3,
+    soft_time_limit=3300,
+    time_limit=3600
+)
+def archive_old_chunks(self):
+    """
+    Arquiva em Parquet (MinIO) os chunks da hypertable reading mais antigos
+    que ``Tenant.archive_after_days`` e remove-os do banco.
+    
+    Tenants sem archive_after_days configurado são ignorados.
+    
+    Execução: Diariamente (configurado no Celery Beat)
+    
+    Returns:
+        dict: Estatísticas da execução (tenants, chunks, rows, bytes, errors)
+    """
+    from apps.ingest.services.archive import archive_chunks
+    
+    logger.info("🗄️ Iniciando arquivamento de chunks antigos...")
+    
+    stats = {
+        'total_tenants': 0,
+        'total_chunks': 0,
+        'total_rows': 0,
+        'hot_bytes': 0,
+        'parquet_bytes': 0,
+        'errors': [],
+    }
+    
+    tenants = Tenant.objects.exclude(slug='public').filter(archive_after_days__isnull=False)
+    
+    for tenant in tenants:
+        horizon = timezone.now() - timedelta(days=tenant.archive_after_days)
+        try:
+            with schema_context(tenant.schema_name):
+                tenant_stats = archive_chunks(horizon)
+        except Exception as e:
+            logger.error(f"❌ Erro ao arquivar tenant {tenant.slug}: {e}", exc_info=True)
+            stats['errors'].append({'tenant': tenant.slug, 'error': str(e)})
+            continue
+        
+        stats['total_tenants'] += 1
+        stats['total_chunks'] += tenant_stats['archived']
+        stats['total_rows'] += tenant_stats['rows']
+        stats['hot_bytes'] += tenant_stats['hot_bytes']
+        stats['parquet_bytes'] += tenant_stats['parquet_bytes']
+        for error in tenant_stats['errors']:
+            stats['errors'].append({'tenant': tenant.slug, **error})
+        
+        if tenant_stats['archived']:
+            logger.info(
+                f"  ✅ {tenant.slug}: {tenant_stats['archived']} chunks, "
+                f"{tenant_stats['rows']} leituras arquivadas"
+            )
+    
+    logger.info(
+        f"✅ Arquivamento concluído: {stats['total_chunks']} chunks, "
+        f"{stats['total_rows']} leituras, {len(stats['errors'])} erros"
+    )
+    return stats
+
+
+@shared_task(
+    name='ingest.tune_chunk_intervals',
+    bind=True,
+    max_retries=3,
+    soft_time_limit=600,
+    time_limit=900
+)
+def tune_chunk_intervals(self):
+    """
+    Ajusta o chunk_time_interval das hypertables de cada tenant para o
+    tamanho alvo (TIMESCALE_CHUNK_SIZING).
+    
+    Execução: Semanalmente (configurado no Celery Beat)
+    
+    Returns:
+        dict: Estatísticas da execução (tenants, changed, errors)
+    """
+    from apps.ingest.services.chunks import tune_chunk_intervals as tune
+    
+    logger.info("📐 Iniciando ajuste de chunk_time_interval...")
+    
+    stats = {
+        'total_tenants': 0,
+        'changed': [],
+        'errors': [],
+    }
+    
+    for tenant in Tenant.objects.exclude(slug='public'):
+        try:
+            with schema_context(tenant.schema_name):
+                tables = tune(apply=True)
+        except Exception as e:
+            logger.error(f"❌ Erro ao ajustar chunks do tenant {tenant.slug}: {e}", exc_info=True)
+            stats['errors'].append({'tenant': tenant.slug, 'error': str(e)})
+            continue
+        
+        stats['total_tenants'] += 1
+        for table in tables:
+            if table['changed']:
+                stats['changed'].append({
+                    'tenant': tenant.slug,
+                    'hypertable': table['hypertable'],
+                    'from': str(table['interval']),
+                    'to': str(table['recommended']),
+                })
+                logger.info(
+                    f"  ✅ {tenant.slug}.{table['hypertable']}: "
+                    f"{table['interval']} → {table['recommended']} ({table['chunks']} chunks)"
+                )
+    
+    logger.info(
+        f"✅ Ajuste de chunks concluído: {stats['total_tenants']} tenants, "
+        f"{len(stats['changed'])} alterações, {len(stats['errors'])} erros"
+    )
+    return stats
+
+
+@shared_task(
+    name='ingest.rollup_closed_days',
+    bind=True,
+    max_retries=3,
+    soft_time_limit=1500,
+    time_limit=1800
+)
+def rollup_closed_days(self, days=7):
+    """
+    Pré-calcula os rollups diários (calendário local do site) dos últimos
+    ``days`` dias fechados de cada ativo.
+    
+    Execução: A cada hora (dias fecham em horários UTC diferentes por fuso)
+    
+    Returns:
+        dict: Estatísticas da execução (tenants, assets, rows, errors)
+    """
+    from apps.ingest.services.calendar_rollup import rollup_recent_days
+    
+    stats = {
+        'total_tenants': 0,
+        'total_assets': 0,
+        'total_rows': 0,
+        'errors': [],
+    }
+    
+    for tenant in Tenant.objects.exclude(slug='public'):
+        try:
+            with schema_context(tenant.schema_name):
+                tenant_stats = rollup_recent_days(days)
+        except Exception as e:
+            logger.error(f"❌ Erro ao calcular rollups do tenant {tenant.slug}: {e}", exc_info=True)
+            stats['errors'].append({'tenant': tenant.slug, 'error': str(e)})
+            continue
+        
+        stats['total_tenants'] += 1
+        stats['total_assets'] += tenant_stats['assets']
+        stats['total_rows'] += tenant_stats['rows']
+    
+    logger.info(
+        f"📅 Rollups diários: {stats['total_rows']} linhas em {stats['total_assets']} ativos, "
+        f"{len(stats['errors'])} erros"
+    )
+    return stats
+
+
+@shared_task(
+    name='ingest.backfill_virtual_sensor',
+    bind=True,
+    max_retries=3,
+    soft_time_limit=3300,
+    time_limit=3600
+)
+def backfill_virtual_sensor(self, schema_name, virtual_sensor_id, days=30):
+    """
+    Calcula o histórico de um sensor virtual nos últimos ``days`` dias
+    (disparado pela API ao criar/alterar a expressão).
+    
+    Returns:
+        dict: {evaluated, inserted}
+    """
+    from apps.assets.models import VirtualSensor
+    from apps.ingest.services.virtual import backfill
+    
+    with schema_context(schema_name):
+        virtual_sensor = VirtualSensor.objects.select_related('asset').filter(pk=virtual_sensor_id).first()
+        if virtual_sensor is None:
+            return {'evaluated': 0, 'inserted': 0}
+        ts_to = timezone.now()
+        return backfill(virtual_sensor, ts_to - timedelta(days=days), ts_to)
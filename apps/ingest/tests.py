@@ -0,0 +1,1182 @@
+import io
+import json
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from types import SimpleNamespace
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
+from zoneinfo import ZoneInfo
+
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Q
+from django.test import SimpleTestCase, override_settings
+from django.utils import timezone
+from django_tenants.test.cases import TenantTestCase
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.assets.models import Asset, Device, Sensor, Site, VirtualSensor
+from apps.common.pagination import decode_cursor, encode_cursor
+from apps.ingest.api_views import ReadingListView
+from apps.ingest.api_views_extended import DeviceSummaryView
+from apps.ingest.models import ArchivedChunk, DailyRollup, Reading, ReadingLatest, ReadingSeries, StateTransition
+from apps.ingest.services import (
+    archive, batch_history, calendar_rollup, chunks, compression, gapfill, history_cache, latest, series, states,
+    statistics, virtual,
+)
+
+
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+START = datetime(2025, 1, 1, 12, 0, tzinfo=dt_timezone.utc)
+
+
+class IngestTenantTestCase(TenantTestCase):
+    """TestCase no schema de um tenant de teste (tabelas de leitura)."""
+
+    @classmethod
+    def setup_tenant(cls, tenant):
+        tenant.name = 'Test'
+        tenant.slug = 'test'
+
+    def setUp(self):
+        cache.clear()
+        series.clear_local_cache()
+
+    def create_chiller(self):
+        """Site, ativo CH-001 e device gw-001 com sensores de retorno/suprimento."""
+        self.site = Site.objects.create(name='Site A')
+        self.asset = Asset.objects.create(tag='CH-001', name='Chiller 1', site=self.site, asset_type='CHILLER')
+        self.device = Device.objects.create(
+            name='Gateway', serial_number='SN-001', asset=self.asset, mqtt_client_id='gw-001'
+        )
+        for tag in ('CH-001-TEMP-RETURN', 'CH-001-TEMP-SUPPLY'):
+            Sensor.objects.create(tag=tag, device=self.device, metric_type='temp_return', unit='celsius')
+
+    def ingest(self, device_id, sensor_id, samples, start, labels=None, asset_tag=None):
+        """Grava (segundos desde start, valor) em reading_point e reading_latest."""
+        readings = [
+            Reading(
+                device_id=device_id,
+                sensor_id=sensor_id,
+                value=value,
+                labels=labels or {},
+                ts=start + timedelta(seconds=offset),
+                asset_tag=asset_tag,
+            )
+            for offset, value in samples
+        ]
+        series.insert_readings(readings)
+        latest.upsert_latest(readings)
+        return readings
+
+
+def compress(mode, deviation, samples, max_interval=900):
+    """Passa (ts, valor) pelo compressor; retorna os pontos gravados."""
+    state = None
+    stored = []
+    for ts, value in samples:
+        points, state = compression.offer(mode, deviation, max_interval, state, ts, value)
+        stored.extend(points)
+    return stored
+
+
+class CompressionTests(SimpleTestCase):
+    """Deadband / swinging door (apps.ingest.services.compression)."""
+
+    def test_deadband_abs_drops_small_changes(self):
+        stored = compress('deadband_abs', 0.5, [(0, 20.0), (10, 20.2), (20, 20.4), (30, 20.6), (40, 20.7)])
+        self.assertEqual(stored, [(0, 20.0), (30, 20.6)])
+
+    def test_deadband_pct_is_relative_to_last_stored(self):
+        stored = compress('deadband_pct', 10, [(0, 100.0), (10, 109.0), (20, 111.0), (30, 121.0), (40, 123.0)])
+        self.assertEqual(stored, [(0, 100.0), (20, 111.0), (40, 123.0)])
+
+    def test_heartbeat_stores_constant_value(self):
+        samples = [(ts, 5.0) for ts in range(0, 400, 10)]
+        stored = compress('deadband_abs', 0.5, samples, max_interval=120)
+        self.assertEqual([ts for ts, _ in stored], [0, 120, 240, 360])
+
+    def test_late_reading_is_stored_without_state_change(self):
+        stored, state = compression.offer('deadband_abs', 0.5, 900, None, 100, 20.0)
+        stored, late_state = compression.offer('deadband_abs', 0.5, 900, state, 50, 20.1)
+        self.assertEqual(stored, [(50, 20.1)])
+        self.assertIs(late_state, state)
+
+    def test_swinging_door_keeps_linear_ramp_endpoints(self):
+        ramp = [(ts, ts * 0.1) for ts in range(0, 110, 10)]
+        flat = [(ts, 10.0) for ts in range(110, 210, 10)]
+        stored = compress('swinging_door', 0.05, ramp + flat)
+        # Rampa e patamar: o vértice (100, 10.0) é gravado quando a porta fecha
+        self.assertIn((100, 10.0), stored)
+        self.assertLess(len(stored), len(ramp + flat) // 2)
+
+    def test_reconstruct_error_is_bounded_by_deviation(self):
+        rng = np.random.default_rng(0)
+        values = np.cumsum(rng.normal(0, 0.2, 500)) + 20
+        samples = [(float(ts), float(value)) for ts, value in zip(range(0, 5000, 10), values)]
+        # Deadband: step-hold dentro do desvio; swinging door: até 2x o desvio
+        for mode, bound in (('deadband_abs', 0.5), ('swinging_door', 1.0)):
+            stored = sorted(compress(mode, 0.5, samples))
+            # Depois do último ponto gravado o trecho ainda está pendente
+            covered = [(ts, value) for ts, value in samples if ts <= stored[-1][0]]
+            errors = [abs(compression.reconstruct(mode, stored, ts) - value) for ts, value in covered]
+            self.assertLess(len(stored), len(samples) // 2, mode)
+            self.assertLessEqual(max(errors), bound, mode)
+
+    def test_reconstruct_step_hold_and_linear(self):
+        stored = [(0, 10.0), (100, 20.0)]
+        self.assertIsNone(compression.reconstruct('deadband_abs', stored, -1))
+        self.assertEqual(compression.reconstruct('deadband_abs', stored, 50), 10.0)
+        self.assertEqual(compression.reconstruct('swinging_door', stored, 50), 15.0)
+        self.assertEqual(compression.reconstruct('swinging_door', stored, 150), 20.0)
+
+
+class ExpressionTests(SimpleTestCase):
+    """Whitelist e avaliação de expressões (apps.ingest.services.virtual)."""
+
+    def test_tags_and_functions(self):
+        expression = virtual.compile_expression('where({CH-001-KW} > 1, {CH-001-COOLING} / {CH-001-KW}, 0)')
+        self.assertEqual(expression.inputs, ('CH-001-KW', 'CH-001-COOLING'))
+        self.assertEqual(float(expression.evaluate({'CH-001-KW': 2.0, 'CH-001-COOLING': 7.0})), 3.5)
+        self.assertEqual(float(expression.evaluate({'CH-001-KW': 0.5, 'CH-001-COOLING': 7.0})), 0.0)
+
+    def test_bare_identifiers_are_tags(self):
+        expression = virtual.compile_expression('abs(temp_return - temp_supply)')
+        self.assertEqual(set(expression.inputs), {'temp_return', 'temp_supply'})
+
+    def test_rejects_constructs_outside_whitelist(self):
+        for source in (
+            '__import__("os").system("true")',
+            '{A}.real',
+            '[{A}][0]',
+            'lambda: {A}',
+            '{A} if {B} else 0',
+            '{A} and {B}',
+            'open({A})',
+            'abs(x={A})',
+            '"text" + {A}',
+            'True + {A}',
+            '1 + 2',
+            '{A} +',
+            '{A} + ' * 200 + '1',
+            'sqrt({A}, {B})',
+            'abs({A}, {A}, {A})',
+            'where({A})',
+            'clip({A}, 0)',
+            'max()',
+        ):
+            with self.assertRaises(ValueError, msg=source):
+                virtual.compile_expression(source)
+
+    def test_invalid_results_are_not_finite(self):
+        expression = virtual.compile_expression('{A} / {B}')
+        self.assertFalse(np.isfinite(expression.evaluate({'A': 1.0, 'B': 0.0})))
+
+
+class AlignInputsTests(SimpleTestCase):
+    """Alinhamento as-of do backfill."""
+
+    def test_as_of_values_within_tolerance(self):
+        grid = np.array([0.0, 30.0, 60.0, 150.0])
+        inputs = {
+            'a': (np.array([0.0, 60.0]), np.array([1.0, 2.0])),
+            'b': (np.array([10.0, 140.0]), np.array([10.0, 20.0])),
+        }
+        aligned, complete = virtual.align_inputs(grid, inputs, tolerance=60)
+        # a: 1, 1, 2, (150 - 60 > 60: vencido)
+        np.testing.assert_array_equal(aligned['a'][:3], [1.0, 1.0, 2.0])
+        self.assertTrue(np.isnan(aligned['a'][3]))
+        # b: sem amostra antes de 10 s
+        self.assertTrue(np.isnan(aligned['b'][0]))
+        np.testing.assert_array_equal(aligned['b'][1:], [10.0, 10.0, 20.0])
+        np.testing.assert_array_equal(complete, [False, True, True, False])
+
+    def test_sample_exactly_at_tolerance_counts(self):
+        aligned, complete = virtual.align_inputs(
+            np.array([100.0]), {'a': (np.array([40.0]), np.array([5.0]))}, tolerance=60
+        )
+        self.assertEqual(aligned['a'][0], 5.0)
+        self.assertTrue(complete[0])
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class DeriveTests(IngestTenantTestCase):
+    """Sensores virtuais calculados na ingestão (virtual.derive)."""
+
+    def setUp(self):
+        super().setUp()
+        self.create_chiller()
+        VirtualSensor.objects.create(
+            asset=self.asset, tag='CH-001-DELTA-T',
+            expression='{CH-001-TEMP-RETURN} - {CH-001-TEMP-SUPPLY}', tolerance_seconds=60,
+        )
+        self.now = timezone.now()
+
+    def batch(self, values, ts):
+        readings = [
+            Reading(device_id='gw-001', sensor_id=tag, value=value, labels={}, ts=ts, asset_tag='CH-001')
+            for tag, value in values.items()
+        ]
+        latest.upsert_latest(readings)
+        return readings
+
+    def test_inputs_in_same_batch(self):
+        derived = virtual.derive(self.batch({'CH-001-TEMP-RETURN': 12.5, 'CH-001-TEMP-SUPPLY': 7.0}, self.now))
+        self.assertEqual(len(derived), 1)
+        self.assertEqual((derived[0].sensor_id, derived[0].value), ('CH-001-DELTA-T', 5.5))
+        self.assertEqual((derived[0].device_id, derived[0].ts), ('gw-001', self.now))
+        self.assertEqual(derived[0].labels, virtual.VIRTUAL_LABELS)
+
+    def test_missing_input_comes_from_reading_latest(self):
+        self.batch({'CH-001-TEMP-SUPPLY': 7.0}, self.now - timedelta(seconds=30))
+        derived = virtual.derive(self.batch({'CH-001-TEMP-RETURN': 12.0}, self.now))
+        self.assertEqual([reading.value for reading in derived], [5.0])
+
+    def test_stale_input_outside_tolerance_skips_point(self):
+        self.batch({'CH-001-TEMP-SUPPLY': 7.0}, self.now - timedelta(minutes=5))
+        self.assertEqual(virtual.derive(self.batch({'CH-001-TEMP-RETURN': 12.0}, self.now)), [])
+
+    def test_chained_virtual_sensor(self):
+        VirtualSensor.objects.create(asset=self.asset, tag='CH-001-DELTA-T-F', expression='{CH-001-DELTA-T} * 1.8')
+        derived = virtual.derive(self.batch({'CH-001-TEMP-RETURN': 12.0, 'CH-001-TEMP-SUPPLY': 7.0}, self.now))
+        self.assertEqual({reading.sensor_id: reading.value for reading in derived},
+                         {'CH-001-DELTA-T': 5.0, 'CH-001-DELTA-T-F': 9.0})
+
+    def test_failing_definition_does_not_block_batch(self):
+        VirtualSensor.objects.create(asset=self.asset, tag='CH-001-BROKEN', expression='{CH-001-TEMP-RETURN} * 2')
+        real_compile = virtual.compile_expression
+
+        def compile_expression(source):
+            if source == '{CH-001-TEMP-RETURN} * 2':
+                return mock.Mock(
+                    inputs=('CH-001-TEMP-RETURN',), evaluate=mock.Mock(side_effect=TypeError('bad arguments'))
+                )
+            return real_compile(source)
+
+        with mock.patch.object(virtual, 'compile_expression', side_effect=compile_expression):
+            derived = virtual.derive(self.batch({'CH-001-TEMP-RETURN': 12.0, 'CH-001-TEMP-SUPPLY': 7.0}, self.now))
+        self.assertEqual([reading.sensor_id for reading in derived], ['CH-001-DELTA-T'])
+
+    def test_derived_series_is_stored_like_any_reading(self):
+        readings = self.batch({'CH-001-TEMP-RETURN': 12.0, 'CH-001-TEMP-SUPPLY': 7.0}, self.now)
+        derived = virtual.derive(readings)
+        series.insert_readings(readings + derived)
+        latest.upsert_latest(derived)
+        row = ReadingLatest.objects.get(device_id='gw-001', sensor_id='CH-001-DELTA-T')
+        self.assertEqual(row.value, 5.0)
+
+
+class StatisticsTests(SimpleTestCase):
+    """Métricas por sensor (apps.ingest.services.statistics)."""
+
+    def test_parse_metrics(self):
+        self.assertEqual(statistics.parse_metrics(None), ('basic',))
+        self.assertEqual(statistics.parse_metrics('all'), statistics.METRICS)
+        # Ordem canônica, espaços e repetições ignorados
+        self.assertEqual(statistics.parse_metrics('rate, percentiles,rate'), ('percentiles', 'rate'))
+        with self.assertRaises(ValueError):
+            statistics.parse_metrics('basic,median')
+
+    def test_basic_and_percentiles(self):
+        ts = np.arange(101, dtype=np.float64) * 60
+        values = np.arange(101, dtype=np.float64)
+        result = statistics.compute_sensor(ts, values, ('basic', 'percentiles'))
+        self.assertEqual(result['count'], 101)
+        self.assertEqual((result['min'], result['avg'], result['max']), (0.0, 50.0, 100.0))
+        self.assertEqual(result['percentiles'], {'p5': 5.0, 'p50': 50.0, 'p95': 95.0})
+
+    def test_histogram_counts_every_sample(self):
+        values = np.random.default_rng(0).normal(20, 2, 500)
+        result = statistics.compute_sensor(np.arange(500.0), values, ('histogram',))
+        self.assertEqual(len(result['histogram']['counts']), statistics.HISTOGRAM_BINS)
+        self.assertEqual(len(result['histogram']['edges']), statistics.HISTOGRAM_BINS + 1)
+        self.assertEqual(sum(result['histogram']['counts']), 500)
+
+    def test_time_in_range_skips_gaps(self):
+        # Amostras a cada 60 s com um buraco de 1 h: o buraco não conta
+        ts = np.array([0, 60, 120, 3720, 3780], dtype=np.float64)
+        values = np.array([10.0, 30.0, 20.0, 5.0, 20.0])
+        result = statistics.compute_sensor(ts, values, ('time_in_range',), {'min': 8, 'max': 25})
+        self.assertEqual(result['time_in_range']['above_seconds'], 60.0)
+        self.assertEqual(result['time_in_range']['below_seconds'], 60.0)
+        self.assertEqual(result['time_in_range']['within_seconds'], 60.0)
+
+    def test_time_in_range_without_thresholds(self):
+        result = statistics.compute_sensor(np.arange(3.0), np.ones(3), ('time_in_range',))
+        self.assertIsNone(result['time_in_range'])
+
+    def test_rate_per_minute(self):
+        ts = np.array([0, 60, 120, 180], dtype=np.float64)
+        values = np.array([10.0, 13.0, 12.0, 8.0])
+        result = statistics.compute_sensor(ts, values, ('rate',))
+        self.assertEqual(result['rate'], {'max_rise_per_min': 3.0, 'max_fall_per_min': -4.0})
+
+    def test_empty_window(self):
+        result = statistics.compute_sensor(np.empty(0), np.empty(0), statistics.METRICS)
+        self.assertEqual(result['count'], 0)
+        self.assertIsNone(result['avg'])
+        for name in ('percentiles', 'histogram', 'time_in_range', 'rate'):
+            self.assertIsNone(result[name])
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class DeviceSummaryViewTests(IngestTenantTestCase):
+    """GET device/<device_id>/summary/ com ``metrics``."""
+
+    def setUp(self):
+        super().setUp()
+        self.user = get_user_model().objects.create_user(
+            username='summary', email='summary@example.com', password='x'
+        )
+        now = timezone.now()
+        self.ingest('dev-1', 'temp', [(minute * 60, 20.0 + minute) for minute in range(10)], now - timedelta(hours=1))
+        self.ingest('dev-1', 'hum', [(0, 50.0)], now - timedelta(minutes=2))
+
+    def get(self, device_id, **params):
+        request = APIRequestFactory().get(f'/api/telemetry/device/{device_id}/summary/', params)
+        force_authenticate(request, user=self.user)
+        return DeviceSummaryView.as_view()(request, device_id=device_id)
+
+    def test_metrics_selects_statistics(self):
+        response = self.get('dev-1', metrics='percentiles,rate')
+        self.assertEqual(response.status_code, 200)
+
+        sensors = {sensor['sensor_id']: sensor for sensor in response.data['sensors']}
+        temp = sensors['temp']['statistics_24h']
+        self.assertEqual(set(temp), {'percentiles', 'rate'})
+        self.assertEqual(temp['percentiles']['p50'], 24.5)
+        self.assertEqual(temp['rate'], {'max_rise_per_min': 1.0, 'max_fall_per_min': 1.0})
+        # Uma amostra: sem taxa
+        self.assertIsNone(sensors['hum']['statistics_24h']['rate'])
+
+        self.assertEqual(response.data['status'], 'ONLINE')
+        self.assertEqual(response.data['statistics']['total_readings_24h'], 11)
+        self.assertEqual(response.data['statistics']['sensors_total'], 2)
+
+    def test_default_metrics_are_basic(self):
+        response = self.get('dev-1')
+        temp = next(sensor for sensor in response.data['sensors'] if sensor['sensor_id'] == 'temp')
+        self.assertEqual(temp['statistics_24h']['count'], 10)
+        self.assertNotIn('percentiles', temp['statistics_24h'])
+
+    def test_unknown_metric_is_rejected(self):
+        self.assertEqual(self.get('dev-1', metrics='median').status_code, 400)
+
+    def test_unknown_device(self):
+        self.assertEqual(self.get('dev-404').status_code, 404)
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class BatchHistoryTests(IngestTenantTestCase):
+    """fetch_batch_history completa cada seletor como DeviceHistoryView."""
+
+    def setUp(self):
+        super().setUp()
+        self.now = timezone.now().replace(microsecond=0)
+        self.ts_from = self.now - timedelta(hours=1)
+        self.ingest('dev-1', 'temp', [(600, 21.0), (1200, 22.0)], self.ts_from)
+        self.ingest('dev-2', 'temp', [(900, 30.0)], self.ts_from)
+
+    def fetch(self, limit=100):
+        selectors = [
+            {'idx': 0, 'scope': 'device', 'key': 'dev-1', 'sensor_ids': []},
+            {'idx': 1, 'scope': 'device', 'key': 'dev-2', 'sensor_ids': ['temp']},
+        ]
+        return batch_history.fetch_batch_history(selectors, 'raw', self.ts_from, self.now, limit)
+
+    def test_hot_rows_per_selector(self):
+        with mock.patch.object(batch_history.archive, 'get_archive_horizon', return_value=None):
+            results = self.fetch()
+        self.assertEqual([row['value'] for row in results[0]], [21.0, 22.0])
+        self.assertEqual([row['value'] for row in results[1]], [30.0])
+
+    def test_archived_rows_before_horizon_are_merged(self):
+        horizon = self.ts_from + timedelta(minutes=5)
+        cold = [{'ts': self.ts_from + timedelta(minutes=1), 'sensor_id': 'temp', 'value': 19.0}]
+        with mock.patch.object(batch_history.archive, 'get_archive_horizon', return_value=horizon), \
+                mock.patch.object(batch_history.archive, 'read_archived_rows', return_value=cold) as read:
+            results = self.fetch(limit=2)
+
+        self.assertEqual([row['value'] for row in results[0]], [19.0, 21.0])
+        read.assert_any_call('device', 'dev-1', self.ts_from, self.now, None)
+        read.assert_any_call('device', 'dev-2', self.ts_from, self.now, ['temp'])
+
+    def test_window_after_horizon_skips_cold_tier(self):
+        with mock.patch.object(batch_history.archive, 'get_archive_horizon', return_value=self.ts_from), \
+                mock.patch.object(batch_history.archive, 'read_archived_rows') as read:
+            self.fetch()
+        read.assert_not_called()
+
+    def test_state_rows_are_included(self):
+        readings = [
+            Reading(
+                device_id='dev-1', sensor_id='door', value=value,
+                labels={'value_type': 'boolean'}, ts=self.ts_from + timedelta(minutes=minute),
+            )
+            for minute, value in ((5, 1.0), (6, 1.0), (30, 0.0))
+        ]
+        states.record_transitions(readings)
+
+        with mock.patch.object(batch_history.archive, 'get_archive_horizon', return_value=None):
+            results = self.fetch()
+
+        door = [(row['ts'], row['state']) for row in results[0] if row['sensor_id'] == 'door']
+        self.assertEqual(door, [
+            (self.ts_from + timedelta(minutes=5), 'on'),
+            (self.ts_from + timedelta(minutes=30), 'off'),
+            (self.now, 'off'),
+        ])
+        self.assertEqual(results[1], [row for row in results[1] if row['sensor_id'] == 'temp'])
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class HistoryCacheTests(IngestTenantTestCase):
+    """Buckets assentados em cache, buckets abertos ao vivo (history_cache)."""
+
+    def setUp(self):
+        super().setUp()
+        self.start = history_cache.floor_bucket(timezone.now() - timedelta(hours=3), '1h')
+        self.end = self.start + timedelta(hours=2)
+        self.ingest('dev-1', 'temp', [(600, 20.0), (1200, 22.0), (4200, 30.0)], self.start)
+
+    def buckets(self):
+        rows, last_modified = history_cache.get_history_buckets('device', 'dev-1', '1h', self.start, self.end)
+        return [(row['bucket'], row['avg_value'], row['last_value'], row['count']) for row in rows], last_modified
+
+    def test_floor_bucket(self):
+        ts = datetime(2025, 1, 1, 12, 7, 31, tzinfo=dt_timezone.utc)
+        self.assertEqual(history_cache.floor_bucket(ts, '5m'), datetime(2025, 1, 1, 12, 5, tzinfo=dt_timezone.utc))
+        self.assertEqual(history_cache.floor_bucket(ts, '1h'), datetime(2025, 1, 1, 12, 0, tzinfo=dt_timezone.utc))
+
+    def test_settled_buckets_are_served_from_cache(self):
+        expected = [
+            (self.start, 21.0, 22.0, 2),
+            (self.start + timedelta(hours=1), 30.0, 30.0, 1),
+        ]
+        rows, last_modified = self.buckets()
+        self.assertEqual(rows, expected)
+        self.assertEqual(last_modified, self.start + timedelta(seconds=4200))
+        self.assertEqual(history_cache.get_cache_stats()['misses'], 2)
+
+        # Leitura gravada sem invalidação: os buckets cacheados não mudam
+        self.ingest('dev-1', 'temp', [(1800, 40.0)], self.start)
+        self.assertEqual(self.buckets()[0], expected)
+        self.assertEqual(history_cache.get_cache_stats()['hits'], 2)
+
+    def test_invalidate_scope_discards_cached_buckets(self):
+        self.buckets()
+        self.ingest('dev-1', 'temp', [(1800, 40.0)], self.start)
+        history_cache.invalidate_scope('device', 'dev-1')
+        rows, _ = self.buckets()
+        self.assertEqual(rows[0], (self.start, 82.0 / 3, 40.0, 3))
+
+    def test_is_late(self):
+        self.assertTrue(history_cache.is_late(timezone.now() - timedelta(minutes=10)))
+        self.assertFalse(history_cache.is_late(timezone.now()))
+
+    def test_conditional_response(self):
+        from django.test import RequestFactory
+        from rest_framework.response import Response
+
+        data = [{'bucket': self.start, 'avg_value': 21.0}]
+        response = history_cache.conditional_response(RequestFactory().get('/'), Response(data), data, self.start)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['ETag'].startswith('W/'))
+
+        request = RequestFactory().get('/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(history_cache.conditional_response(request, Response(data), data, self.start).status_code, 304)
+        changed = [{'bucket': self.start, 'avg_value': 22.0}]
+        self.assertEqual(history_cache.conditional_response(request, Response(changed), changed).status_code, 200)
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class LatestReadingTests(IngestTenantTestCase):
+    """reading_latest: o mais novo vence e repair_latest corrige divergências."""
+
+    def setUp(self):
+        super().setUp()
+        self.start = timezone.now().replace(microsecond=0) - timedelta(hours=1)
+
+    def test_newest_wins_within_and_across_batches(self):
+        self.ingest('dev-1', 'temp', [(60, 21.0), (120, 22.0), (30, 20.0)], self.start)
+        row = ReadingLatest.objects.get(device_id='dev-1', sensor_id='temp')
+        self.assertEqual((row.value, row.ts), (22.0, self.start + timedelta(seconds=120)))
+
+        # Leitura atrasada não sobrescreve; mais nova sim
+        self.ingest('dev-1', 'temp', [(90, 99.0)], self.start)
+        self.assertEqual(ReadingLatest.objects.get(device_id='dev-1', sensor_id='temp').value, 22.0)
+        self.ingest('dev-1', 'temp', [(180, 23.0)], self.start)
+        self.assertEqual(ReadingLatest.objects.get(device_id='dev-1', sensor_id='temp').value, 23.0)
+
+    def test_get_latest_map_returns_only_requested_pairs(self):
+        self.ingest('dev-1', 'temp', [(0, 21.0)], self.start)
+        self.ingest('dev-1', 'hum', [(0, 50.0)], self.start)
+        self.ingest('dev-2', 'temp', [(0, 30.0)], self.start)
+
+        latest_map = latest.get_latest_map([('dev-1', 'temp'), ('dev-2', 'temp'), ('dev-2', 'hum')])
+        self.assertEqual(
+            {pair: row.value for pair, row in latest_map.items()},
+            {('dev-1', 'temp'): 21.0, ('dev-2', 'temp'): 30.0},
+        )
+        self.assertEqual(latest.get_latest_map([]), {})
+
+    def test_repair_latest(self):
+        self.ingest('dev-1', 'temp', [(0, 21.0)], self.start)
+        self.ingest('dev-1', 'hum', [(0, 50.0)], self.start)
+        # Divergências: série sem linha, valor desatualizado e linha órfã
+        series.insert_readings([
+            Reading(device_id='dev-2', sensor_id='temp', value=30.0, labels={}, ts=self.start),
+        ])
+        ReadingLatest.objects.filter(sensor_id='hum').update(value=0.0)
+        ReadingLatest.objects.create(device_id='dev-9', sensor_id='x', value=1.0, labels={}, ts=self.start)
+
+        stats = latest.repair_latest(dry_run=True)
+        self.assertEqual(stats, {'missing': 1, 'stale': 1, 'orphans': 1, 'repaired': 0})
+
+        stats = latest.repair_latest()
+        self.assertEqual(stats['repaired'], 3)
+        self.assertEqual(
+            set(ReadingLatest.objects.values_list('device_id', 'sensor_id', 'value')),
+            {('dev-1', 'temp', 21.0), ('dev-1', 'hum', 50.0), ('dev-2', 'temp', 30.0)},
+        )
+        self.assertEqual(latest.repair_latest(dry_run=True), {'missing': 0, 'stale': 0, 'orphans': 0, 'repaired': 0})
+
+
+class CursorTests(SimpleTestCase):
+    """Cursores opacos da paginação keyset (apps.common.pagination)."""
+
+    def test_round_trip(self):
+        ts = datetime(2025, 1, 1, 12, 0, tzinfo=dt_timezone.utc)
+        token = encode_cursor([ts, 'dev-1', 7])
+        self.assertNotIn('=', token)
+        self.assertEqual(decode_cursor(token), (['2025-01-01T12:00:00+00:00', 'dev-1', 7], False))
+        self.assertEqual(decode_cursor(encode_cursor([1], reverse=True)), ([1], True))
+
+    def test_malformed_tokens(self):
+        for token in ('not-base64!', encode_cursor([1])[:-3], 'eyJ4IjoxfQ', 'eyJ2IjoxfQ'):
+            with self.assertRaises(ValueError, msg=token):
+                decode_cursor(token)
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class ReadingListPaginationTests(IngestTenantTestCase):
+    """GET /api/telemetry/readings/ percorrido por next/previous."""
+
+    def setUp(self):
+        super().setUp()
+        self.user = get_user_model().objects.create_user(username='pages', email='pages@example.com', password='x')
+        start = timezone.now().replace(microsecond=0) - timedelta(hours=1)
+        # Dois sensores com o mesmo ts: a chave desempata por series_id
+        self.ingest('dev-1', 'temp', [(0, 1.0), (60, 2.0), (120, 3.0)], start)
+        self.ingest('dev-1', 'hum', [(60, 4.0), (180, 5.0)], start)
+
+    def get(self, **params):
+        request = APIRequestFactory().get('/api/telemetry/readings/', params)
+        force_authenticate(request, user=self.user)
+        return ReadingListView.as_view()(request)
+
+    def cursor(self, link):
+        return parse_qs(urlparse(link).query)['cursor'][0]
+
+    def test_pages_cover_every_reading_once(self):
+        values, ids, pages = [], [], []
+        response = self.get(page_size=2)
+        while True:
+            self.assertEqual(response.status_code, 200)
+            pages.append([row['value'] for row in response.data['results']])
+            values.extend(pages[-1])
+            ids.extend(row['id'] for row in response.data['results'])
+            if not response.data['next']:
+                break
+            response = self.get(page_size=2, cursor=self.cursor(response.data['next']))
+
+        self.assertEqual(sorted(values), [1.0, 2.0, 3.0, 4.0, 5.0])
+        # id sintetizado (series_id + ts): único por leitura
+        self.assertEqual(len(set(ids)), 5)
+        self.assertEqual(len(pages), 3)
+        self.assertEqual(pages[0][0], 5.0)
+
+        previous = self.get(page_size=2, cursor=self.cursor(response.data['previous']))
+        self.assertEqual([row['value'] for row in previous.data['results']], pages[1])
+
+    def test_invalid_cursor_is_not_found(self):
+        self.assertEqual(self.get(cursor='garbage').status_code, 404)
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class SeriesTests(IngestTenantTestCase):
+    """reading_series + reading_point (apps.ingest.services.series)."""
+
+    def setUp(self):
+        super().setUp()
+        self.start = timezone.now().replace(microsecond=0) - timedelta(hours=1)
+
+    def reading(self, offset, value, sensor_id='temp', labels=None):
+        return Reading(
+            device_id='dev-1', sensor_id=sensor_id, value=value, labels=labels or {},
+            ts=self.start + timedelta(seconds=offset), asset_tag='CH-001',
+        )
+
+    def test_one_series_per_identity(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            inserted = series.insert_readings([
+                self.reading(0, 1.0),
+                self.reading(60, 2.0),
+                self.reading(0, 3.0, labels={'unit': 'C'}),
+                self.reading(0, 4.0, sensor_id='hum'),
+            ])
+        self.assertEqual(inserted, 4)
+        self.assertEqual(ReadingSeries.objects.count(), 3)
+
+        # Séries conhecidas são resolvidas sem consultar o banco
+        series.clear_local_cache()
+        keys = [series.series_key('dev-1', 'temp', 'CH-001'), series.series_key('dev-1', 'hum', 'CH-001')]
+        with self.assertNumQueries(0):
+            resolved = series.resolve_series_ids([self.reading(120, 5.0), self.reading(120, 6.0, sensor_id='hum')])
+        self.assertEqual(set(resolved), set(keys))
+
+    def test_duplicate_points_are_ignored(self):
+        self.assertEqual(series.insert_readings([self.reading(0, 1.0), self.reading(0, 9.0)]), 1)
+        self.assertEqual(series.insert_readings([self.reading(0, 2.0), self.reading(60, 3.0)]), 1)
+        self.assertEqual(
+            list(Reading.objects.filter(device_id='dev-1').order_by('ts').values_list('value', 'asset_tag')),
+            [(1.0, 'CH-001'), (3.0, 'CH-001')],
+        )
+
+    def test_series_key_ignores_label_order(self):
+        self.assertEqual(
+            series.series_key('d', 's', labels={'a': 1, 'b': 2}),
+            series.series_key('d', 's', labels={'b': 2, 'a': 1}),
+        )
+        self.assertNotEqual(series.series_key('d', 's'), series.series_key('d', 's', asset_tag='x'))
+
+    def test_volatile_labels_do_not_create_series(self):
+        labels = {'unit': 'C', 'value_type': 'string'}
+        series.insert_readings([
+            self.reading(offset, 1.0, labels={**labels, 'original_value': value, 'state': value})
+            for offset, value in ((0, 'idle'), (60, 'run'), (120, 'fault'))
+        ])
+        row = ReadingSeries.objects.get()
+        self.assertEqual(row.labels, labels)
+        self.assertEqual(row.sample_count, 3)
+
+
+class IndexCoverageTests(IngestTenantTestCase):
+    """Índices restantes após a auditoria (0010) cobrem as consultas quentes."""
+
+    def plan_indexes(self, queryset):
+        """Índices usados no plano da consulta (varredura sequencial desabilitada)."""
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+            cursor.execute('RESET enable_seqscan')
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+
+        indexes, nodes = set(), [plan[0]['Plan']]
+        while nodes:
+            node = nodes.pop()
+            if 'Index Name' in node:
+                indexes.add(node['Index Name'])
+            nodes.extend(node.get('Plans', []))
+        return indexes
+
+    def test_reading_list_and_keyset_seek_use_ts_index(self):
+        ordered = Reading.objects.order_by('-ts', '-series_id')
+        self.assertIn('reading_point_ts_idx', self.plan_indexes(ordered[:51]))
+        seek = ordered.filter(Q(ts__lt=START) | Q(ts=START, series_id__lt=42))
+        self.assertIn('reading_point_ts_idx', self.plan_indexes(seek[:51]))
+
+    def test_series_history_uses_primary_key(self):
+        history = Reading.objects.filter(series_id=42, ts__gte=START, ts__lt=START + timedelta(hours=1))
+        self.assertIn('reading_point_pkey', self.plan_indexes(history.order_by('ts')))
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class StateTransitionTests(IngestTenantTestCase):
+    """Sensores binários/enumerados gravados por transição (apps.ingest.services.states)."""
+
+    def setUp(self):
+        super().setUp()
+        self.start = history_cache.floor_bucket(timezone.now() - timedelta(hours=3), '1h')
+        self.end = self.start + timedelta(hours=1)
+
+    def at(self, minute):
+        return self.start + timedelta(minutes=minute)
+
+    def samples(self, pairs, sensor_id='compressor', value_type='boolean'):
+        return [
+            Reading(
+                device_id='dev-1', sensor_id=sensor_id, labels={'value_type': value_type, 'state': state},
+                value=1.0 if state == 'on' else 0.0, ts=self.at(minute),
+            )
+            for minute, state in pairs
+        ]
+
+    def record(self, pairs, **kwargs):
+        return states.record_transitions(self.samples(pairs, **kwargs))
+
+    def test_only_changes_are_stored(self):
+        self.assertEqual(self.record([(0, 'on'), (10, 'on'), (20, 'off'), (30, 'off'), (40, 'on')]), 3)
+        # Atrasada, repetida e mudança real em lotes seguintes
+        self.assertEqual(self.record([(35, 'off')]), 0)
+        self.assertEqual(self.record([(50, 'on')]), 0)
+        self.assertEqual(self.record([(70, 'off')]), 1)
+
+        rows = list(StateTransition.objects.order_by('started_at').values_list(
+            'state', 'started_at', 'ended_at', 'duration_seconds'
+        ))
+        self.assertEqual(rows, [
+            ('on', self.at(0), self.at(20), 1200.0),
+            ('off', self.at(20), self.at(40), 1200.0),
+            ('on', self.at(40), self.at(70), 1800.0),
+            ('off', self.at(70), None, None),
+        ])
+
+    def test_series_lock_held_until_commit(self):
+        # Série sem linha aberta: o advisory lock serializa lotes concorrentes
+        self.record([(0, 'on')])
+        self.record([(0, 'open')], sensor_id='door', value_type='string')
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT (classid::bigint << 32) | objid::bigint
+                FROM pg_locks
+                WHERE locktype = 'advisory' AND pid = pg_backend_pid() AND granted
+                """
+            )
+            held = {row[0] for row in cursor.fetchall()}
+        self.assertEqual(held, {states._lock_key('dev-1', 'compressor'), states._lock_key('dev-1', 'door')})
+
+    def test_summarize_and_state_at(self):
+        self.record([(0, 'on'), (20, 'off'), (40, 'on'), (70, 'off')])
+
+        summary = states.summarize('device', 'dev-1', self.start, self.end)
+        self.assertEqual(summary['compressor'], {
+            'on': {'seconds': 2400.0, 'cycles': 2},
+            'off': {'seconds': 1200.0, 'cycles': 1},
+        })
+        self.assertEqual(states.on_time('device', 'dev-1', 'compressor', self.at(10), self.at(50)), 1200.0)
+        self.assertEqual(states.cycle_count('device', 'dev-1', 'compressor', self.at(10), self.at(50)), 1)
+
+        self.assertEqual(states.state_at('device', 'dev-1', 'compressor', self.at(25))['state'], 'off')
+        self.assertIsNone(states.state_at('device', 'dev-1', 'compressor', self.at(-1)))
+
+    def test_bucket_rows_are_time_weighted(self):
+        self.record([(0, 'on'), (20, 'off'), (40, 'on')])
+        rows = states.bucket_rows('device', 'dev-1', '15m', self.start, self.end - timedelta(seconds=1))
+        self.assertEqual(
+            [(row['bucket'], round(row['avg_value'], 4), row['count'], row['state']) for row in rows],
+            [
+                (self.at(0), 1.0, 1, 'on'),
+                (self.at(15), round(1 / 3, 4), 1, 'off'),
+                (self.at(30), round(1 / 3, 4), 1, 'on'),
+                (self.at(45), 1.0, 0, 'on'),
+            ],
+        )
+
+    def test_enum_states_have_no_numeric_value(self):
+        self.record([(0, 'cooling'), (30, 'defrost')], sensor_id='mode', value_type='string')
+        rows = states.raw_rows('device', 'dev-1', self.at(10), self.end)
+        self.assertEqual(
+            [(row['ts'], row['state'], row['value']) for row in rows],
+            [(self.at(10), 'cooling', None), (self.at(30), 'defrost', None), (self.end, 'defrost', None)],
+        )
+
+
+@override_settings(TIMESCALE_CHUNK_SIZING={'TARGET_MB': 256, 'MIN_HOURS': 1, 'MAX_DAYS': 30, 'TOLERANCE': 0.25})
+class ChunkSizingTests(SimpleTestCase):
+    """Recomendação de chunk_time_interval (apps.ingest.services.chunks)."""
+
+    MB = 1024 * 1024
+
+    def test_recommend_interval(self):
+        target = 256 * self.MB
+        # 256 MB por dia -> 1 dia; por 6h -> 6 horas
+        self.assertEqual(chunks.recommend_interval(target / 86400, target), timedelta(days=1))
+        self.assertEqual(chunks.recommend_interval(target / (6 * 3600), target), timedelta(hours=6))
+        # Limites: 1 hora a 30 dias
+        self.assertEqual(chunks.recommend_interval(target, target), timedelta(hours=1))
+        self.assertEqual(chunks.recommend_interval(1, target), timedelta(days=30))
+        self.assertIsNone(chunks.recommend_interval(None, target))
+        self.assertIsNone(chunks.recommend_interval(0, target))
+
+    def test_needs_change_respects_tolerance(self):
+        day = timedelta(days=1)
+        self.assertFalse(chunks.needs_change(day, timedelta(hours=20)))
+        self.assertTrue(chunks.needs_change(day, timedelta(hours=12)))
+        self.assertTrue(chunks.needs_change(day, timedelta(days=7)))
+        self.assertFalse(chunks.needs_change(day, None))
+
+    def test_tune_applies_only_changed_tables(self):
+        inspected = [
+            {'hypertable': 'reading_point', 'interval': timedelta(days=1), 'recommended': timedelta(days=7)},
+            {'hypertable': 'telemetry', 'interval': timedelta(days=1), 'recommended': timedelta(days=1)},
+        ]
+        with mock.patch.object(chunks, 'inspect_hypertables', return_value=inspected), \
+                mock.patch.object(chunks, 'apply_interval') as apply_interval:
+            stats = chunks.tune_chunk_intervals(apply=False)
+            apply_interval.assert_not_called()
+            self.assertEqual([table['changed'] for table in stats], [True, False])
+
+            chunks.tune_chunk_intervals()
+            apply_interval.assert_called_once_with('reading_point', timedelta(days=7))
+
+
+class CalendarPeriodTests(SimpleTestCase):
+    """Aritmética de períodos locais (apps.ingest.services.calendar_rollup)."""
+
+    def test_period_start(self):
+        wednesday = date(2025, 1, 15)
+        self.assertEqual(calendar_rollup.period_start(wednesday, 'day'), wednesday)
+        self.assertEqual(calendar_rollup.period_start(wednesday, 'week'), date(2025, 1, 13))
+        self.assertEqual(calendar_rollup.period_start(date(2025, 1, 19), 'week'), date(2025, 1, 13))
+        self.assertEqual(calendar_rollup.period_start(wednesday, 'month'), date(2025, 1, 1))
+
+    def test_next_period(self):
+        self.assertEqual(calendar_rollup._next_period(date(2025, 1, 13), 'week'), date(2025, 1, 20))
+        self.assertEqual(calendar_rollup._next_period(date(2025, 1, 1), 'month'), date(2025, 2, 1))
+        self.assertEqual(calendar_rollup._next_period(date(2024, 2, 1), 'month'), date(2024, 3, 1))
+        self.assertEqual(calendar_rollup._next_period(date(2024, 12, 1), 'month'), date(2025, 1, 1))
+
+    def test_local_midnight_and_last_closed_day(self):
+        tz = ZoneInfo('America/Sao_Paulo')
+        self.assertEqual(
+            calendar_rollup.local_midnight(date(2025, 1, 15), tz),
+            datetime(2025, 1, 15, 3, 0, tzinfo=dt_timezone.utc),
+        )
+        # 01:00 local: o dia anterior só fecha depois do assentamento
+        now = datetime(2025, 1, 15, 4, 0, tzinfo=dt_timezone.utc)
+        self.assertEqual(calendar_rollup._last_closed_day(tz, now), date(2025, 1, 14))
+        self.assertEqual(calendar_rollup._last_closed_day(tz, now - timedelta(minutes=59)), date(2025, 1, 13))
+
+    def test_combine_weights_average_by_count(self):
+        rows = [(10.0, 5.0, 15.0, 5.0, 15.0, 1), (20.0, 12.0, 30.0, 12.0, 30.0, 3)]
+        self.assertEqual(calendar_rollup._combine(rows), {
+            'avg_value': 17.5, 'min_value': 5.0, 'max_value': 30.0,
+            'first_value': 5.0, 'last_value': 30.0, 'count': 4,
+        })
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class CalendarSeriesTests(IngestTenantTestCase):
+    """Agregados por dia/semana no fuso do site, com rollups dos dias fechados."""
+
+    def setUp(self):
+        super().setUp()
+        self.create_chiller()
+        self.tz = ZoneInfo('America/Sao_Paulo')
+        self.site.timezone = 'America/Sao_Paulo'
+        self.site.save()
+        # Dois dias locais fechados na mesma semana ISO
+        self.day = timezone.now().astimezone(self.tz).date() - timedelta(days=3)
+        if self.day.weekday() == 6:
+            self.day -= timedelta(days=1)
+        midnight = calendar_rollup.local_midnight(self.day + timedelta(days=1), self.tz)
+        series.insert_readings([
+            Reading(device_id='gw-001', sensor_id='energy', value=value, labels={}, ts=ts, asset_tag='CH-001')
+            for ts, value in (
+                (midnight - timedelta(minutes=30), 100.0),
+                (midnight + timedelta(minutes=30), 110.0),
+                (midnight + timedelta(hours=12), 130.0),
+            )
+        ])
+        self.ts_from = calendar_rollup.local_midnight(self.day, self.tz)
+        self.ts_to = midnight + timedelta(hours=23)
+
+    def test_days_follow_the_site_timezone(self):
+        rows, tz_name = calendar_rollup.get_calendar_series('CH-001', 'day', self.ts_from, self.ts_to)
+        self.assertEqual(tz_name, 'America/Sao_Paulo')
+        self.assertEqual(
+            [(row['period_start'], row['count'], row['first_value'], row['delta'], row['closed']) for row in rows],
+            [
+                (calendar_rollup.local_midnight(self.day, self.tz), 1, 100.0, 0.0, True),
+                (calendar_rollup.local_midnight(self.day + timedelta(days=1), self.tz), 2, 110.0, 20.0, True),
+            ],
+        )
+        self.assertEqual(DailyRollup.objects.filter(asset_tag='CH-001').count(), 2)
+
+    def test_week_combines_days_and_invalidation_recomputes(self):
+        rows, _ = calendar_rollup.get_calendar_series('CH-001', 'week', self.ts_from, self.ts_to)
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['period_start'], calendar_rollup.local_midnight(
+            calendar_rollup.period_start(self.day, 'week'), self.tz
+        ))
+        self.assertEqual((rows[0]['count'], rows[0]['avg_value'], rows[0]['delta']), (3, 340.0 / 3, 30.0))
+
+        late = calendar_rollup.local_midnight(self.day, self.tz) + timedelta(hours=12)
+        series.insert_readings([
+            Reading(device_id='gw-001', sensor_id='energy', value=90.0, labels={}, ts=late, asset_tag='CH-001')
+        ])
+        calendar_rollup.invalidate_from('CH-001', late)
+        self.assertFalse(DailyRollup.objects.filter(day__gte=self.day).exists())
+        rows, _ = calendar_rollup.get_calendar_series('CH-001', 'week', self.ts_from, self.ts_to)
+        self.assertEqual((rows[0]['count'], rows[0]['first_value']), (4, 90.0))
+
+
+class GapFillTests(SimpleTestCase):
+    """Série densa por sensor (apps.ingest.services.gapfill.fill_buckets)."""
+
+    def setUp(self):
+        self.start = START
+        self.end = START + timedelta(minutes=9)
+
+    def rows(self, minutes, **extra):
+        return [
+            {
+                'bucket': self.start + timedelta(minutes=minute), 'sensor_id': 'temp',
+                'avg_value': float(minute), 'min_value': float(minute), 'max_value': float(minute),
+                'last_value': float(minute), 'count': 1, **extra,
+            }
+            for minute in minutes
+        ]
+
+    def fill(self, fill, max_gap=None, rows=None):
+        rows = rows if rows is not None else self.rows([0, 2, 8])
+        return gapfill.fill_buckets(rows, '1m', self.start, self.end, fill, max_gap)
+
+    def test_none_keeps_rows(self):
+        rows = self.rows([0, 2, 8])
+        self.assertIs(self.fill('none', rows=rows), rows)
+
+    def test_null_adds_empty_buckets(self):
+        result = self.fill('null')
+        self.assertEqual([row['bucket'] for row in result], [self.start + timedelta(minutes=i) for i in range(10)])
+        self.assertEqual([row['avg_value'] for row in result][:3], [0.0, None, 2.0])
+        self.assertEqual({row['filled'] for row in result if row['count'] == 0}, {False})
+
+    def test_previous_carries_last_value_including_trailing(self):
+        result = self.fill('previous')
+        self.assertEqual([row['avg_value'] for row in result], [0, 0, 2, 2, 2, 2, 2, 2, 8, 8])
+        self.assertEqual([row['filled'] for row in result if row['count'] == 0], [True] * 7)
+
+    def test_linear_interpolates_interior_gaps_only(self):
+        result = self.fill('linear')
+        self.assertEqual([row['avg_value'] for row in result], [0, 1, 2, 3, 4, 5, 6, 7, 8, None])
+        self.assertFalse(result[-1]['filled'])
+
+    def test_max_gap_leaves_long_gaps_empty(self):
+        # 4 buckets: a lacuna de 5 (minutos 3-7) continua vazia
+        result = self.fill('previous', max_gap=240)
+        self.assertEqual([row['avg_value'] for row in result], [0, 0, 2, None, None, None, None, None, 8, 8])
+        result = self.fill('linear', max_gap=240)
+        self.assertEqual([row['avg_value'] for row in result][3:8], [None] * 5)
+
+    def test_state_is_carried_with_previous(self):
+        result = self.fill('previous', rows=self.rows([0], state='on'))
+        self.assertEqual({row['state'] for row in result}, {'on'})
+
+    def test_parse_max_gap(self):
+        self.assertEqual(gapfill.parse_max_gap('900'), 900)
+        self.assertEqual(gapfill.parse_max_gap('15m'), 900)
+        self.assertEqual(gapfill.parse_max_gap('2h'), 7200)
+        self.assertEqual(gapfill.parse_max_gap('1d'), 86400)
+        self.assertIsNone(gapfill.parse_max_gap(''))
+        with self.assertRaises(ValueError):
+            gapfill.parse_max_gap('15 minutes')
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class SeriesCatalogTests(IngestTenantTestCase):
+    """Catálogo em reading_series atualizado a cada lote (series.update_catalog)."""
+
+    def setUp(self):
+        super().setUp()
+        self.start = timezone.now().replace(microsecond=0) - timedelta(hours=1)
+
+    def catalog(self):
+        return ReadingSeries.objects.values(
+            'first_ts', 'last_ts', 'sample_count', 'value_sum', 'min_value', 'max_value', 'interval_seconds'
+        ).get(device_id='dev-1', sensor_id='temp')
+
+    def test_catalog_follows_inserted_points(self):
+        self.ingest('dev-1', 'temp', [(0, 1.0), (60, 2.0), (120, 3.0)], self.start)
+        self.assertEqual(self.catalog(), {
+            'first_ts': self.start, 'last_ts': self.start + timedelta(seconds=120),
+            'sample_count': 3, 'value_sum': 6.0, 'min_value': 1.0, 'max_value': 3.0,
+            'interval_seconds': 60.0,
+        })
+
+        # Intervalo: EWMA com alpha 0.2 (0.8 * 60 + 0.2 * 180)
+        self.ingest('dev-1', 'temp', [(300, 10.0)], self.start)
+        catalog = self.catalog()
+        self.assertAlmostEqual(catalog['interval_seconds'], 84.0)
+        self.assertEqual((catalog['sample_count'], catalog['max_value']), (4, 10.0))
+
+    def test_duplicates_and_late_points(self):
+        self.ingest('dev-1', 'temp', [(0, 1.0), (60, 2.0)], self.start)
+        # Duplicado não conta; atrasado amplia first_ts sem mexer no intervalo
+        self.ingest('dev-1', 'temp', [(60, 99.0), (-60, -5.0)], self.start)
+        catalog = self.catalog()
+        self.assertEqual(catalog['first_ts'], self.start - timedelta(seconds=60))
+        self.assertEqual(catalog['last_ts'], self.start + timedelta(seconds=60))
+        self.assertEqual((catalog['sample_count'], catalog['value_sum']), (3, -2.0))
+        self.assertEqual((catalog['min_value'], catalog['max_value']), (-5.0, 2.0))
+        self.assertEqual(catalog['interval_seconds'], 60.0)
+
+
+class FakeMinio:
+    """Cliente MinIO em memória: objetos por (bucket, nome) e ranges lidos."""
+
+    def __init__(self):
+        self.objects = {}
+        self.ranges = []
+
+    def fput_object(self, bucket, object_name, path, content_type=None):
+        with open(path, 'rb') as f:
+            self.objects[(bucket, object_name)] = f.read()
+
+    def stat_object(self, bucket, object_name):
+        return SimpleNamespace(size=len(self.objects[(bucket, object_name)]))
+
+    def remove_object(self, bucket, object_name):
+        del self.objects[(bucket, object_name)]
+
+    def get_object(self, bucket, object_name, offset=0, length=None):
+        self.ranges.append((offset, length))
+        data = self.objects[(bucket, object_name)][offset:offset + length]
+        return SimpleNamespace(read=lambda: data, close=lambda: None, release_conn=lambda: None)
+
+
+def parquet_bytes(rows, row_group_size):
+    """Parquet no layout do arquivamento: rows = (ts, device_id, sensor_id, asset_tag, value)."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = archive._arrow_schema()
+    columns = list(zip(*rows))
+    table = pa.Table.from_arrays(
+        [pa.array(column, type=field.type) for column, field in zip(columns, schema)]
+        + [pa.array([None] * len(rows), type=pa.string())],
+        schema=schema,
+    )
+    buffer = io.BytesIO()
+    pq.write_table(table, buffer, row_group_size=row_group_size, write_statistics=True)
+    return buffer.getvalue()
+
+
+class ArchiveReadTests(SimpleTestCase):
+    """Leitura da camada fria: nomes, range reads e pruning de row groups."""
+
+    def setUp(self):
+        # Um row group por ativo (10 leituras por minuto cada)
+        self.rows = [
+            (START + timedelta(minutes=minute), f'gw-{asset}', 'temp', f'CH-00{asset}', float(minute))
+            for asset in (1, 2, 3)
+            for minute in range(10)
+        ]
+        self.minio = FakeMinio()
+        self.minio.objects[('bucket', 'obj')] = parquet_bytes(self.rows, row_group_size=10)
+        self.size = len(self.minio.objects[('bucket', 'obj')])
+
+    def test_object_name_for(self):
+        self.assertEqual(
+            archive.object_name_for('umc', '_hyper_1_7_chunk', START, START + timedelta(days=1)),
+            'umc/reading/year=2025/month=01/_hyper_1_7_chunk_20250101T120000_20250102T120000.parquet',
+        )
+
+    def test_range_file_reads_and_seeks(self):
+        data = self.minio.objects[('bucket', 'obj')]
+        source = archive.MinioRangeFile(self.minio, 'bucket', 'obj', self.size)
+
+        self.assertEqual(source.read(4), data[:4])
+        self.assertEqual(source.seek(-8, io.SEEK_END), self.size - 8)
+        self.assertEqual(source.read(), data[-8:])
+        self.assertEqual(source.read(10), b'')
+        self.assertEqual(source.seek(2, io.SEEK_SET), 2)
+        self.assertEqual(source.seek(3, io.SEEK_CUR), 5)
+        buffer = bytearray(6)
+        self.assertEqual(source.readinto(buffer), 6)
+        self.assertEqual(bytes(buffer), data[5:11])
+        self.assertEqual(source.tell(), 11)
+        # Leitura além do fim é limitada ao tamanho do objeto
+        source.seek(self.size - 3)
+        self.assertEqual(source.read(100), data[-3:])
+        self.assertEqual(self.minio.ranges[-1], (self.size - 3, 3))
+
+    def test_select_row_groups_prunes_by_key_and_ts(self):
+        import pyarrow.parquet as pq
+
+        metadata = pq.ParquetFile(io.BytesIO(self.minio.objects[('bucket', 'obj')])).metadata
+        low, high = archive._to_micros(START), archive._to_micros(START + timedelta(minutes=9))
+
+        self.assertEqual(metadata.num_row_groups, 3)
+        self.assertEqual(archive._select_row_groups(metadata, 'asset_tag', ['CH-002'], low, high), [1])
+        self.assertEqual(archive._select_row_groups(metadata, 'asset_tag', ['CH-001', 'CH-003'], low, high), [0, 2])
+        self.assertEqual(archive._select_row_groups(metadata, 'device_id', ['gw-9'], low, high), [])
+        later = archive._to_micros(START + timedelta(hours=1))
+        self.assertEqual(archive._select_row_groups(metadata, 'asset_tag', ['CH-002'], later, later + 1), [])
+
+    def test_parquet_reader_fetches_only_selected_parts(self):
+        import pyarrow.parquet as pq
+
+        rows = [
+            (START + timedelta(seconds=second), f'gw-{asset}', 'temp', f'CH-00{asset}', second * 1.37)
+            for asset in (1, 2, 3)
+            for second in range(20000)
+        ]
+        self.minio.objects[('bucket', 'big')] = parquet_bytes(rows, row_group_size=20000)
+        size = len(self.minio.objects[('bucket', 'big')])
+
+        source = archive.MinioRangeFile(self.minio, 'bucket', 'big', size)
+        table = pq.ParquetFile(source).read_row_groups([1], columns=['ts', 'value'])
+
+        self.assertEqual(table.num_rows, 20000)
+        # Rodapé e os column chunks de um row group, não o objeto inteiro
+        self.assertLess(sum(length for _, length in self.minio.ranges), size / 2)
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class ArchiveChunkTests(IngestTenantTestCase):
+    """archive_chunk: exportação, conferência da contagem e drop."""
+
+    def setUp(self):
+        super().setUp()
+        self.day = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+        self.ingest('gw-001', 'temp', [(minute * 60, float(minute)) for minute in range(5)], self.day,
+                    asset_tag='CH-001')
+        self.chunk = {
+            'chunk_schema': connection.schema_name,
+            'chunk_name': 'reading_point',
+            'range_start': self.day,
+            'range_end': self.day + timedelta(days=1),
+        }
+        self.minio = FakeMinio()
+        patcher = mock.patch.object(archive, 'get_minio_client', return_value=self.minio)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_archives_and_reads_back(self):
+        archived = archive.archive_chunk(self.chunk, bucket='bucket')
+
+        self.assertEqual(archived.row_count, 5)
+        self.assertEqual(archived.parquet_bytes, len(self.minio.objects[('bucket', archived.object_name)]))
+        self.assertFalse(Reading.objects.filter(ts__lt=self.chunk['range_end']).exists())
+        self.assertEqual(archive.get_archive_horizon(), self.chunk['range_end'])
+
+        rows = archive.read_archived_rows('asset', 'CH-001', self.day, self.day + timedelta(minutes=2))
+        self.assertEqual([(row['ts'], row['value']) for row in rows], [
+            (self.day + timedelta(minutes=minute), float(minute)) for minute in range(3)
+        ])
+
+    def test_rows_changed_during_export_abort_without_drop(self):
+        export = archive._export_chunk
+
+        def export_then_late_reading(range_start, range_end, path):
+            rows = export(range_start, range_end, path)
+            self.ingest('gw-001', 'temp', [(3600, 99.0)], self.day, asset_tag='CH-001')
+            return rows
+
+        with mock.patch.object(archive, '_export_chunk', side_effect=export_then_late_reading):
+            with self.assertRaisesRegex(RuntimeError, 'changed during export'):
+                archive.archive_chunk(self.chunk, bucket='bucket')
+
+        # Objeto órfão removido, nada registrado e nenhuma leitura perdida
+        self.assertEqual(self.minio.objects, {})
+        self.assertFalse(ArchivedChunk.objects.exists())
+        self.assertEqual(Reading.objects.filter(ts__lt=self.chunk['range_end']).count(), 6)
+        self.assertIsNone(archive.get_archive_horizon())
@@ -12,9 +12,11 @@ from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from apps.alerts.services import rule_index
 from apps.tenants.models import Tenant
 from .models import Telemetry, Reading
 from .parsers import parser_manager
+from .services import calendar_rollup, compression, history_cache, latest, series, states, virtual
 
 
 logger = logging.getLogger(__name__)
@@ -427,6 +429,9 @@ class IngestView(APIView):
 
                     readings_to_create = []
                     duplicates_skipped = 0
+                    compressed_skipped = 0
+                    state_transitions = 0
+                    virtual_created = 0
 
                     for sensor in sensors:
                         if not isinstance(sensor, dict):
@@ -452,7 +457,7 @@ class IngestView(APIView):
                         )
 
                         # 🔧 PERFORMANCE FIX: Remove redundant .exists() check
-                        # bulk_create with ignore_conflicts=True already handles duplicates
+                        # insert_readings (ON CONFLICT DO NOTHING) already handles duplicates
                         # This .exists() causes N database roundtrips for each sensor
                         
                         readings_to_create.append(
@@ -470,48 +475,60 @@ class IngestView(APIView):
                         )
 
                     if readings_to_create:
-                        # 🔒 SECURITY FIX #4: Use ignore_conflicts to prevent race condition
-                        # Concurrent ingestions can violate unique constraint (device_id, sensor_id, ts)
-                        # Instead of dropping entire batch on IntegrityError, silently skip duplicates
+                        # 🔒 SECURITY FIX #4: duplicados (mesma série e timestamp) são
+                        # ignorados via ON CONFLICT DO NOTHING em vez de derrubar o lote
+                        # 🧬 Pontos estreitos (series_id, ts, value) em reading_point;
+                        # o rowcount do INSERT já é a contagem real de inseridos
+                        # 🔀 Binários/enumerados: apenas mudanças de estado (reading_state)
+                        state_readings = [r for r in readings_to_create if states.is_state_reading(r)]
+                        numeric_readings = [r for r in readings_to_create if not states.is_state_reading(r)]
+                        state_transitions = states.record_transitions(state_readings)
                         
-                        # 🔧 PERFORMANCE FIX: Capture actual insert count
-                        # bulk_create with ignore_conflicts returns empty list in Django
-                        # 🔧 PERFORMANCE FIX (Nov 2025): Use delta calculation instead of 2 range scans
-                        # Audit finding: "Conta linhas antes e depois de cada inserção para calcular 
-                        # o total, mas o resultado é sobrescrito. Além disso, faz duas range scans caras."
-                        # 
-                        # OLD: 2 expensive range scans (before + after)
-                        # NEW: Single count before + delta from bulk_create result
+                        # 🗜️ Sensores com deadband/swinging door descartam amostras redundantes
+                        readings_to_store = compression.apply(numeric_readings)
+                        compressed_skipped = max(len(numeric_readings) - len(readings_to_store), 0)
+                        readings_created = series.insert_readings(readings_to_store) if readings_to_store else 0
+                        duplicates_skipped = len(readings_to_store) - readings_created
                         
-                        # Count existing readings before insert
-                        count_before = Reading.objects.filter(
-                            device_id=device_id,
-                            ts__gte=min(r.ts for r in readings_to_create),
-                            ts__lte=max(r.ts for r in readings_to_create)
-                        ).count()
-                        
-                        # Bulk insert (ignores duplicates silently)
-                        Reading.objects.bulk_create(
-                            readings_to_create, 
-                            ignore_conflicts=True
+                        logger.info(
+                            f"💾 TABELA: reading_point (TimescaleDB hypertable) - "
+                            f"Inseridos={readings_created}, Duplicados ignorados={duplicates_skipped}, "
+                            f"Comprimidos={compressed_skipped}, Total tentativa={len(readings_to_create)}"
                         )
+                        if state_readings:
+                            logger.info(
+                                f"💾 TABELA: reading_state - Transições={state_transitions}, "
+                                f"Amostras de estado={len(state_readings)}"
+                            )
                         
-                        # Count after to get actual inserts (delta method)
-                        count_after = Reading.objects.filter(
-                            device_id=device_id,
-                            ts__gte=min(r.ts for r in readings_to_create),
-                            ts__lte=max(r.ts for r in readings_to_create)
-                        ).count()
+                        # ⚡ Último valor por sensor (newest-timestamp-wins)
+                        latest.upsert_latest(readings_to_create)
                         
-                        # Calculate accurate metrics
-                        readings_created = count_after - count_before
-                        duplicates_skipped = len(readings_to_create) - readings_created
+                        # 🧮 Sensores virtuais do ativo (delta-T, COP...) gravados como séries comuns
+                        virtual_readings = virtual.derive(numeric_readings)
+                        if virtual_readings:
+                            virtual_created = series.insert_readings(virtual_readings)
+                            latest.upsert_latest(virtual_readings)
+                            logger.info(
+                                f"💾 TABELA: reading_point (virtuais) - Inseridos={virtual_created}, "
+                                f"Calculados={len(virtual_readings)}"
+                            )
                         
-                        logger.info(
-                            f"💾 TABELA: reading (TimescaleDB hypertable) - "
-                            f"Inseridos={readings_created}, Duplicados ignorados={duplicates_skipped}, "
-                            f"Total tentativa={len(readings_to_create)}"
-                        )
+                        # 🚨 Regras de alerta avaliadas na hora contra o índice compilado
+                        # (a task periódica alerts.evaluate_rules segue como rede de segurança)
+                        rule_index.dispatch(numeric_readings + virtual_readings, tenant)
+                        
+                        # 📊 Leituras atrasadas alteram buckets já assentados:
+                        # invalida o cache de séries históricas após o commit
+                        oldest_ts = min(r.ts for r in readings_to_create)
+                        if readings_created and history_cache.is_late(oldest_ts):
+                            def _invalidate_history(device_id=device_id, asset_tag=asset_tag, oldest_ts=oldest_ts):
+                                history_cache.invalidate_scope('device', device_id)
+                                if asset_tag:
+                                    history_cache.invalidate_scope('asset', asset_tag)
+                                    calendar_rollup.invalidate_from(asset_tag, oldest_ts)
+                            transaction.on_commit(_invalidate_history)
+                            logger.info(f"🗑️ Cache de histórico invalidado (leituras atrasadas) - device={device_id}")
                         
                         # Atualizar status do device para ONLINE e last_seen
                         try:
@@ -542,6 +559,9 @@ class IngestView(APIView):
                     "timestamp": telemetry.timestamp.isoformat(),
                     "sensors_saved": readings_created,
                     "duplicates_skipped": duplicates_skipped,
+                    "compressed_skipped": compressed_skipped,
+                    "state_transitions": state_transitions,
+                    "virtual_readings": virtual_created,
                     "format": metadata.get('format', 'unknown')
                 }
 
@@ -4,7 +4,7 @@ Django Admin configuration for Control Center (ops app).
 from django.contrib import admin
 from django.utils.html import format_html
 from django.contrib import messages
-from .models import ExportJob, AuditLog
+from .models import ExportJob, AuditLog, RuleEvaluationRun
 from .utils import invalidate_tenants_cache
 
 
@@ -164,3 +164,28 @@ class AuditLogAdmin(admin.ModelAdmin):
             ms
         )
     execution_time_display.short_description = 'Tempo (ms)'
+
+
+@admin.register(RuleEvaluationRun)
+class RuleEvaluationRunAdmin(admin.ModelAdmin):
+    """Admin interface for rule evaluation timings (read-only)."""
+    
+    list_display = [
+        'started_at',
+        'tenant_slug',
+        'chunk',
+        'duration_ms',
+        'rule_count',
+        'triggered',
+        'errors',
+        'timed_out',
+    ]
+    list_filter = ['timed_out', 'tenant_slug']
+    date_hierarchy = 'started_at'
+    ordering = ['-started_at']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
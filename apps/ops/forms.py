@@ -64,11 +64,11 @@ class TelemetryFilterForm(forms.Form):
         help_text="Results per page (max 1000)"
     )
     
-    offset = forms.IntegerField(
+    cursor = forms.CharField(
         required=False,
-        min_value=0,
-        initial=0,
-        help_text="Pagination offset"
+        max_length=512,
+        widget=forms.HiddenInput,
+        help_text="Opaque keyset pagination cursor"
     )
     
     def clean_from_timestamp(self):
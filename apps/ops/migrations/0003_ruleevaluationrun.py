@@ -0,0 +1,58 @@
+# Per-tenant rule evaluation timings (alerts.evaluate_rules chord)
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("ops", "0002_auditlog"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RuleEvaluationRun",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("tenant_slug", models.CharField(max_length=100, verbose_name="Tenant")),
+                (
+                    "chunk",
+                    models.PositiveIntegerField(
+                        default=0,
+                        help_text="Índice do bloco (tenants com muitas regras são divididos)",
+                        verbose_name="Bloco de Regras",
+                    ),
+                ),
+                ("started_at", models.DateTimeField(verbose_name="Iniciado em")),
+                ("duration_ms", models.IntegerField(verbose_name="Duração (ms)")),
+                ("rule_count", models.IntegerField(default=0, verbose_name="Regras")),
+                ("evaluated", models.IntegerField(default=0, verbose_name="Avaliadas")),
+                ("triggered", models.IntegerField(default=0, verbose_name="Disparadas")),
+                ("errors", models.IntegerField(default=0, verbose_name="Erros")),
+                (
+                    "timed_out",
+                    models.BooleanField(
+                        default=False,
+                        help_text="Interrompida pelo soft time limit",
+                        verbose_name="Tempo Esgotado",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Rule Evaluation Run",
+                "verbose_name_plural": "Rule Evaluation Runs",
+                "ordering": ["-started_at"],
+                "indexes": [
+                    models.Index(fields=["tenant_slug", "-started_at"], name="ops_ruleeval_tenant_idx"),
+                    models.Index(fields=["-started_at"], name="ops_ruleeval_started_idx"),
+                ],
+            },
+        ),
+    ]
@@ -307,3 +307,54 @@ class AuditLog(models.Model):
             ip_address=ip_address,
             user_agent=request.META.get('HTTP_USER_AGENT', '')[:500],
         )
+
+
+class RuleEvaluationRun(models.Model):
+    """
+    Per-tenant result of one rule evaluation cycle (alerts.evaluate_rules).
+    
+    One row per tenant task (or per rule chunk for large tenants), written
+    by the chord callback. Used by the ops panel to chart evaluation time.
+    """
+    
+    tenant_slug = models.CharField(
+        max_length=100,
+        verbose_name=_('Tenant'),
+    )
+    
+    chunk = models.PositiveIntegerField(
+        default=0,
+        verbose_name=_('Bloco de Regras'),
+        help_text=_('Índice do bloco (tenants com muitas regras são divididos)')
+    )
+    
+    started_at = models.DateTimeField(
+        verbose_name=_('Iniciado em'),
+    )
+    
+    duration_ms = models.IntegerField(
+        verbose_name=_('Duração (ms)'),
+    )
+    
+    rule_count = models.IntegerField(default=0, verbose_name=_('Regras'))
+    evaluated = models.IntegerField(default=0, verbose_name=_('Avaliadas'))
+    triggered = models.IntegerField(default=0, verbose_name=_('Disparadas'))
+    errors = models.IntegerField(default=0, verbose_name=_('Erros'))
+    
+    timed_out = models.BooleanField(
+        default=False,
+        verbose_name=_('Tempo Esgotado'),
+        help_text=_('Interrompida pelo soft time limit')
+    )
+    
+    class Meta:
+        verbose_name = _('Rule Evaluation Run')
+        verbose_name_plural = _('Rule Evaluation Runs')
+        ordering = ['-started_at']
+        indexes = [
+            models.Index(fields=['tenant_slug', '-started_at'], name='ops_ruleeval_tenant_idx'),
+            models.Index(fields=['-started_at'], name='ops_ruleeval_started_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.tenant_slug}#{self.chunk} - {self.duration_ms}ms - {self.started_at:%Y-%m-%d %H:%M}"
@@ -12,6 +12,8 @@ urlpatterns = [
     path("", views.index, name="index"),
     path("dashboard/", views.telemetry_dashboard, name="dashboard"),
     path("api/chart-data/", views.chart_data_api, name="chart_data_api"),
+    path("api/history-cache/", views.history_cache_stats, name="history_cache_stats"),
+    path("api/rule-evaluation/", views.rule_evaluation_stats, name="rule_evaluation_stats"),
     path("telemetry/", views.telemetry_list, name="telemetry_list"),
     path("telemetry/drilldown/", views.telemetry_drilldown, name="telemetry_drilldown"),
     path("telemetry/export/", views.telemetry_export_csv, name="telemetry_export_csv"),
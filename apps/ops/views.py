@@ -24,10 +24,11 @@ from decimal import Decimal
 import time
 
 from .forms import TelemetryFilterForm
-from .models import ExportJob, AuditLog
+from .models import ExportJob, AuditLog, RuleEvaluationRun
 from .tasks import export_telemetry_async
 from .decorators import audit_action
 from .utils import get_cached_tenants
+from apps.common.pagination import decode_cursor, encode_cursor, estimate_count
 
 
 @staff_member_required
@@ -71,7 +72,11 @@ def telemetry_list(request):
     - to (optional): ISO-8601 timestamp for end
     - bucket (optional): 1m, 5m, or 1h (default: 1m)
     - limit (optional): Results per page (default: 200, max: 1000)
-    - offset (optional): Pagination offset (default: 0)
+    - cursor (optional): Opaque keyset cursor from the previous page
+    
+    Keyset pagination on (bucket, device_id, sensor_id) DESC: deep pages cost
+    the same as the first one. The total is a planner estimate (EXPLAIN),
+    not a count(DISTINCT time_bucket(...)) over the whole range.
     """
     form = TelemetryFilterForm(request.GET)
     
@@ -86,7 +91,18 @@ def telemetry_list(request):
     ts_to = cleaned.get('to_timestamp')
     bucket = cleaned.get('bucket') or '1m'
     limit = cleaned.get('limit') or 200
-    offset = cleaned.get('offset') or 0
+    cursor_token = cleaned.get('cursor') or None
+    
+    # Decode keyset cursor (bucket, device_id, sensor_id)
+    cursor_values, reverse = None, False
+    if cursor_token:
+        try:
+            cursor_values, reverse = decode_cursor(cursor_token)
+            if len(cursor_values) != 3:
+                raise ValueError('Cursor does not match ordering')
+            cursor_values[0] = dt.datetime.fromisoformat(cursor_values[0])
+        except (ValueError, TypeError) as e:
+            return HttpResponseBadRequest(f"Invalid cursor: {e}")
     
     # Get tenant object
     Tenant = get_tenant_model()
@@ -95,88 +111,103 @@ def telemetry_list(request):
     except Tenant.DoesNotExist:
         return HttpResponseBadRequest(f"Tenant '{tenant_slug}' not found")
     
+    # Map bucket to SQL interval
+    bucket_intervals = {
+        '1m': '1 minute',
+        '5m': '5 minutes',
+        '1h': '1 hour',
+    }
+    
+    params = {
+        'bucket_interval': bucket_intervals[bucket],
+        'device_id': device_id or None,
+        'sensor_id': sensor_id or None,
+        'ts_from': ts_from or None,
+        'ts_to': ts_to or None,
+        'limit': limit + 1,  # +1 para saber se há próxima página
+    }
+    
+    # Note: Since we're using real-time aggregation (no materialized CAs),
+    # we'll query the reading table directly with time_bucket
+    base_sql = """
+        SELECT 
+            time_bucket(%(bucket_interval)s, ts) AS bucket,
+            device_id,
+            sensor_id,
+            avg(value) AS avg_value,
+            min(value) AS min_value,
+            max(value) AS max_value,
+            last(value, ts) AS last_value,
+            count(*) AS count
+        FROM reading
+        WHERE 1=1
+          AND (%(device_id)s IS NULL OR device_id = %(device_id)s)
+          AND (%(sensor_id)s IS NULL OR sensor_id = %(sensor_id)s)
+          AND (%(ts_from)s IS NULL OR ts >= %(ts_from)s::timestamptz)
+          AND (%(ts_to)s IS NULL OR ts <= %(ts_to)s::timestamptz)
+          {ts_bound}
+        GROUP BY bucket, device_id, sensor_id
+    """
+    
+    keyset_sql = ''
+    ts_bound = ''
+    if cursor_values:
+        params['cursor_bucket'], params['cursor_device'], params['cursor_sensor'] = cursor_values
+        if reverse:
+            # Página anterior: buckets >= cursor (poda chunks pelo início)
+            ts_bound = "AND ts >= %(cursor_bucket)s::timestamptz"
+            keyset_sql = "WHERE (bucket, device_id, sensor_id) > (%(cursor_bucket)s, %(cursor_device)s, %(cursor_sensor)s)"
+        else:
+            # Próxima página: só precisa ler ts < fim do bucket do cursor
+            ts_bound = "AND ts < %(cursor_bucket)s::timestamptz + %(bucket_interval)s::interval"
+            keyset_sql = "WHERE (bucket, device_id, sensor_id) < (%(cursor_bucket)s, %(cursor_device)s, %(cursor_sensor)s)"
+    
+    direction = 'ASC' if reverse else 'DESC'
+    sql = f"""
+        SELECT * FROM ({base_sql.format(ts_bound=ts_bound)}) agg
+        {keyset_sql}
+        ORDER BY bucket {direction}, device_id {direction}, sensor_id {direction}
+        LIMIT %(limit)s
+    """
+    
     # Query aggregated data using schema_context
     # This ensures proper isolation by executing in the tenant's schema
     data = []
-    total_count = 0
     
     with schema_context(tenant.schema_name):
-        # Note: Since we're using real-time aggregation (no materialized CAs),
-        # we'll query the reading table directly with time_bucket
-        sql = """
-            SELECT 
-                time_bucket(%(bucket_interval)s, ts) AS bucket,
-                device_id,
-                sensor_id,
-                avg(value) AS avg_value,
-                min(value) AS min_value,
-                max(value) AS max_value,
-                last(value, ts) AS last_value,
-                count(*) AS count
-            FROM reading
-            WHERE 1=1
-              AND (%(device_id)s IS NULL OR device_id = %(device_id)s)
-              AND (%(sensor_id)s IS NULL OR sensor_id = %(sensor_id)s)
-              AND (%(ts_from)s IS NULL OR ts >= %(ts_from)s::timestamptz)
-              AND (%(ts_to)s IS NULL OR ts <= %(ts_to)s::timestamptz)
-            GROUP BY bucket, device_id, sensor_id
-            ORDER BY bucket DESC
-            LIMIT %(limit)s OFFSET %(offset)s
-        """
-        
-        # Map bucket to SQL interval
-        bucket_intervals = {
-            '1m': '1 minute',
-            '5m': '5 minutes',
-            '1h': '1 hour',
-        }
-        
-        params = {
-            'bucket_interval': bucket_intervals[bucket],
-            'device_id': device_id or None,
-            'sensor_id': sensor_id or None,
-            'ts_from': ts_from or None,
-            'ts_to': ts_to or None,
-            'limit': limit,
-            'offset': offset,
-        }
-        
         with connection.cursor() as cursor:
             cursor.execute(sql, params)
             rows = cursor.fetchall()
-            
-            for row in rows:
-                data.append({
-                    'bucket': row[0],
-                    'device_id': row[1],
-                    'sensor_id': row[2],
-                    'avg': float(row[3]) if row[3] is not None else None,
-                    'min': float(row[4]) if row[4] is not None else None,
-                    'max': float(row[5]) if row[5] is not None else None,
-                    'last': float(row[6]) if row[6] is not None else None,
-                    'count': row[7],
-                })
-            
-            # Get total count for pagination (approximate)
-            # For exact count on large datasets, this could be expensive
-            # Consider using approximate count or cached value in production
-            count_sql = """
-                SELECT count(DISTINCT time_bucket(%(bucket_interval)s, ts))
-                FROM reading
-                WHERE 1=1
-                  AND (%(device_id)s IS NULL OR device_id = %(device_id)s)
-                  AND (%(sensor_id)s IS NULL OR sensor_id = %(sensor_id)s)
-                  AND (%(ts_from)s IS NULL OR ts >= %(ts_from)s::timestamptz)
-                  AND (%(ts_to)s IS NULL OR ts <= %(ts_to)s::timestamptz)
-            """
-            cursor.execute(count_sql, params)
-            total_count = cursor.fetchone()[0] or 0
-    
-    # Pagination info
-    has_next = (offset + limit) < total_count
-    has_prev = offset > 0
-    next_offset = offset + limit if has_next else None
-    prev_offset = max(0, offset - limit) if has_prev else None
+        
+        # Estimated total (planner statistics, no full count)
+        total_estimate = estimate_count(base_sql.format(ts_bound=''), params)
+    
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if reverse:
+        rows.reverse()
+    
+    for row in rows:
+        data.append({
+            'bucket': row[0],
+            'device_id': row[1],
+            'sensor_id': row[2],
+            'avg': float(row[3]) if row[3] is not None else None,
+            'min': float(row[4]) if row[4] is not None else None,
+            'max': float(row[5]) if row[5] is not None else None,
+            'last': float(row[6]) if row[6] is not None else None,
+            'count': row[7],
+        })
+    
+    # Pagination info (keyset)
+    has_next = (has_more if not reverse else True) and bool(data)
+    has_prev = (bool(cursor_token) if not reverse else has_more) and bool(data)
+    next_cursor = encode_cursor(
+        [data[-1]['bucket'], data[-1]['device_id'], data[-1]['sensor_id']]
+    ) if has_next else None
+    prev_cursor = encode_cursor(
+        [data[0]['bucket'], data[0]['device_id'], data[0]['sensor_id']], reverse=True
+    ) if has_prev else None
     
     context = {
         'results': data,
@@ -188,12 +219,11 @@ def telemetry_list(request):
         'from_timestamp': ts_from,
         'to_timestamp': ts_to,
         'limit': limit,
-        'offset': offset,
-        'total_count': total_count,
+        'total_estimate': total_estimate,
         'has_next': has_next,
         'has_prev': has_prev,
-        'next_offset': next_offset,
-        'prev_offset': prev_offset,
+        'next_cursor': next_cursor,
+        'prev_cursor': prev_cursor,
         'form': form,
     }
     
@@ -270,16 +300,16 @@ def telemetry_drilldown(request):
                     'labels': row[4],
                 })
             
-            # Get basic statistics
+            # Get basic statistics (catálogo de séries, sem varrer reading)
             stats_sql = """
                 SELECT 
-                    count(*) as total_count,
-                    avg(value) as avg_value,
-                    min(value) as min_value,
-                    max(value) as max_value,
-                    min(ts) as earliest_ts,
-                    max(ts) as latest_ts
-                FROM reading
+                    sum(sample_count) as total_count,
+                    sum(value_sum) / NULLIF(sum(sample_count), 0) as avg_value,
+                    min(min_value) as min_value,
+                    max(max_value) as max_value,
+                    min(first_ts) as earliest_ts,
+                    max(last_ts) as latest_ts
+                FROM reading_series
                 WHERE sensor_id = %(sensor_id)s
                   AND (%(device_id)s IS NULL OR device_id = %(device_id)s)
             """
@@ -453,9 +483,11 @@ def telemetry_dashboard(request):
             
             # Get list of available sensors in this tenant
             with schema_context(tenant.schema_name):
+                # Catálogo de séries: sem varrer a hypertable de pontos
                 sql = """
                     SELECT DISTINCT sensor_id
-                    FROM reading
+                    FROM reading_series
+                    WHERE sample_count > 0
                     ORDER BY sensor_id
                     LIMIT 50
                 """
@@ -590,6 +622,68 @@ def chart_data_api(request):
     })
 
 
+@staff_member_required
+@require_http_methods(["GET"])
+def history_cache_stats(request):
+    """
+    Métricas do cache de séries históricas (apps.ingest.services.history_cache).
+    
+    Returns JSON with per-bucket hits, misses and hit_ratio.
+    """
+    from apps.ingest.services.history_cache import get_cache_stats
+    
+    return JsonResponse(get_cache_stats())
+
+
+@staff_member_required
+@require_http_methods(["GET"])
+def rule_evaluation_stats(request):
+    """
+    Duração da avaliação de regras por tenant (ops.RuleEvaluationRun).
+    
+    Query params:
+        - hours: janela (default 24, máx. 336)
+        - tenant: slug (opcional)
+    
+    Returns JSON with one dataset per tenant ({x: started_at, y: duration_ms})
+    and per-tenant summary (runs, avg/max duration, timeouts).
+    """
+    from django.db.models import Avg, Count, Max, Q
+    
+    try:
+        hours = min(max(int(request.GET.get('hours', 24)), 1), 336)
+    except ValueError:
+        hours = 24
+    
+    runs = RuleEvaluationRun.objects.filter(started_at__gte=timezone.now() - dt.timedelta(hours=hours))
+    if request.GET.get('tenant'):
+        runs = runs.filter(tenant_slug=request.GET['tenant'])
+    
+    datasets = {}
+    for tenant_slug, chunk, started_at, duration_ms, timed_out in runs.order_by('started_at').values_list(
+        'tenant_slug', 'chunk', 'started_at', 'duration_ms', 'timed_out'
+    ):
+        label = tenant_slug if not chunk else f"{tenant_slug}#{chunk}"
+        datasets.setdefault(label, []).append({
+            'x': started_at.isoformat(),
+            'y': duration_ms,
+            'timed_out': timed_out,
+        })
+    
+    summary = runs.values('tenant_slug').annotate(
+        runs=Count('id'),
+        avg_duration_ms=Avg('duration_ms'),
+        max_duration_ms=Max('duration_ms'),
+        timeouts=Count('id', filter=Q(timed_out=True)),
+    ).order_by('-max_duration_ms')
+    
+    return JsonResponse({
+        'hours': hours,
+        'datasets': [{'label': label, 'data': data} for label, data in datasets.items()],
+        'summary': list(summary),
+    })
+
+
 # =============================================================================
 # EXPORT VIEWS (Async with Celery)
 # =============================================================================
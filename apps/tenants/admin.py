@@ -35,6 +35,10 @@ class TenantAdmin(TenantAdminMixin, admin.ModelAdmin):
             'fields': ('name', 'slug'),
             'description': 'Nome e identificador único do tenant/organização.'
         }),
+        ('Retenção de Telemetria', {
+            'fields': ('archive_after_days',),
+            'description': 'Leituras mais antigas que o horizonte são exportadas para Parquet (MinIO) e removidas do banco.'
+        }),
         ('Schema e Timestamps', {
             'fields': ('schema_name', 'created_at', 'updated_at'),
             'classes': ('collapse',),
@@ -0,0 +1,18 @@
+# Cold-tier horizon per tenant (reading chunks -> Parquet in MinIO)
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tenants', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tenant',
+            name='archive_after_days',
+            field=models.PositiveIntegerField(blank=True, help_text='Arquivar leituras mais antigas que N dias em Parquet (vazio = não arquivar)', null=True),
+        ),
+    ]
@@ -19,6 +19,7 @@ class Tenant(TenantMixin):
     Attributes:
         name: Display name of the organization (e.g., "Uberlandia Medical Center")
         slug: URL-friendly identifier (e.g., "uberlandia-medical-center")
+        archive_after_days: Cold-tier horizon for reading chunks (None = disabled)
         created_at: Timestamp when tenant was created
         updated_at: Timestamp of last update
     """
@@ -34,6 +35,13 @@ class Tenant(TenantMixin):
         help_text="Identificador único para URLs e schema do banco"
     )
     
+    # Cold tier: chunks de reading mais antigos que N dias vão para Parquet no MinIO
+    archive_after_days = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text="Arquivar leituras mais antigas que N dias em Parquet (vazio = não arquivar)"
+    )
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
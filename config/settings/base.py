@@ -304,6 +304,33 @@ SIMPLE_JWT = {
 # Redis
 REDIS_URL = os.getenv('REDIS_URL', 'redis://redis:6379/0')
 
+# Cache (Redis) - compartilhado entre workers do Gunicorn e Celery
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv('REDIS_CACHE_URL', REDIS_URL),
+        'KEY_PREFIX': 'traksense',
+    }
+}
+
+# 📊 Cache de séries históricas (apps.ingest.services.history_cache)
+# Buckets cujo fim é anterior a now - SETTLE_SECONDS são considerados imutáveis
+# e ficam em cache por TIMEOUT segundos (None = sem expiração).
+TELEMETRY_HISTORY_CACHE = {
+    'ENABLED': os.getenv('TELEMETRY_HISTORY_CACHE_ENABLED', 'True') == 'True',
+    'SETTLE_SECONDS': int(os.getenv('TELEMETRY_HISTORY_CACHE_SETTLE_SECONDS', '120')),
+    'TIMEOUT': int(os.getenv('TELEMETRY_HISTORY_CACHE_TIMEOUT', '0')) or None,
+    'MAX_BUCKETS': 5000,  # Acima disso a consulta vai direto ao banco
+}
+
+# Dimensionamento de chunks das hypertables (apps.ingest.services.chunks)
+TIMESCALE_CHUNK_SIZING = {
+    'TARGET_MB': int(os.getenv('TIMESCALE_CHUNK_TARGET_MB', '256')),
+    'MIN_HOURS': 1,
+    'MAX_DAYS': 30,
+    'TOLERANCE': 0.25,  # Desvio relativo mínimo para alterar o intervalo
+}
+
 # Frontend URL (for email links, OAuth callbacks, etc.)
 FRONTEND_URL = os.getenv('FRONTEND_URL', 'http://localhost:5173')
 
@@ -322,6 +349,15 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
 
+# Filas de entrega de notificações de alertas (alerts.deliver_notifications)
+# Um worker precisa consumir estas filas (docker-compose: notification-worker)
+ALERT_NOTIFICATION_QUEUES = {
+    'email': 'notifications.email',
+    'in_app': 'notifications.in_app',
+    'sms': 'notifications.sms',
+    'whatsapp': 'notifications.whatsapp',
+}
+
 # Celery Beat Schedule - Tarefas periódicas
 CELERY_BEAT_SCHEDULE = {
     # Verificar status online/offline dos sensores a cada 1 hora
@@ -349,6 +385,9 @@ CELERY_BEAT_SCHEDULE = {
         },
     },
     # Avaliar regras de alertas a cada 5 minutos
+    # (dispatcher: uma task por tenant/bloco de regras + chord de totais)
+    # Rede de segurança: o IngestView já avalia cada lote contra o índice
+    # compilado de regras (apps.alerts.services.rule_index)
     'evaluate-alert-rules': {
         'task': 'alerts.evaluate_rules',
         'schedule': 300.0,  # 5 minutos em segundos
@@ -356,6 +395,22 @@ CELERY_BEAT_SCHEDULE = {
             'expires': 60,  # Expira em 1 minuto se não executar
         },
     },
+    # Enviar resumos de alertas cuja task agendada se perdeu
+    'flush-due-alert-digests': {
+        'task': 'alerts.flush_due_alert_digests',
+        'schedule': 300.0,  # 5 minutos em segundos
+        'options': {
+            'expires': 60,  # Expira em 1 minuto se não executar
+        },
+    },
+    # Reconciliar contadores de alertas (AlertCounter) com alerts_alert
+    'reconcile-alert-counters': {
+        'task': 'alerts.reconcile_alert_counters',
+        'schedule': 3600.0,  # 1 hora em segundos
+        'options': {
+            'expires': 600,  # Expira em 10 minutos se não executar
+        },
+    },
     # Limpar alertas antigos uma vez por dia (às 2:00 AM)
     'cleanup-old-alerts': {
         'task': 'alerts.cleanup_old_alerts',
@@ -364,6 +419,28 @@ CELERY_BEAT_SCHEDULE = {
             'expires': 3600,  # Expira em 1 hora se não executar
         },
     },
+    # Arquivar chunks antigos de telemetria em Parquet (MinIO) uma vez por dia
+    'archive-old-reading-chunks': {
+        'task': 'ingest.archive_old_chunks',
+        'schedule': 86400.0,  # 24 horas em segundos
+        'options': {
+            'expires': 3600,
+        },
+    },
+    'rollup-closed-days': {
+        'task': 'ingest.rollup_closed_days',
+        'schedule': 3600.0,  # 1 hora em segundos
+        'options': {
+            'expires': 1800,
+        },
+    },
+    'tune-chunk-intervals': {
+        'task': 'ingest.tune_chunk_intervals',
+        'schedule': 604800.0,  # 7 dias em segundos
+        'options': {
+            'expires': 3600,
+        },
+    },
 }
 
 # MinIO / S3
@@ -372,6 +449,8 @@ MINIO_ACCESS_KEY = os.getenv('MINIO_ACCESS_KEY')
 MINIO_SECRET_KEY = os.getenv('MINIO_SECRET_KEY')
 MINIO_BUCKET = os.getenv('MINIO_BUCKET', 'files')
 MINIO_USE_SSL = os.getenv('MINIO_USE_SSL', 'False') == 'True'
+# Camada fria da telemetria (chunks antigos de reading em Parquet)
+MINIO_ARCHIVE_BUCKET = os.getenv('MINIO_ARCHIVE_BUCKET', 'telemetry-archive')
 
 # 🔒 SECURITY: Validate MinIO credentials if not in DEBUG mode
 if not DEBUG: